@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+"""Benchmark the Myers differs against each other.
+
+This compares MyersDiffer with NumPyMyersDiffer, either on a pair of files
+given on the command line or on a set of generated files, and checks that
+both produce the same opcodes.
+
+Usage:
+
+    ./contrib/profiling/benchmark_differ.py [-n RUNS] [orig_file new_file]
+"""
+
+from __future__ import print_function, unicode_literals
+
+import argparse
+import os
+import random
+import sys
+import timeit
+
+scripts_dir = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(scripts_dir, '..', '..')))
+os.environ.setdefault(str('DJANGO_SETTINGS_MODULE'),
+                      str('reviewboard.settings'))
+
+import django
+django.setup()
+
+from reviewboard.diffviewer.differ import DiffCompatVersion
+from reviewboard.diffviewer.myersdiff import MyersDiffer
+from reviewboard.diffviewer.numpymyersdiff import NumPyMyersDiffer
+
+
+def generate_lines(rand, num_lines):
+    """Return a list of random lines of code-like text.
+
+    Lines are drawn from a small set, as with the blank lines, braces and
+    common statements found in real code. These can't be discarded up-front,
+    which makes for the most expensive diffs.
+    """
+    lines = ['\n', '}\n', '    }\n', '    return;\n'] + [
+        '    call_%d();\n' % i
+        for i in range(40)
+    ]
+
+    return [
+        rand.choice(lines)
+        for i in range(num_lines)
+    ]
+
+
+def generate_cases():
+    """Return a list of (name, orig_lines, new_lines) cases to benchmark."""
+    rand = random.Random(0)
+    cases = []
+
+    orig = generate_lines(rand, 5000)
+    new = list(orig)
+
+    for i in range(0, 5000, 250):
+        new[i:i + 10] = generate_lines(rand, 12)
+
+    cases.append(('scattered edits (5000 lines)', orig, new))
+
+    orig = generate_lines(rand, 5000)
+    new = orig[:1000] + generate_lines(rand, 3000) + orig[4000:]
+    cases.append(('large replacement (5000 lines)', orig, new))
+
+    orig = generate_lines(rand, 2000)
+    new = generate_lines(rand, 2000)
+    cases.append(('rewritten file (2000 lines)', orig, new))
+
+    return cases
+
+
+def benchmark(name, orig, new, runs):
+    """Benchmark both differs on a pair of files and print the results."""
+    results = []
+
+    for differ_cls in (MyersDiffer, NumPyMyersDiffer):
+        def _diff():
+            differ = differ_cls(
+                orig, new,
+                compat_version=DiffCompatVersion.DEFAULT)
+
+            return list(differ.get_opcodes())
+
+        opcodes = _diff()
+        secs = min(timeit.repeat(_diff, number=1, repeat=runs))
+        results.append((differ_cls.__name__, secs, opcodes))
+
+    print(name)
+
+    for differ_name, secs, opcodes in results:
+        print('    %-18s %8.3fs' % (differ_name, secs))
+
+    if results[0][2] != results[1][2]:
+        print('    ERROR: The opcodes differ!')
+    else:
+        print('    Speedup: %.1fx' % (results[0][1] / results[1][1]))
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(
+        description='Benchmark MyersDiffer against NumPyMyersDiffer.')
+    parser.add_argument('-n', '--runs', type=int, default=3,
+                        help='The number of runs for each differ.')
+    parser.add_argument('files', nargs='*', metavar='FILE',
+                        help='An original and modified file to diff.')
+    options = parser.parse_args()
+
+    if not NumPyMyersDiffer.is_available():
+        sys.stderr.write('NumPy must be installed to run this benchmark.\n')
+        sys.exit(1)
+
+    if options.files:
+        if len(options.files) != 2:
+            parser.error('An original and modified file must be provided.')
+
+        with open(options.files[0], 'rb') as fp:
+            orig = fp.read().splitlines(True)
+
+        with open(options.files[1], 'rb') as fp:
+            new = fp.read().splitlines(True)
+
+        cases = [('%s -> %s' % tuple(options.files), orig, new)]
+    else:
+        cases = generate_cases()
+
+    for name, orig, new in cases:
+        benchmark(name, orig, new, options.runs)
+
+
+if __name__ == '__main__':
+    main()
@@ -65,6 +65,20 @@ class DiffSettingsForm(SiteSettingsForm):
                     'to disable size restrictions.'),
         widget=forms.TextInput(attrs={'size': '15'}))
 
+    diffviewer_prerender_diffs = forms.BooleanField(
+        label=_('Pre-render diffs'),
+        help_text=_('Queue diffs to be rendered in the background when '
+                    'they\'re uploaded or published. This requires running '
+                    'the prerender_diffs management command as a worker.'),
+        required=False)
+
+    diffviewer_send_server_timing = forms.BooleanField(
+        label=_('Send diff timings to all users'),
+        help_text=_('Include the time spent building and rendering diffs in '
+                    'a Server-Timing header for all users. These timings are '
+                    'always sent to administrators.'),
+        required=False)
+
     def load(self):
         """Load settings from the form.
 
@@ -108,6 +122,8 @@ class DiffSettingsForm(SiteSettingsForm):
                 'fields': ('diffviewer_max_diff_size',
                            'diffviewer_context_num_lines',
                            'diffviewer_paginate_by',
-                           'diffviewer_paginate_orphans')
+                           'diffviewer_paginate_orphans',
+                           'diffviewer_prerender_diffs',
+                           'diffviewer_send_server_timing')
             }
         )
@@ -148,18 +148,23 @@ defaults.update({
     'company': '',
     'default_use_rich_text': True,
     'diffviewer_context_num_lines': 5,
+    'diffviewer_diff_compression': None,
     'diffviewer_include_space_patterns': [],
     'diffviewer_max_diff_size': 0,
     'diffviewer_paginate_by': 20,
     'diffviewer_paginate_orphans': 10,
+    'diffviewer_prerender_diffs': False,
+    'diffviewer_send_server_timing': False,
     'diffviewer_syntax_highlighting': True,
     'diffviewer_syntax_highlighting_threshold': 0,
     'diffviewer_show_trailing_whitespace': True,
+    'diffviewer_zstd_dictionary_id': None,
     'mail_send_review_mail': False,
     'mail_send_new_user_mail': False,
     'mail_send_password_changed_mail': False,
     'mail_enable_autogenerated_header': True,
     'mail_from_spoofing': EmailMessage.FROM_SPOOFING_SMART,
+    'review_request_page_max_rendered_entries': 50,
     'search_enable': False,
     'send_support_usage_stats': True,
     'site_domain_method': 'http',
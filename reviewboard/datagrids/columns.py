@@ -1,6 +1,8 @@
 from __future__ import unicode_literals
 
 from django.core.urlresolvers import NoReverseMatch
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.template.defaultfilters import date
 from django.utils import six
 from django.utils.html import (conditional_escape, escape, format_html,
@@ -18,6 +20,36 @@ from reviewboard.reviews.templatetags.reviewtags import render_star
 from reviewboard.site.urlresolvers import local_site_reverse
 
 
+def _count_subquery(queryset, group_field_name):
+    """Return an expression counting rows of a queryset for each outer row.
+
+    The queryset should be filtered on an
+    :py:class:`~django.db.models.OuterRef` to the outer query's rows. This
+    allows columns to fetch counts along with the datagrid's rows and to sort
+    by them, without performing a query for each row.
+
+    Args:
+        queryset (django.db.models.query.QuerySet):
+            The queryset of the rows to count.
+
+        group_field_name (unicode):
+            The name of the field the rows are filtered on.
+
+    Returns:
+        django.db.models.expressions.Expression:
+        The expression to annotate the datagrid's queryset with.
+    """
+    return Coalesce(
+        Subquery(
+            queryset
+            .order_by()
+            .values(group_field_name)
+            .annotate(count=Count('pk'))
+            .values('count'),
+            output_field=IntegerField()),
+        0)
+
+
 class BaseStarColumn(Column):
     """Indicates if an item is starred.
 
@@ -384,18 +416,64 @@ class DiffUpdatedSinceColumn(DateTimeSinceColumn):
 
 
 class GroupMemberCountColumn(Column):
-    """Shows the number of users that are part of a review group."""
+    """Shows the number of users that are part of a review group.
+
+    Version Changed:
+        4.0:
+        The counts are now fetched along with the groups, instead of with one
+        query per row, and the column is now sortable.
+    """
 
     def __init__(self, *args, **kwargs):
         """Initialize the column."""
         super(GroupMemberCountColumn, self).__init__(
             link=True,
             link_func=self.link_to_object,
+            sortable=True,
             *args, **kwargs)
 
+    def get_sort_field(self, state):
+        """Return the field used for sorting this column.
+
+        Args:
+            state (djblets.datagrid.grids.StatefulColumn):
+                The column state.
+
+        Returns:
+            unicode:
+            The name of the member count annotated by
+            :py:meth:`augment_queryset`.
+        """
+        return 'groupmembercount_count'
+
     def render_data(self, state, group):
         """Return the rendered contents of the column."""
-        return six.text_type(group.users.count())
+        return six.text_type(group.groupmembercount_count)
+
+    def augment_queryset(self, state, queryset):
+        """Add additional queries to the queryset.
+
+        This will annotate each group with its number of members.
+
+        Args:
+            state (djblets.datagrid.grids.StatefulColumn):
+                The column state.
+
+            queryset (django.db.models.query.QuerySet):
+                The queryset to augment.
+
+        Returns:
+            django.db.models.query.QuerySet:
+            The resulting queryset.
+        """
+        members_field = queryset.model._meta.get_field('users')
+        group_field_name = members_field.m2m_field_name()
+
+        return queryset.annotate(groupmembercount_count=_count_subquery(
+            members_field.remote_field.through.objects.filter(**{
+                group_field_name: OuterRef('pk'),
+            }),
+            group_field_name))
 
     def link_to_object(self, state, group, value):
         """Return the link to the object in the column."""
@@ -541,13 +619,70 @@ class PendingCountColumn(Column):
 
     This will show the pending number of review requests for the given
     review group or user. It only applies to group or user lists.
+
+    The column's ``field_name`` must be the name of the many-to-many relation
+    from the group or user to the review requests being counted.
+
+    Version Changed:
+        4.0:
+        The counts are now fetched along with the groups or users, instead of
+        with one query per row, and the column is now sortable.
     """
 
+    def __init__(self, *args, **kwargs):
+        """Initialize the column."""
+        super(PendingCountColumn, self).__init__(
+            sortable=True,
+            *args, **kwargs)
+
+    def get_sort_field(self, state):
+        """Return the field used for sorting this column.
+
+        Args:
+            state (djblets.datagrid.grids.StatefulColumn):
+                The column state.
+
+        Returns:
+            unicode:
+            The name of the pending count annotated by
+            :py:meth:`augment_queryset`.
+        """
+        return 'pendingcount_count'
+
     def render_data(self, state, obj):
         """Return the rendered contents of the column."""
-        return six.text_type(
-            getattr(obj, self.field_name).filter(
-                public=True, status='P').count())
+        return six.text_type(obj.pendingcount_count)
+
+    def augment_queryset(self, state, queryset):
+        """Add additional queries to the queryset.
+
+        This will annotate each group or user with its number of public,
+        pending review requests.
+
+        Args:
+            state (djblets.datagrid.grids.StatefulColumn):
+                The column state.
+
+            queryset (django.db.models.query.QuerySet):
+                The queryset to augment.
+
+        Returns:
+            django.db.models.query.QuerySet:
+            The resulting queryset.
+        """
+        review_requests_field = \
+            queryset.model._meta.get_field(self.field_name).field
+        obj_field_name = review_requests_field.m2m_reverse_field_name()
+        review_request_field_name = review_requests_field.m2m_field_name()
+
+        return queryset.annotate(pendingcount_count=_count_subquery(
+            review_requests_field.remote_field.through.objects.filter(**{
+                obj_field_name: OuterRef('pk'),
+                '%s__public' % review_request_field_name: True,
+                '%s__status' % review_request_field_name:
+                    ReviewRequest.PENDING_REVIEW,
+            }),
+            obj_field_name))
 
 
 class PeopleColumn(Column):
@@ -970,13 +1105,24 @@ class ToMeColumn(Column):
 
 
 class DiffSizeColumn(Column):
-    """Indicates line add/delete counts for the latest diffset."""
+    """Indicates line add/delete counts for the latest diffset.
+
+    The counts are stored on the review request's
+    :py:class:`~reviewboard.diffviewer.models.diffset_history.DiffSetHistory`
+    when a diff is published, so the column can be rendered and sorted
+    without loading any diffs.
+
+    Version Changed:
+        4.0:
+        The column is now sortable by the total number of changed lines.
+    """
 
     def __init__(self, *args, **kwargs):
         """Initialize the column."""
         super(DiffSizeColumn, self).__init__(
             label=_('Diff Size'),
-            sortable=False,
+            db_field='diffset_history__last_diff_line_count',
+            sortable=True,
             shrink=True,
             *args, **kwargs)
 
@@ -985,14 +1131,7 @@ class DiffSizeColumn(Column):
         if review_request.repository_id is None:
             return ''
 
-        diffsets = list(review_request.diffset_history.diffsets.all())
-
-        if not diffsets:
-            return ''
-
-        diffset = diffsets[-1]
-
-        counts = diffset.get_total_line_counts()
+        counts = review_request.diffset_history.get_last_diff_line_counts()
         insert_count = counts.get('raw_insert_count')
         delete_count = counts.get('raw_delete_count')
         result = []
@@ -1013,8 +1152,8 @@ class DiffSizeColumn(Column):
     def augment_queryset(self, state, queryset):
         """Add additional queries to the queryset.
 
-        This will prefetch the diffsets and filediffs needed to perform the
-        line calculations.
+        This will select the diffset history containing the stored line
+        counts.
 
         Args:
             state (djblets.datagrid.grids.StatefulColumn):
@@ -1027,7 +1166,4 @@ class DiffSizeColumn(Column):
             django.db.models.query.QuerySet:
             The resulting queryset.
         """
-        # TODO: Update this to fetch only the specific fields when we move
-        #       to a newer version of Django.
-        return queryset.prefetch_related('diffset_history__diffsets',
-                                         'diffset_history__diffsets__files')
+        return queryset.select_related('diffset_history')
@@ -79,6 +79,46 @@ class ShowClosedReviewRequestsMixin(object):
         return False
 
 
+class SortByAnnotationMixin(object):
+    """A mixin for datagrids with columns that sort by annotated values.
+
+    Some columns sort by values that are only added to the queryset by their
+    ``augment_queryset`` method, which is normally only called for visible
+    columns. This makes sure hidden columns that are being sorted on still
+    augment the queryset.
+
+    Version Added:
+        4.0
+    """
+
+    def post_process_queryset(self, queryset):
+        """Add column-specific data to the queryset.
+
+        Args:
+            queryset (django.db.models.query.QuerySet):
+                The queryset to augment.
+
+        Returns:
+            django.db.models.query.QuerySet:
+            The resulting augmented queryset.
+        """
+        queryset = super(SortByAnnotationMixin, self).post_process_queryset(
+            queryset)
+
+        for sort_item in self.sort_list or []:
+            column = self.get_column(sort_item.lstrip('-'))
+
+            if column is None or not column.sortable:
+                continue
+
+            stateful_column = self.get_stateful_column(column)
+
+            if stateful_column not in self.columns:
+                queryset = stateful_column.augment_queryset(queryset)
+
+        return queryset
+
+
 class DataGridJSMixin(object):
     """Mixin that provides enhanced JavaScript support for datagrids.
 
@@ -473,7 +513,7 @@ class DashboardDataGrid(DataGridSidebarMixin, ReviewRequestDataGrid):
         return profile_changed or parent_profile_changed
 
 
-class UsersDataGrid(AlphanumericDataGrid):
+class UsersDataGrid(SortByAnnotationMixin, AlphanumericDataGrid):
     """A datagrid showing a list of users registered on Review Board."""
 
     username = UsernameColumn(label=_('Username'))
@@ -537,7 +577,7 @@ class UsersDataGrid(AlphanumericDataGrid):
         return False
 
 
-class GroupDataGrid(DataGrid):
+class GroupDataGrid(SortByAnnotationMixin, DataGrid):
     """A datagrid showing a list of review groups accessible by the user."""
 
     star = ReviewGroupStarColumn()
@@ -3,7 +3,9 @@ from __future__ import print_function, unicode_literals
 from django.contrib.auth.models import AnonymousUser, User
 from django.core.cache import cache
 from django.core.urlresolvers import reverse
+from django.db import connection
 from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
 from django.utils import six
 from django.utils.safestring import SafeText
 from djblets.datagrid.grids import DataGrid
@@ -12,8 +14,11 @@ from djblets.testing.decorators import add_fixtures
 
 from reviewboard.accounts.models import Profile, ReviewRequestVisit
 from reviewboard.datagrids.builtin_items import UserGroupsItem, UserProfileItem
-from reviewboard.datagrids.columns import (FullNameColumn, SummaryColumn,
+from reviewboard.datagrids.columns import (DiffSizeColumn,
+                                           FullNameColumn,
+                                           SummaryColumn,
                                            UsernameColumn)
+from reviewboard.diffviewer.models import DiffSetHistory
 from reviewboard.reviews.models import (Group,
                                         ReviewRequest,
                                         ReviewRequestDraft,
@@ -555,6 +560,118 @@ class GroupListViewTests(BaseViewTestCase):
         self.assertEqual(datagrid.rows[2]['object'].name, 'newgroup')
         self.assertEqual(datagrid.rows[3]['object'].name, 'privgroup')
 
+    @add_fixtures(['test_users'])
+    def test_with_counts(self):
+        """Testing group_list view with pending review request and member
+        counts
+        """
+        group1 = self.create_review_group(name='group1')
+        group2 = self.create_review_group(name='group2')
+        group3 = self.create_review_group(name='group3')
+
+        group1.users.add(*User.objects.filter(username__in=['doc',
+                                                            'grumpy']))
+        group3.users.add(User.objects.get(username='doc'))
+
+        for i in range(2):
+            review_request = self.create_review_request(publish=True)
+            review_request.target_groups.add(group2)
+
+        review_request = self.create_review_request(publish=True)
+        review_request.target_groups.add(group1, group2)
+
+        # Neither of these should be counted.
+        review_request = self.create_review_request(publish=False)
+        review_request.target_groups.add(group1)
+
+        review_request = self.create_review_request(
+            publish=True,
+            status=ReviewRequest.SUBMITTED)
+        review_request.target_groups.add(group1)
+
+        response = self.client.get(
+            '/groups/?columns=name,pending_count,member_count'
+            '&sort=-pending_count,name')
+        self.assertEqual(response.status_code, 200)
+
+        datagrid = self._get_context_var(response, 'datagrid')
+        self.assertEqual(
+            [
+                (row['object'].name,
+                 row['object'].pendingcount_count,
+                 row['object'].groupmembercount_count)
+                for row in datagrid.rows
+            ],
+            [
+                ('group2', 3, 0),
+                ('group1', 1, 2),
+                ('group3', 0, 1),
+            ])
+
+        response = self.client.get(
+            '/groups/?columns=name,pending_count,member_count'
+            '&sort=-member_count,name')
+        self.assertEqual(response.status_code, 200)
+
+        datagrid = self._get_context_var(response, 'datagrid')
+        self.assertEqual(
+            [row['object'].name for row in datagrid.rows],
+            ['group1', 'group3', 'group2'])
+
+    @add_fixtures(['test_users'])
+    def test_with_counts_sort_on_hidden_columns(self):
+        """Testing group_list view sorted by pending review request and
+        member counts with the columns hidden
+        """
+        group1 = self.create_review_group(name='group1')
+        group2 = self.create_review_group(name='group2')
+        group1.users.add(User.objects.get(username='doc'))
+
+        review_request = self.create_review_request(publish=True)
+        review_request.target_groups.add(group2)
+
+        response = self.client.get('/groups/?columns=name'
+                                   '&sort=-pending_count,name')
+        self.assertEqual(response.status_code, 200)
+
+        datagrid = self._get_context_var(response, 'datagrid')
+        self.assertEqual([row['object'].name for row in datagrid.rows],
+                         ['group2', 'group1'])
+
+        response = self.client.get('/groups/?columns=name'
+                                   '&sort=-member_count,name')
+        self.assertEqual(response.status_code, 200)
+
+        datagrid = self._get_context_var(response, 'datagrid')
+        self.assertEqual([row['object'].name for row in datagrid.rows],
+                         ['group1', 'group2'])
+
+    @add_fixtures(['test_users'])
+    def test_with_counts_query_count(self):
+        """Testing group_list view with pending review request and member
+        counts does not perform queries for each group
+        """
+        for i in range(2):
+            group = self.create_review_group(name='group%s' % i)
+            group.users.add(User.objects.get(username='doc'))
+
+        url = '/groups/?columns=name,pending_count,member_count'
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url)
+
+        num_queries = len(ctx.captured_queries)
+
+        for i in range(2, 5):
+            group = self.create_review_group(name='group%s' % i)
+            group.users.add(User.objects.get(username='doc'))
+
+        with self.assertNumQueries(num_queries):
+            response = self.client.get(url)
+
+        datagrid = self._get_context_var(response, 'datagrid')
+        self.assertEqual(len(datagrid.rows), 5)
+
     @add_fixtures(['test_users'])
     def test_as_anonymous_and_redirect(self):
         """Testing group_list view with site-wide login enabled"""
@@ -820,6 +937,52 @@ class SubmitterListViewTests(BaseViewTestCase):
 
         self.assertEqual(datagrid.rows[0]['object'].username, 'grumpy')
 
+    @add_fixtures(['test_users'])
+    def test_with_pending_count(self):
+        """Testing users_list view sorted by pending review request count"""
+        for username, count in (('grumpy', 2), ('doc', 1)):
+            user = User.objects.get(username=username)
+
+            for i in range(count):
+                review_request = self.create_review_request(publish=True)
+                review_request.target_people.add(user)
+
+        response = self.client.get(
+            '/users/?columns=username,pending_count'
+            '&sort=-pending_count,username')
+        self.assertEqual(response.status_code, 200)
+
+        datagrid = self._get_context_var(response, 'datagrid')
+        self.assertEqual(
+            [
+                (row['object'].username, row['object'].pendingcount_count)
+                for row in datagrid.rows
+            ],
+            [
+                ('grumpy', 2),
+                ('doc', 1),
+                ('admin', 0),
+                ('dopey', 0),
+            ])
+
+    @add_fixtures(['test_users'])
+    def test_with_pending_count_sort_on_hidden_column(self):
+        """Testing users_list view sorted by pending review request count
+        with the column hidden
+        """
+        review_request = self.create_review_request(publish=True)
+        review_request.target_people.add(
+            User.objects.get(username='grumpy'))
+
+        response = self.client.get('/users/?columns=username'
+                                   '&sort=-pending_count,username')
+        self.assertEqual(response.status_code, 200)
+
+        datagrid = self._get_context_var(response, 'datagrid')
+        self.assertEqual(
+            [row['object'].username for row in datagrid.rows],
+            ['grumpy', 'admin', 'doc', 'dopey'])
+
     @add_fixtures(['test_users'])
     def test_as_anonymous_and_redirect(self):
         """Testing users_list view as anonymous with anonymous
@@ -946,6 +1109,83 @@ class SubmitterViewTests(BaseViewTestCase):
                          review_request1)
 
 
+class DiffSizeColumnTests(BaseColumnTestCase):
+    """Tests for reviewboard.datagrids.columns.DiffSizeColumn."""
+
+    column = DiffSizeColumn()
+
+    fixtures = ['test_users', 'test_scmtools']
+
+    def test_render_data(self):
+        """Testing DiffSizeColumn.render_data with stored line counts"""
+        review_request = self.create_review_request(create_repository=True,
+                                                    publish=True)
+        history = review_request.diffset_history
+        history.last_diff_insert_count = 10
+        history.last_diff_delete_count = 3
+        history.last_diff_line_count = 13
+        history.save()
+
+        review_request = (
+            self.column.augment_queryset(self.stateful_column,
+                                         ReviewRequest.objects.all())
+            .get(pk=review_request.pk))
+
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self.column.render_data(self.stateful_column, review_request),
+                '<span class="diff-size-column insert">+10</span>&nbsp;'
+                '<span class="diff-size-column delete">-3</span>')
+
+    def test_render_data_without_stored_counts(self):
+        """Testing DiffSizeColumn.render_data without stored line counts"""
+        review_request = self.create_review_request(create_repository=True,
+                                                    publish=True)
+        diffset = self.create_diffset(review_request)
+        self.create_filediff(diffset,
+                             diff=self.DEFAULT_GIT_FILEDIFF_DATA_DIFF)
+
+        self.assertEqual(
+            self.column.render_data(self.stateful_column, review_request),
+            '<span class="diff-size-column insert">+1</span>&nbsp;'
+            '<span class="diff-size-column delete">-1</span>')
+
+        history = DiffSetHistory.objects.get(
+            pk=review_request.diffset_history_id)
+        self.assertEqual(history.last_diff_line_count, 2)
+
+    def test_render_data_without_repository(self):
+        """Testing DiffSizeColumn.render_data without a repository"""
+        review_request = self.create_review_request(publish=True)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self.column.render_data(self.stateful_column, review_request),
+                '')
+
+    def test_sorting(self):
+        """Testing DiffSizeColumn sorts by the stored line counts"""
+        repository = self.create_repository()
+        review_requests = [
+            self.create_review_request(repository=repository,
+                                       summary='Summary %s' % i,
+                                       publish=True)
+            for i in range(3)
+        ]
+
+        for review_request, line_count in zip(review_requests, (5, 20, 1)):
+            DiffSetHistory.objects.filter(
+                pk=review_request.diffset_history_id).update(
+                    last_diff_insert_count=line_count,
+                    last_diff_delete_count=0,
+                    last_diff_line_count=line_count)
+
+        self.assertEqual(
+            list(ReviewRequest.objects.order_by(
+                '-%s' % self.column.get_sort_field(self.stateful_column))),
+            [review_requests[1], review_requests[0], review_requests[2]])
+
+
 class FullNameColumnTests(BaseColumnTestCase):
     """Testing reviewboard.datagrids.columns.FullNameColumn."""
 
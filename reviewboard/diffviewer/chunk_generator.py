@@ -3,24 +3,32 @@ from __future__ import unicode_literals
 import fnmatch
 import functools
 import hashlib
+import os
 import re
+import zlib
 
+import pygments
 import pygments.util
+from django.conf import settings
+from django.core.cache import cache
 from django.utils import six
 from django.utils.encoding import force_text
 from django.utils.html import escape
 from django.utils.safestring import mark_safe
-from django.utils.six.moves import range, zip_longest
+from django.utils.six.moves import cPickle as pickle, range, zip_longest
 from django.utils.translation import get_language, ugettext as _
 from djblets.log import log_timed
-from djblets.cache.backend import cache_memoize
+from djblets.cache.backend import (CACHE_CHUNK_SIZE, cache_memoize,
+                                   make_cache_key)
 from djblets.siteconfig.models import SiteConfiguration
 from pygments import highlight
 from pygments.formatters import HtmlFormatter
-from pygments.lexers import guess_lexer_for_filename
+from pygments.lexers import (find_lexer_class, get_all_lexers,
+                             guess_lexer_for_filename)
 
 from reviewboard.diffviewer.differ import DiffCompatVersion, get_differ
-from reviewboard.diffviewer.diffutils import (get_filediff_encodings,
+from reviewboard.diffviewer.diffutils import (get_chunks_in_range,
+                                              get_filediff_encodings,
                                               get_line_changed_regions,
                                               get_original_file,
                                               get_patched_file,
@@ -28,6 +36,57 @@ from reviewboard.diffviewer.diffutils import (get_filediff_encodings,
                                               split_line_endings)
 from reviewboard.diffviewer.opcode_generator import (DiffOpcodeGenerator,
                                                      get_diff_opcode_generator)
+from reviewboard.diffviewer.timing import (CACHE_CHUNKS,
+                                           CACHE_HIGHLIGHT,
+                                           STAGE_DIFF,
+                                           STAGE_HIGHLIGHT,
+                                           record_diff_cache,
+                                           time_diff_stage)
+
+
+#: The compiled filename patterns for each available Pygments lexer.
+#:
+#: This is built the first time it's needed, by
+#: :py:func:`_get_lexer_filename_patterns`.
+_lexer_filename_patterns = None
+
+
+def _get_lexer_filename_patterns():
+    """Return the compiled filename patterns for each Pygments lexer.
+
+    This includes both the primary filename patterns and the alias filename
+    patterns, which are both considered by
+    :py:func:`~pygments.lexers.guess_lexer_for_filename`.
+
+    Version Added:
+        4.0
+
+    Returns:
+        list of list of re.RegexObject:
+        The compiled filename patterns for each lexer that handles any
+        filenames.
+    """
+    global _lexer_filename_patterns
+
+    if _lexer_filename_patterns is None:
+        lexer_filename_patterns = []
+
+        for name, aliases, filenames, mimetypes in get_all_lexers():
+            lexer_cls = find_lexer_class(name)
+
+            if lexer_cls is not None:
+                patterns = [
+                    re.compile(fnmatch.translate(pattern))
+                    for pattern in (list(lexer_cls.filenames) +
+                                    list(lexer_cls.alias_filenames))
+                ]
+
+                if patterns:
+                    lexer_filename_patterns.append(patterns)
+
+        _lexer_filename_patterns = lexer_filename_patterns
+
+    return _lexer_filename_patterns
 
 
 class NoWrapperHtmlFormatter(HtmlFormatter):
@@ -76,11 +135,41 @@ class RawDiffChunkGenerator(object):
     # Default tab size used in browsers.
     TAB_SIZE = DiffOpcodeGenerator.TAB_SIZE
 
+    #: The maximum number of lines stored in each cached segment of chunks.
+    #:
+    #: Chunks are cached in segments so that callers needing only part of a
+    #: diff don't have to load all of it. Chunks with more lines than this
+    #: are split across segments.
+    #:
+    #: Version Added:
+    #:     4.0
+    CHUNK_SEGMENT_MAX_LINES = 500
+
+    #: The number of cached segments of chunks to fetch at a time.
+    #:
+    #: Version Added:
+    #:     4.0
+    CHUNK_SEGMENT_FETCH_BATCH_SIZE = 8
+
+    #: The maximum size of each item stored in the cache for a segment.
+    #:
+    #: Segments with long lines may be too large to store in a single cache
+    #: item (memcached, for instance, rejects items over 1MB). Their data is
+    #: split across several items of up to this size.
+    #:
+    #: Version Added:
+    #:     4.0
+    CHUNK_SEGMENT_MAX_ITEM_SIZE = CACHE_CHUNK_SIZE
+
     def __init__(self, old, new, orig_filename, modified_filename,
                  enable_syntax_highlighting=True, encoding_list=None,
-                 diff_compat=DiffCompatVersion.DEFAULT):
+                 diff_compat=DiffCompatVersion.DEFAULT, request=None):
         """Initialize the chunk generator.
 
+        Version Changed:
+            4.0:
+            Added the ``request`` argument.
+
         Args:
             old (bytes or list of bytes):
                 The old data being modified.
@@ -105,6 +194,10 @@ class RawDiffChunkGenerator(object):
             diff_compat (int, optional):
                 A specific diff compatibility version to use for any diffing
                 logic.
+
+            request (django.http.HttpRequest, optional):
+                The HTTP request from the client. This is used to record
+                timings for the stages of generating chunks.
         """
         # Check that the data coming in is in the formats we accept.
         for param, param_name in ((old, 'old'), (new, 'new')):
@@ -139,6 +232,7 @@ class RawDiffChunkGenerator(object):
         self.enable_syntax_highlighting = enable_syntax_highlighting
         self.encoding_list = encoding_list or ['iso-8859-15']
         self.diff_compat = diff_compat
+        self.request = request
         self.differ = None
 
         # Chunk processing state.
@@ -146,6 +240,10 @@ class RawDiffChunkGenerator(object):
         self._last_header_index = [0, 0]
         self._chunk_index = 0
 
+        # Chunk caching state.
+        self._cached_chunks_index = None
+        self._generated_chunks = None
+
     def get_opcode_generator(self):
         """Return the DiffOpcodeGenerator used to generate diff opcodes."""
         return get_diff_opcode_generator(self.differ)
@@ -158,20 +256,346 @@ class RawDiffChunkGenerator(object):
         stored in cache (given a cache key), and yielded.
         """
         if cache_key:
-            chunks = cache_memoize(cache_key,
-                                   lambda: list(self.get_chunks_uncached()),
-                                   large_data=True)
+            chunks = self._iter_cached_chunks(cache_key)
         else:
             chunks = self.get_chunks_uncached()
 
         for chunk in chunks:
             yield chunk
 
+    def get_chunks_in_range(self, first_line, num_lines, cache_key=None):
+        """Return the chunks within a range of lines.
+
+        If a cache key is provided, only the cached segments containing the
+        range of lines will be loaded.
+
+        See :py:func:`~reviewboard.diffviewer.diffutils.get_chunks_in_range`
+        for information on the returned chunks.
+
+        Version Added:
+            4.0
+
+        Args:
+            first_line (int):
+                The first virtual line number in the range.
+
+            num_lines (int):
+                The number of lines in the range.
+
+            cache_key (unicode, optional):
+                The cache key for the chunks.
+
+        Returns:
+            list of dict:
+            The chunks within the range of lines.
+        """
+        if num_lines <= 0:
+            return []
+
+        last_line = first_line + num_lines - 1
+
+        if cache_key:
+            chunks = self._iter_cached_chunks(
+                cache_key,
+                lambda segment: (segment['first_line'] <= last_line and
+                                 segment['last_line'] >= first_line))
+        else:
+            chunks = self.get_chunks_uncached()
+
+        return list(get_chunks_in_range(chunks, first_line, num_lines))
+
+    def get_chunk(self, chunk_index, cache_key=None):
+        """Return a single chunk.
+
+        If a cache key is provided, only the cached segments containing the
+        chunk will be loaded.
+
+        Version Added:
+            4.0
+
+        Args:
+            chunk_index (int):
+                The index of the chunk to return.
+
+            cache_key (unicode, optional):
+                The cache key for the chunks.
+
+        Returns:
+            dict:
+            The chunk, or ``None`` if there's no chunk with that index.
+        """
+        if cache_key:
+            chunks = self._iter_cached_chunks(
+                cache_key,
+                lambda segment: (segment['first_chunk'] <= chunk_index <=
+                                 segment['last_chunk']))
+        else:
+            chunks = self.get_chunks_uncached()
+
+        for chunk in chunks:
+            if chunk['index'] == chunk_index:
+                return chunk
+
+        return None
+
+    def get_chunks_summary(self, cache_key=None):
+        """Return a summary of the chunks.
+
+        If a cache key is provided and the chunks have already been cached,
+        this won't load any of the chunks.
+
+        Version Added:
+            4.0
+
+        Args:
+            cache_key (unicode, optional):
+                The cache key for the chunks.
+
+        Returns:
+            dict:
+            The summary, as returned by :py:func:`get_chunks_summary`.
+        """
+        if cache_key:
+            return self._get_cached_chunks_index(cache_key)['summary']
+        else:
+            return get_chunks_summary(self.get_chunks_uncached())
+
     def get_chunks_uncached(self):
         """Yield the list of chunks, bypassing the cache."""
         for chunk in self.generate_chunks(self.old, self.new):
             yield chunk
 
+    def _get_cached_chunks_index(self, cache_key):
+        """Return the index of the cached segments of chunks.
+
+        If the chunks aren't in the cache, they'll be generated and cached.
+
+        Args:
+            cache_key (unicode):
+                The cache key for the chunks.
+
+        Returns:
+            dict:
+            The index of cached segments.
+        """
+        if self._cached_chunks_index is None:
+            index = cache.get(make_cache_key(cache_key))
+            hit = isinstance(index, dict) and 'segments' in index
+            record_diff_cache(self.request, CACHE_CHUNKS, hit,
+                              self.modified_filename)
+
+            if not hit:
+                index = self._cache_chunks(cache_key)
+
+            self._cached_chunks_index = index
+
+        return self._cached_chunks_index
+
+    def _iter_cached_chunks(self, cache_key, segment_filter=None):
+        """Iterate through chunks from the cache.
+
+        Chunks are cached in segments of up to
+        :py:attr:`CHUNK_SEGMENT_MAX_LINES` lines, along with a small index
+        describing the segments. Only the segments matching the filter are
+        fetched from the cache, :py:attr:`CHUNK_SEGMENT_FETCH_BATCH_SIZE`
+        segments at a time, as the chunks are iterated through.
+
+        Chunks that span the boundary of a matched segment will only contain
+        the lines found in the matched segments.
+
+        If the chunks (or any needed segments) aren't in the cache, all
+        chunks will be generated and cached, and the remaining chunks will
+        be yielded from those.
+
+        Args:
+            cache_key (unicode):
+                The cache key for the chunks.
+
+            segment_filter (callable, optional):
+                A function taking an entry from the index's list of segments
+                and returning whether that segment is needed. If not
+                provided, all segments are fetched.
+
+        Yields:
+            dict:
+            Each chunk in the fetched segments.
+        """
+        index = self._get_cached_chunks_index(cache_key)
+        last_index = -1
+
+        if self._generated_chunks is None:
+            segment_part_keys = [
+                self._get_segment_part_keys(cache_key, segment)
+                for segment in index['segments']
+                if segment_filter is None or segment_filter(segment)
+            ]
+            batch_size = self.CHUNK_SEGMENT_FETCH_BATCH_SIZE
+            pending_chunk = None
+
+            for i in range(0, len(segment_part_keys), batch_size):
+                batch_part_keys = segment_part_keys[i:i + batch_size]
+                batch_keys = [
+                    key
+                    for part_keys in batch_part_keys
+                    for key in part_keys
+                ]
+                cached_segments = cache.get_many(batch_keys)
+
+                if len(cached_segments) != len(batch_keys):
+                    # Some of the segments have been evicted from the cache.
+                    # Start over with a fresh set, and pick up where we left
+                    # off below.
+                    record_diff_cache(self.request, CACHE_CHUNKS, False,
+                                      self.modified_filename)
+                    self._cached_chunks_index = self._cache_chunks(cache_key)
+                    break
+
+                for part_keys in batch_part_keys:
+                    pieces = pickle.loads(zlib.decompress(b''.join(
+                        cached_segments[key]
+                        for key in part_keys
+                    )))
+
+                    for piece in pieces:
+                        if (pending_chunk is not None and
+                            pending_chunk['index'] == piece['index']):
+                            # This is a continuation of a chunk that was split
+                            # across segments.
+                            pending_chunk['lines'] += piece['lines']
+                            pending_chunk['numlines'] = \
+                                len(pending_chunk['lines'])
+                        else:
+                            if pending_chunk is not None:
+                                yield pending_chunk
+                                last_index = pending_chunk['index']
+
+                            pending_chunk = piece
+
+            if self._generated_chunks is None:
+                if pending_chunk is not None:
+                    yield pending_chunk
+
+                return
+
+        for chunk in self._generated_chunks:
+            if chunk['index'] > last_index:
+                yield chunk
+
+    def _get_segment_part_keys(self, cache_key, segment):
+        """Return the cache keys for the parts of a cached segment.
+
+        Args:
+            cache_key (unicode):
+                The cache key for the chunks.
+
+            segment (dict):
+                The segment's entry in the index of cached segments.
+
+        Returns:
+            list of unicode:
+            The cache keys for each part of the segment's data, in order.
+        """
+        segment_key = '%s-segment-%d' % (cache_key, segment['number'])
+
+        return [make_cache_key(segment_key)] + [
+            make_cache_key('%s-part-%d' % (segment_key, part))
+            for part in range(1, segment.get('num_parts', 1))
+        ]
+
+    def _cache_chunks(self, cache_key):
+        """Generate the chunks and store them in the cache.
+
+        The generated chunks will be made available to the other methods
+        through ``self._generated_chunks``.
+
+        Args:
+            cache_key (unicode):
+                The cache key for the chunks.
+
+        Returns:
+            dict:
+            The index of cached segments.
+        """
+        # Any stages run while generating chunks (such as fetching and
+        # patching files) are timed separately from the diff stage.
+        with time_diff_stage(self.request, STAGE_DIFF,
+                             self.modified_filename):
+            chunks = list(self.get_chunks_uncached())
+
+        for i, chunk in enumerate(chunks):
+            chunk['index'] = i
+
+        max_lines = self.CHUNK_SEGMENT_MAX_LINES
+        segments = []
+        segment_infos = []
+        pieces = []
+        num_segment_lines = 0
+
+        max_item_size = self.CHUNK_SEGMENT_MAX_ITEM_SIZE
+
+        def _add_segment():
+            data = zlib.compress(
+                pickle.dumps(pieces, protocol=pickle.HIGHEST_PROTOCOL))
+            segment_info = {
+                'number': len(segments),
+                'first_chunk': pieces[0]['index'],
+                'last_chunk': pieces[-1]['index'],
+                'first_line': pieces[0]['lines'][0][0],
+                'last_line': pieces[-1]['lines'][-1][0],
+            }
+
+            if len(data) > max_item_size:
+                segment_info['num_parts'] = \
+                    (len(data) + max_item_size - 1) // max_item_size
+
+            segment_infos.append(segment_info)
+            segments.append(data)
+
+        for chunk in chunks:
+            lines = chunk['lines']
+            start = 0
+
+            while start < len(lines):
+                end = min(len(lines), start + max_lines - num_segment_lines)
+                piece = dict(chunk)
+                piece.update({
+                    'lines': lines[start:end],
+                    'numlines': end - start,
+                })
+                pieces.append(piece)
+                num_segment_lines += end - start
+                start = end
+
+                if num_segment_lines >= max_lines:
+                    _add_segment()
+                    pieces = []
+                    num_segment_lines = 0
+
+        if pieces:
+            _add_segment()
+
+        index = {
+            'segments': segment_infos,
+            'summary': get_chunks_summary(chunks),
+        }
+
+        # The segments are stored before the index, so that the index is
+        # never found without its segments.
+        cache.set_many(
+            {
+                key: data[j * max_item_size:(j + 1) * max_item_size]
+                for segment_info, data in zip(segment_infos, segments)
+                for j, key in enumerate(
+                    self._get_segment_part_keys(cache_key, segment_info))
+            },
+            settings.CACHE_EXPIRATION_TIME)
+        cache.set(make_cache_key(cache_key), index,
+                  settings.CACHE_EXPIRATION_TIME)
+
+        self._generated_chunks = chunks
+
+        return index
+
     def generate_chunks(self, old, new, old_encoding_list=None,
                         new_encoding_list=None):
         """Generate chunks for the difference between two strings.
@@ -257,14 +681,26 @@ class RawDiffChunkGenerator(object):
             markup_b = None
 
             if self._get_enable_syntax_highlighting(old, new, a, b):
-                # TODO: Try to figure out the right lexer for these files
-                #       once instead of twice.
-                markup_a = self._apply_pygments(
-                    old or '',
-                    self.normalize_path_for_display(self.orig_filename))
-                markup_b = self._apply_pygments(
-                    new or '',
-                    self.normalize_path_for_display(self.modified_filename))
+                orig_filename = \
+                    self.normalize_path_for_display(self.orig_filename)
+                modified_filename = \
+                    self.normalize_path_for_display(self.modified_filename)
+
+                with time_diff_stage(self.request, STAGE_HIGHLIGHT,
+                                     self.modified_filename):
+                    orig_lexer, modified_lexer = self._get_lexers(
+                        old or '', orig_filename,
+                        new or '', modified_filename)
+
+                    if orig_lexer is not None:
+                        markup_a = self._apply_pygments(old or '',
+                                                        orig_filename,
+                                                        lexer=orig_lexer)
+
+                    if modified_lexer is not None:
+                        markup_b = self._apply_pygments(new or '',
+                                                        modified_filename,
+                                                        lexer=modified_lexer)
 
             if not markup_a:
                 markup_a = self.NEWLINES_RE.split(escape(old))
@@ -451,7 +887,8 @@ class RawDiffChunkGenerator(object):
         This defaults to simply wrapping get_line_changed_regions() from
         diffutils. Subclasses can override to provide custom behavior.
         """
-        return get_line_changed_regions(old_line, new_line)
+        return get_line_changed_regions(old_line, new_line,
+                                        diff_compat=self.diff_compat)
 
     def _get_enable_syntax_highlighting(self, old, new, a, b):
         """Returns whether or not we'll be enabling syntax highlighting.
@@ -797,24 +1234,90 @@ class RawDiffChunkGenerator(object):
         else:
             self._last_header_index[0] = last_index
 
-    def _apply_pygments(self, data, filename):
-        """Apply Pygments syntax-highlighting to a file's contents.
+    def _get_lexers(self, old, orig_filename, new, modified_filename):
+        """Return the Pygments lexers for the old and new files.
 
-        This will only apply syntax highlighting if a lexer is available and
-        the file extension is not blacklisted.
+        The lexer is only looked up once if both files have the same name,
+        which is the case for most diffs, and the lexer for that name doesn't
+        depend on the file's contents. Otherwise, each file's lexer is
+        guessed from its own contents.
+
+        Version Added:
+            4.0
+
+        Args:
+            old (unicode):
+                The contents of the old file.
+
+            orig_filename (unicode):
+                The name of the old file.
+
+            new (unicode):
+                The contents of the new file.
+
+            modified_filename (unicode):
+                The name of the new file.
+
+        Returns:
+            tuple:
+            A 2-tuple containing the lexers for the old and new files. Either
+            may be ``None``, if the file shouldn't be highlighted.
+        """
+        modified_lexer = self._get_lexer(new, modified_filename)
+
+        if (orig_filename == modified_filename and
+            not self._is_lexer_content_sniffed(orig_filename)):
+            orig_lexer = modified_lexer
+        else:
+            orig_lexer = self._get_lexer(old, orig_filename)
+
+        return orig_lexer, modified_lexer
+
+    def _is_lexer_content_sniffed(self, filename):
+        """Return whether the lexer for a file depends on its contents.
+
+        :py:func:`~pygments.lexers.guess_lexer_for_filename` only looks at
+        the contents of a file if more than one lexer handles its filename
+        (for instance, ``.h`` files may be C, C++, or Objective-C).
+
+        Version Added:
+            4.0
+
+        Args:
+            filename (unicode):
+                The name of the file.
+
+        Returns:
+            bool:
+            Whether more than one lexer handles the filename.
+        """
+        basename = os.path.basename(filename)
+        num_lexers = 0
+
+        for patterns in _get_lexer_filename_patterns():
+            if any(pattern.match(basename) for pattern in patterns):
+                num_lexers += 1
+
+                if num_lexers > 1:
+                    return True
+
+        return False
+
+    def _get_lexer(self, data, filename):
+        """Return the Pygments lexer for a file.
 
         Args:
             data (unicode):
-                The data to syntax highlight.
+                The contents of the file. This is used to choose between
+                lexers that handle the same filename.
 
             filename (unicode):
-                The name of the file. This is used to help determine a
-                suitable lexer.
+                The name of the file.
 
         Returns:
-            list of unicode:
-            A list of lines, all syntax-highlighted, if a lexer is found.
-            If no lexer is available, this will return ``None``.
+            pygments.lexer.Lexer:
+            The lexer for the file, or ``None`` if no lexer is available or
+            the file extension is blacklisted.
         """
         if filename.endswith(self.STYLED_EXT_BLACKLIST):
             return None
@@ -829,8 +1332,63 @@ class RawDiffChunkGenerator(object):
 
         lexer.add_filter('codetagify')
 
-        return split_line_endings(
-            highlight(data, lexer, NoWrapperHtmlFormatter()))
+        return lexer
+
+    def _apply_pygments(self, data, filename, lexer=None):
+        """Apply Pygments syntax-highlighting to a file's contents.
+
+        This will only apply syntax highlighting if a lexer is available and
+        the file extension is not blacklisted.
+
+        Highlighted content is cached by the SHA-256 of the content, the
+        lexer, and the version of Pygments, so the same file content is only
+        highlighted once across all diffs.
+
+        Version Changed:
+            4.0:
+            Added the ``lexer`` argument, and caching of the results.
+
+        Args:
+            data (unicode):
+                The data to syntax highlight.
+
+            filename (unicode):
+                The name of the file. This is used to help determine a
+                suitable lexer.
+
+            lexer (pygments.lexer.Lexer, optional):
+                The lexer to use. If not provided, one will be looked up
+                based on the filename and data.
+
+        Returns:
+            list of unicode:
+            A list of lines, all syntax-highlighted, if a lexer is found.
+            If no lexer is available, this will return ``None``.
+        """
+        if lexer is None:
+            lexer = self._get_lexer(data, filename)
+
+            if lexer is None:
+                return None
+
+        key = 'diff-highlight-%s-%s-%s' % (
+            type(lexer).__name__,
+            pygments.__version__,
+            hashlib.sha256(data.encode('utf-8')).hexdigest())
+
+        highlighted = []
+
+        def _highlight():
+            highlighted.append(True)
+
+            return split_line_endings(
+                highlight(data, lexer, NoWrapperHtmlFormatter()))
+
+        result = cache_memoize(key, _highlight, large_data=True)
+        record_diff_cache(self.request, CACHE_HIGHLIGHT, not highlighted,
+                          self.modified_filename)
+
+        return result
 
 
 class DiffChunkGenerator(RawDiffChunkGenerator):
@@ -926,7 +1484,8 @@ class DiffChunkGenerator(RawDiffChunkGenerator):
             modified_filename=filediff.dest_file,
             enable_syntax_highlighting=enable_syntax_highlighting,
             encoding_list=self.repository.get_encoding_list(),
-            diff_compat=filediff.diffset.diffcompat)
+            diff_compat=filediff.diffset.diffcompat,
+            request=request)
 
     def make_cache_key(self):
         """Create a cache key for any generated chunks."""
@@ -973,14 +1532,7 @@ class DiffChunkGenerator(RawDiffChunkGenerator):
         yielded. Otherwise, new chunks will be generated, stored in cache,
         and yielded.
         """
-        counts = self.filediff.get_line_counts()
-
-        if (self.filediff.binary or
-            self.filediff.source_revision == '' or
-            ((self.filediff.is_new or self.filediff.deleted or
-              self.filediff.moved or self.filediff.copied) and
-             counts['raw_insert_count'] == 0 and
-             counts['raw_delete_count'] == 0)):
+        if not self._has_chunks():
             return
 
         cache_key = self.make_cache_key()
@@ -988,6 +1540,73 @@ class DiffChunkGenerator(RawDiffChunkGenerator):
         for chunk in super(DiffChunkGenerator, self).get_chunks(cache_key):
             yield chunk
 
+    def get_chunks_in_range(self, first_line, num_lines):
+        """Return the chunks within a range of lines.
+
+        Only the cached segments containing the range of lines will be
+        loaded.
+
+        Version Added:
+            4.0
+
+        Args:
+            first_line (int):
+                The first virtual line number in the range.
+
+            num_lines (int):
+                The number of lines in the range.
+
+        Returns:
+            list of dict:
+            The chunks within the range of lines.
+        """
+        if not self._has_chunks():
+            return []
+
+        return super(DiffChunkGenerator, self).get_chunks_in_range(
+            first_line, num_lines, cache_key=self.make_cache_key())
+
+    def get_chunk(self, chunk_index):
+        """Return a single chunk.
+
+        Only the cached segments containing the chunk will be loaded.
+
+        Version Added:
+            4.0
+
+        Args:
+            chunk_index (int):
+                The index of the chunk to return.
+
+        Returns:
+            dict:
+            The chunk, or ``None`` if there's no chunk with that index.
+        """
+        if not self._has_chunks():
+            return None
+
+        return super(DiffChunkGenerator, self).get_chunk(
+            chunk_index, cache_key=self.make_cache_key())
+
+    def get_chunks_summary(self):
+        """Return a summary of the chunks.
+
+        If the chunks have already been cached, this won't load any of the
+        chunks.
+
+        Version Added:
+            4.0
+
+        Returns:
+            dict:
+            The summary, as returned by :py:func:`get_chunks_summary`.
+        """
+        if not self._has_chunks():
+            return get_chunks_summary([])
+
+        return super(DiffChunkGenerator, self).get_chunks_summary(
+            cache_key=self.make_cache_key())
+
     def get_chunks_uncached(self):
         """Yield the list of chunks, bypassing the cache."""
         base_filediff = self.base_filediff
@@ -1135,6 +1754,26 @@ class DiffChunkGenerator(RawDiffChunkGenerator):
     def normalize_path_for_display(self, filename):
         return self.tool.normalize_path_for_display(filename)
 
+    def _has_chunks(self):
+        """Return whether the FileDiff may have any chunks to render.
+
+        Binary files, and files that were added, deleted, moved, or copied
+        without any content changes, have no chunks.
+
+        Returns:
+            bool:
+            Whether there may be chunks to render.
+        """
+        counts = self.filediff.get_line_counts()
+
+        return not (
+            self.filediff.binary or
+            self.filediff.source_revision == '' or
+            ((self.filediff.is_new or self.filediff.deleted or
+              self.filediff.moved or self.filediff.copied) and
+             counts['raw_insert_count'] == 0 and
+             counts['raw_delete_count'] == 0))
+
     def _get_sha1(self, content):
         """Return a SHA1 hash for the provided content.
 
@@ -1162,6 +1801,56 @@ class DiffChunkGenerator(RawDiffChunkGenerator):
         return force_text(hashlib.sha256(content).hexdigest())
 
 
+def get_chunks_summary(chunks):
+    """Return a summary of a file's chunks.
+
+    Version Added:
+        4.0
+
+    Args:
+        chunks (list of dict):
+            The file's chunks.
+
+    Returns:
+        dict:
+        A dictionary with the following keys:
+
+        ``num_chunks`` (:py:class:`int`):
+            The number of chunks.
+
+        ``changed_chunk_indexes`` (:py:class:`list` of :py:class:`int`):
+            The indexes of the chunks that aren't ``equal`` chunks.
+
+        ``whitespace_only`` (:py:class:`bool`):
+            Whether the only changes in the file are whitespace changes.
+
+        ``num_equal_lines`` (:py:class:`int`):
+            The number of lines in ``equal`` chunks.
+    """
+    num_chunks = 0
+    changed_chunk_indexes = []
+    whitespace_only = True
+    num_equal_lines = 0
+
+    for i, chunk in enumerate(chunks):
+        num_chunks += 1
+
+        if chunk['change'] == 'equal':
+            num_equal_lines += chunk['numlines']
+        else:
+            changed_chunk_indexes.append(i)
+
+            if not chunk.get('meta', {}).get('whitespace_chunk', False):
+                whitespace_only = False
+
+    return {
+        'num_chunks': num_chunks,
+        'changed_chunk_indexes': changed_chunk_indexes,
+        'whitespace_only': num_chunks > 0 and whitespace_only,
+        'num_equal_lines': num_equal_lines,
+    }
+
+
 def compute_chunk_last_header(lines, numlines, meta, last_header=None):
     """Computes information for the displayed function/class headers.
 
@@ -44,6 +44,105 @@ def get_file_exists_in_history(validation_info, repository, parent_id, path,
         bool:
         Whether or not the file exists.
     """
+    exists = _get_file_exists_in_validation_info(validation_info, parent_id,
+                                                 path, revision)
+
+    if exists is not None:
+        return exists
+
+    # We did not find an entry in our validation info, so we need to fall back
+    # to checking the repository.
+    return repository.get_file_exists(path, revision,
+                                      base_commit_id=base_commit_id,
+                                      request=request)
+
+
+def get_files_exist_in_history(validation_info, repository, parent_id, files,
+                               request=None):
+    """Return whether or not several files exist, given the validation info.
+
+    This works like :py:func:`get_file_exists_in_history`, but checks any
+    files not found in the validation information against the repository in
+    bulk, using :py:meth:`Repository.get_files_exist()
+    <reviewboard.scmtools.models.Repository.get_files_exist>`.
+
+    Version Added:
+        4.0
+
+    Args:
+        validation_info (dict):
+            Validation metadata generated by the
+            :py:class:`~reviewboard.webapi.resources.validate_diffcommit.
+            ValidateDiffCommitResource`.
+
+        repository (reviewboard.scmtools.models.Repository):
+            The repository.
+
+        parent_id (unicode):
+            The parent commit ID of the commit currently being processed.
+
+        files (list of tuple):
+            A list of ``(path, revision, base_commit_id)`` tuples for the
+            files to check.
+
+        request (django.http.HttpRequest):
+            The HTTP request from the client.
+
+    Returns:
+        list:
+        A list of results, in the same order as ``files``. Each result is
+        either a boolean indicating whether the file exists, or the exception
+        that was raised when checking that file.
+    """
+    results = [
+        _get_file_exists_in_validation_info(validation_info, parent_id,
+                                            path, revision)
+        for path, revision, base_commit_id in files
+    ]
+
+    # Any files we did not find in our validation info need to be checked
+    # in the repository.
+    missing = [
+        i
+        for i, exists in enumerate(results)
+        if exists is None
+    ]
+
+    if missing:
+        repository_results = repository.get_files_exist(
+            [files[i] for i in missing],
+            request=request)
+
+        for i, exists in zip(missing, repository_results):
+            results[i] = exists
+
+    return results
+
+
+def _get_file_exists_in_validation_info(validation_info, parent_id, path,
+                                        revision):
+    """Return whether or not a file exists in the validation information.
+
+    Args:
+        validation_info (dict):
+            Validation metadata generated by the
+            :py:class:`~reviewboard.webapi.resources.validate_diffcommit.
+            ValidateDiffCommitResource`.
+
+        parent_id (unicode):
+            The parent commit ID of the commit currently being processed.
+
+        path (unicode):
+            The file path.
+
+        revision (unicode):
+            The revision of the file to retrieve.
+
+    Returns:
+        bool:
+        Whether or not the file exists, or ``None`` if the file was not
+        found in the validation information.
+    """
     while parent_id in validation_info:
         entry = validation_info[parent_id]
         tree = entry['tree']
@@ -61,11 +160,7 @@ def get_file_exists_in_history(validation_info, repository, parent_id, path,
 
         parent_id = entry['parent_id']
 
-    # We did not find an entry in our validation info, so we need to fall back
-    # to checking the repository.
-    return repository.get_file_exists(path, revision,
-                                      base_commit_id=base_commit_id,
-                                      request=request)
+    return None
 
 
 def exclude_ancestor_filediffs(to_filter, all_filediffs=None):
@@ -0,0 +1,380 @@
+"""Compression of stored diff data.
+
+Each :py:class:`~reviewboard.diffviewer.models.raw_file_diff_data.
+RawFileDiffData` records the ID of the compressor used for its content. New
+compressors can be added to :py:data:`diff_compressor_registry`, and existing
+diffs can be re-compressed using the ``recompressdiffs`` management command.
+
+Version Added:
+    4.0
+"""
+
+from __future__ import unicode_literals
+
+import bz2
+import threading
+
+from django.utils.translation import ugettext_lazy as _
+from djblets.registries.registry import (ALREADY_REGISTERED,
+                                         ATTRIBUTE_REGISTERED, NOT_REGISTERED)
+from djblets.siteconfig.models import SiteConfiguration
+
+from reviewboard.diffviewer.errors import DiffCompressionError
+from reviewboard.registries.registry import Registry
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class DiffCompressor(object):
+    """Base class for a compressor for stored diff data.
+
+    Subclasses must set :py:attr:`compression_id` and :py:attr:`name`, and
+    implement :py:meth:`compress` and :py:meth:`decompress`.
+
+    Version Added:
+        4.0
+    """
+
+    #: The ID of the compressor, stored along with the compressed data.
+    #:
+    #: This must be a single character, and must never change.
+    compression_id = None
+
+    #: The user-visible name of the compressor.
+    name = None
+
+    def is_available(self):
+        """Return whether the compressor can be used.
+
+        Returns:
+            bool:
+            Whether the modules required by the compressor are installed.
+        """
+        return True
+
+    def compress(self, data):
+        """Compress diff data.
+
+        Args:
+            data (bytes):
+                The data to compress.
+
+        Returns:
+            bytes:
+            The compressed data.
+        """
+        raise NotImplementedError
+
+    def decompress(self, data):
+        """Decompress diff data.
+
+        Args:
+            data (bytes):
+                The compressed data.
+
+        Returns:
+            bytes:
+            The decompressed data.
+
+        Raises:
+            reviewboard.diffviewer.errors.DiffCompressionError:
+                The data could not be decompressed.
+        """
+        raise NotImplementedError
+
+
+class BZip2DiffCompressor(DiffCompressor):
+    """A compressor using bzip2.
+
+    This compresses well, but is slow to both compress and decompress. It
+    was the only compressor available before Review Board 4.0.
+
+    Version Added:
+        4.0
+    """
+
+    compression_id = 'B'
+    name = _('BZip2')
+
+    def compress(self, data):
+        """Compress diff data.
+
+        Args:
+            data (bytes):
+                The data to compress.
+
+        Returns:
+            bytes:
+            The compressed data.
+        """
+        return bz2.compress(data, 9)
+
+    def decompress(self, data):
+        """Decompress diff data.
+
+        Args:
+            data (bytes):
+                The compressed data.
+
+        Returns:
+            bytes:
+            The decompressed data.
+        """
+        return bz2.decompress(data)
+
+
+class ZstdDiffCompressor(DiffCompressor):
+    """A compressor using Zstandard.
+
+    This is many times faster than bzip2 to compress and decompress, with
+    a comparable compression ratio. It requires the :pypi:`zstandard`
+    module.
+
+    If a dictionary has been trained on this server's diffs (using
+    ``recompressdiffs --train-dictionary``), it will be used when compressing
+    new diffs. The ID of the dictionary is stored in the compressed data, so
+    older diffs can still be decompressed after a new dictionary is trained.
+
+    Version Added:
+        4.0
+    """
+
+    compression_id = 'Z'
+    name = _('Zstandard')
+
+    #: The compression level to use.
+    COMPRESSION_LEVEL = 10
+
+    #: The site configuration key for the ID of the active dictionary.
+    DICTIONARY_SETTING = 'diffviewer_zstd_dictionary_id'
+
+    def __init__(self):
+        """Initialize the compressor."""
+        self._dicts = {}
+        self._lock = threading.Lock()
+
+    def is_available(self):
+        """Return whether the compressor can be used.
+
+        Returns:
+            bool:
+            Whether the :pypi:`zstandard` module is installed.
+        """
+        return zstandard is not None
+
+    def compress(self, data):
+        """Compress diff data.
+
+        Args:
+            data (bytes):
+                The data to compress.
+
+        Returns:
+            bytes:
+            The compressed data.
+
+        Raises:
+            reviewboard.diffviewer.errors.DiffCompressionError:
+                The active dictionary could not be loaded.
+        """
+        siteconfig = SiteConfiguration.objects.get_current()
+        dict_id = siteconfig.get(self.DICTIONARY_SETTING)
+
+        if dict_id:
+            compressor = zstandard.ZstdCompressor(
+                level=self.COMPRESSION_LEVEL,
+                dict_data=self.get_dictionary(dict_id))
+        else:
+            compressor = zstandard.ZstdCompressor(
+                level=self.COMPRESSION_LEVEL)
+
+        return compressor.compress(data)
+
+    def decompress(self, data):
+        """Decompress diff data.
+
+        Args:
+            data (bytes):
+                The compressed data.
+
+        Returns:
+            bytes:
+            The decompressed data.
+
+        Raises:
+            reviewboard.diffviewer.errors.DiffCompressionError:
+                The :pypi:`zstandard` module isn't installed, or the
+                dictionary used to compress the data could not be loaded.
+        """
+        if zstandard is None:
+            raise DiffCompressionError(
+                'The zstandard module must be installed to read diffs '
+                'compressed with Zstandard.')
+
+        dict_id = zstandard.get_frame_parameters(data).dict_id
+
+        if dict_id:
+            decompressor = zstandard.ZstdDecompressor(
+                dict_data=self.get_dictionary(dict_id))
+        else:
+            decompressor = zstandard.ZstdDecompressor()
+
+        return decompressor.decompress(data)
+
+    def get_dictionary(self, dict_id):
+        """Return a compression dictionary.
+
+        Dictionaries never change, so they're loaded from the database once
+        per process.
+
+        Args:
+            dict_id (int):
+                The ID of the dictionary.
+
+        Returns:
+            zstandard.ZstdCompressionDict:
+            The dictionary.
+
+        Raises:
+            reviewboard.diffviewer.errors.DiffCompressionError:
+                The dictionary could not be found.
+        """
+        from reviewboard.diffviewer.models import DiffCompressionDictionary
+
+        with self._lock:
+            try:
+                return self._dicts[dict_id]
+            except KeyError:
+                pass
+
+        try:
+            dictionary = DiffCompressionDictionary.objects.get(dict_id=dict_id)
+        except DiffCompressionDictionary.DoesNotExist:
+            raise DiffCompressionError(
+                'Zstandard compression dictionary %s could not be found.'
+                % dict_id)
+
+        zstd_dict = zstandard.ZstdCompressionDict(bytes(dictionary.data))
+
+        with self._lock:
+            self._dicts[dict_id] = zstd_dict
+
+        return zstd_dict
+
+    def train_dictionary(self, samples, dict_size):
+        """Train and activate a new compression dictionary.
+
+        The dictionary will be used for all diffs compressed from now on.
+
+        Args:
+            samples (list of bytes):
+                The diffs to train the dictionary on. This should be a large
+                set of typical diffs stored on the server.
+
+            dict_size (int):
+                The maximum size of the dictionary, in bytes.
+
+        Returns:
+            reviewboard.diffviewer.models.DiffCompressionDictionary:
+            The new dictionary.
+
+        Raises:
+            reviewboard.diffviewer.errors.DiffCompressionError:
+                The dictionary could not be trained.
+        """
+        from reviewboard.diffviewer.models import DiffCompressionDictionary
+
+        try:
+            zstd_dict = zstandard.train_dictionary(dict_size, samples)
+        except zstandard.ZstdError as e:
+            raise DiffCompressionError(
+                'Unable to train a compression dictionary: %s' % e)
+
+        dictionary = DiffCompressionDictionary.objects.create(
+            dict_id=zstd_dict.dict_id(),
+            data=zstd_dict.as_bytes())
+
+        siteconfig = SiteConfiguration.objects.get_current()
+        siteconfig.set(self.DICTIONARY_SETTING, dictionary.dict_id)
+        siteconfig.save()
+
+        return dictionary
+
+
+class DiffCompressorRegistry(Registry):
+    """A registry for managing compressors for stored diff data.
+
+    Version Added:
+        4.0
+    """
+
+    lookup_attrs = ['compression_id']
+
+    errors = {
+        ALREADY_REGISTERED: _(
+            '"%(item)s" is already a registered diff compressor.'
+        ),
+        ATTRIBUTE_REGISTERED: _(
+            'A diff compressor with the compression_id "%(attr_value)s" is '
+            'already registered by another compressor (%(duplicate)s).'
+        ),
+        NOT_REGISTERED: _(
+            '"%(attr_value)s" is not a registered diff compressor ID.'
+        ),
+    }
+
+    def get_compressor(self, compression_id):
+        """Return a compressor with the given ID.
+
+        Args:
+            compression_id (unicode):
+                The ID of the compressor.
+
+        Returns:
+            DiffCompressor:
+            The compressor, or ``None`` if it could not be found.
+        """
+        return self.get('compression_id', compression_id)
+
+    def get_default_compressor(self):
+        """Return the compressor used for new diffs.
+
+        This is the compressor set in the ``diffviewer_diff_compression``
+        site configuration setting, if it's available. Otherwise, bzip2 is
+        used. Zstandard is only used once an administrator opts into it
+        (for instance, through ``recompressdiffs --compression=Z``).
+
+        Returns:
+            DiffCompressor:
+            The compressor to use.
+        """
+        siteconfig = SiteConfiguration.objects.get_current()
+
+        for compression_id in (siteconfig.get('diffviewer_diff_compression'),
+                               BZip2DiffCompressor.compression_id):
+            compressor = self.get_compressor(compression_id)
+
+            if compressor is not None and compressor.is_available():
+                return compressor
+
+    def get_defaults(self):
+        """Return the default compressors for the registry.
+
+        Returns:
+            list of DiffCompressor:
+            The default compressors.
+        """
+        return [
+            BZip2DiffCompressor(),
+            ZstdDiffCompressor(),
+        ]
+
+
+#: The registry of compressors for stored diff data.
+#:
+#: Version Added:
+#:     4.0
+diff_compressor_registry = DiffCompressorRegistry()
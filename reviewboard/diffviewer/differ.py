@@ -20,9 +20,14 @@ class DiffCompatVersion(object):
     # (prevents very long diff times for certain files)
     MYERS_SMS_COST_BAIL = 2
 
-    DEFAULT = MYERS_SMS_COST_BAIL
+    # Myers differ, with changed regions within replaced lines found by
+    # comparing tokens instead of using SequenceMatcher
+    # (much faster for diffs with a lot of replaced lines)
+    MYERS_LINE_REGIONS = 3
 
-    MYERS_VERSIONS = (MYERS, MYERS_SMS_COST_BAIL)
+    DEFAULT = MYERS_LINE_REGIONS
+
+    MYERS_VERSIONS = (MYERS, MYERS_SMS_COST_BAIL, MYERS_LINE_REGIONS)
 
 
 class Differ(object):
@@ -91,12 +96,22 @@ def get_differ(a, b, ignore_space=False,
     By default, this will return the MyersDiffer. Older differs can be used
     by specifying a compat_version, but this is only for *really* ancient
     diffs, currently.
+
+    If NumPy is installed, large files will be diffed with the
+    NumPyMyersDiffer, which produces the same results as the MyersDiffer
+    in less time.
     """
     cls = None
 
     if compat_version in DiffCompatVersion.MYERS_VERSIONS:
         from reviewboard.diffviewer.myersdiff import MyersDiffer
-        cls = MyersDiffer
+        from reviewboard.diffviewer.numpymyersdiff import NumPyMyersDiffer
+
+        if (NumPyMyersDiffer.is_available() and
+            len(a) + len(b) >= NumPyMyersDiffer.MIN_LINES):
+            cls = NumPyMyersDiffer
+        else:
+            cls = MyersDiffer
     elif compat_version == DiffCompatVersion.SMDIFFER:
         from reviewboard.diffviewer.smdiff import SMDiffer
         cls = SMDiffer
@@ -10,10 +10,12 @@ import tempfile
 from difflib import SequenceMatcher
 from functools import cmp_to_key
 
+from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
 from django.utils import six
 from django.utils.encoding import force_text
 from django.utils.translation import ugettext as _
+from djblets.cache.backend import cache_memoize, make_cache_key
 from djblets.log import log_timed
 from djblets.siteconfig.models import SiteConfiguration
 from djblets.util.compat.python.past import cmp
@@ -21,7 +23,15 @@ from djblets.util.contextmanagers import controlled_subprocess
 
 from reviewboard.deprecation import RemovedInReviewBoard50Warning
 from reviewboard.diffviewer.commit_utils import exclude_ancestor_filediffs
-from reviewboard.diffviewer.errors import DiffTooBigError, PatchError
+from reviewboard.diffviewer.differ import DiffCompatVersion
+from reviewboard.diffviewer.errors import (DiffTooBigError, PatchError,
+                                           PatchNotApplicableError)
+from reviewboard.diffviewer.patcher import apply_patch
+from reviewboard.diffviewer.timing import (CACHE_PATCHED_FILE,
+                                           STAGE_PARENT_PATCH,
+                                           STAGE_PATCH,
+                                           record_diff_cache,
+                                           time_diff_stage)
 from reviewboard.scmtools.core import PRE_CREATION, HEAD
 
 
@@ -39,8 +49,28 @@ NEWLINE_CONVERSION_UNICODE_RE = re.compile(r'\r(\r?\n)?')
 NEWLINE_BYTES_RE = re.compile(br'(?:\n|\r(?:\r?\n)?)')
 NEWLINE_UNICODE_RE = re.compile(r'(?:\n|\r(?:\r?\n)?)')
 
+#: The tokens compared when finding changed regions within lines.
+#:
+#: Version Added:
+#:     4.0
+LINE_TOKEN_RE = re.compile(r'\w+|\s+|[^\w\s]', re.UNICODE)
+
+#: The minimum similarity for two lines to have changed regions highlighted.
+#:
+#: Version Added:
+#:     4.0
+LINE_CHANGED_REGIONS_MIN_RATIO = 0.6
+
+#: The maximum number of line pairs to remember changed regions for.
+#:
+#: Version Added:
+#:     4.0
+LINE_CHANGED_REGIONS_MEMO_SIZE = 1000
+
 _PATCH_GARBAGE_INPUT = 'patch: **** Only garbage was found in the patch input.'
 
+_line_changed_regions_memo = {}
+
 
 def convert_to_unicode(s, encoding_list):
     """Return the passed string as a unicode object.
@@ -210,8 +240,14 @@ def split_line_endings(data):
 def patch(diff, orig_file, filename, request=None):
     """Apply a diff to a file.
 
-    This delegates out to ``patch`` because noone except Larry Wall knows how
-    to patch.
+    The diff is applied in-process where possible. Diffs that the in-process
+    patcher can't apply with certainty are delegated out to ``patch``,
+    because noone except Larry Wall knows how to patch.
+
+    Version Changed:
+        4.0:
+        Diffs are now applied in-process by default, using
+        :py:func:`reviewboard.diffviewer.patcher.apply_patch`.
 
     Args:
         diff (bytes):
@@ -240,13 +276,55 @@ def patch(diff, orig_file, filename, request=None):
         # Someone uploaded an unchanged file. Return the one we're patching.
         return orig_file
 
-    # Prepare the temporary directory if none is available
-    tempdir = tempfile.mkdtemp(prefix='reviewboard.')
-
     try:
         orig_file = convert_line_endings(orig_file)
         diff = convert_line_endings(diff)
 
+        try:
+            return apply_patch(diff=diff, orig_file=orig_file)
+        except PatchNotApplicableError as e:
+            logging.debug('Unable to apply the diff for %s in-process (%s). '
+                          'Falling back on patch(1).',
+                          filename, e,
+                          request=request)
+
+        return _patch_with_subprocess(diff=diff,
+                                      orig_file=orig_file,
+                                      filename=filename)
+    finally:
+        log_timer.done()
+
+
+def _patch_with_subprocess(diff, orig_file, filename):
+    """Apply a diff to a file using patch(1).
+
+    Version Added:
+        4.0
+
+    Args:
+        diff (bytes):
+            The contents of the diff to apply. This must have normalized
+            line endings.
+
+        orig_file (bytes):
+            The contents of the original file. This must have normalized
+            line endings.
+
+        filename (unicode):
+            The name of the file being patched.
+
+    Returns:
+        bytes:
+        The contents of the patched file.
+
+    Raises:
+        reviewboard.diffutils.errors.PatchError:
+            An error occurred when trying to apply the patch.
+    """
+    # Prepare the temporary directory if none is available
+    tempdir = tempfile.mkdtemp(prefix='reviewboard.')
+
+    try:
         (fd, oldfile) = tempfile.mkstemp(dir=tempdir)
         f = os.fdopen(fd, 'w+b')
         f.write(orig_file)
@@ -299,7 +377,110 @@ def patch(diff, orig_file, filename, request=None):
         return new_file
     finally:
         shutil.rmtree(tempdir)
-        log_timer.done()
+
+
+def _make_patched_file_cache_key(filediff):
+    """Return a cache key for the patched file of a FileDiff.
+
+    Version Added:
+        4.0
+
+    Args:
+        filediff (reviewboard.diffviewer.models.filediff.FileDiff):
+            The FileDiff whose patched file is cached.
+
+    Returns:
+        unicode:
+        The cache key.
+    """
+    return 'diff-patched-file-%s' % filediff.pk
+
+
+def get_cached_patched_file(filediff):
+    """Return the patched file of a FileDiff from the cache.
+
+    This is used along with :py:func:`cache_patched_file` to cache the
+    intermediate files computed when applying a chain of ancestor FileDiffs.
+    The cache is keyed off the FileDiff's ID, so it can be looked up before
+    anything about the file has been computed.
+
+    Version Added:
+        4.0
+
+    Args:
+        filediff (reviewboard.diffviewer.models.filediff.FileDiff):
+            The FileDiff whose patched file should be returned.
+
+    Returns:
+        bytes:
+        The patched file, or ``None`` if it was not in the cache.
+    """
+    key = _make_patched_file_cache_key(filediff)
+
+    if make_cache_key(key) not in cache:
+        return None
+
+    return cache_memoize(key, lambda: [None], large_data=True)[0]
+
+
+def cache_patched_file(filediff, data):
+    """Store the patched file of a FileDiff in the cache.
+
+    Version Added:
+        4.0
+
+    Args:
+        filediff (reviewboard.diffviewer.models.filediff.FileDiff):
+            The FileDiff the file was patched with.
+
+        data (bytes):
+            The patched file.
+    """
+    cache_memoize(_make_patched_file_cache_key(filediff),
+                  lambda: [data],
+                  large_data=True,
+                  force_overwrite=True)
+
+
+def _get_repository_file_info(filediff):
+    """Return the information needed to fetch a FileDiff's source file.
+
+    Version Added:
+        4.0
+
+    Args:
+        filediff (reviewboard.diffviewer.models.filediff.FileDiff):
+            The FileDiff whose source file will be fetched from the
+            repository.
+
+    Returns:
+        tuple:
+        A 2-tuple of the path and revision of the file in the repository.
+    """
+    extra_data = filediff.extra_data or {}
+
+    # If the file has a parent source filename/revision recorded, we're
+    # going to need to fetch that, since that'll be (potentially) the
+    # latest commit in the repository.
+    #
+    # This information was added in Review Board 3.0.19. Prior versions
+    # stored the parent source revision as filediff.source_revision
+    # (rather than leaving that as identifying information for the actual
+    # file being shown in the review). It did not store the parent
+    # filename at all (which impacted diffs that contained a moved/renamed
+    # file on any type of repository that required a filename for lookup,
+    # such as Mercurial -- Git was not affected, since it only needs
+    # blob SHAs).
+    #
+    # If we're not working with a parent diff, or this is a FileDiff
+    # with legacy parent diff information, we just use the FileDiff
+    # FileDiff filename/revision fields as normal.
+    source_filename = extra_data.get('parent_source_filename',
+                                     filediff.source_file)
+    source_revision = extra_data.get('parent_source_revision',
+                                     filediff.source_revision)
+
+    return source_filename, source_revision
 
 
 def get_original_file_from_repo(filediff, request=None, encoding_list=None):
@@ -344,28 +525,7 @@ def get_original_file_from_repo(filediff, request=None, encoding_list=None):
             An error occurred while computing the pre-patch file.
     """
     data = b''
-    extra_data = filediff.extra_data or {}
-
-    # If the file has a parent source filename/revision recorded, we're
-    # going to need to fetch that, since that'll be (potentially) the
-    # latest commit in the repository.
-    #
-    # This information was added in Review Board 3.0.19. Prior versions
-    # stored the parent source revision as filediff.source_revision
-    # (rather than leaving that as identifying information for the actual
-    # file being shown in the review). It did not store the parent
-    # filename at all (which impacted diffs that contained a moved/renamed
-    # file on any type of repository that required a filename for lookup,
-    # such as Mercurial -- Git was not affected, since it only needs
-    # blob SHAs).
-    #
-    # If we're not working with a parent diff, or this is a FileDiff
-    # with legacy parent diff information, we just use the FileDiff
-    # FileDiff filename/revision fields as normal.
-    source_filename = extra_data.get('parent_source_filename',
-                                     filediff.source_file)
-    source_revision = extra_data.get('parent_source_revision',
-                                     filediff.source_revision)
+    source_filename, source_revision = _get_repository_file_info(filediff)
 
     if source_revision != PRE_CREATION:
         repository = filediff.get_repository()
@@ -404,10 +564,11 @@ def get_original_file_from_repo(filediff, request=None, encoding_list=None):
     if (filediff.parent_diff and
         not filediff.is_parent_diff_empty(cache_only=True)):
         try:
-            data = patch(diff=filediff.parent_diff,
-                         orig_file=data,
-                         filename=source_filename,
-                         request=request)
+            with time_diff_stage(request, STAGE_PARENT_PATCH):
+                data = patch(diff=filediff.parent_diff,
+                             orig_file=data,
+                             filename=source_filename,
+                             request=request)
         except PatchError as e:
             # patch(1) cannot process diff files that contain no diff sections.
             # We are going to check and see if the parent diff contains no diff
@@ -476,30 +637,48 @@ def get_original_file(filediff, request=None, encoding_list=None):
     ancestors = filediff.get_ancestors(minimal=True)
 
     if ancestors:
-        oldest_ancestor = ancestors[0]
-
-        # If the file was created outside this history, fetch it from the
-        # repository and apply the parent diff if it exists.
-        if not oldest_ancestor.is_new:
-            data = get_original_file_from_repo(filediff=oldest_ancestor,
-                                               request=request,
-                                               encoding_list=encoding_list)
-
-        if not oldest_ancestor.is_diff_empty:
-            data = patch(diff=oldest_ancestor.diff,
-                         orig_file=data,
-                         filename=oldest_ancestor.source_file,
-                         request=request)
-
-        for ancestor in ancestors[1:]:
-            # TODO: Cache these results so that if this ``filediff`` is an
-            # ancestor of another FileDiff, computing that FileDiff's original
-            # file will be cheaper. This will also allow an ancestor filediff's
-            # original file to be computed cheaper.
-            data = patch(diff=ancestor.diff,
-                         orig_file=data,
-                         filename=ancestor.source_file,
-                         request=request)
+        # Start from the most recent ancestor that we have a patched file
+        # for in the cache, if any.
+        for i in range(len(ancestors) - 1, -1, -1):
+            cached_data = get_cached_patched_file(ancestors[i])
+
+            if cached_data is not None:
+                data = cached_data
+                ancestors = ancestors[i + 1:]
+                record_diff_cache(request, CACHE_PATCHED_FILE, True)
+                break
+        else:
+            record_diff_cache(request, CACHE_PATCHED_FILE, False)
+            oldest_ancestor = ancestors[0]
+            ancestors = ancestors[1:]
+
+            # If the file was created outside this history, fetch it from the
+            # repository and apply the parent diff if it exists.
+            if not oldest_ancestor.is_new:
+                data = get_original_file_from_repo(
+                    filediff=oldest_ancestor,
+                    request=request,
+                    encoding_list=encoding_list)
+
+            if not oldest_ancestor.is_diff_empty:
+                with time_diff_stage(request, STAGE_PATCH):
+                    data = patch(diff=oldest_ancestor.diff,
+                                 orig_file=data,
+                                 filename=oldest_ancestor.source_file,
+                                 request=request)
+
+            cache_patched_file(oldest_ancestor, data)
+
+        for ancestor in ancestors:
+            with time_diff_stage(request, STAGE_PATCH):
+                data = patch(diff=ancestor.diff,
+                             orig_file=data,
+                             filename=ancestor.source_file,
+                             request=request)
+
+            # Cache the result, so that later descendants of this ancestor
+            # can start from here.
+            cache_patched_file(ancestor, data)
     elif not filediff.is_new:
         data = get_original_file_from_repo(filediff=filediff,
                                            request=request,
@@ -508,6 +687,74 @@ def get_original_file(filediff, request=None, encoding_list=None):
     return data
 
 
+def prefetch_original_files(filediffs, request=None):
+    """Fetch the repository files needed to build several pre-patch files.
+
+    This determines the file that :py:func:`get_original_file` would need
+    to fetch from the repository for each FileDiff, and fetches any that
+    aren't already cached in as few operations as possible, using
+    :py:meth:`Repository.prefetch_files()
+    <reviewboard.scmtools.models.Repository.prefetch_files>`.
+
+    This is an optimization only. Any errors are logged and will be raised
+    again when the file is later fetched.
+
+    Version Added:
+        4.0
+
+    Args:
+        filediffs (list of reviewboard.diffviewer.models.filediff.FileDiff):
+            The FileDiffs whose pre-patch files will be needed.
+
+        request (django.http.HttpRequest, optional):
+            The HTTP request from the client.
+    """
+    repositories = {}
+    files_by_repository = {}
+
+    for filediff in filediffs:
+        if filediff.binary:
+            continue
+
+        if filediff.parent_diff:
+            source_filediff = filediff
+        else:
+            ancestors = filediff.get_ancestors(minimal=True)
+
+            if ancestors:
+                source_filediff = ancestors[0]
+            else:
+                source_filediff = filediff
+
+            if source_filediff.is_new:
+                continue
+
+        source_filename, source_revision = \
+            _get_repository_file_info(source_filediff)
+
+        if source_revision == PRE_CREATION:
+            continue
+
+        repository = source_filediff.get_repository()
+        repositories[repository.pk] = repository
+        files_by_repository.setdefault(repository.pk, []).append((
+            source_filename,
+            source_revision,
+            source_filediff.diffset.base_commit_id,
+        ))
+
+    for repository_id, files in six.iteritems(files_by_repository):
+        repository = repositories[repository_id]
+
+        try:
+            repository.prefetch_files(files, request=request)
+        except Exception as e:
+            logging.exception('Unable to prefetch %d files from repository '
+                              '%s: %s',
+                              len(files), repository_id, e,
+                              request=request)
+
+
 def get_patched_file(source_data, filediff, request=None):
     """Return the patched version of a file.
 
@@ -533,10 +780,11 @@ def get_patched_file(source_data, filediff, request=None):
                                       filename=filediff.source_file,
                                       revision=filediff.source_revision)
 
-    return patch(diff=diff,
-                 orig_file=source_data,
-                 filename=filediff.dest_file,
-                 request=request)
+    with time_diff_stage(request, STAGE_PATCH):
+        return patch(diff=diff,
+                     orig_file=source_data,
+                     filename=filediff.dest_file,
+                     request=request)
 
 
 def get_revision_str(revision):
@@ -1219,39 +1467,190 @@ def populate_diff_chunks(files, enable_syntax_highlighting=True,
     diff chunk data for each file in the list. The chunk data is stored in
     the file state.
     """
-    from reviewboard.diffviewer.chunk_generator import get_diff_chunk_generator
+    from reviewboard.diffviewer.chunk_generator import get_chunks_summary
+
+    generators = [
+        _get_diff_file_chunk_generator(diff_file, enable_syntax_highlighting,
+                                       request)
+        for diff_file in files
+    ]
+
+    if len(files) > 1:
+        # Fetch the source files for any chunks that need to be generated
+        # up-front, so the repository can fetch them together rather than
+        # one at a time.
+        filediffs = []
+
+        for diff_file, generator in zip(files, generators):
+            if (hasattr(generator, 'make_cache_key') and
+                make_cache_key(generator.make_cache_key()) in cache):
+                continue
 
-    for diff_file in files:
-        generator = get_diff_chunk_generator(
-            request,
-            diff_file['filediff'],
-            diff_file['interfilediff'],
-            diff_file['force_interdiff'],
-            enable_syntax_highlighting,
-            base_filediff=diff_file.get('base_filediff'))
+            filediffs += [
+                filediff
+                for filediff in (diff_file['filediff'],
+                                 diff_file['interfilediff'],
+                                 diff_file.get('base_filediff'))
+                if filediff is not None
+            ]
+
+        if filediffs:
+            prefetch_original_files(filediffs, request=request)
+
+    for diff_file, generator in zip(files, generators):
         chunks = list(generator.get_chunks())
 
+        for j, chunk in enumerate(chunks):
+            chunk['index'] = j
+
+        _update_diff_file_chunks_summary(diff_file,
+                                         get_chunks_summary(chunks))
         diff_file.update({
             'chunks': chunks,
-            'num_chunks': len(chunks),
-            'changed_chunk_indexes': [],
-            'whitespace_only': len(chunks) > 0,
+            'chunks_loaded': True,
         })
 
-        for j, chunk in enumerate(chunks):
-            chunk['index'] = j
 
-            if chunk['change'] != 'equal':
-                diff_file['changed_chunk_indexes'].append(j)
-                meta = chunk.get('meta', {})
+def populate_diff_chunk(diff_file, chunk_index,
+                        enable_syntax_highlighting=True, request=None):
+    """Populate a diff file with a single chunk.
 
-                if not meta.get('whitespace_chunk', False):
-                    diff_file['whitespace_only'] = False
+    This is used when rendering a single chunk of a file (such as when
+    expanding collapsed lines). Only the cached segments of the file's chunks
+    that contain the chunk will be loaded.
 
-        diff_file.update({
-            'num_changes': len(diff_file['changed_chunk_indexes']),
-            'chunks_loaded': True,
-        })
+    The diff file's ``chunks`` will contain only the requested chunk, or will
+    be empty if the chunk index is out of range. The other chunk-related
+    fields will describe the whole file, as with
+    :py:func:`populate_diff_chunks`.
+
+    Version Added:
+        4.0
+
+    Args:
+        diff_file (dict):
+            The diff file, as returned by :py:func:`get_diff_files`.
+
+        chunk_index (int):
+            The index of the chunk to load.
+
+        enable_syntax_highlighting (bool, optional):
+            Whether to syntax-highlight the chunk.
+
+        request (django.http.HttpRequest, optional):
+            The HTTP request from the client.
+
+    Returns:
+        dict:
+        The chunk, or ``None`` if the chunk index is out of range.
+    """
+    generator = _get_diff_file_chunk_generator(diff_file,
+                                               enable_syntax_highlighting,
+                                               request)
+    summary = generator.get_chunks_summary()
+
+    if 0 <= chunk_index < summary['num_chunks']:
+        chunk = generator.get_chunk(chunk_index)
+    else:
+        chunk = None
+
+    _update_diff_file_chunks_summary(diff_file, summary)
+
+    if chunk is None:
+        diff_file['chunks'] = []
+    else:
+        diff_file['chunks'] = [chunk]
+
+    return chunk
+
+
+def iter_diff_chunks(diff_file, enable_syntax_highlighting=True,
+                     request=None):
+    """Populate a diff file with a summary of its chunks and iterate them.
+
+    Unlike :py:func:`populate_diff_chunks`, the chunks aren't stored in the
+    diff file. They're loaded from the cache a few segments at a time as the
+    returned iterator is consumed, so that very large files can be rendered
+    without holding all of their chunks in memory.
+
+    The summary is populated before this returns, so errors from generating
+    the chunks (such as :py:class:`~reviewboard.diffviewer.errors.
+    PatchError`) are raised by this function, rather than while iterating.
+
+    Version Added:
+        4.0
+
+    Args:
+        diff_file (dict):
+            The diff file, as returned by :py:func:`get_diff_files`.
+
+        enable_syntax_highlighting (bool, optional):
+            Whether to syntax-highlight the chunks.
+
+        request (django.http.HttpRequest, optional):
+            The HTTP request from the client.
+
+    Returns:
+        iterator of dict:
+        An iterator through the file's chunks.
+    """
+    generator = _get_diff_file_chunk_generator(diff_file,
+                                               enable_syntax_highlighting,
+                                               request)
+    _update_diff_file_chunks_summary(diff_file,
+                                     generator.get_chunks_summary())
+
+    return generator.get_chunks()
+
+
+def _get_diff_file_chunk_generator(diff_file, enable_syntax_highlighting,
+                                   request):
+    """Return a chunk generator for a diff file.
+
+    Args:
+        diff_file (dict):
+            The diff file, as returned by :py:func:`get_diff_files`.
+
+        enable_syntax_highlighting (bool):
+            Whether to syntax-highlight the chunks.
+
+        request (django.http.HttpRequest):
+            The HTTP request from the client.
+
+    Returns:
+        reviewboard.diffviewer.chunk_generator.DiffChunkGenerator:
+        The chunk generator.
+    """
+    from reviewboard.diffviewer.chunk_generator import get_diff_chunk_generator
+
+    return get_diff_chunk_generator(
+        request,
+        diff_file['filediff'],
+        diff_file['interfilediff'],
+        diff_file['force_interdiff'],
+        enable_syntax_highlighting,
+        base_filediff=diff_file.get('base_filediff'))
+
+
+def _update_diff_file_chunks_summary(diff_file, summary):
+    """Update a diff file with a summary of its chunks.
+
+    Args:
+        diff_file (dict):
+            The diff file to update.
+
+        summary (dict):
+            The summary, as returned by
+            :py:func:`~reviewboard.diffviewer.chunk_generator.
+            get_chunks_summary`.
+    """
+    diff_file.update({
+        'num_chunks': summary['num_chunks'],
+        'changed_chunk_indexes': list(summary['changed_chunk_indexes']),
+        'whitespace_only': summary['whitespace_only'],
+        'num_changes': len(summary['changed_chunk_indexes']),
+        'num_equal_lines': summary['num_equal_lines'],
+    })
 
 
 def get_file_from_filediff(context, filediff, interfilediff):
@@ -1479,7 +1878,7 @@ def get_chunks_in_range(chunks, first_line, num_lines):
                 last_index = len(lines)
 
             new_chunk = {
-                'index': i,
+                'index': chunk.get('index', i),
                 'lines': chunk['lines'][start_index:last_index],
                 'numlines': last_index - start_index,
                 'change': chunk['change'],
@@ -1511,29 +1910,402 @@ def get_enable_highlighting(user):
             user_syntax_highlighting)
 
 
-def get_line_changed_regions(oldline, newline):
-    """Returns regions of changes between two similar lines."""
+def get_line_changed_regions(oldline, newline, diff_compat=None):
+    """Return regions of changes between two similar lines.
+
+    If most of the line has changed, no regions will be returned, since
+    highlighting them wouldn't be useful.
+
+    Version Changed:
+        4.0:
+        Added the ``diff_compat`` argument.
+
+    Args:
+        oldline (unicode):
+            The old version of the line.
+
+        newline (unicode):
+            The new version of the line.
+
+        diff_compat (int, optional):
+            The diff compatibility version of the diff containing the lines.
+            For :py:attr:`DiffCompatVersion.MYERS_LINE_REGIONS
+            <reviewboard.diffviewer.differ.DiffCompatVersion.
+            MYERS_LINE_REGIONS>` and higher, the lines are compared
+            word-by-word using a Myers diff, and then character-by-character
+            within the words that changed. Otherwise (including if not
+            provided), they're compared character-by-character using
+            :py:class:`difflib.SequenceMatcher`.
+
+    Returns:
+        tuple:
+        A 2-tuple containing lists of ``(start, end)`` ranges of changes in
+        the old line and the new line. Both will be ``None`` if most of the
+        line has changed, or if either line is ``None``.
+    """
     if oldline is None or newline is None:
         return None, None
 
+    if (diff_compat is not None and
+        diff_compat >= DiffCompatVersion.MYERS_LINE_REGIONS):
+        key = (oldline, newline)
+
+        memo = _line_changed_regions_memo
+
+        # Reformatting changes tend to make the same change to many lines,
+        # so recent results are remembered.
+        try:
+            oldchanges, newchanges = memo[key]
+        except KeyError:
+            oldchanges, newchanges = _get_line_token_changed_regions(oldline,
+                                                                     newline)
+
+            if len(memo) >= LINE_CHANGED_REGIONS_MEMO_SIZE:
+                memo.clear()
+
+            memo[key] = (oldchanges, newchanges)
+
+        if oldchanges is None:
+            return None, None
+
+        return list(oldchanges), list(newchanges)
+
     # Use the SequenceMatcher directly. It seems to give us better results
     # for this. We should investigate steps to move to the new differ.
     differ = SequenceMatcher(None, oldline, newline)
 
     # This thresholds our results -- we don't want to show inter-line diffs
     # if most of the line has changed, unless those lines are very short.
+    #
+    # The quick ratios are upper bounds on the real ratio, and are much
+    # cheaper to compute, so they're checked first.
 
     # FIXME: just a plain, linear threshold is pretty crummy here.  Short
     # changes in a short line get lost.  I haven't yet thought of a fancy
     # nonlinear test.
-    if differ.ratio() < 0.6:
+    if (differ.real_quick_ratio() < LINE_CHANGED_REGIONS_MIN_RATIO or
+        differ.quick_ratio() < LINE_CHANGED_REGIONS_MIN_RATIO or
+        differ.ratio() < LINE_CHANGED_REGIONS_MIN_RATIO):
+        return None, None
+
+    return _get_changed_regions_from_opcodes(oldline, newline,
+                                             differ.get_opcodes())
+
+
+def _get_line_token_changed_regions(oldline, newline):
+    """Return regions of changes between two lines, compared by tokens.
+
+    The lines are split into words, runs of whitespace and individual
+    punctuation characters, which are compared using a Myers diff. The diff
+    gives up as soon as it's clear that too much of the line has changed.
+    The characters of any replaced tokens are then compared, so that only
+    the changed parts of those tokens are highlighted.
+
+    Args:
+        oldline (unicode):
+            The old version of the line.
+
+        newline (unicode):
+            The new version of the line.
+
+    Returns:
+        tuple:
+        A 2-tuple containing tuples of ``(start, end)`` ranges of changes in
+        the old line and the new line. Both will be ``None`` if most of the
+        line has changed.
+    """
+    if oldline == newline:
+        # This also covers two empty lines, which would otherwise divide by
+        # zero below. These can come from lines with only markup changes,
+        # once the markup is stripped.
+        return (), ()
+
+    old_tokens = LINE_TOKEN_RE.findall(oldline)
+    new_tokens = LINE_TOKEN_RE.findall(newline)
+    num_tokens = len(old_tokens) + len(new_tokens)
+    max_changes = int(num_tokens * (1 - LINE_CHANGED_REGIONS_MIN_RATIO))
+
+    # As a quick check, count the tokens the lines have in common,
+    # regardless of order. This is an upper bound on the number of tokens
+    # that can be matched up.
+    old_token_counts = {}
+
+    for token in old_tokens:
+        old_token_counts[token] = old_token_counts.get(token, 0) + 1
+
+    num_common = 0
+
+    for token in new_tokens:
+        count = old_token_counts.get(token)
+
+        if count:
+            old_token_counts[token] = count - 1
+            num_common += 1
+
+    if num_tokens - 2 * num_common > max_changes:
         return None, None
 
+    matches = _get_token_matches(old_tokens, new_tokens, max_changes)
+
+    if matches is None:
+        return None, None
+
+    # Convert the matches to character offsets. Within tokens that were
+    # replaced, the characters are compared as well, so that small changes
+    # to a word (such as a renamed variable) only highlight what changed.
+    old_offsets = [0]
+    new_offsets = [0]
+
+    for token in old_tokens:
+        old_offsets.append(old_offsets[-1] + len(token))
+
+    for token in new_tokens:
+        new_offsets.append(new_offsets[-1] + len(token))
+
+    opcodes = []
+
+    for tag, i1, i2, j1, j2 in _get_opcodes_from_matches(
+            matches, len(old_tokens), len(new_tokens)):
+        i1 = old_offsets[i1]
+        i2 = old_offsets[i2]
+        j1 = new_offsets[j1]
+        j2 = new_offsets[j2]
+
+        old_chars = oldline[i1:i2]
+        new_chars = newline[j1:j2]
+
+        # Changes to whitespace aren't highlighted, so there's no need to
+        # look at those characters.
+        if (tag == 'replace' and
+            not old_chars.isspace() and
+            not new_chars.isspace()):
+            char_matches = _get_token_matches(
+                old_chars, new_chars, len(old_chars) + len(new_chars))
+
+            new_opcodes = [
+                (char_tag, i1 + ci1, i1 + ci2, j1 + cj1, j1 + cj2)
+                for char_tag, ci1, ci2, cj1, cj2 in _get_opcodes_from_matches(
+                    char_matches, len(old_chars), len(new_chars))
+            ]
+        else:
+            new_opcodes = [(tag, i1, i2, j1, j2)]
+
+        for opcode in new_opcodes:
+            # Join runs of matching characters that span tokens, so that
+            # they're treated as one run when building the regions.
+            if (opcode[0] == 'equal' and opcodes and
+                opcodes[-1][0] == 'equal'):
+                opcodes[-1] = ('equal', opcodes[-1][1], opcode[2],
+                               opcodes[-1][3], opcode[4])
+            else:
+                opcodes.append(opcode)
+
+    # Check that enough of the line's characters (rather than its tokens)
+    # are unchanged.
+    num_matched_chars = sum(
+        i2 - i1
+        for tag, i1, i2, j1, j2 in opcodes
+        if tag == 'equal'
+    )
+
+    if (2.0 * num_matched_chars / (len(oldline) + len(newline)) <
+        LINE_CHANGED_REGIONS_MIN_RATIO):
+        return None, None
+
+    oldchanges, newchanges = _get_changed_regions_from_opcodes(
+        oldline, newline, opcodes)
+
+    return tuple(oldchanges), tuple(newchanges)
+
+
+def _get_token_matches(a, b, max_changes):
+    """Return the matching runs of tokens between two lists of tokens.
+
+    This is a Myers diff, bounded by the number of changes (insertions and
+    deletions) allowed. Tokens common to the start and end of both lists
+    are matched up front.
+
+    Args:
+        a (list of unicode):
+            The old list of tokens.
+
+        b (list of unicode):
+            The new list of tokens.
+
+        max_changes (int):
+            The maximum number of changes allowed.
+
+    Returns:
+        list of tuple:
+        A list of ``(i, j, size)`` tuples, like
+        :py:meth:`difflib.SequenceMatcher.get_matching_blocks` (but without
+        the final dummy match), or ``None`` if there are more than
+        ``max_changes`` changes.
+    """
+    n = len(a)
+    m = len(b)
+    prefix = 0
+
+    while prefix < n and prefix < m and a[prefix] == b[prefix]:
+        prefix += 1
+
+    suffix = 0
+
+    while (suffix < n - prefix and suffix < m - prefix and
+           a[n - suffix - 1] == b[m - suffix - 1]):
+        suffix += 1
+
+    start = prefix
+    n -= suffix
+    m -= suffix
+
+    # Each entry in trace is the furthest x reached on each diagonal k
+    # (where k = x - y) before the next round of changes.
+    v = {1: start}
+    trace = []
+    found = False
+
+    for d in range(min(max_changes, (n - start) + (m - start)) + 1):
+        trace.append(dict(v))
+
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[k - 1] < v[k + 1]):
+                x = v[k + 1]
+            else:
+                x = v[k - 1] + 1
+
+            y = x - k
+
+            while x < n and y < m and a[x] == b[y]:
+                x += 1
+                y += 1
+
+            v[k] = x
+
+            if x >= n and y >= m:
+                found = True
+                break
+
+        if found:
+            break
+
+    if not found:
+        return None
+
+    # Walk back through the trace to find the matched tokens.
+    matched = []
+    x = n
+    y = m
+
+    for d in range(len(trace) - 1, -1, -1):
+        v = trace[d]
+        k = x - y
+
+        if k == -d or (k != d and v[k - 1] < v[k + 1]):
+            prev_k = k + 1
+        else:
+            prev_k = k - 1
+
+        prev_x = v[prev_k]
+        prev_y = prev_x - prev_k
+
+        while x > prev_x and y > prev_y and x > start and y > start:
+            x -= 1
+            y -= 1
+            matched.append((x, y))
+
+        x = prev_x
+        y = prev_y
+
+    matched.reverse()
+
+    matches = []
+
+    if prefix:
+        matches.append((0, 0, prefix))
+
+    for x, y in matched:
+        if matches and (matches[-1][0] + matches[-1][2] == x and
+                        matches[-1][1] + matches[-1][2] == y):
+            matches[-1] = (matches[-1][0], matches[-1][1],
+                           matches[-1][2] + 1)
+        else:
+            matches.append((x, y, 1))
+
+    if suffix:
+        if matches and (matches[-1][0] + matches[-1][2] == n and
+                        matches[-1][1] + matches[-1][2] == m):
+            matches[-1] = (matches[-1][0], matches[-1][1],
+                           matches[-1][2] + suffix)
+        else:
+            matches.append((n, m, suffix))
+
+    return matches
+
+
+def _get_opcodes_from_matches(matches, n, m):
+    """Return diff opcodes from the matching runs between two sequences.
+
+    Args:
+        matches (list of tuple):
+            The ``(i, j, size)`` matching runs, as returned by
+            :py:func:`_get_token_matches`.
+
+        n (int):
+            The length of the old sequence.
+
+        m (int):
+            The length of the new sequence.
+
+    Returns:
+        list of tuple:
+        The opcodes, in the form returned by
+        :py:meth:`difflib.SequenceMatcher.get_opcodes`.
+    """
+    opcodes = []
+    i = j = 0
+
+    for match_i, match_j, size in matches + [(n, m, 0)]:
+        if i < match_i and j < match_j:
+            opcodes.append(('replace', i, match_i, j, match_j))
+        elif i < match_i:
+            opcodes.append(('delete', i, match_i, j, match_j))
+        elif j < match_j:
+            opcodes.append(('insert', i, match_i, j, match_j))
+
+        i = match_i + size
+        j = match_j + size
+
+        if size:
+            opcodes.append(('equal', match_i, i, match_j, j))
+
+    return opcodes
+
+
+def _get_changed_regions_from_opcodes(oldline, newline, opcodes):
+    """Return regions of changes between two lines from diff opcodes.
+
+    Args:
+        oldline (unicode):
+            The old version of the line.
+
+        newline (unicode):
+            The new version of the line.
+
+        opcodes (list of tuple):
+            The opcodes for the differences between the lines, in the form
+            returned by :py:meth:`difflib.SequenceMatcher.get_opcodes`.
+
+    Returns:
+        tuple:
+        A 2-tuple containing lists of ``(start, end)`` ranges of changes in
+        the old line and the new line.
+    """
     oldchanges = []
     newchanges = []
     back = (0, 0)
 
-    for tag, i1, i2, j1, j2 in differ.get_opcodes():
+    for tag, i1, i2, j1, j2 in opcodes:
         if tag == 'equal':
             if (i2 - i1 < 3) or (j2 - j1 < 3):
                 back = (j2 - j1, i2 - i1)
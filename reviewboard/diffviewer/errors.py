@@ -85,3 +85,22 @@ class PatchError(UserVisibleError):
 
         super(PatchError, self).__init__(
             _('The patch to "%s" did not apply cleanly.') % filename)
+
+
+class PatchNotApplicableError(Exception):
+    """A diff could not be applied by the in-process patcher.
+
+    This is used internally to indicate that the diff must be applied using
+    :command:`patch` instead. It is never shown to users.
+
+    Version Added:
+        4.0
+    """
+
+
+class DiffCompressionError(Exception):
+    """An error compressing or decompressing stored diff data.
+
+    Version Added:
+        4.0
+    """
@@ -16,4 +16,5 @@ SEQUENCE = [
     'raw_diff_file_data',
     'diffcommit_relations',
     'delete_file_count_fields',
+    'diffsethistory_line_counts',
 ]
@@ -0,0 +1,14 @@
+from __future__ import unicode_literals
+
+from django_evolution.mutations import AddField
+from django.db import models
+
+
+MUTATIONS = [
+    AddField('DiffSetHistory', 'last_diff_insert_count', models.IntegerField,
+             null=True),
+    AddField('DiffSetHistory', 'last_diff_delete_count', models.IntegerField,
+             null=True),
+    AddField('DiffSetHistory', 'last_diff_line_count', models.IntegerField,
+             null=True),
+]
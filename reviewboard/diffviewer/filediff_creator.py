@@ -6,6 +6,7 @@ import os
 from functools import cmp_to_key
 
 from django.utils.encoding import force_bytes, force_text
+from django.utils.six.moves import zip
 from django.utils.translation import ugettext as _
 from djblets.util.compat.python.past import cmp
 
@@ -30,7 +31,8 @@ _IMPL_EXTENSIONS = [
 def create_filediffs(diff_file_contents, parent_diff_file_contents,
                      repository, basedir, base_commit_id, diffset,
                      request=None, check_existence=True, get_file_exists=None,
-                     diffcommit=None, validate_only=False):
+                     diffcommit=None, validate_only=False,
+                     get_files_exist=None):
     """Create FileDiffs from the given data.
 
     Args:
@@ -78,6 +80,18 @@ def create_filediffs(diff_file_contents, parent_diff_file_contents,
             won't populate the database at all and will return ``None``
             upon success. This defaults to ``False``.
 
+        get_files_exist (callable, optional):
+            A callable that is used to determine if several files exist at
+            once. This takes a list of ``(path, revision, base_commit_id)``
+            tuples and a ``request`` keyword argument, and returns a list of
+            results in the same order, each being a boolean or an exception.
+
+            If provided, this will be used instead of ``get_file_exists``,
+            allowing the checks to be made in bulk.
+
+            Version Added:
+                4.0
+
     Returns:
         list of reviewboard.diffviewer.models.filediff.FileDiff:
         The created FileDiffs.
@@ -95,6 +109,7 @@ def create_filediffs(diff_file_contents, parent_diff_file_contents,
         basedir=basedir,
         check_existence=check_existence,
         get_file_exists=get_file_exists,
+        get_files_exist=get_files_exist,
         base_commit_id=base_commit_id)
 
     encoding_list = repository.get_encoding_list()
@@ -183,7 +198,8 @@ def create_filediffs(diff_file_contents, parent_diff_file_contents,
 
 def _prepare_file_list(diff_file_contents, parent_diff_file_contents,
                        repository, request, basedir, check_existence,
-                       get_file_exists=None, base_commit_id=None):
+                       get_file_exists=None, base_commit_id=None,
+                       get_files_exist=None):
     """Extract the list of files from the diff.
 
     Args:
@@ -217,6 +233,11 @@ def _prepare_file_list(diff_file_contents, parent_diff_file_contents,
             files, if the diffs represent blob IDs instead of commit IDs
             and the service doesn't support those lookups.
 
+        get_files_exist (callable, optional):
+            A callable to use to determine if several files exist in the
+            repository at once. If provided, this is used instead of
+            ``get_file_exists``.
+
     Returns:
         tuple:
         A tuple of the following:
@@ -251,7 +272,8 @@ def _prepare_file_list(diff_file_contents, parent_diff_file_contents,
         request=request,
         check_existence=(check_existence and
                          not parent_diff_file_contents),
-        get_file_exists=get_file_exists))
+        get_file_exists=get_file_exists,
+        get_files_exist=get_files_exist))
 
     if len(files) == 0:
         raise EmptyDiffError(_('The diff is empty.'))
@@ -277,6 +299,7 @@ def _prepare_file_list(diff_file_contents, parent_diff_file_contents,
             f.modified_filename: f
             for f in _process_files(
                 get_file_exists=get_file_exists,
+                get_files_exist=get_files_exist,
                 parser=parent_parser,
                 basedir=basedir,
                 repository=repository,
@@ -295,7 +318,7 @@ def _prepare_file_list(diff_file_contents, parent_diff_file_contents,
 
 def _process_files(parser, basedir, repository, base_commit_id,
                    request, get_file_exists=None, check_existence=False,
-                   limit_to=None):
+                   limit_to=None, get_files_exist=None):
     """Collect metadata about files in the parser.
 
     Args:
@@ -331,6 +354,12 @@ def _process_files(parser, basedir, repository, base_commit_id,
         limit_to (list of unicode, optional):
             A list of filenames to limit the results to.
 
+        get_files_exist (callable, optional):
+            A callable to use to determine if several files exist in the
+            repository at once. If provided, this is used instead of
+            ``get_file_exists``, and all existence checks are made after the
+            diff is parsed.
+
     Yields:
        reviewboard.diffviewer.parser.ParsedDiffFile:
        The files present in the diff.
@@ -346,6 +375,8 @@ def _process_files(parser, basedir, repository, base_commit_id,
 
     tool = repository.get_scmtool()
     basedir = force_bytes(basedir)
+    files = []
+    files_to_check = []
 
     for f in parser.parse():
         # This will either be a Revision or bytes. Either way, convert it
@@ -376,25 +407,44 @@ def _process_files(parser, basedir, repository, base_commit_id,
         source_filename = _normalize_filename(source_filename, basedir)
 
         # FIXME: this would be a good place to find permissions errors
-        if (source_revision != PRE_CREATION and
+        if (check_existence and
+            source_revision != PRE_CREATION and
             source_revision != UNKNOWN and
             not f.binary and
             not f.deleted and
             not f.moved and
-            not f.copied and
-            (check_existence and
-             not get_file_exists(force_text(source_filename),
-                                 force_text(source_revision),
-                                 base_commit_id=base_commit_id,
-                                 request=request))):
-            raise FileNotFoundError(force_text(source_filename),
-                                    force_text(source_revision),
-                                    base_commit_id)
+            not f.copied):
+            files_to_check.append((force_text(source_filename),
+                                   force_text(source_revision),
+                                   base_commit_id))
 
         f.orig_filename = source_filename
         f.orig_file_details = source_revision
         f.modified_filename = dest_filename
 
+        files.append(f)
+
+    if files_to_check:
+        if get_files_exist is None:
+            # Check each file in turn, stopping at the first missing file.
+            results = (
+                get_file_exists(path, revision,
+                                base_commit_id=base_commit_id,
+                                request=request)
+                for path, revision, base_commit_id in files_to_check
+            )
+        else:
+            results = get_files_exist(files_to_check, request=request)
+
+        # Report the first error in the order the files appear in the diff.
+        for (path, revision, base_commit_id), exists in zip(files_to_check,
+                                                             results):
+            if isinstance(exists, Exception):
+                raise exists
+            elif not exists:
+                raise FileNotFoundError(path, revision, base_commit_id)
+
+    for f in files:
         yield f
 
 
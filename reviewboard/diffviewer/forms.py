@@ -13,7 +13,8 @@ from django.utils.encoding import force_text
 from django.utils.translation import ugettext, ugettext_lazy as _
 
 from reviewboard.diffviewer.commit_utils import (deserialize_validation_info,
-                                                 get_file_exists_in_history)
+                                                 get_file_exists_in_history,
+                                                 get_files_exist_in_history)
 from reviewboard.diffviewer.differ import DiffCompatVersion
 from reviewboard.diffviewer.diffutils import check_diff_size
 from reviewboard.diffviewer.filediff_creator import create_filediffs
@@ -477,6 +478,10 @@ class ValidateCommitForm(BaseCommitValidationForm):
                                   validation_info or {},
                                   self.repository,
                                   self.cleaned_data['parent_id'])
+        get_files_exist = partial(get_files_exist_in_history,
+                                  validation_info or {},
+                                  self.repository,
+                                  self.cleaned_data['parent_id'])
 
         return create_filediffs(
             diff_file_contents=diff_file.read(),
@@ -485,6 +490,7 @@ class ValidateCommitForm(BaseCommitValidationForm):
             basedir='',
             base_commit_id=base_commit_id,
             get_file_exists=get_file_exists,
+            get_files_exist=get_files_exist,
             diffset=diffset,
             request=self.request,
             diffcommit=None,
@@ -7,6 +7,7 @@ from datetime import datetime, timedelta
 
 from django.conf import settings
 from django.contrib.humanize.templatetags.humanize import intcomma
+from django.core.management.base import CommandError
 from django.utils.translation import ugettext as _, ungettext_lazy as N_
 from djblets.util.compat.django.core.management.base import BaseCommand
 
@@ -67,6 +68,15 @@ class Command(BaseCommand):
             help=_("The maximum number of migrations to perform. This is "
                    "useful if you have a lot of diffs to migrate and want "
                    "to do it over several sessions."))
+        parser.add_argument(
+            '--workers',
+            action='store',
+            dest='workers',
+            type=int,
+            default=1,
+            help=_('The number of worker processes to migrate diffs with. '
+                   'Using more than one can speed up migrations on large '
+                   'databases considerably.'))
 
     def handle(self, **options):
         """Handle the command.
@@ -79,6 +89,9 @@ class Command(BaseCommand):
             django.core.management.CommandError:
                 There was an error performing a diff migration.
         """
+        if options['workers'] < 1:
+            raise CommandError(_('--workers must be at least 1.'))
+
         self.show_progress = options['show_progress']
         max_diffs = options['max_diffs']
 
@@ -135,27 +148,40 @@ class Command(BaseCommand):
 
         info = FileDiff.objects.migrate_all(batch_done_cb=self._on_batch_done,
                                             counts=counts,
-                                            max_diffs=max_diffs)
+                                            max_diffs=max_diffs,
+                                            workers=options['workers'])
 
         if info['diffs_migrated'] == 0:
             self.stdout.write(_('All diffs have already been migrated.\n'))
         else:
             old_diff_size = info['old_diff_size']
             new_diff_size = info['new_diff_size']
+            elapsed_time = info['elapsed_time']
+
+            if elapsed_time > 0:
+                diffs_per_second = info['diffs_migrated'] / elapsed_time
+            else:
+                diffs_per_second = 0.0
 
             self.stdout.write(
                 _('\n'
                   '\n'
                   'Condensed stored diffs from %(old_size)s bytes to '
-                  '%(new_size)s bytes (%(savings_pct)0.2f%% savings)\n')
+                  '%(new_size)s bytes (%(savings_pct)0.2f%% savings)\n'
+                  'Migrated %(count)s diffs in %(elapsed)d seconds '
+                  '(%(rate)0.1f diffs per second)\n')
                 % {
                     'old_size': intcomma(old_diff_size),
                     'new_size': intcomma(new_diff_size),
                     'savings_pct': (float(old_diff_size - new_diff_size) /
                                     float(old_diff_size) * 100),
+                    'count': intcomma(info['diffs_migrated']),
+                    'elapsed': elapsed_time,
+                    'rate': diffs_per_second,
                 })
 
-    def _on_batch_done(self, total_diffs_migrated, total_count=None, **kwargs):
+    def _on_batch_done(self, total_diffs_migrated, total_count=None,
+                       diffs_per_second=None, **kwargs):
         """Handler for when a batch of diffs are processed.
 
         This will report the progress of the operation, showing the estimated
@@ -171,6 +197,9 @@ class Command(BaseCommand):
                 may be ``None``, in which case the output won't contain
                 progress and time estimation.
 
+            diffs_per_second (float, optional):
+                The average number of diffs migrated per second.
+
             **kwargs (dict, unused):
                 Unused keyword arguments.
         """
@@ -201,8 +230,10 @@ class Command(BaseCommand):
             else:
                 time_remaining_s = self.CALC_TIME_REMAINING_STR
 
-            prefix_s = '  [%d%%] %s/%s - ' % (pct, total_diffs_migrated,
-                                              total_count)
+            prefix_s = '  [%d%%] %s/%s (%d/s) - ' % (pct,
+                                                     total_diffs_migrated,
+                                                     total_count,
+                                                     diffs_per_second or 0)
 
             sys.stdout.write(prefix_s)
 
@@ -0,0 +1,91 @@
+"""Management command to store the sizes of the latest diffs."""
+
+from __future__ import unicode_literals
+
+import sys
+
+from django.conf import settings
+from django.contrib.humanize.templatetags.humanize import intcomma
+from django.utils.translation import ugettext as _
+from djblets.util.compat.django.core.management.base import BaseCommand
+
+from reviewboard.diffviewer.models import DiffSetHistory
+
+
+class Command(BaseCommand):
+    """Management command to store the sizes of the latest diffs.
+
+    The number of inserted and deleted lines in the latest diff of each
+    review request are stored when a diff is published. This computes them
+    for any diffs published before they were stored.
+
+    Version Added:
+        4.0
+    """
+
+    help = _('Computes and stores the number of changed lines in the latest '
+             'diff of each review request, for use in the dashboard.')
+
+    def add_arguments(self, parser):
+        """Add arguments to the command.
+
+        Args:
+            parser (argparse.ArgumentParser):
+                The argument parser for the command.
+        """
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            dest='populate_all',
+            default=False,
+            help=_('Recompute the sizes even if they were already stored.'))
+        parser.add_argument(
+            '--batch-size',
+            action='store',
+            dest='batch_size',
+            type=int,
+            default=100,
+            help=_('The number of review requests to process in each '
+                   'batch.'))
+
+    def handle(self, **options):
+        """Handle the command.
+
+        Args:
+            **options (dict):
+                Options parsed on the command line.
+        """
+        batch_size = options['batch_size']
+
+        # Don't allow queries to be stored.
+        settings.DEBUG = False
+
+        queryset = DiffSetHistory.objects.all()
+
+        if not options['populate_all']:
+            queryset = queryset.filter(last_diff_line_count__isnull=True)
+
+        history_ids = list(queryset.order_by('pk').values_list('pk',
+                                                               flat=True))
+        total_count = len(history_ids)
+
+        if total_count == 0:
+            self.stdout.write(_('All diff sizes have already been '
+                                'stored.\n'))
+            return
+
+        self.stdout.write(_('Storing diff sizes for %s review requests...\n')
+                          % intcomma(total_count))
+
+        for i in range(0, total_count, batch_size):
+            batch_ids = history_ids[i:i + batch_size]
+            DiffSetHistory.objects.populate_last_diff_line_counts(
+                list(DiffSetHistory.objects.filter(pk__in=batch_ids)))
+
+            # NOTE: We use sys.stdout when writing instead of self.stdout in
+            #       order to control newlines.
+            sys.stdout.write('  %s/%s\r' % (i + len(batch_ids), total_count))
+            sys.stdout.flush()
+
+        self.stdout.write(_('\nStored diff sizes for %s review requests.\n')
+                          % intcomma(total_count))
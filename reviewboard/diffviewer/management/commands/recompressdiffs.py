@@ -0,0 +1,220 @@
+"""Management command to re-compress stored diffs in the database."""
+
+from __future__ import unicode_literals
+
+import sys
+
+from django.conf import settings
+from django.contrib.humanize.templatetags.humanize import intcomma
+from django.core.management.base import CommandError
+from django.utils import six
+from django.utils.translation import ugettext as _
+from djblets.siteconfig.models import SiteConfiguration
+from djblets.util.compat.django.core.management.base import BaseCommand
+
+from reviewboard.diffviewer.compression import (ZstdDiffCompressor,
+                                                diff_compressor_registry)
+from reviewboard.diffviewer.errors import DiffCompressionError
+from reviewboard.diffviewer.models import RawFileDiffData
+
+
+class Command(BaseCommand):
+    """Management command to re-compress stored diffs in the database.
+
+    Version Added:
+        4.0
+    """
+
+    help = _('Re-compresses the diffs stored in the database using a '
+             'faster compression method.')
+
+    def add_arguments(self, parser):
+        """Add arguments to the command.
+
+        Args:
+            parser (argparse.ArgumentParser):
+                The argument parser for the command.
+        """
+        parser.add_argument(
+            '--compression',
+            action='store',
+            dest='compression_id',
+            default=None,
+            help=_('The ID of the compression method to use for existing '
+                   'and new diffs ("B" for bzip2, "Z" for Zstandard). '
+                   'Defaults to the compression method used for new diffs.'))
+        parser.add_argument(
+            '--train-dictionary',
+            action='store_true',
+            dest='train_dictionary',
+            default=False,
+            help=_('Train a new Zstandard compression dictionary on the '
+                   'stored diffs, and use it for all diffs compressed from '
+                   'now on. This implies --all.'))
+        parser.add_argument(
+            '--dictionary-size',
+            action='store',
+            dest='dictionary_size',
+            type=int,
+            default=112640,
+            help=_('The maximum size of a trained dictionary, in bytes.'))
+        parser.add_argument(
+            '--dictionary-samples',
+            action='store',
+            dest='dictionary_samples',
+            type=int,
+            default=10000,
+            help=_('The number of recent diffs to train a dictionary on.'))
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            dest='recompress_all',
+            default=False,
+            help=_('Re-compress diffs even if they were already compressed '
+                   'with the chosen compression method.'))
+        parser.add_argument(
+            '--batch-size',
+            action='store',
+            dest='batch_size',
+            type=int,
+            default=100,
+            help=_('The number of diffs to re-compress in each batch.'))
+        parser.add_argument(
+            '--max-diffs',
+            action='store',
+            dest='max_diffs',
+            type=int,
+            default=None,
+            help=_('The maximum number of diffs to re-compress. This is '
+                   'useful if you have a lot of diffs and want to do it '
+                   'over several sessions.'))
+
+    def handle(self, **options):
+        """Handle the command.
+
+        Args:
+            **options (dict):
+                Options parsed on the command line.
+
+        Raises:
+            django.core.management.CommandError:
+                The compression method is unknown or unavailable, or a
+                dictionary could not be trained.
+        """
+        compression_id = options['compression_id']
+        recompress_all = options['recompress_all']
+
+        if compression_id is None:
+            compressor = diff_compressor_registry.get_default_compressor()
+        else:
+            compressor = diff_compressor_registry.get_compressor(
+                compression_id)
+
+            if compressor is None:
+                raise CommandError(_('Unknown compression method "%s".')
+                                   % compression_id)
+
+        if not compressor.is_available():
+            raise CommandError(
+                _('The %s compression method is not available. Make sure '
+                  'its modules are installed.')
+                % compressor.name)
+
+        if compression_id is not None:
+            siteconfig = SiteConfiguration.objects.get_current()
+            siteconfig.set('diffviewer_diff_compression', compression_id)
+            siteconfig.save()
+
+        # Don't allow queries to be stored.
+        settings.DEBUG = False
+
+        if options['train_dictionary']:
+            if not isinstance(compressor, ZstdDiffCompressor):
+                raise CommandError(
+                    _('Dictionaries can only be trained for Zstandard '
+                      'compression.'))
+
+            self._train_dictionary(compressor,
+                                   dict_size=options['dictionary_size'],
+                                   num_samples=options['dictionary_samples'])
+            recompress_all = True
+
+        self.stdout.write(_('Re-compressing diffs using %s...\n')
+                          % compressor.name)
+
+        info = RawFileDiffData.objects.recompress_all(
+            compressor=compressor,
+            recompress_all=recompress_all,
+            batch_done_cb=self._on_batch_done,
+            batch_size=options['batch_size'],
+            max_diffs=options['max_diffs'])
+
+        if info['diffs_migrated'] == 0:
+            self.stdout.write(_('All diffs have already been '
+                                're-compressed.\n'))
+        else:
+            self.stdout.write(
+                _('\n'
+                  '\n'
+                  'Re-compressed %(count)s diffs from %(old_size)s bytes to '
+                  '%(new_size)s bytes\n')
+                % {
+                    'count': intcomma(info['diffs_migrated']),
+                    'old_size': intcomma(info['old_diff_size']),
+                    'new_size': intcomma(info['new_diff_size']),
+                })
+
+    def _train_dictionary(self, compressor, dict_size, num_samples):
+        """Train a new dictionary on the most recent stored diffs.
+
+        Args:
+            compressor (reviewboard.diffviewer.compression.
+                        ZstdDiffCompressor):
+                The compressor to train the dictionary for.
+
+            dict_size (int):
+                The maximum size of the dictionary.
+
+            num_samples (int):
+                The number of diffs to train the dictionary on.
+
+        Raises:
+            django.core.management.CommandError:
+                The dictionary could not be trained.
+        """
+        self.stdout.write(_('Training a compression dictionary on %d '
+                            'diffs...\n')
+                          % num_samples)
+
+        samples = [
+            raw_fdd.content
+            for raw_fdd in (RawFileDiffData.objects
+                            .only('pk', 'binary', 'compression')
+                            .order_by('-pk')[:num_samples])
+        ]
+
+        try:
+            dictionary = compressor.train_dictionary(samples,
+                                                     dict_size=dict_size)
+        except DiffCompressionError as e:
+            raise CommandError(six.text_type(e))
+
+        self.stdout.write(_('Trained dictionary %s.\n') % dictionary.dict_id)
+
+    def _on_batch_done(self, total_diffs_migrated, total_count, **kwargs):
+        """Handler for when a batch of diffs are processed.
+
+        Args:
+            total_diffs_migrated (int):
+                The total number of diffs re-compressed so far.
+
+            total_count (int):
+                The total number of diffs to re-compress.
+
+            **kwargs (dict, unused):
+                Unused keyword arguments.
+        """
+        # NOTE: We use sys.stdout when writing instead of self.stdout in order
+        #       to control newlines.
+        sys.stdout.write('  %s/%s\r' % (total_diffs_migrated, total_count))
+        sys.stdout.flush()
@@ -2,20 +2,25 @@
 
 from __future__ import unicode_literals
 
-import bz2
 import gc
 import hashlib
 import logging
+import multiprocessing
+import time
+from collections import deque
 from functools import partial
 
 from django.conf import settings
 from django.db import models, reset_queries, connection, connections
-from django.db.models import Count, Q
+from django.db.models import Case, Count, Max, Min, Q, Value, When
 from django.db.utils import IntegrityError
+from django.utils import six, timezone
 from django.utils.encoding import force_text
 from django.utils.translation import ugettext as _
 
-from reviewboard.diffviewer.commit_utils import get_file_exists_in_history
+from reviewboard.diffviewer.commit_utils import (get_file_exists_in_history,
+                                                 get_files_exist_in_history)
+from reviewboard.diffviewer.compression import diff_compressor_registry
 from reviewboard.diffviewer.differ import DiffCompatVersion
 from reviewboard.diffviewer.diffutils import check_diff_size
 from reviewboard.diffviewer.filediff_creator import create_filediffs
@@ -24,14 +29,168 @@ from reviewboard.diffviewer.filediff_creator import create_filediffs
 logger = logging.getLogger(__name__)
 
 
+def _migrate_checkpoint_batch(checkpoint_id, limit):
+    """Migrate the next batch of objects in a checkpointed range.
+
+    This is used by :py:meth:`FileDiffManager.migrate_all` to migrate
+    batches in worker processes, which can only run module-level functions.
+
+    Args:
+        checkpoint_id (int):
+            The ID of the checkpoint for the range.
+
+        limit (int):
+            The maximum number of objects to migrate.
+
+    Returns:
+        tuple:
+        The result of the batch. See
+        :py:meth:`FileDiffManager._migrate_checkpoint_batch` for details.
+    """
+    from reviewboard.diffviewer.models import FileDiff
+
+    return FileDiff.objects._migrate_checkpoint_batch(checkpoint_id, limit)
+
+
+def _bulk_update_extra_data(model, objs, batch_size=100):
+    """Save the extra_data of many objects in a few queries.
+
+    Each batch of objects is written with a single ``UPDATE`` statement,
+    choosing the new value for each row through a ``CASE`` expression.
+
+    Args:
+        model (type):
+            The model class of the objects.
+
+        objs (list of django.db.models.Model):
+            The objects to save.
+
+        batch_size (int, optional):
+            The maximum number of objects to write in each query.
+    """
+    field = model._meta.get_field('extra_data')
+
+    for i in range(0, len(objs), batch_size):
+        batch = objs[i:i + batch_size]
+
+        model.objects.filter(pk__in=[obj.pk for obj in batch]).update(
+            extra_data=Case(
+                output_field=field,
+                *[
+                    When(pk=obj.pk,
+                         then=Value(field.dumps(obj.extra_data)))
+                    for obj in batch
+                ]))
+
+
 class FileDiffManager(models.Manager):
     """A manager for FileDiff objects.
 
     This contains utility methods for locating FileDiffs that haven't been
-    migrated to use RawFileDiffData.
+    migrated to use RawFileDiffData, and for computing line counts in bulk.
     """
 
-    MIGRATE_OBJECT_LIMIT = 200
+    def populate_line_counts(self, filediffs=None):
+        """Compute and store any missing raw line counts for FileDiffs.
+
+        :py:meth:`FileDiff.get_line_counts()
+        <reviewboard.diffviewer.models.filediff.FileDiff.get_line_counts>`
+        computes and saves missing counts one FileDiff at a time. This
+        instead fetches the diff data for all FileDiffs missing counts in
+        one query, parses only the diffs that have never been counted, and
+        writes the results back in bulk.
+
+        Version Added:
+            4.0
+
+        Args:
+            filediffs (iterable of reviewboard.diffviewer.models.FileDiff,
+                       optional):
+                The FileDiffs to populate. This defaults to all FileDiffs
+                in this manager, which is useful for related managers such
+                as ``diffset.files``.
+
+        Returns:
+            list of reviewboard.diffviewer.models.FileDiff:
+            The FileDiffs, with their line counts populated. Calling
+            :py:meth:`~reviewboard.diffviewer.models.filediff.FileDiff.
+            get_line_counts` on these will not perform any queries.
+        """
+        from reviewboard.diffviewer.models import DiffSet, RawFileDiffData
+
+        if filediffs is None:
+            filediffs = self.all()
+
+        filediffs = list(filediffs)
+        missing = [
+            filediff
+            for filediff in filediffs
+            if ('raw_insert_count' not in filediff.extra_data or
+                'raw_delete_count' not in filediff.extra_data)
+        ]
+
+        if not missing:
+            return filediffs
+
+        for filediff in missing:
+            if not filediff.diff_hash_id:
+                filediff._migrate_diff_data(recalculate_counts=False)
+
+        raw_fdds = RawFileDiffData.objects.in_bulk(set(
+            filediff.diff_hash_id
+            for filediff in missing
+        ))
+        uncounted_raw_fdds = {}
+
+        for filediff in missing:
+            raw_fdd = raw_fdds[filediff.diff_hash_id]
+            filediff.diff_hash = raw_fdd
+
+            if raw_fdd.insert_count is None:
+                uncounted_raw_fdds.setdefault(raw_fdd.pk, (raw_fdd,
+                                                           filediff))
+
+        if uncounted_raw_fdds:
+            diffsets = (
+                DiffSet.objects
+                .filter(pk__in=set(
+                    filediff.diffset_id
+                    for raw_fdd, filediff in six.itervalues(
+                        uncounted_raw_fdds)
+                ))
+                .select_related('repository__tool')
+                .in_bulk()
+            )
+            tools = {}
+
+            for raw_fdd, filediff in six.itervalues(uncounted_raw_fdds):
+                repository = diffsets[filediff.diffset_id].repository
+
+                try:
+                    tool = tools[repository.pk]
+                except KeyError:
+                    tool = repository.get_scmtool()
+                    tools[repository.pk] = tool
+
+                raw_fdd.recalculate_line_counts(tool, save=False)
+
+            _bulk_update_extra_data(
+                RawFileDiffData,
+                [
+                    raw_fdd
+                    for raw_fdd, filediff in six.itervalues(uncounted_raw_fdds)
+                    if raw_fdd.insert_count is not None
+                ])
+
+        for filediff in missing:
+            filediff.extra_data.update({
+                'raw_insert_count': filediff.diff_hash.insert_count,
+                'raw_delete_count': filediff.diff_hash.delete_count,
+            })
+
+        _bulk_update_extra_data(self.model, missing)
+
+        return filediffs
 
     def unmigrated(self):
         """Query FileDiffs that store their own diff content.
@@ -149,15 +308,30 @@ class FileDiffManager(models.Manager):
         }
 
     def migrate_all(self, batch_done_cb=None, counts=None, batch_size=40,
-                    max_diffs=None):
+                    max_diffs=None, workers=1):
         """Migrate diff content in FileDiffs to use RawFileDiffData.
 
         This will run through all unmigrated FileDiffs and migrate them,
         condensing their storage needs and removing the content from
         FileDiffs.
 
+        The objects to migrate are split up into ranges of primary keys,
+        which can be migrated in parallel by several worker processes. The
+        progress for each range is checkpointed in the database (using
+        :py:class:`~reviewboard.diffviewer.models.diff_migration_checkpoint.
+        DiffMigrationCheckpoint`) after every batch, so if the migration is
+        interrupted or limited by ``max_diffs``, the next call will pick up
+        where it left off. The ranges are kept until they've been fully
+        migrated, so a resumed migration will use the same number of ranges
+        as before, regardless of ``workers``.
+
         This will return a dictionary with the result of the process.
 
+        Version Changed:
+            4.0:
+            Added the ``workers`` argument, and made the migration
+            resumable.
+
         Args:
             batch_done_cb (callable, optional):
                 A function to call after each batch of objects has been
@@ -173,6 +347,12 @@ class FileDiffManager(models.Manager):
 
                 Note that ``total_count`` may be ``None``.
 
+                The keyword arguments also contain throughput statistics:
+                ``total_diff_size`` and ``total_bytes_saved`` (the sizes of
+                the migrated diffs, and the storage saved), ``elapsed_time``
+                (the number of seconds since the migration started), and
+                ``diffs_per_second``.
+
             counts (dict, optional):
                 A dictionary of counts for calculations.
 
@@ -188,22 +368,32 @@ class FileDiffManager(models.Manager):
 
             max_diffs (int, optional):
                 The maximum number of diffs to migrate.
+
+            workers (int, optional):
+                The number of worker processes to migrate diffs with. If
+                ``1``, diffs will be migrated in this process.
+
+        Returns:
+            dict:
+            Information on the migration, with ``diffs_migrated``,
+            ``old_diff_size``, ``new_diff_size``, ``bytes_saved`` and
+            ``elapsed_time`` keys.
         """
-        from reviewboard.diffviewer.models import LegacyFileDiffData
+        from reviewboard.diffviewer.models import DiffMigrationCheckpoint
 
         assert batch_done_cb is None or callable(batch_done_cb)
+        assert workers >= 1
 
         total_diffs_migrated = 0
         total_diff_size = 0
         total_bytes_saved = 0
 
-        unmigrated_filediffs = self.unmigrated()
-        legacy_data_items = LegacyFileDiffData.objects.all()
-
         if counts is not None:
             total_count = counts.get('total_count')
+        elif batch_done_cb is not None:
+            total_count = self.get_migration_counts()['total_count']
         else:
-            total_count = self.get_migration_counts()
+            total_count = None
 
         if max_diffs is not None:
             if total_count is None:
@@ -211,290 +401,436 @@ class FileDiffManager(models.Manager):
             else:
                 total_count = min(total_count, max_diffs)
 
-        migration_tasks = (
-            (self._migrate_filediffs, unmigrated_filediffs),
-            (self._migrate_legacy_fdd, legacy_data_items),
-        )
-
-        for migrate_func, queryset in migration_tasks:
-            for batch_info in migrate_func(queryset=queryset,
-                                           batch_size=batch_size,
-                                           max_diffs=max_diffs):
-                total_diffs_migrated += batch_info[0]
-                total_diff_size += batch_info[1]
-                total_bytes_saved += batch_info[2]
-
-                if batch_done_cb is not None:
-                    batch_done_cb(total_diffs_migrated=total_diffs_migrated,
-                                  total_count=total_count)
-
-                if max_diffs is not None:
-                    max_diffs -= batch_info[0]
-
-            if max_diffs is not None and max_diffs <= 0:
-                break
+        if workers > 1:
+            # Worker processes can't share the database connections of this
+            # process. Closing them here means each worker will open its
+            # own.
+            connections.close_all()
+            pool = multiprocessing.Pool(processes=workers)
+        else:
+            pool = None
+
+        start_time = time.time()
+
+        try:
+            for task in (DiffMigrationCheckpoint.TASK_FILEDIFFS,
+                         DiffMigrationCheckpoint.TASK_LEGACY_FILE_DIFF_DATA):
+                if max_diffs is not None and total_diffs_migrated >= max_diffs:
+                    break
+
+                # Each checkpointed range has at most one batch being
+                # migrated at a time. Batches are queued up in the pool (or
+                # run here, if there's no pool), and their results are read
+                # back in the order they were queued, queuing up the next
+                # batch for the range after each one.
+                ready_ids = self._get_migration_checkpoint_ids(
+                    task, num_ranges=workers)
+                pending = deque()
+                num_scheduled = total_diffs_migrated
+
+                while ready_ids or pending:
+                    for checkpoint_id in ready_ids:
+                        if max_diffs is None:
+                            limit = batch_size
+                        else:
+                            limit = min(batch_size, max_diffs - num_scheduled)
+
+                        if limit <= 0:
+                            continue
+
+                        args = (checkpoint_id, limit)
+
+                        if pool is None:
+                            get_result = partial(_migrate_checkpoint_batch,
+                                                 *args)
+                        else:
+                            get_result = pool.apply_async(
+                                _migrate_checkpoint_batch, args).get
+
+                        pending.append((limit, get_result))
+                        num_scheduled += limit
+
+                    ready_ids = []
+
+                    if not pending:
+                        break
+
+                    limit, get_result = pending.popleft()
+                    checkpoint_id, batch_len, diff_size, bytes_saved, done = \
+                        get_result()
+
+                    num_scheduled -= limit - batch_len
+                    total_diffs_migrated += batch_len
+                    total_diff_size += diff_size
+                    total_bytes_saved += bytes_saved
+
+                    if not done:
+                        ready_ids.append(checkpoint_id)
+
+                    if batch_done_cb is not None and batch_len > 0:
+                        self._report_migration_progress(
+                            batch_done_cb,
+                            start_time=start_time,
+                            total_diffs_migrated=total_diffs_migrated,
+                            total_count=total_count,
+                            total_diff_size=total_diff_size,
+                            total_bytes_saved=total_bytes_saved)
+        except Exception:
+            if pool is not None:
+                pool.terminate()
+
+            raise
+        else:
+            if pool is not None:
+                pool.close()
+        finally:
+            if pool is not None:
+                pool.join()
 
         # Call batch_done_cb one more time, using the finalized total count
         # which may differ from the original count due to a bad total row
         # count estimate or a too-large max_diffs.
         if batch_done_cb is not None:
-            batch_done_cb(total_diffs_migrated=total_diffs_migrated,
-                          total_count=total_diffs_migrated)
+            self._report_migration_progress(
+                batch_done_cb,
+                start_time=start_time,
+                total_diffs_migrated=total_diffs_migrated,
+                total_count=total_diffs_migrated,
+                total_diff_size=total_diff_size,
+                total_bytes_saved=total_bytes_saved)
 
         return {
             'diffs_migrated': total_diffs_migrated,
             'old_diff_size': total_diff_size,
             'new_diff_size': total_diff_size - total_bytes_saved,
             'bytes_saved': total_bytes_saved,
+            'elapsed_time': time.time() - start_time,
         }
 
-    def _migrate_legacy_fdd(self, queryset, batch_size,
-                            max_diffs=None):
-        """Migrate data from LegacyFileDiffData to RawFileDiffData.
-
-        This will go through every
-        :py:class:`~reviewboard.diffviewer.models.LegacyFileDiffData` and
-        convert them to
-        :py:class:`~reviewboard.diffviewer.models.RawFileDiffData` entries,
-        removing the old versions. All associated FileDiffs are then updated to
-        point to the new RawFileDiffData entry instead of the old
-        LegacyFileDiffData.
+    def _report_migration_progress(self, batch_done_cb, start_time,
+                                   total_diffs_migrated, **kwargs):
+        """Report the progress of a migration to a callback.
 
         Args:
-            queryset (django.db.models.query.QuerySet):
-                The queryset for retrieving
-                :py:class:`~reviewboard.diffviewer.models.LegacyFileDiffData`
-                objects.
-
-            batch_size (int):
-                The number of objects to process in each batch.
+            batch_done_cb (callable):
+                The callback passed to :py:meth:`migrate_all`.
 
-            max_diffs (int, optional):
-                The maximum number of diffs to migrate. This may be ``None``,
-                in which case all diffs will be migrated.
+            start_time (float):
+                The time the migration started.
 
-        Yields:
-            tuple:
-            A tuple containing the following items:
+            total_diffs_migrated (int):
+                The total number of diffs migrated so far.
 
-            1. The size of the batch.
-            2. The total number of bytes of diff data from the old legacy
-               entries in this batch.
-            3. The total number of bytes saved during this migration.
-            4. A list of all legacy hashes that were migrated for diffs.
-            5. A list of all legacy hashes that were migrated for parent diffs.
-            6. A list of all legacy hashes that were migrated for diffs and
-               parent diffs.
+            **kwargs (dict):
+                Additional keyword arguments to pass to the callback.
         """
-        from reviewboard.diffviewer.models import RawFileDiffData
+        elapsed_time = time.time() - start_time
 
-        cursor = connection.cursor()
+        if elapsed_time > 0:
+            diffs_per_second = total_diffs_migrated / elapsed_time
+        else:
+            diffs_per_second = 0.0
 
-        queryset = queryset.annotate(
-            num_filediffs=Count('filediffs'),
-            num_parent_filediffs=Count('parent_filediffs'))
+        batch_done_cb(total_diffs_migrated=total_diffs_migrated,
+                      elapsed_time=elapsed_time,
+                      diffs_per_second=diffs_per_second,
+                      **kwargs)
 
-        for batch in self._iter_batches(queryset=queryset,
-                                        batch_size=batch_size,
-                                        max_diffs=max_diffs):
-            batch_total_diff_size = 0
-            batch_total_bytes_saved = 0
-            raw_fdds = []
-            all_diff_hashes = []
-            filediff_hashes = []
-            parent_filediff_hashes = []
+    def _get_migration_checkpoint_ids(self, task, num_ranges):
+        """Return the IDs of checkpoints for the ranges left to migrate.
 
-            for legacy_fdd in batch:
-                raw_fdd = RawFileDiffData.objects.create_from_legacy(
-                    legacy_fdd, save=False)
+        If there are no checkpoints for the task, the objects left to migrate
+        will be split up into new ranges, each with a checkpoint.
 
-                raw_fdds.append(raw_fdd)
+        Args:
+            task (unicode):
+                The migration task to return checkpoints for.
 
-                binary_hash = legacy_fdd.binary_hash
+            num_ranges (int):
+                The number of ranges to split the objects into, if there are
+                no checkpoints yet.
 
-                old_diff_size = len(legacy_fdd.get_binary_base64())
-                batch_total_diff_size += old_diff_size
-                batch_total_bytes_saved += old_diff_size - len(raw_fdd.binary)
+        Returns:
+            list of int:
+            The IDs of the checkpoints.
+        """
+        from reviewboard.diffviewer.models import DiffMigrationCheckpoint
+
+        checkpoints = DiffMigrationCheckpoint.objects.filter(task=task)
+        checkpoint_ids = list(checkpoints.values_list('pk', flat=True))
+
+        if not checkpoint_ids:
+            DiffMigrationCheckpoint.objects.bulk_create(
+                DiffMigrationCheckpoint(task=task,
+                                        range_start=range_start,
+                                        range_end=range_end)
+                for range_start, range_end in self._get_migration_ranges(
+                    task, num_ranges)
+            )
 
-                # Update all associated FileDiffs to use the new objects
-                # instead of the old ones.
-                if legacy_fdd.num_filediffs > 0:
-                    filediff_hashes.append(binary_hash)
+            checkpoint_ids = list(checkpoints.values_list('pk', flat=True))
 
-                if legacy_fdd.num_parent_filediffs > 0:
-                    parent_filediff_hashes.append(binary_hash)
+        return checkpoint_ids
 
-                all_diff_hashes.append(binary_hash)
+    def _get_migration_ranges(self, task, num_ranges):
+        """Split the objects left to migrate into ranges of primary keys.
 
-            try:
-                # Attempt to create all the entries we want in one go.
-                RawFileDiffData.objects.bulk_create(raw_fdds)
-            except IntegrityError:
-                # One or more entries in the batch conflicted with an existing
-                # entry, meaning it was already created. We'll just need to
-                # operate on the contents of this batch one-by-one.
-                for raw_fdd in raw_fdds:
-                    try:
-                        raw_fdd.save()
-                    except IntegrityError:
-                        raw_fdd = RawFileDiffData.objects.get(
-                            binary_hash=raw_fdd.binary_hash)
-
-                        # This was already in the database, so we didn't have
-                        # to write new data. That means we get to reclaim
-                        # its size in the amount of bytes saved.
-                        batch_total_bytes_saved += len(raw_fdd.binary)
-
-            if filediff_hashes:
-                self._transition_hashes(cursor, 'diff_hash', filediff_hashes)
-
-            if parent_filediff_hashes:
-                self._transition_hashes(cursor, 'parent_diff_hash',
-                                        parent_filediff_hashes)
-
-            queryset.filter(pk__in=all_diff_hashes).delete()
-
-            yield (len(batch), batch_total_diff_size,
-                   batch_total_bytes_saved, filediff_hashes,
-                   parent_filediff_hashes, all_diff_hashes)
-
-    def _migrate_filediffs(self, queryset, batch_size, max_diffs=None):
-        """Migrate old diff data from a FileDiff into a RawFileDiffData.
+        FileDiffs are split evenly by their IDs. LegacyFileDiffData entries
+        are keyed by SHA1 hashes, which are evenly distributed, so they're
+        split by the first two hex digits of the hash.
 
         Args:
-            queryset (django.db.models.query.QuerySet):
-                The queryset for retrieving
-                :py:class:`~reviewboard.diffviewer.models.FileDiff` objects.
+            task (unicode):
+                The migration task to split objects for.
 
-            batch_size (int):
-                The number of objects to process in each batch.
+            num_ranges (int):
+                The maximum number of ranges to return.
 
-            max_diffs (int, optional):
-                The maximum number of diffs to migrate. This may be ``None``,
-                in which case all diffs will be migrated.
+        Returns:
+            list of tuple:
+            A list of ``(range_start, range_end)`` tuples. The start of the
+            first range and the end of the last range are ``None``.
+        """
+        from reviewboard.diffviewer.models import (DiffMigrationCheckpoint,
+                                                   LegacyFileDiffData)
+
+        if task == DiffMigrationCheckpoint.TASK_FILEDIFFS:
+            pks = self.unmigrated().aggregate(min_pk=Min('pk'),
+                                              max_pk=Max('pk'))
+
+            if pks['min_pk'] is None:
+                return []
+
+            span = pks['max_pk'] - pks['min_pk'] + 1
+            num_ranges = min(num_ranges, span)
+            boundaries = [
+                six.text_type(pks['min_pk'] + span * i // num_ranges)
+                for i in range(1, num_ranges)
+            ]
+        else:
+            if not LegacyFileDiffData.objects.exists():
+                return []
+
+            num_ranges = min(num_ranges, 256)
+            boundaries = [
+                '%02x' % (256 * i // num_ranges)
+                for i in range(1, num_ranges)
+            ]
+
+        return list(zip([None] + boundaries, boundaries + [None]))
 
-        Yields:
+    def _migrate_checkpoint_batch(self, checkpoint_id, limit):
+        """Migrate the next batch of objects in a checkpointed range.
+
+        The checkpoint will be updated with the last object migrated, or
+        deleted if the range has been fully migrated.
+
+        Args:
+            checkpoint_id (int):
+                The ID of the checkpoint for the range.
+
+            limit (int):
+                The maximum number of objects to migrate.
+
+        Returns:
             tuple:
             A tuple containing the following items:
 
-            1. The size of the batch.
-            2. The total number of bytes of diff data from the old legacy
-               entries in this batch.
-            3. The total number of bytes saved during this migration.
+            1. The ID of the checkpoint.
+            2. The number of objects migrated.
+            3. The total number of bytes of diff data from the old entries
+               in this batch.
+            4. The total number of bytes saved during this migration.
+            5. Whether the range has been fully migrated.
         """
-        for batch in self._iter_batches(queryset=queryset,
-                                        batch_size=batch_size,
-                                        max_diffs=max_diffs):
+        from reviewboard.diffviewer.models import (DiffMigrationCheckpoint,
+                                                   LegacyFileDiffData)
+
+        checkpoint = DiffMigrationCheckpoint.objects.get(pk=checkpoint_id)
+
+        if checkpoint.task == DiffMigrationCheckpoint.TASK_FILEDIFFS:
+            queryset = self.unmigrated()
+            to_pk = int
+            migrate_batch = self._migrate_filediff_batch
+        else:
+            queryset = LegacyFileDiffData.objects.annotate(
+                num_filediffs=Count('filediffs'),
+                num_parent_filediffs=Count('parent_filediffs'))
+            to_pk = six.text_type
+            migrate_batch = self._migrate_legacy_fdd_batch
+
+        # Migrated objects no longer match the queries, but filtering by the
+        # last migrated key keeps the database from having to skip past them
+        # (and past any objects that failed to migrate) on every batch.
+        if checkpoint.last_key is not None:
+            queryset = queryset.filter(pk__gt=to_pk(checkpoint.last_key))
+        elif checkpoint.range_start is not None:
+            queryset = queryset.filter(pk__gte=to_pk(checkpoint.range_start))
+
+        if checkpoint.range_end is not None:
+            queryset = queryset.filter(pk__lt=to_pk(checkpoint.range_end))
+
+        batch = list(queryset.order_by('pk')[:limit])
+
+        if batch:
+            batch_total_diff_size, batch_total_bytes_saved = \
+                migrate_batch(batch)
+        else:
             batch_total_diff_size = 0
             batch_total_bytes_saved = 0
 
-            for filediff in batch:
-                diff_size = len(filediff.get_diff64_base64())
-                parent_diff_size = len(filediff.get_parent_diff64_base64())
+        done = len(batch) < limit
 
-                batch_total_diff_size += diff_size + parent_diff_size
+        if done:
+            checkpoint.delete()
+        else:
+            checkpoint.last_key = six.text_type(batch[-1].pk)
+            checkpoint.timestamp = timezone.now()
+            checkpoint.save(update_fields=('last_key', 'timestamp'))
 
-                diff_hash_is_new, parent_diff_hash_is_new = \
-                    filediff._migrate_diff_data(recalculate_counts=False)
+        # Do all we can to limit the memory usage by resetting any stored
+        # queries (if DEBUG is True), and force garbage collection of
+        # anything we may have from processing an object.
+        reset_queries()
+        gc.collect()
 
-                if diff_size > 0:
-                    batch_total_bytes_saved += diff_size
+        return (checkpoint_id, len(batch), batch_total_diff_size,
+                batch_total_bytes_saved, done)
 
-                    if diff_hash_is_new:
-                        # This is a new entry, so we have to subtract the
-                        # new storage size. This *could* be larger than the
-                        # original diff, but will usually be smaller.
-                        batch_total_bytes_saved -= \
-                            len(filediff.diff_hash.binary)
+    def _migrate_legacy_fdd_batch(self, batch):
+        """Migrate data from LegacyFileDiffData to RawFileDiffData.
 
-                if parent_diff_size > 0:
-                    batch_total_bytes_saved += parent_diff_size
+        This will convert a batch of
+        :py:class:`~reviewboard.diffviewer.models.LegacyFileDiffData` entries
+        to :py:class:`~reviewboard.diffviewer.models.RawFileDiffData` entries,
+        removing the old versions. All associated FileDiffs are then updated to
+        point to the new RawFileDiffData entry instead of the old
+        LegacyFileDiffData.
 
-                    if diff_hash_is_new:
-                        # This is a new entry, so we have to subtract the
-                        # new storage size. This *could* be larger than the
-                        # original diff, but will usually be smaller.
-                        batch_total_bytes_saved -= \
-                            len(filediff.parent_diff_hash.binary)
+        Args:
+            batch (list of reviewboard.diffviewer.models.LegacyFileDiffData):
+                The entries to migrate. These must be annotated with
+                ``num_filediffs`` and ``num_parent_filediffs``.
 
-            yield len(batch), batch_total_diff_size, batch_total_bytes_saved
+        Returns:
+            tuple:
+            A tuple containing the following items:
 
-    def _iter_batches(self, queryset, batch_size, max_diffs=None,
-                      object_limit=MIGRATE_OBJECT_LIMIT):
-        """Iterate through items in a queryset, yielding batches.
+            1. The total number of bytes of diff data from the old legacy
+               entries in this batch.
+            2. The total number of bytes saved during this migration.
+        """
+        from reviewboard.diffviewer.models import (LegacyFileDiffData,
+                                                   RawFileDiffData)
 
-        This will gather up to a specified number of items from a
-        queryset at a time, process them into batches of a specified
-        size, and yield them.
+        cursor = connection.cursor()
+        batch_total_diff_size = 0
+        batch_total_bytes_saved = 0
+        raw_fdds = []
+        all_diff_hashes = []
+        filediff_hashes = []
+        parent_filediff_hashes = []
+
+        for legacy_fdd in batch:
+            raw_fdd = RawFileDiffData.objects.create_from_legacy(
+                legacy_fdd, save=False)
+
+            raw_fdds.append(raw_fdd)
+
+            binary_hash = legacy_fdd.binary_hash
+
+            old_diff_size = len(legacy_fdd.get_binary_base64())
+            batch_total_diff_size += old_diff_size
+            batch_total_bytes_saved += old_diff_size - len(raw_fdd.binary)
+
+            # Update all associated FileDiffs to use the new objects
+            # instead of the old ones.
+            if legacy_fdd.num_filediffs > 0:
+                filediff_hashes.append(binary_hash)
+
+            if legacy_fdd.num_parent_filediffs > 0:
+                parent_filediff_hashes.append(binary_hash)
+
+            all_diff_hashes.append(binary_hash)
+
+        try:
+            # Attempt to create all the entries we want in one go.
+            RawFileDiffData.objects.bulk_create(raw_fdds)
+        except IntegrityError:
+            # One or more entries in the batch conflicted with an existing
+            # entry, meaning it was already created. We'll just need to
+            # operate on the contents of this batch one-by-one.
+            for raw_fdd in raw_fdds:
+                try:
+                    raw_fdd.save()
+                except IntegrityError:
+                    raw_fdd = RawFileDiffData.objects.get(
+                        binary_hash=raw_fdd.binary_hash)
 
-        After each set of objects fetched from the database, garbage
-        collection will be forced and stored queries reset, in order to
-        reduce memory usage.
+                    # This was already in the database, so we didn't have
+                    # to write new data. That means we get to reclaim
+                    # its size in the amount of bytes saved.
+                    batch_total_bytes_saved += len(raw_fdd.binary)
 
-        Args:
-            queryset (django.db.models.query.QuerySet):
-                The queryset to execute for fetching objects.
+        if filediff_hashes:
+            self._transition_hashes(cursor, 'diff_hash', filediff_hashes)
 
-            batch_size (int):
-                The maximum number of objects to yield per batch.
+        if parent_filediff_hashes:
+            self._transition_hashes(cursor, 'parent_diff_hash',
+                                    parent_filediff_hashes)
 
-            max_diffs (int, optional):
-                The maximum number of diffs to migrate. This may be ``None``,
-                in which case all diffs will be migrated.
+        LegacyFileDiffData.objects.filter(pk__in=all_diff_hashes).delete()
+
+        return batch_total_diff_size, batch_total_bytes_saved
+
+    def _migrate_filediff_batch(self, batch):
+        """Migrate old diff data from FileDiffs into RawFileDiffData.
 
-            object_limit (int, optional):
-                The maximum number of objects to fetch from the database per
-                query.
+        Args:
+            batch (list of reviewboard.diffviewer.models.FileDiff):
+                The FileDiffs to migrate.
+
+        Returns:
+            tuple:
+            A tuple containing the following items:
 
-        Yields:
-            list of django.db.models.Model:
-            A batch of items to process. This will never be larger than
-            ``batch_size``.
+            1. The total number of bytes of diff data from the old legacy
+               entries in this batch.
+            2. The total number of bytes saved during this migration.
         """
-        batch = []
-        total_processed = 0
-
-        # We're going to iterate until we've exhausted the available objects
-        # from the database for the provided query, or hit the maximum number
-        # of diffs that were requested.
-        while max_diffs is None or total_processed < max_diffs:
-            # Every time we work on a batch, we're re-querying the list of
-            # objects. This result from the query is expected not to have any
-            # previously-processed objects from a yielded batch. It may,
-            # however, have objects we've previously seen that haven't been
-            # yielded in a batch yet. That's why we're indexing from the
-            # length of the batch to the object limit (or to the requested
-            # max_diffs, whichever is smaller).
-            limit = object_limit
-            processed = 0
+        batch_total_diff_size = 0
+        batch_total_bytes_saved = 0
 
-            if max_diffs is not None:
-                limit = min(limit, max_diffs - total_processed)
+        for filediff in batch:
+            diff_size = len(filediff.get_diff64_base64())
+            parent_diff_size = len(filediff.get_parent_diff64_base64())
 
-            batch_len = len(batch)
+            batch_total_diff_size += diff_size + parent_diff_size
 
-            for item in queryset[batch_len:limit].iterator():
-                batch.append(item)
-                processed += 1
+            diff_hash_is_new, parent_diff_hash_is_new = \
+                filediff._migrate_diff_data(recalculate_counts=False)
 
-                if len(batch) == batch_size:
-                    yield batch
-                    batch = []
+            if diff_size > 0:
+                batch_total_bytes_saved += diff_size
 
-            total_processed += processed
+                if diff_hash_is_new:
+                    # This is a new entry, so we have to subtract the
+                    # new storage size. This *could* be larger than the
+                    # original diff, but will usually be smaller.
+                    batch_total_bytes_saved -= \
+                        len(filediff.diff_hash.binary)
 
-            # Do all we can to limit the memory usage by resetting any
-            # stored queries (if DEBUG is True), and force garbage
-            # collection of anything we may have from processing an object.
-            reset_queries()
-            gc.collect()
+            if parent_diff_size > 0:
+                batch_total_bytes_saved += parent_diff_size
 
-            if processed < limit:
-                # We've processed all items in the database. We're done.
-                break
+                if parent_diff_hash_is_new:
+                    # This is a new entry, so we have to subtract the
+                    # new storage size. This *could* be larger than the
+                    # original diff, but will usually be smaller.
+                    batch_total_bytes_saved -= \
+                        len(filediff.parent_diff_hash.binary)
 
-        if batch:
-            yield batch
+        return batch_total_diff_size, batch_total_bytes_saved
 
     def _transition_hashes(self, cursor, hash_field_name, diff_hashes):
         """Transitions FileDiff-associated hashes to RawFileDiffData.
@@ -568,16 +904,27 @@ class FileDiffManager(models.Manager):
                     ),
                 })
         else:
-            raw_fdds = RawFileDiffData.objects.filter(
-                binary_hash__in=diff_hashes).only('pk', 'binary_hash')
-
-            for raw_fdd in raw_fdds:
-                self.filter(**{
-                    legacy_hash_field_name: raw_fdd.binary_hash
-                }).update(**{
-                    hash_field_name: raw_fdd.pk,
-                    legacy_hash_field_name: None
-                })
+            # Other databases don't support joins on updates, but we can
+            # still look up the new IDs in a subquery, and update all the
+            # FileDiffs in one go.
+            cursor.execute(
+                'UPDATE %(filediff_table)s'
+                '  SET'
+                '    raw_%(hash_field_name)s_id = ('
+                '      SELECT raw_fdd.id'
+                '        FROM %(raw_fdd_table)s raw_fdd'
+                '        WHERE raw_fdd.binary_hash = '
+                '              %(filediff_table)s.%(hash_field_name)s_id'
+                '    ),'
+                '    %(hash_field_name)s_id = NULL'
+                '  WHERE %(hash_field_name)s_id IN (%(params)s)'
+                % {
+                    'filediff_table': self.model._meta.db_table,
+                    'raw_fdd_table': RawFileDiffData._meta.db_table,
+                    'hash_field_name': hash_field_name,
+                    'params': ','.join(['%s'] * len(diff_hashes)),
+                },
+                diff_hashes)
 
         if settings.DEBUG:
             new_filediff_info = dict(
@@ -594,20 +941,183 @@ class RawFileDiffDataManager(models.Manager):
     This provides conveniences for creating an entry based on a
     LegacyFileDiffData object.
     """
-    def process_diff_data(self, data):
+    def process_diff_data(self, data, compressor=None):
         """Processes a diff, returning the resulting content and compression.
 
         If the content would benefit from being compressed, this will
         return the compressed content and the value for the compression
         flag. Otherwise, it will return the raw content.
+
+        Args:
+            data (bytes):
+                The diff data to process.
+
+            compressor (reviewboard.diffviewer.compression.DiffCompressor,
+                        optional):
+                The compressor to use. This defaults to the compressor
+                configured for new diffs.
+
+                Version Added:
+                    4.0
+
+        Returns:
+            tuple:
+            A 2-tuple of the content to store and the compression flag.
         """
-        compressed_data = bz2.compress(data, 9)
+        if compressor is None:
+            compressor = diff_compressor_registry.get_default_compressor()
+
+        compressed_data = compressor.compress(data)
 
         if len(compressed_data) < len(data):
-            return compressed_data, self.model.COMPRESSION_BZIP2
+            return compressed_data, compressor.compression_id
         else:
             return data, None
 
+    def get_recompression_queryset(self, compressor, recompress_all=False):
+        """Return the entries that need to be re-compressed.
+
+        Version Added:
+            4.0
+
+        Args:
+            compressor (reviewboard.diffviewer.compression.DiffCompressor):
+                The compressor that entries will be re-compressed with.
+
+            recompress_all (bool, optional):
+                Whether to include entries already compressed with
+                ``compressor``. This is useful after training a new
+                dictionary.
+
+        Returns:
+            django.db.models.query.QuerySet:
+            The queryset for the entries to re-compress.
+        """
+        queryset = self.filter(compression__isnull=False)
+
+        if not recompress_all:
+            queryset = queryset.exclude(
+                compression=compressor.compression_id)
+
+        return queryset
+
+    def recompress_all(self, compressor=None, recompress_all=False,
+                       batch_done_cb=None, batch_size=100, max_diffs=None):
+        """Re-compress stored diff data using a different compressor.
+
+        Entries are processed in batches, in the order they were created.
+        Each entry is updated in a single query, only if it hasn't changed
+        since it was read, so this is safe to run while the server is in use.
+        If interrupted, it can be run again to continue where it left off.
+
+        Entries that were stored uncompressed, because compression didn't
+        make them any smaller, are left alone.
+
+        Version Added:
+            4.0
+
+        Args:
+            compressor (reviewboard.diffviewer.compression.DiffCompressor,
+                        optional):
+                The compressor to use. This defaults to the compressor
+                configured for new diffs.
+
+            recompress_all (bool, optional):
+                Whether to re-compress entries already compressed with
+                ``compressor``.
+
+            batch_done_cb (callable, optional):
+                A function to call after each batch of entries has been
+                processed. This can be used for progress notification.
+
+                This should be in the form of:
+
+                .. code-block:: python
+
+                   def on_batch_done(total_diffs_migrated=None,
+                                     total_count=None, **kwargs):
+                       ...
+
+            batch_size (int, optional):
+                The number of entries to process in each batch.
+
+            max_diffs (int, optional):
+                The maximum number of entries to re-compress.
+
+        Returns:
+            dict:
+            Information on the re-compressed entries, with ``diffs_migrated``,
+            ``old_diff_size`` and ``new_diff_size`` keys.
+        """
+        assert batch_done_cb is None or callable(batch_done_cb)
+
+        if compressor is None:
+            compressor = diff_compressor_registry.get_default_compressor()
+
+        queryset = (
+            self.get_recompression_queryset(compressor,
+                                            recompress_all=recompress_all)
+            .only('pk', 'binary', 'compression')
+            .order_by('pk')
+        )
+
+        if batch_done_cb is not None:
+            total_count = queryset.count()
+
+            if max_diffs is not None:
+                total_count = min(total_count, max_diffs)
+
+        total_diffs_migrated = 0
+        old_diff_size = 0
+        new_diff_size = 0
+        last_pk = None
+
+        while max_diffs is None or total_diffs_migrated < max_diffs:
+            batch_queryset = queryset
+
+            if last_pk is not None:
+                batch_queryset = batch_queryset.filter(pk__gt=last_pk)
+
+            if max_diffs is None:
+                limit = batch_size
+            else:
+                limit = min(batch_size, max_diffs - total_diffs_migrated)
+
+            batch = list(batch_queryset[:limit])
+
+            if not batch:
+                break
+
+            for raw_fdd in batch:
+                old_binary = bytes(raw_fdd.binary)
+                new_binary, new_compression = self.process_diff_data(
+                    raw_fdd.content,
+                    compressor=compressor)
+
+                updated = (
+                    self.filter(pk=raw_fdd.pk,
+                                compression=raw_fdd.compression)
+                    .update(binary=new_binary,
+                            compression=new_compression)
+                )
+
+                if updated:
+                    total_diffs_migrated += 1
+                    old_diff_size += len(old_binary)
+                    new_diff_size += len(new_binary)
+
+            last_pk = batch[-1].pk
+
+            if batch_done_cb is not None:
+                batch_done_cb(total_diffs_migrated=total_diffs_migrated,
+                              total_count=total_count)
+
+        return {
+            'diffs_migrated': total_diffs_migrated,
+            'old_diff_size': old_diff_size,
+            'new_diff_size': new_diff_size,
+        }
+
     def get_or_create_from_data(self, data):
         """Return or create a new stored entry for diff data.
 
@@ -922,9 +1432,14 @@ class DiffCommitManager(BaseDiffManager):
                                   validation_info or {},
                                   repository,
                                   parent_id)
+        get_files_exist = partial(get_files_exist_in_history,
+                                  validation_info or {},
+                                  repository,
+                                  parent_id)
 
         create_filediffs(
             get_file_exists=get_file_exists,
+            get_files_exist=get_files_exist,
             diff_file_contents=diff_file_contents,
             parent_diff_file_contents=parent_diff_file_contents,
             repository=repository,
@@ -1059,6 +1574,7 @@ class DiffSetManager(BaseDiffManager):
 
         create_filediffs(
             get_file_exists=repository.get_file_exists,
+            get_files_exist=repository.get_files_exist,
             diff_file_contents=diff_file_contents,
             parent_diff_file_contents=parent_diff_file_contents,
             repository=repository,
@@ -1075,6 +1591,75 @@ class DiffSetManager(BaseDiffManager):
 
         return diffset
 
+    def populate_raw_line_counts(self, diffsets):
+        """Compute and store the total raw line counts for DiffSets.
+
+        The totals are stored in each DiffSet's ``extra_data``, so that pages
+        listing many DiffSets can show them without fetching or parsing any
+        diffs. Totals are only computed for DiffSets that don't already have
+        them, and all FileDiffs needed for those are fetched and counted in
+        one pass.
+
+        Totals for a commit series are not stored until the series is
+        finalized, since more files may still be added to it.
+
+        Version Added:
+            4.0
+
+        Args:
+            diffsets (list of reviewboard.diffviewer.models.diffset.DiffSet):
+                The DiffSets to populate.
+        """
+        from reviewboard.diffviewer.models import FileDiff
+
+        key = self.model._RAW_LINE_COUNTS_KEY
+        missing = {}
+
+        for diffset in diffsets:
+            if diffset.extra_data is None:
+                diffset.extra_data = {}
+
+            if key not in diffset.extra_data:
+                diffset.extra_data[key] = {
+                    'raw_insert_count': 0,
+                    'raw_delete_count': 0,
+                }
+                missing[diffset.pk] = diffset
+
+        if not missing:
+            return
+
+        filediffs = []
+        unfetched_ids = []
+
+        for diffset_id, diffset in six.iteritems(missing):
+            if (hasattr(diffset, '_prefetched_objects_cache') and
+                'files' in diffset._prefetched_objects_cache):
+                filediffs += diffset.files.all()
+            else:
+                unfetched_ids.append(diffset_id)
+
+        if unfetched_ids:
+            filediffs += FileDiff.objects.filter(diffset__in=unfetched_ids)
+
+        for filediff in FileDiff.objects.populate_line_counts(filediffs):
+            totals = missing[filediff.diffset_id].extra_data[key]
+
+            for count_key in ('raw_insert_count', 'raw_delete_count'):
+                value = filediff.extra_data[count_key]
+
+                if value is not None:
+                    totals[count_key] += value
+
+        _bulk_update_extra_data(
+            self.model,
+            [
+                diffset
+                for diffset in six.itervalues(missing)
+                if (diffset.commit_count == 0 or
+                    diffset.is_commit_series_finalized)
+            ])
+
     def create_empty(self, repository, diffset_history=None, **kwargs):
         """Create a DiffSet with no attached FileDiffs.
 
@@ -1106,3 +1691,85 @@ class DiffSetManager(BaseDiffManager):
             repository=repository,
             diffcompat=DiffCompatVersion.DEFAULT,
             **kwargs)
+
+
+class DiffSetHistoryManager(models.Manager):
+    """A manager for DiffSetHistory objects.
+
+    Version Added:
+        4.0
+    """
+
+    def populate_last_diff_line_counts(self, histories):
+        """Compute and store the line counts of the latest diff in histories.
+
+        The total inserted and deleted lines of the latest
+        :py:class:`~reviewboard.diffviewer.models.diffset.DiffSet` in each
+        history are stored on the history, so that lists of review requests
+        can show and sort by the size of their diffs without fetching any
+        DiffSets or FileDiffs. Histories without any DiffSets are given
+        counts of 0.
+
+        The latest DiffSets for all histories are fetched in one query, and
+        histories sharing the same counts are written together.
+
+        Args:
+            histories (list of reviewboard.diffviewer.models.diffset_history.
+                       DiffSetHistory):
+                The histories to populate. The counts are also set on these
+                instances.
+        """
+        from reviewboard.diffviewer.models import DiffSet
+
+        histories = [
+            history
+            for history in histories
+            if history.pk is not None
+        ]
+
+        if not histories:
+            return
+
+        latest_diffset_ids = {}
+        latest_revisions = {}
+
+        diffset_rows = (
+            DiffSet.objects
+            .filter(history__in=[history.pk for history in histories])
+            .values_list('pk', 'history', 'revision'))
+
+        for diffset_id, history_id, revision in diffset_rows:
+            if revision > latest_revisions.get(history_id, -1):
+                latest_revisions[history_id] = revision
+                latest_diffset_ids[history_id] = diffset_id
+
+        diffsets = list(
+            DiffSet.objects
+            .filter(pk__in=latest_diffset_ids.values())
+            .prefetch_related('files'))
+        DiffSet.objects.populate_raw_line_counts(diffsets)
+
+        counts = {
+            diffset.history_id: diffset.get_total_raw_line_counts()
+            for diffset in diffsets
+        }
+        history_ids_by_counts = {}
+
+        for history in histories:
+            history_counts = counts.get(history.pk, {})
+            insert_count = history_counts.get('raw_insert_count', 0)
+            delete_count = history_counts.get('raw_delete_count', 0)
+
+            history.last_diff_insert_count = insert_count
+            history.last_diff_delete_count = delete_count
+            history.last_diff_line_count = insert_count + delete_count
+
+            history_ids_by_counts.setdefault(
+                (insert_count, delete_count), []).append(history.pk)
+
+        for (insert_count, delete_count), history_ids in \
+                six.iteritems(history_ids_by_counts):
+            self.filter(pk__in=history_ids).update(
+                last_diff_insert_count=insert_count,
+                last_diff_delete_count=delete_count,
+                last_diff_line_count=insert_count + delete_count)
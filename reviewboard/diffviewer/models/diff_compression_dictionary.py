@@ -0,0 +1,46 @@
+"""DiffCompressionDictionary model definition."""
+
+from __future__ import unicode_literals
+
+from django.db import models
+from django.utils import timezone
+from django.utils.encoding import python_2_unicode_compatible
+from django.utils.translation import ugettext_lazy as _
+
+
+@python_2_unicode_compatible
+class DiffCompressionDictionary(models.Model):
+    """A compression dictionary trained on the diffs stored on this server.
+
+    Dictionaries are used by the zstd compressor to compress small diffs
+    far better than it could on its own. Every diff compressed with a
+    dictionary records its ID, so dictionaries must never be deleted while
+    any diffs are still compressed with them.
+
+    Version Added:
+        4.0
+    """
+
+    #: The ID of the dictionary, as recorded in compressed data.
+    dict_id = models.BigIntegerField(_('dictionary ID'), unique=True)
+
+    #: The contents of the dictionary.
+    data = models.BinaryField()
+
+    #: The time the dictionary was trained.
+    timestamp = models.DateTimeField(_('timestamp'), default=timezone.now)
+
+    def __str__(self):
+        """Return a human-readable representation of the dictionary.
+
+        Returns:
+            unicode:
+            A human-readable representation of the dictionary.
+        """
+        return 'Diff compression dictionary %s' % self.dict_id
+
+    class Meta:
+        app_label = 'diffviewer'
+        db_table = 'diffviewer_diffcompressiondictionary'
+        verbose_name = _('Diff Compression Dictionary')
+        verbose_name_plural = _('Diff Compression Dictionaries')
@@ -0,0 +1,72 @@
+"""DiffMigrationCheckpoint model definition."""
+
+from __future__ import unicode_literals
+
+from django.db import models
+from django.utils import timezone
+from django.utils.encoding import python_2_unicode_compatible
+from django.utils.translation import ugettext_lazy as _
+
+
+@python_2_unicode_compatible
+class DiffMigrationCheckpoint(models.Model):
+    """Progress on migrating a range of legacy diff data.
+
+    :py:meth:`FileDiff.objects.migrate_all()
+    <reviewboard.diffviewer.managers.FileDiffManager.migrate_all>` splits the
+    legacy diff data into ranges of primary keys, which can be migrated in
+    parallel. Each range has a checkpoint recording the last key migrated,
+    so that an interrupted migration can pick up where it left off. The
+    checkpoint is deleted once its range has been fully migrated.
+
+    Version Added:
+        4.0
+    """
+
+    #: The task for migrating FileDiffs that store their own diff content.
+    TASK_FILEDIFFS = 'filediffs'
+
+    #: The task for migrating LegacyFileDiffData entries.
+    TASK_LEGACY_FILE_DIFF_DATA = 'legacy_file_diff_data'
+
+    TASK_CHOICES = (
+        (TASK_FILEDIFFS, _('FileDiffs')),
+        (TASK_LEGACY_FILE_DIFF_DATA, _('Legacy File Diff Data')),
+    )
+
+    #: The migration task this range belongs to.
+    task = models.CharField(_('task'), max_length=32, choices=TASK_CHOICES)
+
+    #: The first primary key in the range (inclusive).
+    #:
+    #: This is ``None`` if the range starts at the first key.
+    range_start = models.CharField(_('range start'), max_length=40,
+                                   null=True)
+
+    #: The end of the range (exclusive).
+    #:
+    #: This is ``None`` if the range extends to the last key.
+    range_end = models.CharField(_('range end'), max_length=40, null=True)
+
+    #: The last primary key in the range that was migrated.
+    last_key = models.CharField(_('last key'), max_length=40, null=True)
+
+    #: The time the checkpoint was last updated.
+    timestamp = models.DateTimeField(_('timestamp'), default=timezone.now)
+
+    def __str__(self):
+        """Return a human-readable representation of the checkpoint.
+
+        Returns:
+            unicode:
+            A human-readable representation of the checkpoint.
+        """
+        return 'Diff migration checkpoint for %s [%s, %s)' % (
+            self.task, self.range_start or '', self.range_end or '')
+
+    class Meta:
+        app_label = 'diffviewer'
+        db_table = 'diffviewer_diffmigrationcheckpoint'
+        ordering = ('pk',)
+        verbose_name = _('Diff Migration Checkpoint')
+        verbose_name_plural = _('Diff Migration Checkpoints')
@@ -223,7 +223,7 @@ class DiffCommit(models.Model):
             :py:class:`FileDiffs
             <reviewboard.diffviewer.models.filediff.FileDiff>`.
         """
-        return get_total_line_counts(self.files.all())
+        return get_total_line_counts(self.files.populate_line_counts())
 
     def __str__(self):
         """Return a human-readable representation of the commit.
@@ -20,6 +20,7 @@ class DiffSet(models.Model):
     """A revisioned collection of FileDiffs."""
 
     _FINALIZED_COMMIT_SERIES_KEY = '__finalized_commit_series'
+    _RAW_LINE_COUNTS_KEY = '__raw_line_counts'
 
     name = models.CharField(_('name'), max_length=256)
     revision = models.IntegerField(_("revision"))
@@ -142,6 +143,7 @@ class DiffSet(models.Model):
 
         filediffs = create_filediffs(
             get_file_exists=self.repository.get_file_exists,
+            get_files_exist=self.repository.get_files_exist,
             diff_file_contents=cumulative_diff,
             parent_diff_file_contents=parent_diff,
             repository=self.repository,
@@ -155,6 +157,7 @@ class DiffSet(models.Model):
             self.extra_data = {}
 
         self.extra_data[self._FINALIZED_COMMIT_SERIES_KEY] = True
+        self.extra_data.pop(self._RAW_LINE_COUNTS_KEY, None)
 
         if save:
             self.save(update_fields=('extra_data',))
@@ -180,7 +183,35 @@ class DiffSet(models.Model):
             :py:class:`FileDiffs
             <reviewboard.diffviewer.models.filediff.FileDiff>`.
         """
-        return get_total_line_counts(self.files.all())
+        return get_total_line_counts(self.files.populate_line_counts())
+
+    def get_total_raw_line_counts(self):
+        """Return the total raw line counts of all child FileDiffs.
+
+        Unlike :py:meth:`get_total_line_counts`, the totals are stored on the
+        DiffSet once computed, so this will not need to fetch or parse any
+        diffs after the first call. To compute the totals for many DiffSets
+        at once, use :py:meth:`DiffSet.objects.populate_raw_line_counts()
+        <reviewboard.diffviewer.managers.DiffSetManager.
+        populate_raw_line_counts>`.
+
+        Version Added:
+            4.0
+
+        Returns:
+            dict:
+            A dictionary with the following keys:
+
+            * ``raw_insert_count``
+            * ``raw_delete_count``
+
+            Each entry maps to the sum of that line count type for all child
+            :py:class:`FileDiffs
+            <reviewboard.diffviewer.models.filediff.FileDiff>`.
+        """
+        DiffSet.objects.populate_raw_line_counts([self])
+
+        return dict(self.extra_data[self._RAW_LINE_COUNTS_KEY])
 
     @property
     def per_commit_files(self):
@@ -286,6 +317,9 @@ class DiffSet(models.Model):
         in the history, and will set it to on more than the most recent
         diffset otherwise.
 
+        The line counts stored for the latest diff in the history will be
+        cleared, so that they're computed again from the new latest diff.
+
         Args:
             **kwargs (dict):
                 Extra arguments for the save call.
@@ -295,6 +329,9 @@ class DiffSet(models.Model):
                 self.update_revision_from_history(self.history)
 
             self.history.last_diff_updated = self.timestamp
+            self.history.last_diff_insert_count = None
+            self.history.last_diff_delete_count = None
+            self.history.last_diff_line_count = None
             self.history.save()
 
         super(DiffSet, self).save(**kwargs)
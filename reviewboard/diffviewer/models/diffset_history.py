@@ -9,6 +9,8 @@ from djblets.db.fields import JSONField
 
 from django.utils.encoding import python_2_unicode_compatible
 
+from reviewboard.diffviewer.managers import DiffSetHistoryManager
+
 
 @python_2_unicode_compatible
 class DiffSetHistory(models.Model):
@@ -26,8 +28,67 @@ class DiffSetHistory(models.Model):
         null=True,
         default=None)
 
+    #: The number of lines inserted in the latest diff.
+    #:
+    #: This is ``None`` if the count has not been computed yet.
+    #:
+    #: Version Added:
+    #:     4.0
+    last_diff_insert_count = models.IntegerField(
+        _('last diff inserted lines'),
+        null=True,
+        default=None)
+
+    #: The number of lines deleted in the latest diff.
+    #:
+    #: This is ``None`` if the count has not been computed yet.
+    #:
+    #: Version Added:
+    #:     4.0
+    last_diff_delete_count = models.IntegerField(
+        _('last diff deleted lines'),
+        null=True,
+        default=None)
+
+    #: The total number of lines inserted and deleted in the latest diff.
+    #:
+    #: This is stored separately so that histories can be sorted by the size
+    #: of their latest diff. It is ``None`` if the count has not been
+    #: computed yet.
+    #:
+    #: Version Added:
+    #:     4.0
+    last_diff_line_count = models.IntegerField(
+        _('last diff changed lines'),
+        null=True,
+        default=None)
+
     extra_data = JSONField(null=True)
 
+    objects = DiffSetHistoryManager()
+
+    def get_last_diff_line_counts(self):
+        """Return the line counts of the latest diff in the history.
+
+        The counts will be computed and stored if they haven't been already.
+
+        Version Added:
+            4.0
+
+        Returns:
+            dict:
+            A dictionary with ``raw_insert_count`` and ``raw_delete_count``
+            keys.
+        """
+        if (self.last_diff_insert_count is None or
+            self.last_diff_delete_count is None):
+            DiffSetHistory.objects.populate_last_diff_line_counts([self])
+
+        return {
+            'raw_insert_count': self.last_diff_insert_count,
+            'raw_delete_count': self.last_diff_delete_count,
+        }
+
     def __str__(self):
         """Return a human-readable representation of the model.
 
@@ -2,13 +2,13 @@
 
 from __future__ import unicode_literals
 
-import bz2
 import logging
 
 from django.db import models
 from django.utils.translation import ugettext_lazy as _
 from djblets.db.fields import JSONField
 
+from reviewboard.diffviewer.compression import diff_compressor_registry
 from reviewboard.diffviewer.errors import DiffParserError
 from reviewboard.diffviewer.managers import RawFileDiffDataManager
 
@@ -18,14 +18,20 @@ class RawFileDiffData(models.Model):
 
     This is the class used in Review Board 2.5+ to store diff content.
     Unlike in previous versions, the content is not base64-encoded. Instead,
-    it is stored either as bzip2-compressed data (if the resulting
-    compressed data is smaller than the raw data), or as the raw data itself.
+    it is stored either as compressed data (if the resulting compressed data
+    is smaller than the raw data), or as the raw data itself.
+
+    The compression flag contains the ID of the compressor used, as
+    registered in :py:data:`~reviewboard.diffviewer.compression.
+    diff_compressor_registry`.
     """
 
     COMPRESSION_BZIP2 = 'B'
+    COMPRESSION_ZSTD = 'Z'
 
     COMPRESSION_CHOICES = (
         (COMPRESSION_BZIP2, _('BZip2-compressed')),
+        (COMPRESSION_ZSTD, _('Zstandard-compressed')),
     )
 
     binary_hash = models.CharField(_("hash"), max_length=40, unique=True)
@@ -42,16 +48,26 @@ class RawFileDiffData(models.Model):
 
         The content will be uncompressed (if necessary) and returned as the
         raw set of bytes originally uploaded.
+
+        Raises:
+            reviewboard.diffviewer.errors.DiffCompressionError:
+                The content could not be decompressed.
+
+            NotImplementedError:
+                The content was compressed with an unknown compressor.
         """
-        if self.compression == self.COMPRESSION_BZIP2:
-            return bz2.decompress(self.binary)
-        elif self.compression is None:
+        if self.compression is None:
             return bytes(self.binary)
-        else:
+
+        compressor = diff_compressor_registry.get_compressor(self.compression)
+
+        if compressor is None:
             raise NotImplementedError(
                 'Unsupported compression method %s for RawFileDiffData %s'
                 % (self.compression, self.pk))
 
+        return compressor.decompress(bytes(self.binary))
+
     @property
     def insert_count(self):
         return self.extra_data.get('insert_count')
@@ -68,11 +84,21 @@ class RawFileDiffData(models.Model):
     def delete_count(self, value):
         self.extra_data['delete_count'] = value
 
-    def recalculate_line_counts(self, tool):
+    def recalculate_line_counts(self, tool, save=True):
         """Recalculates the insert_count and delete_count values.
 
         This will attempt to re-parse the stored diff and fetch the
         line counts through the parser.
+
+        Args:
+            tool (reviewboard.scmtools.core.SCMTool):
+                The SCMTool used to parse the diff.
+
+            save (bool, optional):
+                Whether to save the new counts to the database.
+
+                Version Added:
+                    4.0
         """
         logging.debug('Recalculating insert/delete line counts on '
                       'RawFileDiffData %s' % self.pk)
@@ -93,7 +119,7 @@ class RawFileDiffData(models.Model):
             self.insert_count = file_info.insert_count
             self.delete_count = file_info.delete_count
 
-            if self.pk:
+            if save and self.pk:
                 self.save(update_fields=['extra_data'])
 
     class Meta:
@@ -38,6 +38,7 @@ class MyersDiffer(Differ):
 
         # SMS State
         self.max_lines = 0
+        self.max_cost = 0
         self.fdiag = None
         self.bdiag = None
 
@@ -158,6 +159,7 @@ class MyersDiffer(Differ):
         self.fdiag = [0] * vector_size
         self.bdiag = [0] * vector_size
         self.downoff = self.upoff = self.b_data.undiscarded_lines + 1
+        self.max_cost = max(256, self._very_approx_sqrt(self.max_lines * 4))
 
         self._lcs(0, self.a_data.undiscarded_lines,
                   0, self.b_data.undiscarded_lines,
@@ -243,7 +245,7 @@ class MyersDiffer(Differ):
         up_min = up_max = up_k
 
         cost = 0
-        max_cost = max(256, self._very_approx_sqrt(self.max_lines * 4))
+        max_cost = self.max_cost
 
         while True:
             cost += 1
@@ -0,0 +1,777 @@
+"""A Myers differ that runs its searches over NumPy arrays.
+
+:py:class:`NumPyMyersDiffer` produces exactly the same opcodes as
+:py:class:`~reviewboard.diffviewer.myersdiff.MyersDiffer`, but performs the
+expensive parts of the algorithm over integer arrays instead of one element
+at a time in Python:
+
+* Counting and discarding lines that can't match anything in the other file.
+* Walking past equal lines at the start and end of each range.
+* Extending all the diagonals of a D-path in the Shortest Middle Snake
+  search at once.
+
+This makes a large difference for files with big replacements, where the
+middle snake search dominates the cost of a diff.
+
+NumPy is an optional dependency. If it's not installed,
+:py:func:`~reviewboard.diffviewer.differ.get_differ` will continue to use
+:py:class:`~reviewboard.diffviewer.myersdiff.MyersDiffer`.
+
+Version Added:
+    4.0
+"""
+
+from __future__ import unicode_literals
+
+from django.utils.six.moves import range
+
+from reviewboard.diffviewer.differ import DiffCompatVersion
+from reviewboard.diffviewer.myersdiff import MyersDiffer
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class NumPyMyersDiffer(MyersDiffer):
+    """A Myers differ that runs its searches over NumPy arrays.
+
+    The results are identical to those of :py:class:`~reviewboard.
+    diffviewer.myersdiff.MyersDiffer` for every compatibility version.
+
+    Version Added:
+        4.0
+    """
+
+    #: The minimum combined number of lines for this differ to be used.
+    #:
+    #: Below this, the overhead of setting up arrays outweighs the savings,
+    #: and :py:func:`~reviewboard.diffviewer.differ.get_differ` will use
+    #: :py:class:`~reviewboard.diffviewer.myersdiff.MyersDiffer` instead.
+    MIN_LINES = 500
+
+    #: The number of lines in a range below which it's searched one diagonal
+    #: at a time.
+    #:
+    #: Searches over small ranges only cover a few diagonals, and are faster
+    #: without the overhead of working with arrays.
+    VECTOR_SEARCH_MIN_LINES = 64
+
+    #: The number of diagonals below which snakes are followed one by one.
+    #:
+    #: Following a few diagonals at a time is faster than comparing arrays of
+    #: them, particularly for long snakes.
+    VECTOR_SLIDE_MIN = 8
+
+    #: The number of lines first compared when walking past equal lines.
+    #:
+    #: The number compared grows with each step, so that short runs of equal
+    #: lines are cheap and long runs take few steps.
+    MATCH_WINDOW_SIZE = 16
+
+    @classmethod
+    def is_available(cls):
+        """Return whether this differ can be used.
+
+        Returns:
+            bool:
+            ``True`` if NumPy is installed.
+        """
+        return np is not None
+
+    def _gen_diff_data(self):
+        """Generate all the diff data needed to return opcodes or the ratio.
+
+        This is only called once during the lifetime of the differ.
+        """
+        if self.a_data and self.b_data:
+            return
+
+        self.a_data = self.DiffData(self._gen_diff_codes(self.a, False))
+        self.b_data = self.DiffData(self._gen_diff_codes(self.b, True))
+
+        self._discard_confusing_lines()
+
+        # Elements are compared one at a time in places, which is faster on
+        # lists than on arrays, so both are kept.
+        self._a_codes = np.array(self.a_data.undiscarded, dtype=np.intp)
+        self._b_codes = np.array(self.b_data.undiscarded, dtype=np.intp)
+
+        self.max_lines = (self.a_data.undiscarded_lines +
+                          self.b_data.undiscarded_lines + 3)
+
+        vector_size = (self.a_data.undiscarded_lines +
+                       self.b_data.undiscarded_lines + 3)
+        self.fdiag = np.zeros(vector_size, dtype=np.intp)
+        self.bdiag = np.zeros(vector_size, dtype=np.intp)
+        self.downoff = self.upoff = self.b_data.undiscarded_lines + 1
+        self.max_cost = max(256, self._very_approx_sqrt(self.max_lines * 4))
+
+        self._lcs(0, self.a_data.undiscarded_lines,
+                  0, self.b_data.undiscarded_lines,
+                  self.minimal_diff)
+        self._shift_chunks(self.a_data, self.b_data)
+        self._shift_chunks(self.b_data, self.a_data)
+
+    def _find_sms(self, a_lower, a_upper, b_lower, b_upper, find_minimal):
+        """Find the Shortest Middle Snake.
+
+        Every diagonal of a D-path only depends on the diagonals of the
+        previous D-path, so each is extended as a whole. The diagonals are
+        checked for an overlap in the same order as
+        :py:meth:`MyersDiffer._find_sms
+        <reviewboard.diffviewer.myersdiff.MyersDiffer._find_sms>`, in order
+        to find the same snake.
+
+        Args:
+            a_lower (int):
+                The start of the range in the original file.
+
+            a_upper (int):
+                The end of the range in the original file.
+
+            b_lower (int):
+                The start of the range in the modified file.
+
+            b_upper (int):
+                The end of the range in the modified file.
+
+            find_minimal (bool):
+                Whether to skip the heuristics and find a minimal diff.
+
+        Returns:
+            tuple:
+            A 4-tuple of the position of the snake in the original and
+            modified files, and whether the ranges before and after it
+            should be diffed minimally.
+        """
+        if (a_upper - a_lower + b_upper - b_lower <
+            self.VECTOR_SEARCH_MIN_LINES):
+            x, y, low_minimal, high_minimal = \
+                super(NumPyMyersDiffer, self)._find_sms(
+                    a_lower, a_upper, b_lower, b_upper, find_minimal)
+
+            return int(x), int(y), low_minimal, high_minimal
+
+        down_vector = self.fdiag
+        up_vector = self.bdiag
+        downoff = self.downoff
+        upoff = self.upoff
+
+        down_k = a_lower - b_lower
+        up_k = a_upper - b_upper
+        odd_delta = (down_k - up_k) % 2 != 0
+
+        down_vector[downoff + down_k] = a_lower
+        up_vector[upoff + up_k] = a_upper
+
+        dmin = a_lower - b_upper
+        dmax = a_upper - b_lower
+
+        down_min = down_max = down_k
+        up_min = up_max = up_k
+
+        cost = 0
+        max_cost = self.max_cost
+
+        while True:
+            cost += 1
+
+            if down_min > dmin:
+                down_min -= 1
+                down_vector[downoff + down_min - 1] = -1
+            else:
+                down_min += 1
+
+            if down_max < dmax:
+                down_max += 1
+                down_vector[downoff + down_max + 1] = -1
+            else:
+                down_max -= 1
+
+            # Extend the forward path.
+            ks = np.arange(down_max, down_min - 1, -2)
+            indexes = downoff + ks
+            tlo = down_vector[indexes - 1]
+            thi = down_vector[indexes + 1]
+            xs = np.where(tlo >= thi, tlo + 1, thi)
+            ys = xs - ks
+            old_xs = xs.copy()
+
+            self._slide_forward(xs, ys, a_upper, b_upper)
+
+            if odd_delta:
+                overlaps = np.flatnonzero((ks >= up_min) & (ks <= up_max) &
+                                          (up_vector[upoff + ks] <= xs))
+
+                if overlaps.size:
+                    i = overlaps[0]
+
+                    return int(xs[i]), int(ys[i]), True, True
+
+            big_snake = bool(((xs - old_xs) > self.SNAKE_LIMIT).any())
+            down_vector[indexes] = xs
+
+            # Extend the reverse path.
+            if up_min > dmin:
+                up_min -= 1
+                up_vector[upoff + up_min - 1] = self.max_lines
+            else:
+                up_min += 1
+
+            if up_max < dmax:
+                up_max += 1
+                up_vector[upoff + up_max + 1] = self.max_lines
+            else:
+                up_max -= 1
+
+            ks = np.arange(up_max, up_min - 1, -2)
+            indexes = upoff + ks
+            tlo = up_vector[indexes - 1]
+            thi = up_vector[indexes + 1]
+            xs = np.where(tlo < thi, tlo, thi - 1)
+            ys = xs - ks
+            old_xs = xs.copy()
+
+            self._slide_backward(xs, ys, a_lower, b_lower)
+
+            if not odd_delta:
+                overlaps = np.flatnonzero((ks >= down_min) &
+                                          (ks <= down_max) &
+                                          (xs <= down_vector[downoff + ks]))
+
+                if overlaps.size:
+                    i = overlaps[0]
+
+                    return int(xs[i]), int(ys[i]), True, True
+
+            if ((old_xs - xs) > self.SNAKE_LIMIT).any():
+                big_snake = True
+
+            up_vector[indexes] = xs
+
+            if find_minimal:
+                continue
+
+            # See MyersDiffer._find_sms for the reasoning behind these
+            # heuristics.
+            if cost > 200 and big_snake:
+                ret_x, ret_y, best = self._find_diagonal(
+                    down_min, down_max, down_k, 0,
+                    downoff, down_vector,
+                    lambda x: x - a_lower,
+                    lambda x: a_lower + self.SNAKE_LIMIT <= x < a_upper,
+                    lambda y: b_lower + self.SNAKE_LIMIT <= y < b_upper,
+                    lambda i, k: i - k,
+                    1, cost)
+
+                if best > 0:
+                    return int(ret_x), int(ret_y), True, False
+
+                ret_x, ret_y, best = self._find_diagonal(
+                    up_min, up_max, up_k, best, upoff,
+                    up_vector,
+                    lambda x: a_upper - x,
+                    lambda x: a_lower < x <= a_upper - self.SNAKE_LIMIT,
+                    lambda y: b_lower < y <= b_upper - self.SNAKE_LIMIT,
+                    lambda i, k: i + k,
+                    0, cost)
+
+                if best > 0:
+                    return int(ret_x), int(ret_y), False, True
+
+            if (cost >= max_cost and
+                self.compat_version >= DiffCompatVersion.MYERS_SMS_COST_BAIL):
+                return self._find_sms_halfway(a_lower, a_upper,
+                                              b_lower, b_upper,
+                                              down_min, down_max,
+                                              up_min, up_max)
+
+    def _find_sms_halfway(self, a_lower, a_upper, b_lower, b_upper,
+                          down_min, down_max, up_min, up_max):
+        """Return the halfway point of a search that has gone on too long.
+
+        This picks the same point as the cost bail in
+        :py:meth:`MyersDiffer._find_sms
+        <reviewboard.diffviewer.myersdiff.MyersDiffer._find_sms>`: the
+        furthest reaching forward or backward diagonal, whichever has made
+        the most progress.
+
+        Args:
+            a_lower (int):
+                The start of the range in the original file.
+
+            a_upper (int):
+                The end of the range in the original file.
+
+            b_lower (int):
+                The start of the range in the modified file.
+
+            b_upper (int):
+                The end of the range in the modified file.
+
+            down_min (int):
+                The lowest diagonal of the forward search.
+
+            down_max (int):
+                The highest diagonal of the forward search.
+
+            up_min (int):
+                The lowest diagonal of the backward search.
+
+            up_max (int):
+                The highest diagonal of the backward search.
+
+        Returns:
+            tuple:
+            A 4-tuple in the same form as :py:meth:`_find_sms`.
+        """
+        # Find the forward diagonal that maximizes x + y. Ties go to the
+        # first diagonal checked, which is the highest one.
+        ds = np.arange(down_max, down_min - 1, -2)
+        xs = np.minimum(self.fdiag[self.downoff + ds], a_upper)
+        ys = xs - ds
+        clipped = b_upper < ys
+        xs = np.where(clipped, b_upper + ds, xs)
+        ys = np.where(clipped, b_upper, ys)
+        i = int(np.argmax(xs + ys))
+        fx_best = int(xs[i])
+        fxy_best = int(xs[i] + ys[i])
+
+        # Find the backward diagonal that minimizes x + y.
+        ds = np.arange(up_max, up_min - 1, -2)
+        xs = np.maximum(self.bdiag[self.upoff + ds], a_lower)
+        ys = xs - ds
+        clipped = ys < b_lower
+        xs = np.where(clipped, b_lower + ds, xs)
+        ys = np.where(clipped, b_lower, ys)
+        i = int(np.argmin(xs + ys))
+        bx_best = int(xs[i])
+        bxy_best = int(xs[i] + ys[i])
+
+        if bxy_best >= self.max_lines:
+            # MyersDiffer only accepts diagonals strictly below its starting
+            # bound.
+            bx_best = 0
+            bxy_best = self.max_lines
+
+        # Use the better of the two diagonals.
+        if a_upper + b_upper - bxy_best < fxy_best - (a_lower + b_lower):
+            return fx_best, fxy_best - fx_best, True, False
+        else:
+            return bx_best, bxy_best - bx_best, False, True
+
+    def _slide_forward(self, xs, ys, a_upper, b_upper):
+        """Follow the snakes forward from a set of points.
+
+        Args:
+            xs (numpy.ndarray):
+                The positions in the original file. These will be updated
+                in place.
+
+            ys (numpy.ndarray):
+                The positions in the modified file. These will be updated
+                in place.
+
+            a_upper (int):
+                The end of the range in the original file.
+
+            b_upper (int):
+                The end of the range in the modified file.
+        """
+        a_codes = self._a_codes
+        b_codes = self._b_codes
+        active = np.flatnonzero((xs < a_upper) & (ys < b_upper))
+
+        while active.size > self.VECTOR_SLIDE_MIN:
+            active = active[a_codes[xs[active]] == b_codes[ys[active]]]
+            xs[active] += 1
+            ys[active] += 1
+            active = active[(xs[active] < a_upper) & (ys[active] < b_upper)]
+
+        for i in active.tolist():
+            x = int(xs[i])
+            y = int(ys[i])
+            matched = self._match_forward(x, y,
+                                          min(a_upper - x, b_upper - y))
+            xs[i] = x + matched
+            ys[i] = y + matched
+
+    def _slide_backward(self, xs, ys, a_lower, b_lower):
+        """Follow the snakes backward from a set of points.
+
+        Args:
+            xs (numpy.ndarray):
+                The positions in the original file. These will be updated
+                in place.
+
+            ys (numpy.ndarray):
+                The positions in the modified file. These will be updated
+                in place.
+
+            a_lower (int):
+                The start of the range in the original file.
+
+            b_lower (int):
+                The start of the range in the modified file.
+        """
+        a_codes = self._a_codes
+        b_codes = self._b_codes
+        active = np.flatnonzero((xs > a_lower) & (ys > b_lower))
+
+        while active.size > self.VECTOR_SLIDE_MIN:
+            active = active[a_codes[xs[active] - 1] ==
+                            b_codes[ys[active] - 1]]
+            xs[active] -= 1
+            ys[active] -= 1
+            active = active[(xs[active] > a_lower) & (ys[active] > b_lower)]
+
+        for i in active.tolist():
+            x = int(xs[i])
+            y = int(ys[i])
+            matched = self._match_backward(x, y,
+                                           min(x - a_lower, y - b_lower))
+            xs[i] = x - matched
+            ys[i] = y - matched
+
+    def _match_forward(self, a_start, b_start, max_len):
+        """Return the number of equal lines following two positions.
+
+        Args:
+            a_start (int):
+                The position in the original file.
+
+            b_start (int):
+                The position in the modified file.
+
+            max_len (int):
+                The maximum number of lines to compare.
+
+        Returns:
+            int:
+            The number of equal lines.
+        """
+        if (max_len <= 0 or
+            (self.a_data.undiscarded[a_start] !=
+             self.b_data.undiscarded[b_start])):
+            return 0
+
+        matched = 1
+        window_size = self.MATCH_WINDOW_SIZE
+
+        while matched < max_len:
+            n = min(window_size, max_len - matched)
+            a_i = a_start + matched
+            b_i = b_start + matched
+            mismatches = np.flatnonzero(self._a_codes[a_i:a_i + n] !=
+                                        self._b_codes[b_i:b_i + n])
+
+            if mismatches.size:
+                return matched + int(mismatches[0])
+
+            matched += n
+            window_size *= 4
+
+        return matched
+
+    def _match_backward(self, a_end, b_end, max_len):
+        """Return the number of equal lines preceding two positions.
+
+        Args:
+            a_end (int):
+                The position in the original file.
+
+            b_end (int):
+                The position in the modified file.
+
+            max_len (int):
+                The maximum number of lines to compare.
+
+        Returns:
+            int:
+            The number of equal lines.
+        """
+        if (max_len <= 0 or
+            (self.a_data.undiscarded[a_end - 1] !=
+             self.b_data.undiscarded[b_end - 1])):
+            return 0
+
+        matched = 1
+        window_size = self.MATCH_WINDOW_SIZE
+
+        while matched < max_len:
+            n = min(window_size, max_len - matched)
+            a_i = a_end - matched
+            b_i = b_end - matched
+            mismatches = np.flatnonzero(self._a_codes[a_i - n:a_i] !=
+                                        self._b_codes[b_i - n:b_i])
+
+            if mismatches.size:
+                return matched + n - 1 - int(mismatches[-1])
+
+            matched += n
+            window_size *= 4
+
+        return matched
+
+    def _lcs(self, a_lower, a_upper, b_lower, b_upper, find_minimal):
+        """Compute the Longest Common Subsequence for a range of lines.
+
+        Args:
+            a_lower (int):
+                The start of the range in the original file.
+
+            a_upper (int):
+                The end of the range in the original file.
+
+            b_lower (int):
+                The start of the range in the modified file.
+
+            b_upper (int):
+                The end of the range in the modified file.
+
+            find_minimal (bool):
+                Whether to skip the heuristics and find a minimal diff.
+        """
+        matched = self._match_forward(
+            a_lower, b_lower, min(a_upper - a_lower, b_upper - b_lower))
+        a_lower += matched
+        b_lower += matched
+
+        matched = self._match_backward(
+            a_upper, b_upper, min(a_upper - a_lower, b_upper - b_lower))
+        a_upper -= matched
+        b_upper -= matched
+
+        if a_lower == a_upper:
+            # Inserted lines.
+            real_indexes = self.b_data.real_indexes[b_lower:b_upper]
+            self.b_data.modified.update(dict.fromkeys(real_indexes, True))
+        elif b_lower == b_upper:
+            # Deleted lines.
+            real_indexes = self.a_data.real_indexes[a_lower:a_upper]
+            self.a_data.modified.update(dict.fromkeys(real_indexes, True))
+        else:
+            # Find the middle snake and length of an optimal path for A and B
+            x, y, low_minimal, high_minimal = \
+                self._find_sms(a_lower, a_upper, b_lower, b_upper,
+                               find_minimal)
+
+            self._lcs(a_lower, x, b_lower, y, low_minimal)
+            self._lcs(x, a_upper, y, b_upper, high_minimal)
+
+    def _discard_confusing_lines(self):
+        """Discard lines that have no chance of matching the other file.
+
+        This marks the same lines as :py:meth:`MyersDiffer.
+        _discard_confusing_lines <reviewboard.diffviewer.myersdiff.
+        MyersDiffer._discard_confusing_lines>`, counting lines and building
+        the lists of undiscarded lines over arrays.
+        """
+        a_codes = np.array(self.a_data.data, dtype=np.intp)
+        b_codes = np.array(self.b_data.data, dtype=np.intp)
+        a_code_counts = np.bincount(a_codes, minlength=self.last_code + 1)
+        b_code_counts = np.bincount(b_codes, minlength=self.last_code + 1)
+
+        a_discards = self._build_discard_list(self.a_data, a_codes,
+                                              b_code_counts)
+        b_discards = self._build_discard_list(self.b_data, b_codes,
+                                              a_code_counts)
+
+        self._check_discard_runs(self.a_data, a_discards)
+        self._check_discard_runs(self.b_data, b_discards)
+
+        self._discard_lines(self.a_data, a_codes, a_discards)
+        self._discard_lines(self.b_data, b_codes, b_discards)
+
+    def _build_discard_list(self, data, codes, counts):
+        """Build the list of provisionally discarded lines.
+
+        Args:
+            data (MyersDiffer.DiffData):
+                The data for the file.
+
+            codes (numpy.ndarray):
+                The line codes for the file.
+
+            counts (numpy.ndarray):
+                The number of times each line code appears in the other
+                file.
+
+        Returns:
+            numpy.ndarray:
+            The discard state for each line.
+        """
+        many = 5 * self._very_approx_sqrt(data.length / 64)
+        num_matches = counts[codes]
+        discards = np.zeros(data.length, dtype=np.int8)
+
+        # No line can appear more often than there are lines, so clamp the
+        # threshold to keep the comparison within integer range.
+        many = min(many, np.iinfo(np.intp).max)
+
+        discards[(codes != 0) & (num_matches > many)] = self.DISCARD_CANCEL
+        discards[(codes != 0) & (num_matches == 0)] = self.DISCARD_FOUND
+
+        return discards
+
+    def _check_discard_runs(self, data, discards):
+        """Settle which provisionally discarded lines are discarded.
+
+        Only lines that are provisionally discarded are visited, in order,
+        since settling a run never marks a new line for discarding.
+
+        Args:
+            data (MyersDiffer.DiffData):
+                The data for the file.
+
+            discards (numpy.ndarray):
+                The discard state for each line. This will be updated in
+                place.
+        """
+        DISCARD_NONE = self.DISCARD_NONE
+        DISCARD_FOUND = self.DISCARD_FOUND
+        DISCARD_CANCEL = self.DISCARD_CANCEL
+
+        positions = np.flatnonzero(discards).tolist()
+
+        if not positions:
+            return
+
+        states = discards.tolist()
+        i = 0
+
+        for pos in positions:
+            if pos < i:
+                continue
+
+            i = pos
+
+            # Cancel the provisional discards that are not in the middle
+            # of a run of discards
+            if states[i] == DISCARD_CANCEL:
+                states[i] = DISCARD_NONE
+            elif states[i] == DISCARD_FOUND:
+                # We found a provisional discard
+                provisional = 0
+
+                # Find the end of this run of discardable lines and count
+                # how many are provisionally discardable.
+                j = i
+
+                while j < data.length:
+                    if states[j] == DISCARD_NONE:
+                        break
+                    elif states[j] == DISCARD_CANCEL:
+                        provisional += 1
+
+                    j += 1
+
+                # Cancel the provisional discards at the end and shrink
+                # the run.
+                while j > i and states[j - 1] == DISCARD_CANCEL:
+                    j -= 1
+                    states[j] = DISCARD_NONE
+                    provisional -= 1
+
+                length = j - i
+
+                # If 1/4 of the lines are provisional, cancel discarding
+                # all the provisional lines in the run.
+                if provisional * 4 > length:
+                    while j > i:
+                        j -= 1
+
+                        if states[j] == DISCARD_CANCEL:
+                            states[j] = DISCARD_NONE
+                else:
+                    minimum = 1 + self._very_approx_sqrt(length / 4)
+                    j = 0
+                    consec = 0
+
+                    while j < length:
+                        if states[i + j] != DISCARD_CANCEL:
+                            consec = 0
+                        else:
+                            consec += 1
+
+                            if minimum == consec:
+                                j -= consec
+                            elif minimum < consec:
+                                states[i + j] = DISCARD_NONE
+
+                        j += 1
+
+                    self._scan_discard_run(states, i, length, 1)
+                    i += length - 1
+                    self._scan_discard_run(states, i, length, -1)
+
+            i += 1
+
+        discards[:] = states
+
+    def _scan_discard_run(self, states, i, length, step):
+        """Cancel provisional discards at one end of a run.
+
+        Args:
+            states (list of int):
+                The discard state for each line. This will be updated in
+                place.
+
+            i (int):
+                The index of the end of the run to start from.
+
+            length (int):
+                The length of the run.
+
+            step (int):
+                The direction to scan in, either ``1`` or ``-1``.
+        """
+        consec = 0
+
+        for j in range(length):
+            index = i + j * step
+            discard = states[index]
+
+            if j >= 8 and discard == self.DISCARD_FOUND:
+                break
+
+            if discard == self.DISCARD_FOUND:
+                consec += 1
+            else:
+                consec = 0
+
+                if discard == self.DISCARD_CANCEL:
+                    states[index] = self.DISCARD_NONE
+
+            if consec == 3:
+                break
+
+    def _discard_lines(self, data, codes, discards):
+        """Record the lines to diff and the lines discarded.
+
+        Args:
+            data (MyersDiffer.DiffData):
+                The data for the file.
+
+            codes (numpy.ndarray):
+                The line codes for the file.
+
+            discards (numpy.ndarray):
+                The discard state for each line.
+        """
+        if self.minimal_diff:
+            keep = np.ones(data.length, dtype=bool)
+        else:
+            keep = (discards == self.DISCARD_NONE)
+
+        real_indexes = np.flatnonzero(keep)
+        num_kept = len(real_indexes)
+        padding = [0] * (data.length - num_kept)
+
+        data.undiscarded = codes[keep].tolist() + padding
+        data.real_indexes = real_indexes.tolist() + padding
+        data.undiscarded_lines = num_kept
+        data.modified.update(
+            dict.fromkeys(np.flatnonzero(~keep).tolist(), True))
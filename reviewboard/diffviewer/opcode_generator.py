@@ -1,13 +1,21 @@
 from __future__ import unicode_literals
 
+import logging
 import os
 import re
+from bisect import bisect_left
+from collections import OrderedDict
 
 from django.utils import six
 from django.utils.six.moves import range
 
 from reviewboard.diffviewer.processors import (filter_interdiff_opcodes,
                                                post_process_filtered_equals)
+from reviewboard.diffviewer.timing import (STAGE_MOVE_DETECTION,
+                                           time_diff_stage)
+
+
+logger = logging.getLogger(__name__)
 
 
 class MoveRange(object):
@@ -40,6 +48,16 @@ class DiffOpcodeGenerator(object):
     MOVE_PREFERRED_MIN_LINES = 2
     MOVE_MIN_LINE_LENGTH = 20
 
+    #: The maximum number of removed groups checked for moved lines.
+    #:
+    #: This bounds the time spent on move detection for large files with
+    #: many repeated lines. Once reached, moves found so far are kept and no
+    #: further moves are looked for.
+    #:
+    #: Version Added:
+    #:     4.0
+    MOVE_MAX_CANDIDATES = 200000
+
     TAB_SIZE = 8
 
     def __init__(self, differ, diff=None, interdiff=None, request=None,
@@ -85,6 +103,7 @@ class DiffOpcodeGenerator(object):
         self.groups = []
         self.removes = {}
         self.inserts = []
+        self.move_candidates_left = self.MOVE_MAX_CANDIDATES
 
         # Run the opcodes through the chain.
         opcodes = self.differ.get_opcodes()
@@ -93,7 +112,9 @@ class DiffOpcodeGenerator(object):
         opcodes = self._apply_meta_processors(opcodes)
 
         self._group_opcodes(opcodes)
-        self._compute_moves()
+
+        with time_diff_stage(self.request, STAGE_MOVE_DETECTION):
+            self._compute_moves()
 
         for opcodes in self.groups:
             yield opcodes
@@ -182,13 +203,13 @@ class DiffOpcodeGenerator(object):
         for group_index, group in enumerate(opcodes):
             self.groups.append(group)
 
-            # Store delete/insert ranges for later lookup. We will be building
-            # keys that in most cases will be unique for the particular block
-            # of text being inserted/deleted. There is a chance of collision,
-            # so we store a list of matching groups under that key.
+            # Store delete/insert ranges for later lookup. Removed lines are
+            # indexed by their stripped content, and then by the index of the
+            # group they're in, giving the sorted positions of the line in
+            # that group.
             #
-            # Later, we will loop through the keys and attempt to find insert
-            # keys/groups that match remove keys/groups.
+            # Later, we will loop through the inserted lines and look up the
+            # removed lines and groups that match.
             tag = group[0]
 
             if tag in ('delete', 'replace'):
@@ -199,8 +220,8 @@ class DiffOpcodeGenerator(object):
                     line = self.differ.a[i].strip()
 
                     if line:
-                        self.removes.setdefault(line, []).append(
-                            (i, group, group_index))
+                        self.removes.setdefault(line, OrderedDict()) \
+                            .setdefault(group_index, []).append(i)
 
             if tag in ('insert', 'replace'):
                 self.inserts.append(group)
@@ -338,6 +359,12 @@ class DiffOpcodeGenerator(object):
         r_move_indexes_used = set()
 
         for insert in self.inserts:
+            if self.move_candidates_left <= 0:
+                logger.debug('Stopped looking for moved lines after checking '
+                             '%d candidates.',
+                             self.MOVE_MAX_CANDIDATES)
+                break
+
             self._compute_move_for_insert(r_move_indexes_used, *insert)
 
     def _compute_move_for_insert(self, r_move_indexes_used, itag, ii1, ii2,
@@ -414,48 +441,16 @@ class DiffOpcodeGenerator(object):
                 #
                 # If there isn't any move information for this line, we'll
                 # simply add it to the move ranges.
-                for ri, rgroup, rgroup_index in self.removes[iline]:
-                    # Ignore any lines that have already been processed as
-                    # part of a move, so we don't end up with incorrect blocks
-                    # of lines being matched.
-                    if ri in r_move_indexes_used:
-                        continue
-
-                    r_move_range = r_move_ranges.get(move_key)
-
-                    if not r_move_range or ri != r_move_range.end + 1:
-                        # We either didn't have a previous range, or this
-                        # group didn't immediately follow it, so we need
-                        # to start a new one.
-                        move_key = '%s-%s-%s-%s' % rgroup[1:5]
-                        r_move_range = r_move_ranges.get(move_key)
+                if is_replace:
+                    # Don't match a replace line that's just "replacing"
+                    # itself (which would happen if it's just changing
+                    # whitespace).
+                    self_ri = ii1 + i_move_cur - ij1
+                else:
+                    self_ri = None
 
-                    if r_move_range:
-                        # If the remove information for the line is next in
-                        # the sequence for this calculated move range...
-                        if ri == r_move_range.end + 1:
-                            # This is part of the current range, so update
-                            # the end of the range to include it.
-                            r_move_range.end = ri
-                            r_move_range.add_group(rgroup, rgroup_index)
-                            updated_range = True
-                    else:
-                        # Check that this isn't a replace line that's just
-                        # "replacing" itself (which would happen if it's just
-                        # changing whitespace).
-                        if not is_replace or i_move_cur - ij1 != ri - ii1:
-                            # We don't have any move ranges yet, or we're done
-                            # with the existing range, so it's time to build
-                            # one based on any removed lines we find that
-                            # match the inserted line.
-                            r_move_ranges[move_key] = \
-                                MoveRange(ri, ri, [(rgroup, rgroup_index)])
-                            updated_range = True
-
-                    if updated_range:
-                        # We found a range we were able to update. Don't
-                        # attempt any more matches for removed lines.
-                        break
+                move_key, updated_range = self._find_move_for_line(
+                    iline, move_key, r_move_ranges, self_ri)
 
                 if not updated_range and r_move_ranges:
                     # We didn't find a move range that this line is a part
@@ -566,12 +561,133 @@ class DiffOpcodeGenerator(object):
                         # We'll use the r_range above, but normalize back to
                         # 0-based indexes.
                         r_move_indexes_used.update(r - 1 for r in r_range)
+                        self._remove_moved_lines(r_move_range)
 
                 # Reset the state for the next range.
                 move_key = None
                 i_move_range = MoveRange(i_move_cur, i_move_cur)
                 r_move_ranges = {}
 
+    def _find_move_for_line(self, iline, move_key, r_move_ranges, self_ri):
+        """Find a removed line to include in a move range for an inserted line.
+
+        The removed groups containing the line are checked in order. The line
+        is added to the first range that it immediately follows, either in
+        the range currently being built or in the range for its group. If
+        its group has no range yet, a new range is started there.
+
+        Only the first unused position of the line in each group, and the
+        position following each range, need to be checked, so this doesn't
+        depend on how many times the line appears.
+
+        Version Added:
+            4.0
+
+        Args:
+            iline (unicode):
+                The stripped inserted line.
+
+            move_key (unicode):
+                The key of the move range currently being built, if any.
+
+            r_move_ranges (dict):
+                The move ranges being built, keyed by removed group. This
+                will be updated.
+
+            self_ri (int):
+                The position of the removed line this line replaces, if it's
+                a replace line. This won't be used to start a new range.
+
+        Returns:
+            tuple:
+            A 2-tuple containing:
+
+            1. The key of the move range being built.
+            2. Whether a move range was started or updated.
+        """
+        for rgroup_index, r_indexes in six.iteritems(self.removes[iline]):
+            if self.move_candidates_left <= 0:
+                break
+
+            self.move_candidates_left -= 1
+            rgroup = self.groups[rgroup_index]
+            r_move_range = r_move_ranges.get(move_key)
+
+            if r_move_range and r_indexes[0] == r_move_range.end + 1:
+                # This continues the current range into this group.
+                r_move_range.end = r_indexes[0]
+                r_move_range.add_group(rgroup, rgroup_index)
+
+                return move_key, True
+
+            move_key = '%s-%s-%s-%s' % rgroup[1:5]
+            r_move_range = r_move_ranges.get(move_key)
+
+            if r_move_range:
+                # If the remove information for the line is next in the
+                # sequence for this calculated move range, then this is part
+                # of the range, so update the end of the range to include it.
+                ri = r_move_range.end + 1
+                i = bisect_left(r_indexes, ri)
+
+                if i < len(r_indexes) and r_indexes[i] == ri:
+                    r_move_range.end = ri
+                    r_move_range.add_group(rgroup, rgroup_index)
+
+                    return move_key, True
+            else:
+                # We don't have any move ranges yet, or we're done with the
+                # existing range, so it's time to build one based on the
+                # first removed line in this group that matches the inserted
+                # line.
+                for ri in r_indexes[:2]:
+                    if ri != self_ri:
+                        r_move_ranges[move_key] = \
+                            MoveRange(ri, ri, [(rgroup, rgroup_index)])
+
+                        return move_key, True
+
+        return move_key, False
+
+    def _remove_moved_lines(self, r_move_range):
+        """Remove the lines in a move range from the removed lines index.
+
+        This ensures they're not factored in again when determining possible
+        ranges for future moves.
+
+        Version Added:
+            4.0
+
+        Args:
+            r_move_range (MoveRange):
+                The move range containing the lines to remove.
+        """
+        groups = dict(
+            (group_index, group)
+            for group, group_index in r_move_range.groups
+        )
+
+        for group_index, group in six.iteritems(groups):
+            i1 = max(group[1], r_move_range.start)
+            i2 = min(group[2], r_move_range.end + 1)
+
+            for i in range(i1, i2):
+                r_groups = self.removes.get(self.differ.a[i].strip())
+
+                if not r_groups or group_index not in r_groups:
+                    continue
+
+                r_indexes = r_groups[group_index]
+                j = bisect_left(r_indexes, i)
+
+                if j < len(r_indexes) and r_indexes[j] == i:
+                    del r_indexes[j]
+
+                    if not r_indexes:
+                        # The line is left in the index, so that it's still
+                        # known to have been removed.
+                        del r_groups[group_index]
+
     def _find_longest_move_range(self, r_move_ranges):
         # Go through every range of lines we've found and find the longest.
         #
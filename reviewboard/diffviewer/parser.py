@@ -1,8 +1,8 @@
 from __future__ import unicode_literals
 
-import io
 import logging
 import re
+from array import array
 
 from django.utils import six
 from django.utils.encoding import force_bytes
@@ -17,6 +17,162 @@ from reviewboard.scmtools.core import Revision
 logger = logging.getLogger(__name__)
 
 
+class DiffLines(object):
+    """The lines in a diff, located by their offsets in the diff's data.
+
+    This behaves like the list of lines returned by
+    :py:func:`~reviewboard.diffviewer.diffutils.split_line_endings`, and
+    splits lines on the same newline sequences. However, rather than copying
+    every line out of the diff up-front, only the start and end offsets of
+    each line are stored. Lines are sliced out of the diff as they're
+    accessed.
+
+    This keeps the memory used for parsing a large diff close to the size of
+    the diff itself, and allows ranges of lines to be added to a
+    :py:class:`ParsedDiffFile` without copying them (see
+    :py:meth:`ParsedDiffFile.append_lines`).
+
+    Version Added:
+        4.0
+
+    Attributes:
+        data (bytes):
+            The diff content that the lines were found in.
+    """
+
+    def __init__(self, data):
+        """Initialize the lines.
+
+        Args:
+            data (bytes):
+                The diff content to split into lines.
+        """
+        from reviewboard.diffviewer.diffutils import NEWLINE_BYTES_RE
+
+        self.data = data
+
+        # If there are no carriage returns, every line ends with a plain
+        # newline, which is how lines are written to a ParsedDiffFile. That
+        # allows ranges of lines to be copied straight out of the diff.
+        self._lf_only = b'\r' not in data
+
+        starts = array(str('L'))
+        ends = array(str('L'))
+        data_len = len(data)
+        self._data_len = data_len
+        pos = 0
+
+        if self._lf_only:
+            find = data.find
+
+            while pos < data_len:
+                i = find(b'\n', pos)
+
+                if i == -1:
+                    i = data_len
+
+                starts.append(pos)
+                ends.append(i)
+                pos = i + 1
+        else:
+            for m in NEWLINE_BYTES_RE.finditer(data):
+                starts.append(pos)
+                ends.append(m.start())
+                pos = m.end()
+
+            # As with split_line_endings(), a trailing newline doesn't start
+            # a new line.
+            if pos < data_len:
+                starts.append(pos)
+                ends.append(data_len)
+
+        self._starts = starts
+        self._ends = ends
+
+    def __len__(self):
+        """Return the number of lines.
+
+        Returns:
+            int:
+            The number of lines in the diff.
+        """
+        return len(self._starts)
+
+    def __getitem__(self, index):
+        """Return a line or list of lines.
+
+        Args:
+            index (int or slice):
+                The index of the line, or a slice of lines.
+
+        Returns:
+            bytes or list of bytes:
+            The line (without the newline), or a list of lines if ``index``
+            is a slice.
+
+        Raises:
+            IndexError:
+                The index was out of range.
+        """
+        try:
+            return self.data[self._starts[index]:self._ends[index]]
+        except TypeError:
+            # Slicing the offsets returns arrays, which can't be used to
+            # slice the data. This must be a slice of lines.
+            if not isinstance(index, slice):
+                raise
+
+            data = self.data
+
+            return [
+                data[start:end]
+                for start, end in zip(self._starts[index], self._ends[index])
+            ]
+
+    def __iter__(self):
+        """Iterate through the lines.
+
+        Yields:
+            bytes:
+            Each line in the diff, without the newline.
+        """
+        data = self.data
+
+        for start, end in zip(self._starts, self._ends):
+            yield data[start:end]
+
+    def get_span(self, start, end):
+        """Return the offsets in the diff covering a range of lines.
+
+        The span will include the newline at the end of each line. It's only
+        available if the lines appear in the diff exactly as they would be
+        written to a :py:class:`ParsedDiffFile`, meaning that each line must
+        end with a single ``\\n``.
+
+        Args:
+            start (int):
+                The index of the first line in the range.
+
+            end (int):
+                The index after the last line in the range.
+
+        Returns:
+            tuple:
+            A tuple of the start and end offsets in the diff, or ``None`` if
+            the lines must be copied individually.
+        """
+        if not self._lf_only or start >= end:
+            return None
+
+        span_end = self._ends[end - 1]
+
+        if span_end == self._data_len:
+            # The last line in the diff has no newline.
+            return None
+
+        return self._starts[start], span_end + 1
+
+
 class ParsedDiffFile(object):
     """A parsed file from a diff.
 
@@ -177,8 +333,14 @@ class ParsedDiffFile(object):
         self.delete_count = 0
         self.skip = False
 
-        self._data_io = io.BytesIO()
+        # The data is stored as a list of chunks, which are either bytes or
+        # [start, end] offsets into the diff's data (for lines added through
+        # append_lines()). They're joined together when the data is first
+        # accessed.
+        self._data_chunks = []
+        self._data_source = None
         self._data = None
+        self._finalized = False
 
         self._deprecated_info = {}
 
@@ -336,10 +498,18 @@ class ParsedDiffFile(object):
 
         This must be accessed after :py:meth:`finalize` has been called.
         """
-        if self._data is None:
+        if not self._finalized:
             raise ValueError('ParsedDiffFile.data cannot be accessed until '
                              'finalize() is called.')
 
+        if self._data is None:
+            source = self._data_source
+
+            self._data = b''.join(
+                source[chunk[0]:chunk[1]] if isinstance(chunk, list) else chunk
+                for chunk in self._data_chunks)
+            self._data_chunks = None
+
         return self._data
 
     def finalize(self):
@@ -348,8 +518,7 @@ class ParsedDiffFile(object):
         This makes the diff data available to consumers and closes the buffer
         for writing.
         """
-        self._data = self._data_io.getvalue()
-        self._data_io.close()
+        self._finalized = True
 
     def prepend_data(self, data):
         """Prepend data to the buffer.
@@ -359,12 +528,7 @@ class ParsedDiffFile(object):
                 The data to prepend.
         """
         if data:
-            new_data_io = io.BytesIO()
-            new_data_io.write(data)
-            new_data_io.write(self._data_io.getvalue())
-
-            self._data_io.close()
-            self._data_io = new_data_io
+            self._data_chunks.insert(0, data)
 
     def append_data(self, data):
         """Append data to the buffer.
@@ -374,7 +538,106 @@ class ParsedDiffFile(object):
                 The data to append.
         """
         if data:
-            self._data_io.write(data)
+            self._data_chunks.append(data)
+
+    def prepend_lines(self, lines, start, end):
+        """Prepend a range of lines from the diff to the buffer.
+
+        Each line will be followed by a ``\\n``.
+
+        Version Added:
+            4.0
+
+        Args:
+            lines (DiffLines):
+                The lines in the diff.
+
+            start (int):
+                The index of the first line to prepend.
+
+            end (int):
+                The index after the last line to prepend.
+        """
+        span = self._get_lines_span(lines, start, end)
+
+        if span is None:
+            self.prepend_data(b''.join(
+                line + b'\n'
+                for line in lines[start:end]
+            ))
+        else:
+            chunks = self._data_chunks
+            first_chunk = chunks[0] if chunks else None
+
+            if isinstance(first_chunk, list) and first_chunk[0] == span[1]:
+                first_chunk[0] = span[0]
+            else:
+                chunks.insert(0, list(span))
+
+    def append_lines(self, lines, start, end):
+        """Append a range of lines from the diff to the buffer.
+
+        Each line will be followed by a ``\\n``.
+
+        Where possible, this will reference the lines in the diff's data
+        rather than copying them. Consecutive ranges of lines are merged, so
+        the data for a file is usually only copied out of the diff once, when
+        it's first accessed.
+
+        Version Added:
+            4.0
+
+        Args:
+            lines (DiffLines):
+                The lines in the diff.
+
+            start (int):
+                The index of the first line to append.
+
+            end (int):
+                The index after the last line to append.
+        """
+        span = self._get_lines_span(lines, start, end)
+
+        if span is None:
+            for line in lines[start:end]:
+                self.append_data(line)
+                self.append_data(b'\n')
+        else:
+            chunks = self._data_chunks
+            last_chunk = chunks[-1] if chunks else None
+
+            if isinstance(last_chunk, list) and last_chunk[1] == span[0]:
+                last_chunk[1] = span[1]
+            else:
+                chunks.append(list(span))
+
+    def _get_lines_span(self, lines, start, end):
+        """Return the span in the diff's data covering a range of lines.
+
+        Args:
+            lines (DiffLines):
+                The lines in the diff.
+
+            start (int):
+                The index of the first line.
+
+            end (int):
+                The index after the last line.
+
+        Returns:
+            tuple:
+            A tuple of the start and end offsets of the lines, or ``None`` if
+            the lines must be copied instead.
+        """
+        if (not isinstance(lines, DiffLines) or
+            (self._data_source is not None and
+             self._data_source is not lines.data)):
+            return None
+
+        self._data_source = lines.data
+
+        return lines.get_span(start, end)
 
     def _warn_old_usage_deprecation(self):
         """Warn that a DiffParser is populating information in an old way."""
@@ -423,6 +686,17 @@ class DiffParser(object):
     #: Its presence and location is not guaranteed.
     INDEX_SEP = b'=' * 67
 
+    #: The minimum size of a diff, in bytes, for lines to be found lazily.
+    #:
+    #: Diffs at least this large are split into lines using
+    #: :py:class:`DiffLines`, which keeps memory usage close to the size of
+    #: the diff at the cost of slower access to each line. Smaller diffs are
+    #: split into a list of lines up-front.
+    #:
+    #: Version Added:
+    #:     4.0
+    LAZY_LINES_MIN_SIZE = 4 * 1024 * 1024
+
     def __init__(self, data):
         """Initialize the parser.
 
@@ -444,7 +718,11 @@ class DiffParser(object):
         self.base_commit_id = None
         self.new_commit_id = None
         self.data = data
-        self.lines = split_line_endings(data)
+
+        if len(data) >= self.LAZY_LINES_MIN_SIZE:
+            self.lines = DiffLines(data)
+        else:
+            self.lines = split_line_endings(data)
 
     def parse(self):
         """Parse the diff.
@@ -465,13 +743,13 @@ class DiffParser(object):
         logger.debug('%s.parse: Beginning parse of diff, size = %s',
                      type(self).__name__, len(self.data))
 
-        preamble = io.BytesIO()
         self.files = []
         parsed_file = None
+        num_lines = len(self.lines)
         i = 0
 
         # Go through each line in the diff, looking for diff headers.
-        while i < len(self.lines):
+        while i < num_lines:
             next_linenum, new_file = self.parse_change_header(i)
 
             if new_file:
@@ -481,29 +759,23 @@ class DiffParser(object):
                 if self.files:
                     self.files[-1].finalize()
 
-                parsed_file = new_file
-
-                # We need to prepend the preamble, if we have one.
-                parsed_file.prepend_data(preamble.getvalue())
-
-                preamble.close()
-                preamble = io.BytesIO()
+                if parsed_file is None:
+                    # This is the first file. Any lines before it are part
+                    # of the preamble, which we need to prepend.
+                    new_file.prepend_lines(self.lines, 0, i)
 
+                parsed_file = new_file
                 self.files.append(parsed_file)
                 i = next_linenum
+            elif parsed_file:
+                i = self.parse_diff_line(i, parsed_file)
             else:
-                if parsed_file:
-                    i = self.parse_diff_line(i, parsed_file)
-                else:
-                    preamble.write(self.lines[i])
-                    preamble.write(b'\n')
-                    i += 1
+                # This is part of the preamble.
+                i += 1
 
         if self.files:
             self.files[-1].finalize()
 
-        preamble.close()
-
         logger.debug('%s.parse: Finished parsing diff.', type(self).__name__)
 
         return self.files
@@ -535,8 +807,7 @@ class DiffParser(object):
             elif line.startswith(b'+'):
                 parsed_file.insert_count += 1
 
-        parsed_file.append_data(line)
-        parsed_file.append_data(b'\n')
+        parsed_file.append_lines(self.lines, linenum, linenum + 1)
 
         return linenum + 1
 
@@ -606,9 +877,7 @@ class DiffParser(object):
 
         # The header is part of the diff, so make sure it gets in the
         # diff content.
-        for line in self.lines[start:linenum]:
-            parsed_file.append_data(line)
-            parsed_file.append_data(b'\n')
+        parsed_file.append_lines(self.lines, start, linenum)
 
         return linenum, parsed_file
 
@@ -904,8 +1173,65 @@ class DiffParser(object):
             TypeError:
                 The provided ``diffset_or_commit`` wasn't of a supported type.
         """
-        if hasattr(diffset_or_commit, 'cumulative_files'):
-            filediffs = diffset_or_commit.cumulative_files
+        return b''.join(self._iter_filediff_diffs(diffset_or_commit))
+
+    def iter_raw_diff(self, diffset_or_commit):
+        """Iterate through a raw diff, one file at a time.
+
+        This generates the same diff as :py:meth:`raw_diff`, but only
+        decompresses one file's diff at a time, making it suitable for
+        streaming large diffs to a client.
+
+        If a subclass overrides :py:meth:`raw_diff` without overriding this
+        method, the result of :py:meth:`raw_diff` will be yielded whole.
+
+        Version Added:
+            4.0
+
+        Args:
+            diffset_or_commit (reviewboard.diffviewer.models.diffset.DiffSet or
+                               reviewboard.diffviewer.models.diffcommit
+                               .DiffCommit):
+                The DiffSet or DiffCommit to render.
+
+        Yields:
+            bytes:
+            The diff for each component FileDiff.
+
+        Raises:
+            TypeError:
+                The provided ``diffset_or_commit`` wasn't of a supported type.
+        """
+        if type(self).raw_diff is not DiffParser.raw_diff:
+            yield self.raw_diff(diffset_or_commit)
+        else:
+            for data in self._iter_filediff_diffs(diffset_or_commit):
+                yield data
+
+    def _iter_filediff_diffs(self, diffset_or_commit):
+        """Iterate through the diffs of the FileDiffs in a DiffSet or commit.
+
+        The stored diff data for all the FileDiffs is fetched in a single
+        query, but is only decompressed as each diff is yielded.
+
+        Args:
+            diffset_or_commit (reviewboard.diffviewer.models.diffset.DiffSet or
+                               reviewboard.diffviewer.models.diffcommit
+                               .DiffCommit):
+                The DiffSet or DiffCommit to render.
+
+        Yields:
+            bytes:
+            The diff for each component FileDiff.
+
+        Raises:
+            TypeError:
+                The provided ``diffset_or_commit`` wasn't of a supported type.
+        """
+        # Check the class for cumulative_files, since accessing the property
+        # on the instance would fetch the files.
+        if hasattr(type(diffset_or_commit), 'cumulative_files'):
+            filediffs = diffset_or_commit.files.filter(commit_id__isnull=True)
         elif hasattr(diffset_or_commit, 'files'):
             filediffs = diffset_or_commit.files.all()
         else:
@@ -913,10 +1239,15 @@ class DiffParser(object):
                             'or DiffCommit.'
                             % diffset_or_commit)
 
-        return b''.join(
-            filediff.diff
-            for filediff in filediffs
-        )
+        filediffs = list(filediffs.select_related('diff_hash'))
+
+        # Release each FileDiff (and its compressed data) once its diff has
+        # been yielded, so that only the compressed data for the remaining
+        # files is held in memory.
+        filediffs.reverse()
+
+        while filediffs:
+            yield filediffs.pop().diff
 
     def get_orig_commit_id(self):
         """Return the commit ID of the original revision for the diff.
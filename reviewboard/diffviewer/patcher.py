@@ -0,0 +1,423 @@
+"""In-process application of unified diffs.
+
+This implements the subset of :command:`patch` needed to apply the unified
+diffs stored for a :py:class:`~reviewboard.diffviewer.models.filediff.
+FileDiff` to an in-memory buffer, without having to write temporary files or
+spawn a process.
+
+Hunks are located using the same strategy as GNU :command:`patch`: each hunk
+is first tried at the position recorded in its header (adjusted by the offset
+of any previous hunks), then at increasing offsets before and after that
+position, and finally with up to two lines of leading and trailing context
+ignored ("fuzz").
+
+Anything this module can't handle with certainty (context or ed-style diffs,
+multiple files, malformed hunks, reversed patches, or hunks that can't be
+located) results in a :py:class:`~reviewboard.diffviewer.errors.
+PatchNotApplicableError`, so the caller can hand the diff off to
+:command:`patch` for the definitive result.
+
+Version Added:
+    4.0
+"""
+
+from __future__ import unicode_literals
+
+import re
+
+from reviewboard.diffviewer.errors import PatchNotApplicableError
+
+
+#: The maximum number of context lines that can be ignored for a hunk.
+#:
+#: This matches the default fuzz factor used by GNU patch.
+MAX_FUZZ = 2
+
+
+_HUNK_HEADER_RE = re.compile(
+    br'^@@ -(?P<orig_start>\d+)(,(?P<orig_len>\d+))? '
+    br'\+(?P<modified_start>\d+)(,(?P<modified_len>\d+))? @@')
+
+_CONTEXT = b' '
+_DELETE = b'-'
+_INSERT = b'+'
+
+
+class _Hunk(object):
+    """A parsed hunk from a unified diff.
+
+    Attributes:
+        first (int):
+            The 1-based line number in the original file where the
+            hunk's pattern begins. For hunks that contain no original lines,
+            this is the line the new content is inserted before.
+
+        lines (list of tuple):
+            A list of ``(op, line)`` tuples, where ``op`` is one of
+            ``b' '``, ``b'-'``, or ``b'+'``, and ``line`` is the line's
+            content (including the trailing newline, if any).
+
+        pattern (list of bytes):
+            The lines that must be present in the original file (context and
+            deleted lines).
+
+        prefix_context (int):
+            The number of context lines at the start of the hunk.
+
+        suffix_context (int):
+            The number of context lines at the end of the hunk.
+    """
+
+    def __init__(self, orig_start, orig_len, lines):
+        """Initialize the hunk.
+
+        Args:
+            orig_start (int):
+                The original start line number from the hunk header.
+
+            orig_len (int):
+                The number of original lines from the hunk header.
+
+            lines (list of tuple):
+                The ``(op, line)`` tuples making up the hunk.
+        """
+        if orig_len == 0:
+            # The header refers to the line the new content follows, rather
+            # than the line it precedes.
+            orig_start += 1
+
+        self.first = orig_start
+        self.lines = lines
+        self.pattern = [
+            line
+            for op, line in lines
+            if op != _INSERT
+        ]
+
+        self.prefix_context = 0
+
+        for op, line in lines:
+            if op != _CONTEXT:
+                break
+
+            self.prefix_context += 1
+
+        self.suffix_context = 0
+
+        for op, line in reversed(lines):
+            if op != _CONTEXT:
+                break
+
+            self.suffix_context += 1
+
+
+def parse_hunks(diff):
+    """Parse the hunks out of a unified diff for a single file.
+
+    Any content before the first hunk (such as ``---``/``+++`` headers or
+    Git extended headers) is ignored.
+
+    Args:
+        diff (bytes):
+            The diff to parse. This must have normalized line endings.
+
+    Returns:
+        list of _Hunk:
+        The list of hunks in the diff.
+
+    Raises:
+        reviewboard.diffviewer.errors.PatchNotApplicableError:
+            The diff contained content that can't be safely applied
+            in-process.
+    """
+    lines = diff.splitlines(True)
+    num_lines = len(lines)
+    hunks = []
+    i = 0
+
+    while i < num_lines:
+        line = lines[i]
+        i += 1
+
+        if not line.startswith(b'@@ '):
+            if hunks and line != b'\n':
+                # This is either trailing garbage or the start of another
+                # file's diff. Either way, patch(1) has to decide what to
+                # do with it.
+                raise PatchNotApplicableError(
+                    'Unexpected content after hunk on line %d' % i)
+
+            continue
+
+        m = _HUNK_HEADER_RE.match(line)
+
+        if not m:
+            raise PatchNotApplicableError('Malformed hunk header on line %d'
+                                          % i)
+
+        orig_start = int(m.group('orig_start'))
+        orig_remaining = int(m.group('orig_len') or 1)
+        modified_remaining = int(m.group('modified_len') or 1)
+        hunk_lines = []
+        orig_len = orig_remaining
+
+        while orig_remaining > 0 or modified_remaining > 0:
+            if i >= num_lines:
+                raise PatchNotApplicableError('Truncated hunk on line %d' % i)
+
+            line = lines[i]
+            i += 1
+
+            if not line.endswith(b'\n'):
+                raise PatchNotApplicableError(
+                    'Unterminated hunk line on line %d' % i)
+
+            if line == b'\n':
+                # Some tools strip the trailing whitespace from empty context
+                # lines. patch(1) treats these as context.
+                op = _CONTEXT
+                line = b' \n'
+            else:
+                op = line[:1]
+
+            if op == _CONTEXT:
+                orig_remaining -= 1
+                modified_remaining -= 1
+            elif op == _DELETE:
+                orig_remaining -= 1
+            elif op == _INSERT:
+                modified_remaining -= 1
+            else:
+                raise PatchNotApplicableError(
+                    'Unexpected hunk line on line %d' % i)
+
+            if orig_remaining < 0 or modified_remaining < 0:
+                raise PatchNotApplicableError(
+                    'Hunk line counts do not match header on line %d' % i)
+
+            line = line[1:]
+
+            if i < num_lines and lines[i].startswith(b'\\'):
+                # "\ No newline at end of file"
+                line = line[:-1]
+                i += 1
+
+            hunk_lines.append((op, line))
+
+        hunks.append(_Hunk(orig_start=orig_start,
+                           orig_len=orig_len,
+                           lines=hunk_lines))
+
+    return hunks
+
+
+def apply_patch(diff, orig_file):
+    """Apply a unified diff to the contents of a file.
+
+    Args:
+        diff (bytes):
+            The diff to apply. This must have normalized line endings.
+
+        orig_file (bytes):
+            The original file contents. This must have normalized line
+            endings.
+
+    Returns:
+        bytes:
+        The patched file contents.
+
+    Raises:
+        reviewboard.diffviewer.errors.PatchNotApplicableError:
+            The diff couldn't be applied in-process. The caller should fall
+            back on :command:`patch`.
+    """
+    hunks = parse_hunks(diff)
+
+    if not hunks:
+        raise PatchNotApplicableError('No hunks were found in the diff')
+
+    input_lines = orig_file.splitlines(True)
+    num_input_lines = len(input_lines)
+    result = []
+
+    # The number of input lines that have been written to the result (or
+    # deleted), and the running offset between hunk headers and where hunks
+    # were found.
+    #
+    # As with patch(1), lines are only frozen up to the last line a hunk
+    # changed. Trailing context is left unfrozen, so that the leading
+    # context of the next hunk can overlap it.
+    last_frozen_line = 0
+    offset = 0
+
+    for hunk_num, hunk in enumerate(hunks):
+        context = max(hunk.prefix_context, hunk.suffix_context)
+        max_fuzz = min(MAX_FUZZ, context)
+        where = None
+
+        for fuzz in range(max_fuzz + 1):
+            where, offset = _locate_hunk(hunk=hunk,
+                                         input_lines=input_lines,
+                                         fuzz=fuzz,
+                                         offset=offset,
+                                         last_frozen_line=last_frozen_line)
+
+            if where is not None:
+                break
+
+            if hunk_num == 0:
+                # patch(1) checks whether the first hunk applies in reverse
+                # before trying fuzz, and prompts if it does. Let it make
+                # that call.
+                break
+
+        if where is None:
+            raise PatchNotApplicableError('Hunk #%d could not be located'
+                                          % (hunk_num + 1))
+
+        if where - 1 > num_input_lines:
+            raise PatchNotApplicableError('Hunk #%d starts past the end of '
+                                          'the file'
+                                          % (hunk_num + 1))
+
+        input_line = where - 1
+
+        for op, line in hunk.lines:
+            if op == _CONTEXT:
+                # As with patch(1), context is always copied from the file
+                # along with the lines before the next change, so that
+                # fuzzed lines are preserved.
+                input_line += 1
+                continue
+
+            if input_line < last_frozen_line:
+                raise PatchNotApplicableError(
+                    'Hunk #%d overlaps a previous hunk' % (hunk_num + 1))
+
+            result += input_lines[last_frozen_line:input_line]
+            last_frozen_line = input_line
+
+            if op == _INSERT:
+                result.append(line)
+            else:
+                if input_line >= num_input_lines:
+                    raise PatchNotApplicableError(
+                        'Hunk #%d extends past the end of the file'
+                        % (hunk_num + 1))
+
+                input_line += 1
+                last_frozen_line = input_line
+
+    result += input_lines[last_frozen_line:]
+
+    for line in result[:-1]:
+        if not line.endswith(b'\n'):
+            raise PatchNotApplicableError(
+                'A line without a trailing newline was placed before the '
+                'end of the file')
+
+    return b''.join(result)
+
+
+def _locate_hunk(hunk, input_lines, fuzz, offset, last_frozen_line):
+    """Locate the position in the file where a hunk applies.
+
+    This follows the search order and constraints used by GNU patch, so that
+    a located hunk will be placed exactly where :command:`patch` would
+    place it.
+
+    Args:
+        hunk (_Hunk):
+            The hunk to locate.
+
+        input_lines (list of bytes):
+            The lines of the original file.
+
+        fuzz (int):
+            The number of context lines that may be ignored.
+
+        offset (int):
+            The current offset between hunk headers and the file.
+
+        last_frozen_line (int):
+            The number of lines already written to the result, up to the
+            last line changed by a previous hunk. The hunk can't be placed
+            before this.
+
+    Returns:
+        tuple:
+        A 2-tuple containing:
+
+        1. The 1-based line number where the hunk applies, or ``None``
+           if it could not be located.
+        2. The new offset to use for subsequent hunks.
+    """
+    num_input_lines = len(input_lines)
+    pattern = hunk.pattern
+    pat_lines = len(pattern)
+    first_guess = hunk.first + offset
+
+    if not pat_lines:
+        return first_guess, offset
+
+    prefix_context = hunk.prefix_context
+    suffix_context = hunk.suffix_context
+    context = max(prefix_context, suffix_context)
+    prefix_fuzz = fuzz + prefix_context - context
+    suffix_fuzz = fuzz + suffix_context - context
+    max_where = num_input_lines - (pat_lines - suffix_fuzz) + 1
+    min_where = last_frozen_line + 1
+    max_pos_offset = max_where - first_guess
+    max_neg_offset = first_guess - min_where
+    max_offset = max(max_pos_offset, max_neg_offset)
+
+    if first_guess <= max_neg_offset:
+        max_neg_offset = first_guess - 1
+
+    def _matches(where, prefix_fuzz, suffix_fuzz):
+        start = where - 1 + prefix_fuzz
+        end = start + pat_lines - prefix_fuzz - suffix_fuzz
+
+        return (start >= 0 and
+                end <= num_input_lines and
+                input_lines[start:end] ==
+                pattern[prefix_fuzz:pat_lines - suffix_fuzz])
+
+    if prefix_fuzz < 0 and hunk.first <= 1:
+        # The hunk can only match at the start of the file.
+        if (suffix_fuzz < 0 and
+            (pat_lines != num_input_lines or
+             prefix_context < last_frozen_line)):
+            # It can only match the entire file, and doesn't.
+            return None, offset
+
+        new_offset = 1 - first_guess
+
+        if (last_frozen_line <= prefix_context and
+            new_offset <= max_pos_offset and
+            _matches(1, 0, suffix_fuzz)):
+            return 1, offset + new_offset
+
+        return None, offset
+    elif prefix_fuzz < 0:
+        prefix_fuzz = 0
+
+    if suffix_fuzz < 0:
+        # The hunk can only match at the end of the file.
+        where = num_input_lines - pat_lines + 1
+
+        if where >= min_where and _matches(where, prefix_fuzz, 0):
+            return where, offset + where - first_guess
+
+        return None, offset
+
+    for cur_offset in range(max_offset + 1):
+        if (cur_offset <= max_pos_offset and
+            _matches(first_guess + cur_offset, prefix_fuzz, suffix_fuzz)):
+            return first_guess + cur_offset, offset + cur_offset
+
+        if (0 < cur_offset <= max_neg_offset and
+            _matches(first_guess - cur_offset, prefix_fuzz, suffix_fuzz)):
+            return first_guess - cur_offset, offset - cur_offset
+
+    return None, offset
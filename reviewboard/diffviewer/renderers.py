@@ -1,15 +1,25 @@
 from __future__ import unicode_literals
 
+import logging
+
 from django.conf import settings
-from django.http import HttpResponse
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
 from django.utils import six
 from django.utils.translation import ugettext as _, get_language
-from djblets.cache.backend import cache_memoize
+from djblets.cache.backend import (cache_memoize, cache_memoize_iter,
+                                   make_cache_key)
 from djblets.util.compat.django.template.loader import render_to_string
 
 from reviewboard.diffviewer.chunk_generator import compute_chunk_last_header
-from reviewboard.diffviewer.diffutils import populate_diff_chunks
+from reviewboard.diffviewer.diffutils import (iter_diff_chunks,
+                                              populate_diff_chunk,
+                                              populate_diff_chunks)
 from reviewboard.diffviewer.errors import UserVisibleError
+from reviewboard.diffviewer.timing import (CACHE_HTML,
+                                           STAGE_RENDER,
+                                           record_diff_cache,
+                                           time_diff_stage)
 
 
 class DiffRenderer(object):
@@ -32,6 +42,36 @@ class DiffRenderer(object):
     """
     default_template_name = 'diffviewer/diff_file_fragment.html'
 
+    #: The template used for the start of a file when streaming.
+    #:
+    #: Version Added:
+    #:     4.0
+    header_template_name = 'diffviewer/_diff_file_header.html'
+
+    #: The template used for each batch of chunks when streaming.
+    #:
+    #: Version Added:
+    #:     4.0
+    chunks_template_name = 'diffviewer/_diff_file_chunks.html'
+
+    #: The template used for the end of a file when streaming.
+    #:
+    #: Version Added:
+    #:     4.0
+    footer_template_name = 'diffviewer/_diff_file_footer.html'
+
+    #: The template used to end a file if there's an error while streaming.
+    #:
+    #: Version Added:
+    #:     4.0
+    stream_error_template_name = 'diffviewer/_diff_file_stream_error.html'
+
+    #: The approximate number of lines to render at a time when streaming.
+    #:
+    #: Version Added:
+    #:     4.0
+    STREAMING_BATCH_LINES = 500
+
     def __init__(self, diff_file, chunk_index=None, highlighting=False,
                  collapse_all=True, lines_of_context=None, extra_context=None,
                  allow_caching=True, template_name=default_template_name,
@@ -46,6 +86,7 @@ class DiffRenderer(object):
         self.template_name = template_name
         self.num_chunks = 0
         self.show_deleted = show_deleted
+        self._chunk = None
 
         if self.lines_of_context and len(self.lines_of_context) == 1:
             # If we only have one value, then assume it represents before
@@ -56,6 +97,118 @@ class DiffRenderer(object):
         """Renders the diff to an HttpResponse."""
         return HttpResponse(self.render_to_string(request))
 
+    def render_to_streaming_response(self, request):
+        """Render the diff to a streaming HTTP response.
+
+        See :py:meth:`render_to_iter` for details.
+
+        Version Added:
+            4.0
+
+        Args:
+            request (django.http.HttpRequest):
+                The HTTP request from the client.
+
+        Returns:
+            django.http.StreamingHttpResponse:
+            The response containing the rendered diff.
+        """
+        return StreamingHttpResponse(self.render_to_iter(request))
+
+    def render_to_iter(self, request):
+        """Return an iterator through the rendered HTML for the diff.
+
+        When rendering a whole file with the default template, the file's
+        chunks are rendered and yielded in small batches, as they're loaded
+        from the cache. This keeps memory use bounded for very large files,
+        and lets the client start receiving the diff sooner. The rendered
+        HTML is cached as it's yielded.
+
+        Anything else is rendered through :py:meth:`render_to_string`, and
+        yielded all at once.
+
+        The first part of the diff is rendered before this returns, so that
+        any errors from generating the chunks (such as
+        :py:class:`~reviewboard.diffviewer.errors.PatchError`) are raised by
+        this method, rather than once a response has started. If an error
+        occurs later while iterating, it's logged, and the rest of the diff
+        is replaced with an error message rendered from
+        :py:attr:`stream_error_template_name`.
+
+        Version Added:
+            4.0
+
+        Args:
+            request (django.http.HttpRequest):
+                The HTTP request from the client.
+
+        Returns:
+            iterator of unicode:
+            An iterator through the rendered HTML.
+        """
+        if (self.chunk_index is not None or
+            self.lines_of_context or
+            self.template_name != self.default_template_name):
+            return iter([self.render_to_string(request)])
+
+        if not self.allow_caching:
+            items = self.render_to_iter_uncached(request)
+        else:
+            # This uses a separate cache key from render_to_string(), since
+            # the HTML is stored as a series of items, rather than a single
+            # string.
+            cache_key = '%s-streamed' % self.make_cache_key()
+            is_cached = make_cache_key(cache_key) in cache
+            record_diff_cache(request, CACHE_HTML, is_cached,
+                              self._get_timing_filename())
+
+            if is_cached:
+                items = cache_memoize_iter(
+                    cache_key,
+                    lambda: self.render_to_iter_uncached(request))
+            else:
+                items = cache_memoize_iter(
+                    cache_key,
+                    self.render_to_iter_uncached(request))
+
+        # Render the first part now. If the cached HTML was evicted after
+        # the check above, this is where it will be regenerated, and any
+        # errors doing so need to reach the caller before the response
+        # starts.
+        try:
+            first_item = next(items)
+        except StopIteration:
+            return iter([])
+
+        return self._iter_with_stream_errors(first_item, items, request)
+
+    def render_to_iter_uncached(self, request):
+        """Return an iterator through the rendered HTML without caching.
+
+        See :py:meth:`render_to_iter` for details.
+
+        Version Added:
+            4.0
+
+        Args:
+            request (django.http.HttpRequest):
+                The HTTP request from the client.
+
+        Returns:
+            iterator of unicode:
+            An iterator through the rendered HTML.
+        """
+        chunks = iter_diff_chunks(self.diff_file, self.highlighting,
+                                  request=request)
+
+        # The chunks are rendered in batches as they're loaded, rather than
+        # being stored in the file.
+        self.diff_file['chunks'] = []
+        context = self.make_context()
+        context['equal_lines'] = self.diff_file['num_equal_lines']
+
+        return self._iter_rendered_chunks(context, chunks, request)
+
     def render_to_string(self, request):
         """Returns the diff as a string.
 
@@ -69,10 +222,19 @@ class DiffRenderer(object):
         cache = self.allow_caching and not self.lines_of_context
 
         if cache:
-            return cache_memoize(
-                self.make_cache_key(),
-                lambda: self.render_to_string_uncached(request),
-                large_data=True)
+            rendered = []
+
+            def _render():
+                rendered.append(True)
+
+                return self.render_to_string_uncached(request)
+
+            result = cache_memoize(self.make_cache_key(), _render,
+                                   large_data=True)
+            record_diff_cache(request, CACHE_HTML, not rendered,
+                              self._get_timing_filename())
+
+            return result
         else:
             return self.render_to_string_uncached(request)
 
@@ -83,22 +245,36 @@ class DiffRenderer(object):
         only as often as necessary. render_to_string will call this if it's
         not already in the cache.
         """
-        if not self.diff_file.get('chunks_loaded', False):
+        chunks_loaded = self.diff_file.get('chunks_loaded', False)
+
+        if self.chunk_index is not None and not chunks_loaded:
+            # Only the chunk being rendered is needed, so avoid loading the
+            # rest of the file's chunks.
+            self._chunk = populate_diff_chunk(self.diff_file,
+                                              self.chunk_index,
+                                              self.highlighting,
+                                              request=request)
+        elif not chunks_loaded:
             populate_diff_chunks([self.diff_file], self.highlighting,
                                  request=request)
 
         if self.chunk_index is not None:
             assert not self.lines_of_context or self.collapse_all
 
-            self.num_chunks = len(self.diff_file['chunks'])
+            if chunks_loaded:
+                self.num_chunks = len(self.diff_file['chunks'])
+            else:
+                self.num_chunks = self.diff_file['num_chunks']
 
             if self.chunk_index < 0 or self.chunk_index >= self.num_chunks:
                 raise UserVisibleError(
                     _('Invalid chunk index %s specified.')
                     % self.chunk_index)
 
-        return render_to_string(template_name=self.template_name,
-                                context=self.make_context())
+        with time_diff_stage(request, STAGE_RENDER,
+                             self._get_timing_filename()):
+            return render_to_string(template_name=self.template_name,
+                                    context=self.make_context())
 
     def make_cache_key(self):
         """Creates and returns a cache key representing the diff to render."""
@@ -146,8 +322,10 @@ class DiffRenderer(object):
         if self.chunk_index is not None:
             # We're rendering a specific chunk within a file's diff, rather
             # than the whole diff.
-            self.diff_file['chunks'] = \
-                [self.diff_file['chunks'][self.chunk_index]]
+            if self._chunk is None:
+                self._chunk = self.diff_file['chunks'][self.chunk_index]
+
+            self.diff_file['chunks'] = [self._chunk]
 
             if self.lines_of_context:
                 # We're rendering a specific range of lines within this chunk,
@@ -246,10 +424,150 @@ class DiffRenderer(object):
             'equal_lines': equal_lines,
             'standalone': self.chunk_index is not None,
             'show_deleted': self.show_deleted,
+            'show_chunks': self._get_show_chunks(),
         })
 
         return context
 
+    def _get_show_chunks(self):
+        """Return whether the file's chunks should be rendered.
+
+        Chunks aren't rendered for binary files, files that were moved or
+        copied without changes, empty new files, or deleted files (unless
+        showing deleted files).
+
+        Returns:
+            bool:
+            Whether the file's chunks should be rendered.
+        """
+        diff_file = self.diff_file
+
+        return not (
+            diff_file.get('binary') or
+            (diff_file.get('moved_or_copied') and
+             diff_file.get('num_changes') == 0) or
+            (diff_file.get('newfile') and
+             diff_file.get('num_chunks') == 0) or
+            (diff_file.get('deleted') and not self.show_deleted))
+
+    def _iter_rendered_chunks(self, context, chunks, request):
+        """Render a file's diff in batches of chunks.
+
+        Args:
+            context (dict):
+                The context for the templates.
+
+            chunks (iterator of dict):
+                The file's chunks.
+
+            request (django.http.HttpRequest):
+                The HTTP request from the client.
+
+        Yields:
+            unicode:
+            Each rendered portion of the diff.
+        """
+        yield render_to_string(template_name=self.header_template_name,
+                               context=context)
+
+        if context['show_chunks']:
+            batch = []
+            num_lines = 0
+
+            for chunk in chunks:
+                batch.append(chunk)
+                num_lines += chunk['numlines']
+
+                if num_lines >= self.STREAMING_BATCH_LINES:
+                    yield self._render_chunks(context, batch, request)
+                    batch = []
+                    num_lines = 0
+
+            if batch:
+                yield self._render_chunks(context, batch, request)
+
+        yield render_to_string(template_name=self.footer_template_name,
+                               context=context)
+
+    def _iter_with_stream_errors(self, first_item, items, request):
+        """Yield rendered parts of a diff, handling errors while streaming.
+
+        Once a streaming response has started, errors can no longer be
+        turned into an error page. Instead, the error is logged and an error
+        message closing out the file is yielded, so the client isn't left
+        with a silently truncated diff. A partial render is never cached,
+        since the cache entry is only completed once all items are yielded.
+
+        Args:
+            first_item (unicode):
+                The first rendered part of the diff.
+
+            items (iterator of unicode):
+                The remaining rendered parts of the diff.
+
+            request (django.http.HttpRequest):
+                The HTTP request from the client.
+
+        Yields:
+            unicode:
+            Each rendered part of the diff, followed by an error message if
+            rendering failed.
+        """
+        yield first_item
+
+        try:
+            for item in items:
+                yield item
+        except Exception as e:
+            logging.exception('%s: Error streaming the diff for %s: %s',
+                              self.__class__.__name__,
+                              self._get_timing_filename(), e,
+                              request=request)
+
+            yield render_to_string(
+                template_name=self.stream_error_template_name,
+                context=dict(self.extra_context,
+                             error=e,
+                             file=self.diff_file,
+                             standalone=False))
+
+    def _render_chunks(self, context, chunks, request):
+        """Render a batch of chunks.
+
+        Args:
+            context (dict):
+                The context for the templates.
+
+            chunks (list of dict):
+                The chunks to render.
+
+            request (django.http.HttpRequest):
+                The HTTP request from the client.
+
+        Returns:
+            unicode:
+            The rendered chunks.
+        """
+        with time_diff_stage(request, STAGE_RENDER,
+                             self._get_timing_filename()):
+            return render_to_string(template_name=self.chunks_template_name,
+                                    context=dict(context, chunks=chunks))
+
+    def _get_timing_filename(self):
+        """Return the filename to record diff timings under.
+
+        Returns:
+            unicode:
+            The destination filename of the FileDiff being rendered, or
+            ``None`` if there isn't one.
+        """
+        filediff = self.diff_file.get('filediff')
+
+        if filediff is None:
+            return None
+
+        return filediff.dest_file
+
 
 _diff_renderer_class = DiffRenderer
 
@@ -9,7 +9,8 @@ from reviewboard.diffviewer.commit_utils import (CommitHistoryDiffEntry,
                                                  diff_histories,
                                                  exclude_ancestor_filediffs,
                                                  get_base_and_tip_commits,
-                                                 get_file_exists_in_history)
+                                                 get_file_exists_in_history,
+                                                 get_files_exist_in_history)
 from reviewboard.diffviewer.models import DiffCommit
 from reviewboard.diffviewer.tests.test_diffutils import \
     BaseFileDiffAncestorTests
@@ -392,6 +393,55 @@ class GetFileExistsInHistoryTests(SpyAgency, TestCase):
         return get_file_exists_in_history
 
 
+class GetFilesExistInHistoryTests(SpyAgency, TestCase):
+    """Unit tests for get_files_exist_in_history."""
+
+    fixtures = ['test_scmtools']
+
+    def test_get_files_exist_in_history(self):
+        """Testing get_files_exist_in_history checks files not in the
+        history in the repository
+        """
+        repository = self.create_repository()
+        validation_info = {
+            'r1': {
+                'parent_id': 'r0',
+                'tree': {
+                    'added': [{
+                        'filename': 'foo',
+                        'revision': 'a' * 40,
+                    }],
+                    'modified': [],
+                    'removed': [],
+                },
+            },
+        }
+
+        self.spy_on(repository.get_files_exist,
+                    call_fake=lambda _self, files, request=None: [
+                        path == 'bar'
+                        for path, revision, base_commit_id in files
+                    ])
+
+        self.assertEqual(
+            get_files_exist_in_history(
+                validation_info=validation_info,
+                repository=repository,
+                parent_id='r1',
+                files=[
+                    ('foo', 'a' * 40, None),
+                    ('bar', 'b' * 40, None),
+                    ('baz', 'c' * 40, None),
+                ]),
+            [True, True, False])
+        self.assertSpyCallCount(repository.get_files_exist, 1)
+        self.assertSpyCalledWith(repository.get_files_exist,
+                                 [
+                                     ('bar', 'b' * 40, None),
+                                     ('baz', 'c' * 40, None),
+                                 ])
+
+
 class ExcludeAncestorFileDiffsTests(BaseFileDiffAncestorTests):
     """Unit tests for commit_utils.exclude_ancestor_filediffs."""
 
@@ -0,0 +1,174 @@
+from __future__ import unicode_literals
+
+import nose
+from djblets.siteconfig.models import SiteConfiguration
+from kgb import SpyAgency
+
+from reviewboard.diffviewer.compression import (BZip2DiffCompressor,
+                                                ZstdDiffCompressor,
+                                                diff_compressor_registry,
+                                                zstandard)
+from reviewboard.diffviewer.errors import DiffCompressionError
+from reviewboard.diffviewer.models import (DiffCompressionDictionary,
+                                           RawFileDiffData)
+from reviewboard.testing import TestCase
+
+
+class DiffCompressorRegistryTests(SpyAgency, TestCase):
+    """Unit tests for DiffCompressorRegistry."""
+
+    def test_get_compressor(self):
+        """Testing DiffCompressorRegistry.get_compressor"""
+        self.assertIsInstance(diff_compressor_registry.get_compressor('B'),
+                              BZip2DiffCompressor)
+        self.assertIsInstance(diff_compressor_registry.get_compressor('Z'),
+                              ZstdDiffCompressor)
+        self.assertIsNone(diff_compressor_registry.get_compressor('X'))
+
+    def test_get_default_compressor(self):
+        """Testing DiffCompressorRegistry.get_default_compressor without
+        diffviewer_diff_compression set uses bzip2
+        """
+        self.spy_on(ZstdDiffCompressor.is_available,
+                    call_fake=lambda self: True)
+
+        self.assertIsInstance(
+            diff_compressor_registry.get_default_compressor(),
+            BZip2DiffCompressor)
+
+    def test_get_default_compressor_with_setting(self):
+        """Testing DiffCompressorRegistry.get_default_compressor with
+        diffviewer_diff_compression set
+        """
+        with self.siteconfig_settings({'diffviewer_diff_compression': 'B'}):
+            self.assertIsInstance(
+                diff_compressor_registry.get_default_compressor(),
+                BZip2DiffCompressor)
+
+    def test_get_default_compressor_with_zstd_setting(self):
+        """Testing DiffCompressorRegistry.get_default_compressor with
+        diffviewer_diff_compression set to Zstandard
+        """
+        self.spy_on(ZstdDiffCompressor.is_available,
+                    call_fake=lambda self: True)
+
+        with self.siteconfig_settings({'diffviewer_diff_compression': 'Z'}):
+            self.assertIsInstance(
+                diff_compressor_registry.get_default_compressor(),
+                ZstdDiffCompressor)
+
+    def test_get_default_compressor_with_zstd_setting_unavailable(self):
+        """Testing DiffCompressorRegistry.get_default_compressor with
+        diffviewer_diff_compression set to Zstandard and Zstandard
+        unavailable
+        """
+        self.spy_on(ZstdDiffCompressor.is_available,
+                    call_fake=lambda self: False)
+
+        with self.siteconfig_settings({'diffviewer_diff_compression': 'Z'}):
+            self.assertIsInstance(
+                diff_compressor_registry.get_default_compressor(),
+                BZip2DiffCompressor)
+
+
+class ZstdDiffCompressorTests(TestCase):
+    """Unit tests for ZstdDiffCompressor."""
+
+    def setUp(self):
+        super(ZstdDiffCompressorTests, self).setUp()
+
+        if zstandard is None:
+            raise nose.SkipTest('zstandard is not installed')
+
+        self.compressor = ZstdDiffCompressor()
+
+    def tearDown(self):
+        # Training a dictionary activates it in the site configuration.
+        siteconfig = SiteConfiguration.objects.get_current()
+        siteconfig.set(ZstdDiffCompressor.DICTIONARY_SETTING, None)
+        siteconfig.save()
+
+        super(ZstdDiffCompressorTests, self).tearDown()
+
+    def test_compress(self):
+        """Testing ZstdDiffCompressor.compress and decompress"""
+        data = self._make_diff(1) * 10
+        compressed = self.compressor.compress(data)
+
+        self.assertLess(len(compressed), len(data))
+        self.assertEqual(self.compressor.decompress(compressed), data)
+
+    def test_compress_with_dictionary(self):
+        """Testing ZstdDiffCompressor.compress with a trained dictionary"""
+        data = self._make_diff(1000)
+        without_dict = self.compressor.compress(data)
+
+        dictionary = self.compressor.train_dictionary(
+            [self._make_diff(i) for i in range(1000)],
+            dict_size=4096)
+
+        self.assertEqual(DiffCompressionDictionary.objects.get(),
+                         dictionary)
+
+        with_dict = self.compressor.compress(data)
+
+        self.assertLess(len(with_dict), len(without_dict))
+        self.assertEqual(
+            zstandard.get_frame_parameters(with_dict).dict_id,
+            dictionary.dict_id)
+
+        # Dictionaries should be loaded from the database as needed.
+        self.assertEqual(ZstdDiffCompressor().decompress(with_dict), data)
+        self.assertEqual(ZstdDiffCompressor().decompress(without_dict), data)
+
+    def test_decompress_with_missing_dictionary(self):
+        """Testing ZstdDiffCompressor.decompress with a missing dictionary"""
+        self.compressor.train_dictionary(
+            [self._make_diff(i) for i in range(1000)],
+            dict_size=4096)
+        compressed = self.compressor.compress(self._make_diff(1000))
+
+        DiffCompressionDictionary.objects.all().delete()
+
+        with self.assertRaises(DiffCompressionError):
+            ZstdDiffCompressor().decompress(compressed)
+
+    def _make_diff(self, i):
+        """Return a small diff for compression.
+
+        Args:
+            i (int):
+                A number used to vary the diff.
+
+        Returns:
+            bytes:
+            The diff.
+        """
+        return (
+            b'diff --git a/src/module%d.py b/src/module%d.py\n'
+            b'index %07x..%07x 100644\n'
+            b'--- a/src/module%d.py\n'
+            b'+++ b/src/module%d.py\n'
+            b'@@ -%d,6 +%d,7 @@ class Module%d(object):\n'
+            b'     def __init__(self):\n'
+            b'         """Initialize the module."""\n'
+            b'-        self.value = %d\n'
+            b'+        self.value = %d\n'
+            b'+        self.enabled = True\n'
+            b' \n'
+            b'     def run(self):\n'
+            % (i, i, i * 7919, i * 104729, i, i, i, i, i, i, i + 1)
+        )
+
+
+class RawFileDiffDataTests(TestCase):
+    """Unit tests for RawFileDiffData."""
+
+    def test_content_with_unknown_compression(self):
+        """Testing RawFileDiffData.content with an unknown compression
+        method
+        """
+        raw_fdd = RawFileDiffData(binary=b'abc', compression='X')
+
+        with self.assertRaises(NotImplementedError):
+            raw_fdd.content
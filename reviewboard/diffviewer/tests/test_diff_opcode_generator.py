@@ -698,10 +698,82 @@ class MoveDetectionTests(TestCase):
             ]
         )
 
-    def _test_move_detection(self, a, b, expected_i_moves, expected_r_moves):
+    def test_move_detection_with_repeated_lines(self):
+        """Testing DiffOpcodeGenerator move detection with lines repeated
+        throughout the file
+        """
+        self._test_move_detection(
+            [
+                'if (first_condition) {',
+                '    first_call();',
+                '}',
+                'if (second_condition) {',
+                '    second_call();',
+                '}',
+                'if (moved_condition) {',
+                '    moved_call();',
+                '}',
+                'done();',
+            ],
+            [
+                'if (moved_condition) {',
+                '    moved_call();',
+                '}',
+                'if (first_condition) {',
+                '    first_call();',
+                '}',
+                'if (second_condition) {',
+                '    second_call();',
+                '}',
+                'done();',
+            ],
+            [
+                {
+                    1: 7,
+                    2: 8,
+                },
+            ],
+            [
+                {
+                    7: 1,
+                    8: 2,
+                },
+            ]
+        )
+
+    def test_move_detection_with_max_candidates(self):
+        """Testing DiffOpcodeGenerator move detection stops after
+        MOVE_MAX_CANDIDATES
+        """
+        self._test_move_detection(
+            [
+                'if (first_condition) {',
+                '    first_call();',
+                '}',
+                'if (moved_condition) {',
+                '    moved_call();',
+                '}',
+            ],
+            [
+                'if (moved_condition) {',
+                '    moved_call();',
+                '}',
+                'if (first_condition) {',
+                '    first_call();',
+                '}',
+            ],
+            [],
+            [],
+            move_max_candidates=0)
+
+    def _test_move_detection(self, a, b, expected_i_moves, expected_r_moves,
+                             move_max_candidates=None):
         differ = MyersDiffer(a, b)
         opcode_generator = get_diff_opcode_generator(differ)
 
+        if move_max_candidates is not None:
+            opcode_generator.MOVE_MAX_CANDIDATES = move_max_candidates
+
         r_moves = []
         i_moves = []
 
@@ -2,10 +2,59 @@ from __future__ import unicode_literals
 
 from djblets.testing.decorators import add_fixtures
 
-from reviewboard.diffviewer.parser import DiffParser
+from reviewboard.diffviewer.diffutils import split_line_endings
+from reviewboard.diffviewer.parser import DiffLines, DiffParser
 from reviewboard.testing import TestCase
 
 
+class DiffLinesTests(TestCase):
+    """Unit tests for reviewboard.diffviewer.parser.DiffLines."""
+
+    def test_lines(self):
+        """Testing DiffLines matches split_line_endings"""
+        for data in (b'',
+                     b'\n',
+                     b'abc',
+                     b'abc\n',
+                     b'abc\n\ndef',
+                     b'abc\r\ndef\rghi\r\r\njkl\x0cmno\n',
+                     b'abc\r'):
+            expected = split_line_endings(data)
+            lines = DiffLines(data)
+
+            self.assertEqual(len(lines), len(expected))
+            self.assertEqual(list(lines), expected)
+            self.assertEqual(lines[:], expected)
+            self.assertEqual(lines[1:-1], expected[1:-1])
+            self.assertEqual([lines[i] for i in range(len(lines))], expected)
+
+            if expected:
+                self.assertEqual(lines[-1], expected[-1])
+
+    def test_getitem_out_of_range(self):
+        """Testing DiffLines.__getitem__ with an index out of range"""
+        with self.assertRaises(IndexError):
+            DiffLines(b'abc\n')[1]
+
+    def test_get_span(self):
+        """Testing DiffLines.get_span"""
+        lines = DiffLines(b'abc\ndef\nghi')
+
+        self.assertEqual(lines.get_span(0, 1), (0, 4))
+        self.assertEqual(lines.get_span(0, 2), (0, 8))
+        self.assertIsNone(lines.get_span(1, 1))
+
+        # The last line has no newline, so it must be copied.
+        self.assertIsNone(lines.get_span(1, 3))
+
+    def test_get_span_with_carriage_returns(self):
+        """Testing DiffLines.get_span with carriage returns in the data"""
+        lines = DiffLines(b'abc\r\ndef\n')
+
+        self.assertIsNone(lines.get_span(0, 1))
+        self.assertIsNone(lines.get_span(1, 2))
+
+
 class DiffParserTest(TestCase):
     """Unit tests for DiffParser."""
 
@@ -51,6 +100,45 @@ class DiffParserTest(TestCase):
         self.assertEqual(files[0].insert_count, 3)
         self.assertEqual(files[0].delete_count, 4)
 
+    def test_parse_with_lazy_lines(self):
+        """Testing DiffParser.parse with lines found lazily"""
+        class LazyDiffParser(DiffParser):
+            LAZY_LINES_MIN_SIZE = 0
+
+        diff1 = (
+            b'Some preamble\n'
+            b'--- README  123\n'
+            b'+++ README  (new)\n'
+            b'@@ -1,1 +1,1 @@\n'
+            b'-blah\n'
+            b'+blah!\n'
+        )
+        diff2 = (
+            b'--- main.c  456\n'
+            b'+++ main.c  (new)\n'
+            b'@@ -1,1 +1,2 @@\n'
+            b' blah\n'
+            b'+blah?\n'
+        )
+
+        for data in (diff1 + diff2,
+                     diff1 + diff2[:-1],
+                     diff1.replace(b'\n', b'\r\n') + diff2):
+            parser = LazyDiffParser(data)
+            self.assertIsInstance(parser.lines, DiffLines)
+
+            files = parser.parse()
+            expected_files = DiffParser(data).parse()
+
+            self.assertEqual(len(files), 2)
+            self.assertEqual([f.data for f in files],
+                             [f.data for f in expected_files])
+            self.assertEqual([f.insert_count for f in files], [1, 1])
+            self.assertEqual([f.delete_count for f in files], [1, 0])
+
+        self.assertEqual(files[0].data, diff1)
+        self.assertEqual(files[1].data, diff2)
+
     @add_fixtures(['test_scmtools'])
     def test_raw_diff_with_diffset(self):
         """Testing DiffParser.raw_diff with DiffSet"""
@@ -206,3 +294,55 @@ class DiffParserTest(TestCase):
 
         parser = DiffParser(b'')
         self.assertEqual(parser.raw_diff(commit1), commit1_diff)
+
+    @add_fixtures(['test_scmtools'])
+    def test_iter_raw_diff(self):
+        """Testing DiffParser.iter_raw_diff"""
+        repository = self.create_repository(tool_name='Test')
+        diffset = self.create_diffset(repository=repository)
+
+        diff1 = (
+            b'--- README\n'
+            b'+++ README\n'
+            b'@@ -1,1 +1,1 @@\n'
+            b'-Hello, world!\n'
+            b'+Hi, world!\n'
+        )
+        diff2 = (
+            b'--- ABC\n'
+            b'+++ ABC\n'
+            b'@@ -1,1 +1,1 @@\n'
+            b'-line!\n'
+            b'+line..\n'
+        )
+
+        self.create_filediff(diffset, source_file='README',
+                             dest_file='README', diff=diff1)
+        self.create_filediff(diffset, source_file='ABC', dest_file='ABC',
+                             diff=diff2)
+
+        parser = DiffParser(b'')
+
+        # The diff data for all files should be fetched in one query.
+        with self.assertNumQueries(1):
+            self.assertEqual(list(parser.iter_raw_diff(diffset)),
+                             [diff1, diff2])
+
+    @add_fixtures(['test_scmtools'])
+    def test_iter_raw_diff_with_raw_diff_override(self):
+        """Testing DiffParser.iter_raw_diff with a subclass overriding
+        raw_diff
+        """
+        class CustomDiffParser(DiffParser):
+            def raw_diff(self, diffset_or_commit):
+                return (b'# Custom header\n' +
+                        super(CustomDiffParser, self).raw_diff(
+                            diffset_or_commit))
+
+        repository = self.create_repository(tool_name='Test')
+        diffset = self.create_diffset(repository=repository)
+        self.create_filediff(diffset, diff=b'diff\n')
+
+        parser = CustomDiffParser(b'')
+        self.assertEqual(list(parser.iter_raw_diff(diffset)),
+                         [b'# Custom header\ndiff\n'])
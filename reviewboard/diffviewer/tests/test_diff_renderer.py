@@ -1,11 +1,16 @@
 from __future__ import unicode_literals
 
-from django.http import HttpResponse
+import re
+
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
 from django.test import RequestFactory
-from djblets.cache.backend import cache_memoize
+from djblets.cache.backend import cache_memoize, make_cache_key
 from kgb import SpyAgency
 
-from reviewboard.diffviewer.errors import UserVisibleError
+from reviewboard.diffviewer import renderers
+from reviewboard.diffviewer.diffutils import get_diff_files
+from reviewboard.diffviewer.errors import PatchError, UserVisibleError
 from reviewboard.diffviewer.models import FileDiff
 from reviewboard.diffviewer.renderers import DiffRenderer
 from reviewboard.testing import TestCase
@@ -14,6 +19,8 @@ from reviewboard.testing import TestCase
 class DiffRendererTests(SpyAgency, TestCase):
     """Unit tests for DiffRenderer."""
 
+    fixtures = ['test_scmtools']
+
     def test_construction_with_invalid_chunks(self):
         """Testing DiffRenderer construction with invalid chunks"""
         diff_file = {
@@ -48,6 +55,48 @@ class DiffRendererTests(SpyAgency, TestCase):
         self.assertEqual(renderer.num_chunks, 1)
         self.assertEqual(renderer.chunk_index, 0)
 
+    def test_render_to_string_uncached_with_chunk_index(self):
+        """Testing DiffRenderer.render_to_string_uncached with chunk_index
+        loads only that chunk
+        """
+        chunk = {
+            'change': 'replace',
+            'index': 1,
+            'lines': [],
+            'meta': {},
+            'numlines': 0,
+        }
+        diff_file = {
+            'filediff': None,
+            'interfilediff': None,
+            'force_interdiff': False,
+        }
+
+        def _populate_diff_chunk(diff_file, chunk_index, *args, **kwargs):
+            diff_file.update({
+                'chunks': [chunk],
+                'num_chunks': 3,
+                'changed_chunk_indexes': [1],
+                'num_changes': 1,
+                'whitespace_only': False,
+            })
+
+            return chunk
+
+        self.spy_on(renderers.populate_diff_chunk,
+                    call_fake=_populate_diff_chunk)
+        self.spy_on(renderers.populate_diff_chunks, call_original=False)
+        self.spy_on(renderers.render_to_string,
+                    call_fake=lambda template_name, **kwargs: 'Foo')
+
+        renderer = DiffRenderer(diff_file, chunk_index=1)
+        self.assertEqual(renderer.render_to_string_uncached(None), 'Foo')
+
+        self.assertSpyCalledWith(renderers.populate_diff_chunk, diff_file, 1)
+        self.assertFalse(renderers.populate_diff_chunks.called)
+        self.assertEqual(renderer.num_chunks, 3)
+        self.assertEqual(diff_file['chunks'], [chunk])
+
     def test_render_to_response(self):
         """Testing DiffRenderer.render_to_response"""
         diff_file = {
@@ -110,6 +159,118 @@ class DiffRendererTests(SpyAgency, TestCase):
         self.assertFalse(renderer.make_cache_key.called)
         self.assertFalse(cache_memoize.spy.called)
 
+    def test_render_to_iter(self):
+        """Testing DiffRenderer.render_to_iter renders chunks in batches"""
+        class BatchingDiffRenderer(DiffRenderer):
+            STREAMING_BATCH_LINES = 5
+
+        diff_file = self._create_diff_file()
+        renderer = BatchingDiffRenderer(diff_file, collapse_all=False)
+        self.spy_on(renderer._render_chunks)
+
+        items = list(renderer.render_to_iter(None))
+
+        self.assertEqual(len(renderer._render_chunks.calls), 4)
+        self.assertEqual(len(items), 6)
+        self.assertEqual(diff_file['chunks'], [])
+
+        # The result should match a standard render of the file, aside from
+        # whitespace between tags.
+        expected = DiffRenderer(self._create_diff_file(),
+                                collapse_all=False).render_to_string(None)
+
+        self.assertEqual(re.sub(r'\s+', ' ', ''.join(items)).strip(),
+                         re.sub(r'\s+', ' ', expected).strip())
+        self.assertIn('data-lines-equal="28"', expected)
+
+    def test_render_to_iter_with_cache(self):
+        """Testing DiffRenderer.render_to_iter uses the cache"""
+        renderer = DiffRenderer(self._create_diff_file())
+        html = ''.join(renderer.render_to_iter(None))
+
+        renderer = DiffRenderer(self._create_diff_file())
+        self.spy_on(renderer.render_to_iter_uncached)
+
+        self.assertEqual(''.join(renderer.render_to_iter(None)), html)
+        self.assertFalse(renderer.render_to_iter_uncached.called)
+
+    def test_render_to_iter_with_evicted_cache(self):
+        """Testing DiffRenderer.render_to_iter raises errors regenerating
+        evicted HTML before iterating
+        """
+        def _render_to_iter_uncached(_self, request):
+            raise PatchError(filename='README',
+                             error_output=b'',
+                             orig_file=b'',
+                             new_file=b'',
+                             diff=b'',
+                             rejects=None)
+
+        renderer = DiffRenderer(self._create_diff_file())
+        self.spy_on(renderer.render_to_iter_uncached,
+                    call_fake=_render_to_iter_uncached)
+
+        # Simulate the HTML being partially evicted from the cache after
+        # it's been checked.
+        cache.set(make_cache_key('%s-streamed' % renderer.make_cache_key()),
+                  '1')
+
+        with self.assertRaises(PatchError):
+            renderer.render_to_iter(None)
+
+    def test_render_to_iter_with_error_while_streaming(self):
+        """Testing DiffRenderer.render_to_iter with an error after
+        streaming has started
+        """
+        class BatchingDiffRenderer(DiffRenderer):
+            STREAMING_BATCH_LINES = 5
+
+        def _render_chunks(_self, *args, **kwargs):
+            if len(renderer._render_chunks.calls) == 2:
+                raise Exception('Oh no')
+
+            return '<tbody></tbody>'
+
+        renderer = BatchingDiffRenderer(self._create_diff_file(),
+                                        collapse_all=False)
+        self.spy_on(renderer._render_chunks, call_fake=_render_chunks)
+
+        items = renderer.render_to_iter(None)
+        html = ''.join(items)
+
+        self.assertIn('<tbody class="diff-stream-error">', html)
+        self.assertIn('Oh no', html)
+        self.assertTrue(html.rstrip().endswith('</table>'))
+        self.assertEqual(html.count('<tbody></tbody>'), 1)
+
+        # The partial render should not have been cached.
+        self.assertNotIn(
+            make_cache_key('%s-streamed' % renderer.make_cache_key()),
+            cache)
+
+    def test_render_to_iter_with_chunk_index(self):
+        """Testing DiffRenderer.render_to_iter with chunk_index renders
+        through render_to_string
+        """
+        renderer = DiffRenderer(self._create_diff_file(), chunk_index=1)
+        self.spy_on(renderer.render_to_string,
+                    call_fake=lambda self, request: 'Foo')
+        self.spy_on(renderer.render_to_iter_uncached)
+
+        self.assertEqual(list(renderer.render_to_iter(None)), ['Foo'])
+        self.assertFalse(renderer.render_to_iter_uncached.called)
+
+    def test_render_to_streaming_response(self):
+        """Testing DiffRenderer.render_to_streaming_response"""
+        renderer = DiffRenderer({})
+        self.spy_on(renderer.render_to_iter,
+                    call_fake=lambda self, request: iter(['Foo', 'Bar']))
+
+        response = renderer.render_to_streaming_response(None)
+
+        self.assertIsInstance(response, StreamingHttpResponse)
+        self.assertEqual(b''.join(response.streaming_content), b'FooBar')
+
     def test_make_context_with_chunk_index(self):
         """Testing DiffRenderer.make_context with chunk_index"""
         diff_file = {
@@ -146,3 +307,39 @@ class DiffRendererTests(SpyAgency, TestCase):
 
         chunk = diff_file['chunks'][0]
         self.assertEqual(chunk['change'], 'replace')
+
+    def _create_diff_file(self):
+        """Return a diff file for a FileDiff modifying a 30-line file.
+
+        The file has 2 changed lines, making for 5 chunks.
+
+        Returns:
+            dict:
+            The diff file, as returned by
+            :py:func:`~reviewboard.diffviewer.diffutils.get_diff_files`.
+        """
+        if not hasattr(self, '_filediff'):
+            repository = self.create_repository(tool_name='Test')
+            diffset = self.create_diffset(repository=repository)
+            self._filediff = self.create_filediff(
+                diffset=diffset,
+                source_file='/data:%s' % '\n'.join(
+                    'Line %d' % i
+                    for i in range(1, 31)
+                ),
+                diff=(
+                    b'--- README\n'
+                    b'+++ README\n'
+                    b'@@ -9,3 +9,3 @@\n'
+                    b' Line 9\n'
+                    b'-Line 10\n'
+                    b'+Line ten\n'
+                    b' Line 11\n'
+                    b'@@ -24,3 +24,3 @@\n'
+                    b' Line 24\n'
+                    b'-Line 25\n'
+                    b'+Line twenty-five\n'
+                    b' Line 26\n'
+                ))
+
+        return get_diff_files(self._filediff.diffset, self._filediff)[0]
@@ -116,3 +116,72 @@ class DiffSetTests(TestCase):
             result = diffset.cumulative_files
 
         self.assertEqual(result, expected)
+
+    def test_get_total_raw_line_counts(self):
+        """Testing DiffSet.get_total_raw_line_counts"""
+        repository = self.create_repository()
+        diffset = self.create_diffset(repository=repository)
+        self.create_filediff(diffset=diffset,
+                             diff=self.DEFAULT_GIT_FILEDIFF_DATA_DIFF)
+        self.create_filediff(diffset=diffset,
+                             diff=self.DEFAULT_GIT_FILEDIFF_DATA_DIFF)
+
+        expected = {
+            'raw_insert_count': 2,
+            'raw_delete_count': 2,
+        }
+
+        self.assertEqual(diffset.get_total_raw_line_counts(), expected)
+
+        # The totals should now be stored on the DiffSet.
+        diffset = DiffSet.objects.get(pk=diffset.pk)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(diffset.get_total_raw_line_counts(), expected)
+
+    def test_get_total_raw_line_counts_unfinalized_commit_series(self):
+        """Testing DiffSet.get_total_raw_line_counts with an unfinalized
+        commit series
+        """
+        repository = self.create_repository()
+        diffset = self.create_diffset(repository=repository)
+        self.create_diffcommit(diffset=diffset)
+
+        self.assertEqual(diffset.get_total_raw_line_counts(), {
+            'raw_insert_count': 1,
+            'raw_delete_count': 1,
+        })
+
+        diffset = DiffSet.objects.get(pk=diffset.pk)
+        self.assertNotIn(DiffSet._RAW_LINE_COUNTS_KEY, diffset.extra_data)
+
+    def test_populate_raw_line_counts(self):
+        """Testing DiffSetManager.populate_raw_line_counts"""
+        repository = self.create_repository()
+        diffsets = []
+
+        for i in range(3):
+            diffset = self.create_diffset(repository=repository, revision=i)
+            diffsets.append(diffset)
+
+            for j in range(i):
+                self.create_filediff(
+                    diffset=diffset,
+                    diff=self.DEFAULT_GIT_FILEDIFF_DATA_DIFF)
+
+        diffsets = list(DiffSet.objects.prefetch_related('files')
+                        .filter(pk__in=[diffset.pk for diffset in diffsets])
+                        .order_by('pk'))
+
+        # This should fetch the RawFileDiffData and DiffSets, and write the
+        # RawFileDiffData, FileDiffs, and DiffSets.
+        with self.assertNumQueries(5):
+            DiffSet.objects.populate_raw_line_counts(diffsets)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                [
+                    diffset.get_total_raw_line_counts()['raw_insert_count']
+                    for diffset in diffsets
+                ],
+                [0, 1, 2])
@@ -0,0 +1,100 @@
+"""Unit tests for reviewboard.diffviewer.managers.DiffSetHistoryManager."""
+
+from __future__ import unicode_literals
+
+from reviewboard.diffviewer.models import DiffSetHistory
+from reviewboard.testing import TestCase
+
+
+class DiffSetHistoryManagerTests(TestCase):
+    """Unit tests for DiffSetHistoryManager."""
+
+    fixtures = ['test_scmtools']
+
+    def test_populate_last_diff_line_counts(self):
+        """Testing DiffSetHistoryManager.populate_last_diff_line_counts"""
+        repository = self.create_repository()
+        history1 = DiffSetHistory.objects.create()
+        history2 = DiffSetHistory.objects.create()
+        history3 = DiffSetHistory.objects.create()
+
+        diffset = self.create_diffset(repository=repository, revision=1)
+        self.create_filediff(diffset,
+                             diff=self.DEFAULT_GIT_FILEDIFF_DATA_DIFF)
+        history1.diffsets.add(diffset)
+
+        diffset = self.create_diffset(repository=repository, revision=2)
+        self.create_filediff(diffset,
+                             diff=self.DEFAULT_GIT_FILEDIFF_DATA_DIFF)
+        self.create_filediff(diffset,
+                             source_file='/test-file-2',
+                             dest_file='/test-file-2',
+                             diff=self.DEFAULT_GIT_FILEDIFF_DATA_DIFF)
+        history1.diffsets.add(diffset)
+
+        diffset = self.create_diffset(repository=repository, revision=1)
+        self.create_filediff(diffset,
+                             diff=self.DEFAULT_GIT_FILEDIFF_DATA_DIFF)
+        history2.diffsets.add(diffset)
+
+        histories = [history1, history2, history3]
+
+        DiffSetHistory.objects.populate_last_diff_line_counts(histories)
+
+        self.assertEqual(
+            [
+                (history.last_diff_insert_count,
+                 history.last_diff_delete_count,
+                 history.last_diff_line_count)
+                for history in histories
+            ],
+            [(2, 2, 4), (1, 1, 2), (0, 0, 0)])
+
+        self.assertEqual(
+            list(DiffSetHistory.objects
+                 .filter(pk__in=[history.pk for history in histories])
+                 .order_by('pk')
+                 .values_list('last_diff_insert_count',
+                              'last_diff_delete_count',
+                              'last_diff_line_count')),
+            [(2, 2, 4), (1, 1, 2), (0, 0, 0)])
+
+    def test_get_last_diff_line_counts_with_stored_counts(self):
+        """Testing DiffSetHistory.get_last_diff_line_counts with counts
+        already stored
+        """
+        history = DiffSetHistory.objects.create(last_diff_insert_count=10,
+                                                last_diff_delete_count=3,
+                                                last_diff_line_count=13)
+
+        with self.assertNumQueries(0):
+            counts = history.get_last_diff_line_counts()
+
+        self.assertEqual(counts, {
+            'raw_insert_count': 10,
+            'raw_delete_count': 3,
+        })
+
+    def test_diffset_save_clears_counts(self):
+        """Testing DiffSet.save clears the stored line counts on the
+        history
+        """
+        history = DiffSetHistory.objects.create(last_diff_insert_count=10,
+                                                last_diff_delete_count=3,
+                                                last_diff_line_count=13)
+
+        diffset = self.create_diffset(repository=self.create_repository())
+        self.create_filediff(diffset,
+                             diff=self.DEFAULT_GIT_FILEDIFF_DATA_DIFF)
+        diffset.history = history
+        diffset.save(update_fields=('history',))
+
+        history = DiffSetHistory.objects.get(pk=history.pk)
+        self.assertIsNone(history.last_diff_insert_count)
+        self.assertIsNone(history.last_diff_delete_count)
+        self.assertIsNone(history.last_diff_line_count)
+
+        self.assertEqual(history.get_last_diff_line_counts(), {
+            'raw_insert_count': 1,
+            'raw_delete_count': 1,
+        })
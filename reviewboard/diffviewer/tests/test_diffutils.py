@@ -10,8 +10,10 @@ from kgb import SpyAgency
 
 from reviewboard.deprecation import RemovedInReviewBoard50Warning
 from reviewboard.diffviewer.diffutils import (
+    cache_patched_file,
     convert_line_endings,
     convert_to_unicode,
+    get_cached_patched_file,
     get_diff_data_chunks_info,
     get_diff_files,
     get_displayed_diff_line_ranges,
@@ -27,9 +29,13 @@ from reviewboard.diffviewer.diffutils import (
     get_revision_str,
     get_sorted_filediffs,
     patch,
+    populate_diff_chunks,
+    prefetch_original_files,
     split_line_endings,
     _PATCH_GARBAGE_INPUT,
-    _get_last_header_in_chunks_before_line)
+    _get_last_header_in_chunks_before_line,
+    _patch_with_subprocess)
+from reviewboard.diffviewer.differ import DiffCompatVersion
 from reviewboard.diffviewer.errors import PatchError
 from reviewboard.diffviewer.models import DiffCommit, FileDiff
 from reviewboard.scmtools.core import PRE_CREATION
@@ -2627,6 +2633,88 @@ class GetLineChangedRegionsTests(TestCase):
         regions = get_line_changed_regions(old, new)
         deep_equal(regions, (None, None))
 
+    def test_get_line_changed_regions_with_myers_line_regions(self):
+        """Testing get_line_changed_regions with
+        DiffCompatVersion.MYERS_LINE_REGIONS
+        """
+        diff_compat = DiffCompatVersion.MYERS_LINE_REGIONS
+
+        self.assertEqual(
+            get_line_changed_regions(None, None, diff_compat=diff_compat),
+            (None, None))
+
+        old = 'submitter = models.ForeignKey(Person, verbose_name="Submitter")'
+        new = 'submitter = models.ForeignKey(User, verbose_name="Submitter")'
+        self.assertEqual(
+            get_line_changed_regions(old, new, diff_compat=diff_compat),
+            ([(30, 36)], [(30, 34)]))
+
+        # Only the characters that changed within a word are highlighted.
+        old = 'self.value = compute(data)'
+        new = 'self.values = compute(data)'
+        self.assertEqual(
+            get_line_changed_regions(old, new, diff_compat=diff_compat),
+            ([(10, 10)], [(10, 11)]))
+
+        old = 'x = compute_total(items)'
+        new = 'x = compute_totals(items)'
+        self.assertEqual(
+            get_line_changed_regions(old, new, diff_compat=diff_compat),
+            ([(17, 17)], [(17, 18)]))
+
+        old = 'la de da.'
+        new = 'la de doo.'
+        self.assertEqual(
+            get_line_changed_regions(old, new, diff_compat=diff_compat),
+            ([(7, 8)], [(7, 9)]))
+
+        # Whitespace-only changes aren't highlighted.
+        old = '    return value'
+        new = '        return value'
+        self.assertEqual(
+            get_line_changed_regions(old, new, diff_compat=diff_compat),
+            ([], []))
+
+        old = 'abcdefghijklm'
+        new = 'nopqrstuvwxyz'
+        self.assertEqual(
+            get_line_changed_regions(old, new, diff_compat=diff_compat),
+            (None, None))
+
+        old = 'if value is None and other is None:'
+        new = 'while count > 0 or total < limit:'
+        self.assertEqual(
+            get_line_changed_regions(old, new, diff_compat=diff_compat),
+            (None, None))
+
+    def test_get_line_changed_regions_with_myers_line_regions_empty(self):
+        """Testing get_line_changed_regions with
+        DiffCompatVersion.MYERS_LINE_REGIONS and empty lines
+        """
+        diff_compat = DiffCompatVersion.MYERS_LINE_REGIONS
+
+        self.assertEqual(
+            get_line_changed_regions('', '', diff_compat=diff_compat),
+            ([], []))
+        self.assertEqual(
+            get_line_changed_regions('', 'abc', diff_compat=diff_compat),
+            (None, None))
+
+    def test_get_line_changed_regions_with_myers_line_regions_memo(self):
+        """Testing get_line_changed_regions with
+        DiffCompatVersion.MYERS_LINE_REGIONS returns new lists for
+        remembered lines
+        """
+        diff_compat = DiffCompatVersion.MYERS_LINE_REGIONS
+        old = 'x = foo(a, b)'
+        new = 'x = foo(a, c)'
+
+        regions1 = get_line_changed_regions(old, new, diff_compat=diff_compat)
+        regions1[0].append((0, 1))
+
+        regions2 = get_line_changed_regions(old, new, diff_compat=diff_compat)
+        self.assertEqual(regions2, ([(11, 12)], [(11, 12)]))
+
 
 class GetDisplayedDiffLineRangesTests(TestCase):
     """Unit tests for get_displayed_diff_line_ranges."""
@@ -3196,7 +3284,7 @@ class DiffExpansionHeaderTests(TestCase):
                          lines[header['left']['line'] - 1][2])
 
 
-class PatchTests(TestCase):
+class PatchTests(SpyAgency, TestCase):
     """Unit tests for patch."""
 
     def test_patch(self):
@@ -3437,6 +3525,42 @@ class PatchTests(TestCase):
                         filename='README')
         self.assertEqual(patched, new)
 
+    def test_patch_in_process(self):
+        """Testing patch applies the diff in-process"""
+        self.spy_on(_patch_with_subprocess)
+
+        patched = patch(diff=(b'--- README\n'
+                              b'+++ README\n'
+                              b'@@ -1,2 +1,2 @@\n'
+                              b' line 1\n'
+                              b'-line 2\n'
+                              b'+line two\n'),
+                        orig_file=b'line 1\nline 2\n',
+                        filename='README')
+
+        self.assertEqual(patched, b'line 1\nline two\n')
+        self.assertFalse(_patch_with_subprocess.called)
+
+    def test_patch_falls_back_on_subprocess(self):
+        """Testing patch falls back on patch(1) for diffs that can't be
+        applied in-process
+        """
+        self.spy_on(_patch_with_subprocess)
+
+        patched = patch(diff=(b'--- README\n'
+                              b'+++ README\n'
+                              b'@@ -1,4 +1,4 @@\n'
+                              b' line one\n'
+                              b' line 2\n'
+                              b'-line 3\n'
+                              b'+line three\n'
+                              b' line 4\n'),
+                        orig_file=b'line 1\nline 2\nline 3\nline 4\n',
+                        filename='README')
+
+        self.assertEqual(patched, b'line 1\nline 2\nline three\nline 4\n')
+        self.assertTrue(_patch_with_subprocess.called)
+
 
 class GetFileDiffEncodingsTests(TestCase):
     """Unit tests for get_filediff_encodings."""
@@ -3530,6 +3654,58 @@ class GetOriginalFileTests(BaseFileDiffAncestorTests):
         self.assertEqual(get_original_file(filediff=filediff), b'foo\n')
         self.assertFalse(get_original_file_from_repo.called)
 
+    def test_with_cached_ancestor(self):
+        """Testing get_original_file starts from the patched file of a
+        cached ancestor
+        """
+        self.set_up_filediffs()
+
+        ancestor = FileDiff.objects.get(dest_file='foo',
+                                        dest_detail='257cc56',
+                                        commit_id=2)
+        cache_patched_file(ancestor, b'foo\n')
+
+        filediff = FileDiff.objects.get(dest_file='qux', dest_detail='03b37a0',
+                                        commit_id=3)
+
+        self.spy_on(patch)
+
+        self.assertEqual(get_original_file(filediff=filediff), b'foo\n')
+        self.assertFalse(patch.called)
+        self.assertFalse(get_original_file_from_repo.called)
+
+    def test_caches_ancestors(self):
+        """Testing get_original_file caches the patched files of ancestors"""
+        self.set_up_filediffs()
+
+        filediff = FileDiff.objects.get(dest_file='qux', dest_detail='03b37a0',
+                                        commit_id=3)
+
+        self.assertEqual(get_original_file(filediff=filediff), b'foo\n')
+
+        for ancestor in filediff.get_ancestors(minimal=True):
+            self.assertIsNotNone(get_cached_patched_file(ancestor))
+
+        # The next lookup should start from the newest cached ancestor.
+        self.spy_on(patch)
+
+        self.assertEqual(get_original_file(filediff=filediff), b'foo\n')
+        self.assertFalse(patch.called)
+
+    def test_without_cached_ancestor(self):
+        """Testing get_original_file with ancestors that have no patched
+        file in the cache
+        """
+        self.set_up_filediffs()
+
+        filediff = FileDiff.objects.get(dest_file='qux', dest_detail='03b37a0',
+                                        commit_id=3)
+
+        self.spy_on(patch)
+
+        self.assertEqual(get_original_file(filediff=filediff), b'foo\n')
+        self.assertTrue(patch.called)
+
     def test_empty_parent_diff_old_patch(self):
         """Testing get_original_file with an empty parent diff with patch(1)
         that does not accept empty diffs
@@ -3786,6 +3962,48 @@ class GetOriginalFileTests(BaseFileDiffAncestorTests):
         self.assertTrue(convert_line_endings.called_with('hello world'))
 
 
+class PrefetchOriginalFilesTests(BaseFileDiffAncestorTests):
+    """Unit tests for prefetch_original_files."""
+
+    def setUp(self):
+        super(PrefetchOriginalFilesTests, self).setUp()
+
+        self.set_up_filediffs()
+        self.spy_on(Repository.prefetch_files,
+                    owner=Repository,
+                    call_fake=lambda *args, **kwargs: None)
+
+    def test_prefetch_original_files(self):
+        """Testing prefetch_original_files"""
+        by_details = self.get_filediffs_by_details()
+
+        prefetch_original_files([
+            by_details[(1, 'bar', '5716ca5', 'bar', '8e739cc')],
+            by_details[(2, 'baz', '7601807', 'baz', '280beb2')],
+            by_details[(3, 'foo', '257cc56', 'qux', '03b37a0')],
+        ])
+
+        self.assertSpyCallCount(Repository.prefetch_files, 1)
+        self.assertSpyCalledWith(Repository.prefetch_files,
+                                 [('bar', 'e69de29', None)])
+
+    def test_populate_diff_chunks(self):
+        """Testing populate_diff_chunks prefetches original files"""
+        self.spy_on(prefetch_original_files)
+
+        files = get_diff_files(diffset=self.diffset)
+        self.assertGreater(len(files), 1)
+
+        populate_diff_chunks(files)
+        self.assertSpyCallCount(prefetch_original_files, 1)
+        self.assertEqual(
+            set(prefetch_original_files.last_call.args[0]),
+            {
+                diff_file['filediff']
+                for diff_file in files
+            })
+
+
 class SplitLineEndingsTests(TestCase):
     """Unit tests for reviewboard.diffviewer.diffutils.split_line_endings."""
 
@@ -3,13 +3,15 @@
 from __future__ import unicode_literals
 
 from django.utils.timezone import now
+from kgb import SpyAgency
 
 from reviewboard.diffviewer.filediff_creator import create_filediffs
 from reviewboard.diffviewer.models import DiffCommit, DiffSet
+from reviewboard.scmtools.core import FileNotFoundError
 from reviewboard.testing import TestCase
 
 
-class FileDiffCreatorTests(TestCase):
+class FileDiffCreatorTests(SpyAgency, TestCase):
     """Tests for reviewboard.diffviewer.filediff_creator."""
 
     fixtures = ['test_scmtools']
@@ -93,3 +95,91 @@ class FileDiffCreatorTests(TestCase):
 
         self.assertEqual(diffset.files.count(), 2)
         self.assertEqual(commits[1].files.count(), 1)
+
+    def test_create_filediffs_with_get_files_exist(self):
+        """Testing create_filediffs() with get_files_exist checks all files
+        at once
+        """
+        repository = self.create_repository()
+        diffset = self.create_diffset(repository=repository)
+
+        self.spy_on(repository.get_file_exists)
+        self.spy_on(repository.get_files_exist,
+                    call_fake=lambda _self, files, request=None: (
+                        [True] * len(files)))
+
+        create_filediffs(
+            self._make_diff(['a.txt', 'b.txt', 'c.txt']),
+            None,
+            repository=repository,
+            basedir='/',
+            base_commit_id='0' * 40,
+            diffset=diffset,
+            get_file_exists=repository.get_file_exists,
+            get_files_exist=repository.get_files_exist)
+
+        self.assertEqual(diffset.files.count(), 3)
+        self.assertSpyNotCalled(repository.get_file_exists)
+        self.assertSpyCallCount(repository.get_files_exist, 1)
+        self.assertEqual(
+            [
+                path
+                for path, revision, base_commit_id in
+                repository.get_files_exist.last_call.args[0]
+            ],
+            ['/a.txt', '/b.txt', '/c.txt'])
+
+    def test_create_filediffs_with_get_files_exist_error_order(self):
+        """Testing create_filediffs() with get_files_exist reports the first
+        missing file in the diff
+        """
+        repository = self.create_repository()
+        diffset = self.create_diffset(repository=repository)
+
+        self.spy_on(repository.get_files_exist,
+                    call_fake=lambda _self, files, request=None: [
+                        Exception('Oh no') if path == '/c.txt' else
+                        path != '/b.txt'
+                        for path, revision, base_commit_id in files
+                    ])
+
+        with self.assertRaises(FileNotFoundError) as ctx:
+            create_filediffs(
+                self._make_diff(['a.txt', 'b.txt', 'c.txt']),
+                None,
+                repository=repository,
+                basedir='/',
+                base_commit_id='0' * 40,
+                diffset=diffset,
+                get_file_exists=repository.get_file_exists,
+                get_files_exist=repository.get_files_exist)
+
+        self.assertEqual(ctx.exception.path, '/b.txt')
+        self.assertEqual(diffset.files.count(), 0)
+
+    def _make_diff(self, filenames):
+        """Return a Git diff modifying the given files.
+
+        Args:
+            filenames (list of unicode):
+                The names of the files to modify.
+
+        Returns:
+            bytes:
+            The diff.
+        """
+        return b''.join(
+            (
+                b'diff --git a/%(name)s b/%(name)s\n'
+                b'index %(index)s..%(index)s 100644\n'
+                b'--- a/%(name)s\n'
+                b'+++ b/%(name)s\n'
+                b'@@ -1 +1 @@\n'
+                b'-old\n'
+                b'+new\n'
+            ) % {
+                b'name': filename.encode('utf-8'),
+                b'index': b'%07d' % i,
+            }
+            for i, filename in enumerate(filenames, start=1)
+        )
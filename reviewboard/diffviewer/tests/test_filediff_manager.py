@@ -0,0 +1,274 @@
+"""Unit tests for reviewboard.diffviewer.managers.FileDiffManager."""
+
+from __future__ import unicode_literals
+
+from djblets.db.fields import Base64DecodedValue
+
+from reviewboard.diffviewer.models import (DiffMigrationCheckpoint, DiffSet,
+                                           FileDiff, LegacyFileDiffData,
+                                           RawFileDiffData)
+from reviewboard.testing import TestCase
+
+
+class FileDiffManagerMigrateAllTests(TestCase):
+    """Unit tests for FileDiffManager.migrate_all."""
+
+    fixtures = ['test_scmtools']
+
+    def setUp(self):
+        super(FileDiffManagerMigrateAllTests, self).setUp()
+
+        self.diffset = DiffSet.objects.create(
+            name='test',
+            revision=1,
+            repository=self.create_repository(tool_name='Test'))
+
+    def test_migrate_all(self):
+        """Testing FileDiffManager.migrate_all"""
+        filediffs = [
+            self._create_filediff(diff64=self._make_diff(i))
+            for i in range(3)
+        ]
+
+        legacy_fdd = LegacyFileDiffData.objects.create(
+            binary_hash='abc123',
+            binary=Base64DecodedValue(self._make_diff(10)))
+        legacy_filediff = self._create_filediff(legacy_diff_hash=legacy_fdd)
+        legacy_parent_filediff = self._create_filediff(
+            legacy_diff_hash=legacy_fdd,
+            legacy_parent_diff_hash=legacy_fdd)
+
+        info = FileDiff.objects.migrate_all(batch_size=2)
+
+        self.assertEqual(info['diffs_migrated'], 4)
+        self.assertFalse(FileDiff.objects.unmigrated().exists())
+        self.assertFalse(LegacyFileDiffData.objects.exists())
+        self.assertFalse(DiffMigrationCheckpoint.objects.exists())
+
+        for i, filediff in enumerate(filediffs):
+            filediff = FileDiff.objects.get(pk=filediff.pk)
+            self.assertEqual(filediff.diff64, b'')
+            self.assertEqual(filediff.diff_hash.content, self._make_diff(i))
+
+        raw_fdd = RawFileDiffData.objects.get(binary_hash='abc123')
+
+        legacy_filediff = FileDiff.objects.get(pk=legacy_filediff.pk)
+        self.assertIsNone(legacy_filediff.legacy_diff_hash_id)
+        self.assertEqual(legacy_filediff.diff_hash, raw_fdd)
+
+        legacy_parent_filediff = FileDiff.objects.get(
+            pk=legacy_parent_filediff.pk)
+        self.assertIsNone(legacy_parent_filediff.legacy_diff_hash_id)
+        self.assertIsNone(legacy_parent_filediff.legacy_parent_diff_hash_id)
+        self.assertEqual(legacy_parent_filediff.diff_hash, raw_fdd)
+        self.assertEqual(legacy_parent_filediff.parent_diff_hash, raw_fdd)
+
+    def test_migrate_all_resumes(self):
+        """Testing FileDiffManager.migrate_all resumes from a checkpoint
+        after being stopped by max_diffs
+        """
+        filediffs = [
+            self._create_filediff(diff64=self._make_diff(i))
+            for i in range(5)
+        ]
+
+        info = FileDiff.objects.migrate_all(batch_size=2, max_diffs=3)
+        self.assertEqual(info['diffs_migrated'], 3)
+
+        checkpoint = DiffMigrationCheckpoint.objects.get()
+        self.assertEqual(checkpoint.task,
+                         DiffMigrationCheckpoint.TASK_FILEDIFFS)
+        self.assertEqual(checkpoint.last_key, '%s' % filediffs[2].pk)
+        self.assertEqual(
+            list(FileDiff.objects.unmigrated().order_by('pk')),
+            filediffs[3:])
+
+        info = FileDiff.objects.migrate_all(batch_size=2)
+        self.assertEqual(info['diffs_migrated'], 2)
+        self.assertFalse(FileDiff.objects.unmigrated().exists())
+        self.assertFalse(DiffMigrationCheckpoint.objects.exists())
+
+    def test_migrate_all_with_ranges(self):
+        """Testing FileDiffManager.migrate_all with objects split into
+        several checkpointed ranges
+        """
+        for i in range(7):
+            self._create_filediff(diff64=self._make_diff(i))
+
+        for binary_hash in ('0123', '7abc', 'ffff'):
+            LegacyFileDiffData.objects.create(
+                binary_hash=binary_hash,
+                binary=Base64DecodedValue(b'diff %s\n' % binary_hash.encode()))
+
+        filediffs_task = DiffMigrationCheckpoint.TASK_FILEDIFFS
+        legacy_task = DiffMigrationCheckpoint.TASK_LEGACY_FILE_DIFF_DATA
+
+        for task in (filediffs_task, legacy_task):
+            FileDiff.objects._get_migration_checkpoint_ids(task,
+                                                           num_ranges=3)
+
+        self.assertEqual(
+            list(DiffMigrationCheckpoint.objects
+                 .filter(task=legacy_task)
+                 .values_list('range_start', 'range_end')),
+            [(None, '55'), ('55', 'aa'), ('aa', None)])
+        self.assertEqual(
+            DiffMigrationCheckpoint.objects.filter(task=filediffs_task)
+            .count(),
+            3)
+
+        info = FileDiff.objects.migrate_all(batch_size=2)
+
+        self.assertEqual(info['diffs_migrated'], 10)
+        self.assertFalse(FileDiff.objects.unmigrated().exists())
+        self.assertFalse(LegacyFileDiffData.objects.exists())
+        self.assertFalse(DiffMigrationCheckpoint.objects.exists())
+
+    def test_migrate_all_batch_done_cb(self):
+        """Testing FileDiffManager.migrate_all reports throughput to
+        batch_done_cb
+        """
+        for i in range(3):
+            self._create_filediff(diff64=self._make_diff(i))
+
+        calls = []
+
+        def _on_batch_done(**kwargs):
+            calls.append(kwargs)
+
+        FileDiff.objects.migrate_all(batch_done_cb=_on_batch_done,
+                                     counts={'total_count': 3},
+                                     batch_size=2)
+
+        self.assertEqual(
+            [
+                (call['total_diffs_migrated'], call['total_count'])
+                for call in calls
+            ],
+            [(2, 3), (3, 3), (3, 3)])
+
+        for call in calls:
+            self.assertIn('elapsed_time', call)
+            self.assertIn('diffs_per_second', call)
+            self.assertGreater(call['total_diff_size'], 0)
+            self.assertIn('total_bytes_saved', call)
+
+    def _create_filediff(self, diff64=b'', **kwargs):
+        """Create an unmigrated FileDiff.
+
+        Args:
+            diff64 (bytes, optional):
+                The diff content to store on the FileDiff.
+
+            **kwargs (dict):
+                Additional fields for the FileDiff.
+
+        Returns:
+            reviewboard.diffviewer.models.FileDiff:
+            The new FileDiff.
+        """
+        return FileDiff.objects.create(diffset=self.diffset,
+                                       source_file='README',
+                                       dest_file='README',
+                                       diff64=diff64,
+                                       parent_diff64=b'',
+                                       **kwargs)
+
+    def _make_diff(self, i):
+        """Return a small diff.
+
+        Args:
+            i (int):
+                A number used to vary the diff.
+
+        Returns:
+            bytes:
+            The diff.
+        """
+        return (
+            b'--- README\n'
+            b'+++ README\n'
+            b'@@ -1 +1 @@\n'
+            b'-line %d\n'
+            b'+line %d\n'
+            % (i, i + 1)
+        )
+
+
+class FileDiffManagerPopulateLineCountsTests(TestCase):
+    """Unit tests for FileDiffManager.populate_line_counts."""
+
+    fixtures = ['test_scmtools']
+
+    def test_populate_line_counts(self):
+        """Testing FileDiffManager.populate_line_counts"""
+        diffset = self.create_diffset(repository=self.create_repository())
+
+        for i in range(3):
+            self.create_filediff(diffset,
+                                 diff=self.DEFAULT_GIT_FILEDIFF_DATA_DIFF)
+
+        filediffs = list(FileDiff.objects.filter(diffset=diffset))
+
+        # This should fetch the RawFileDiffData, fetch the DiffSet, and
+        # write the RawFileDiffData and FileDiffs.
+        with self.assertNumQueries(4):
+            result = FileDiff.objects.populate_line_counts(filediffs)
+
+        self.assertEqual(result, filediffs)
+
+        with self.assertNumQueries(0):
+            for filediff in result:
+                counts = filediff.get_line_counts()
+                self.assertEqual(counts['raw_insert_count'], 1)
+
+        for filediff in FileDiff.objects.filter(diffset=diffset):
+            self.assertEqual(filediff.extra_data['raw_insert_count'], 1)
+            self.assertEqual(filediff.extra_data['raw_delete_count'], 1)
+
+        raw_fdd = RawFileDiffData.objects.get()
+        self.assertEqual(raw_fdd.insert_count, 1)
+        self.assertEqual(raw_fdd.delete_count, 1)
+
+    def test_populate_line_counts_with_counted_diff_data(self):
+        """Testing FileDiffManager.populate_line_counts with line counts
+        already stored on the RawFileDiffData
+        """
+        diffset = self.create_diffset(repository=self.create_repository())
+        filediff = self.create_filediff(
+            diffset,
+            diff=self.DEFAULT_GIT_FILEDIFF_DATA_DIFF)
+        filediff.diff_hash.insert_count = 5
+        filediff.diff_hash.delete_count = 2
+        filediff.diff_hash.save(update_fields=('extra_data',))
+
+        # This should fetch the FileDiff and RawFileDiffData and write the
+        # FileDiff, without parsing the diff.
+        with self.assertNumQueries(3):
+            diffset.files.populate_line_counts()
+
+        filediff = FileDiff.objects.get(pk=filediff.pk)
+        self.assertEqual(filediff.extra_data['raw_insert_count'], 5)
+        self.assertEqual(filediff.extra_data['raw_delete_count'], 2)
+
+    def test_populate_line_counts_with_stored_counts(self):
+        """Testing FileDiffManager.populate_line_counts with line counts
+        already stored on the FileDiffs
+        """
+        diffset = self.create_diffset(repository=self.create_repository())
+        filediff = self.create_filediff(
+            diffset,
+            diff=self.DEFAULT_GIT_FILEDIFF_DATA_DIFF)
+        filediff.extra_data.update({
+            'raw_insert_count': 5,
+            'raw_delete_count': 2,
+        })
+        filediff.save(update_fields=('extra_data',))
+
+        filediffs = list(diffset.files.all())
+
+        with self.assertNumQueries(0):
+            FileDiff.objects.populate_line_counts(filediffs)
+
+        self.assertEqual(filediffs[0].get_line_counts()['raw_insert_count'],
+                         5)
@@ -61,7 +61,7 @@ class FileDiffMigrationTests(TestCase):
 
         self.assertEqual(diff, self.DEFAULT_GIT_FILEDIFF_DATA_DIFF)
         self.assertEqual(self.filediff.diff64, b'')
-        self.assertEqual(self.filediff.diff_hash.binary,
+        self.assertEqual(self.filediff.diff_hash.content,
                          self.DEFAULT_GIT_FILEDIFF_DATA_DIFF)
         self.assertEqual(self.filediff.diff, diff)
         self.assertIsNone(self.filediff.parent_diff)
@@ -81,7 +81,7 @@ class FileDiffMigrationTests(TestCase):
 
         self.assertEqual(parent_diff, self.parent_diff)
         self.assertEqual(self.filediff.parent_diff64, b'')
-        self.assertEqual(self.filediff.parent_diff_hash.binary,
+        self.assertEqual(self.filediff.parent_diff_hash.content,
                          self.parent_diff)
         self.assertEqual(self.filediff.parent_diff, self.parent_diff)
 
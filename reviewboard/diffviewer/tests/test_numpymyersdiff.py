@@ -0,0 +1,165 @@
+from __future__ import unicode_literals
+
+import random
+
+import nose
+from kgb import SpyAgency
+
+from reviewboard.diffviewer.differ import DiffCompatVersion, get_differ
+from reviewboard.diffviewer.myersdiff import MyersDiffer
+from reviewboard.diffviewer.numpymyersdiff import NumPyMyersDiffer
+from reviewboard.testing import TestCase
+
+
+class NumPyMyersDifferTests(TestCase):
+    """Unit tests for NumPyMyersDiffer."""
+
+    def setUp(self):
+        super(NumPyMyersDifferTests, self).setUp()
+
+        if not NumPyMyersDiffer.is_available():
+            raise nose.SkipTest('NumPy is not installed')
+
+    def test_equals(self):
+        """Testing NumPyMyersDiffer with equal chunk"""
+        self._test_diff(['1', '2', '3'],
+                        ['1', '2', '3'])
+
+    def test_delete(self):
+        """Testing NumPyMyersDiffer with delete chunk"""
+        self._test_diff(['1', '2', '3'],
+                        [])
+
+    def test_insert_before_lines(self):
+        """Testing NumPyMyersDiffer with insert before existing lines"""
+        self._test_diff('1\n2\n3\n',
+                        '0\n1\n2\n3\n')
+
+    def test_replace_insert_between_lines(self):
+        """Testing NumPyMyersDiffer with replace and insert between existing
+        lines
+        """
+        self._test_diff('1\n2\n3\n7\n',
+                        '1\n2\n4\n5\n6\n7\n')
+
+    def test_large_replacement(self):
+        """Testing NumPyMyersDiffer with a large replacement of common lines
+        """
+        orig = self._generate_lines(1000)
+        new = orig[:200] + self._generate_lines(600) + orig[700:]
+
+        self._test_diff(orig, new)
+
+    def test_scattered_changes(self):
+        """Testing NumPyMyersDiffer with many scattered changes"""
+        orig = self._generate_lines(1000)
+        new = list(orig)
+
+        for i in range(0, 1000, 50):
+            new[i:i + 3] = self._generate_lines(4)
+
+        self._test_diff(orig, new)
+
+    def test_discarded_lines(self):
+        """Testing NumPyMyersDiffer with lines unique to each file"""
+        orig = self._generate_lines(300)
+        new = list(orig)
+
+        for i in range(0, 300, 30):
+            new[i:i + 10] = ['new line %d\n' % j for j in range(i, i + 10)]
+
+        self._test_diff(orig, new)
+
+    def test_ignore_space(self):
+        """Testing NumPyMyersDiffer with ignore_space=True"""
+        orig = self._generate_lines(500)
+        new = ['  %s' % line for line in orig[:250]] + orig[300:]
+
+        self._test_diff(orig, new, ignore_space=True)
+
+    def test_compat_myers(self):
+        """Testing NumPyMyersDiffer with DiffCompatVersion.MYERS"""
+        orig = self._generate_lines(1000)
+        new = orig[:100] + self._generate_lines(700) + orig[800:]
+
+        self._test_diff(orig, new, compat_version=DiffCompatVersion.MYERS)
+
+    def _generate_lines(self, num_lines):
+        """Return lines drawn from a small set of common lines.
+
+        Args:
+            num_lines (int):
+                The number of lines to generate.
+
+        Returns:
+            list of unicode:
+            The generated lines.
+        """
+        rand = random.Random(num_lines)
+        lines = ['\n', '}\n', '    }\n', '    return;\n'] + [
+            '    call_%d();\n' % i
+            for i in range(30)
+        ]
+
+        return [
+            rand.choice(lines)
+            for i in range(num_lines)
+        ]
+
+    def _test_diff(self, a, b, ignore_space=False,
+                   compat_version=DiffCompatVersion.DEFAULT):
+        """Test that both Myers differs produce the same opcodes.
+
+        Args:
+            a (list of unicode):
+                The original lines.
+
+            b (list of unicode):
+                The modified lines.
+
+            ignore_space (bool, optional):
+                Whether to ignore leading whitespace.
+
+            compat_version (int, optional):
+                The diff compatibility version.
+        """
+        expected = list(MyersDiffer(
+            a, b,
+            ignore_space=ignore_space,
+            compat_version=compat_version).get_opcodes())
+        opcodes = list(NumPyMyersDiffer(
+            a, b,
+            ignore_space=ignore_space,
+            compat_version=compat_version).get_opcodes())
+
+        self.assertEqual(opcodes, expected)
+
+
+class GetDifferTests(SpyAgency, TestCase):
+    """Unit tests for reviewboard.diffviewer.differ.get_differ."""
+
+    def test_with_small_files(self):
+        """Testing get_differ with small files"""
+        differ = get_differ(['a\n'], ['b\n'])
+
+        self.assertIs(type(differ), MyersDiffer)
+
+    def test_with_large_files(self):
+        """Testing get_differ with large files and NumPy installed"""
+        self.spy_on(NumPyMyersDiffer.is_available,
+                    call_fake=lambda cls: True)
+
+        lines = ['a\n'] * NumPyMyersDiffer.MIN_LINES
+        differ = get_differ(lines, lines)
+
+        self.assertIs(type(differ), NumPyMyersDiffer)
+
+    def test_with_large_files_without_numpy(self):
+        """Testing get_differ with large files and NumPy not installed"""
+        self.spy_on(NumPyMyersDiffer.is_available,
+                    call_fake=lambda cls: False)
+
+        lines = ['a\n'] * NumPyMyersDiffer.MIN_LINES
+        differ = get_differ(lines, lines)
+
+        self.assertIs(type(differ), MyersDiffer)
@@ -0,0 +1,257 @@
+from __future__ import unicode_literals
+
+from reviewboard.diffviewer.errors import PatchNotApplicableError
+from reviewboard.diffviewer.patcher import apply_patch, parse_hunks
+from reviewboard.testing import TestCase
+
+
+class ParseHunksTests(TestCase):
+    """Unit tests for reviewboard.diffviewer.patcher.parse_hunks."""
+
+    def test_parse_hunks(self):
+        """Testing parse_hunks"""
+        hunks = parse_hunks(
+            b'diff --git a/README b/README\n'
+            b'--- a/README\n'
+            b'+++ b/README\n'
+            b'@@ -1,3 +1,3 @@\n'
+            b' line 1\n'
+            b'-line 2\n'
+            b'+line two\n'
+            b' line 3\n'
+            b'@@ -10,0 +11 @@\n'
+            b'+line 11\n')
+
+        self.assertEqual(len(hunks), 2)
+
+        hunk = hunks[0]
+        self.assertEqual(hunk.first, 1)
+        self.assertEqual(hunk.pattern, [b'line 1\n', b'line 2\n',
+                                        b'line 3\n'])
+        self.assertEqual(hunk.prefix_context, 1)
+        self.assertEqual(hunk.suffix_context, 1)
+
+        hunk = hunks[1]
+        self.assertEqual(hunk.first, 11)
+        self.assertEqual(hunk.pattern, [])
+        self.assertEqual(hunk.lines, [(b'+', b'line 11\n')])
+
+    def test_parse_hunks_with_no_newline(self):
+        """Testing parse_hunks with "No newline at end of file" markers"""
+        hunks = parse_hunks(
+            b'@@ -1 +1 @@\n'
+            b'-line 1\n'
+            b'\\ No newline at end of file\n'
+            b'+line 1\n')
+
+        self.assertEqual(len(hunks), 1)
+        self.assertEqual(hunks[0].lines, [(b'-', b'line 1'),
+                                          (b'+', b'line 1\n')])
+
+    def test_parse_hunks_with_multiple_files(self):
+        """Testing parse_hunks with a diff containing multiple files"""
+        message = 'Unexpected content after hunk on line 6'
+
+        with self.assertRaisesMessage(PatchNotApplicableError, message):
+            parse_hunks(
+                b'--- README\n'
+                b'+++ README\n'
+                b'@@ -1 +1 @@\n'
+                b'-line 1\n'
+                b'+line one\n'
+                b'--- README2\n'
+                b'+++ README2\n'
+                b'@@ -1 +1 @@\n'
+                b'-line 1\n'
+                b'+line one\n')
+
+    def test_parse_hunks_with_truncated_hunk(self):
+        """Testing parse_hunks with a truncated hunk"""
+        with self.assertRaisesMessage(PatchNotApplicableError,
+                                      'Truncated hunk'):
+            parse_hunks(
+                b'@@ -1,3 +1,3 @@\n'
+                b' line 1\n'
+                b'-line 2\n')
+
+
+class ApplyPatchTests(TestCase):
+    """Unit tests for reviewboard.diffviewer.patcher.apply_patch."""
+
+    orig_file = b''.join(
+        b'line %d\n' % i
+        for i in range(1, 21)
+    )
+
+    def test_apply_patch(self):
+        """Testing apply_patch"""
+        patched = apply_patch(
+            diff=(
+                b'--- README\n'
+                b'+++ README\n'
+                b'@@ -2,3 +2,3 @@\n'
+                b' line 2\n'
+                b'-line 3\n'
+                b'+line three\n'
+                b' line 4\n'
+                b'@@ -18,3 +18,4 @@\n'
+                b' line 18\n'
+                b' line 19\n'
+                b' line 20\n'
+                b'+line 21\n'
+            ),
+            orig_file=self.orig_file)
+
+        self.assertEqual(
+            patched,
+            self.orig_file
+            .replace(b'line 3\n', b'line three\n') +
+            b'line 21\n')
+
+    def test_apply_patch_with_offset(self):
+        """Testing apply_patch with hunks at an offset"""
+        patched = apply_patch(
+            diff=(
+                b'@@ -10,3 +10,3 @@\n'
+                b' line 5\n'
+                b'-line 6\n'
+                b'+line six\n'
+                b' line 7\n'
+                b'@@ -15,3 +15,2 @@\n'
+                b' line 10\n'
+                b'-line 11\n'
+                b' line 12\n'
+            ),
+            orig_file=self.orig_file)
+
+        self.assertEqual(
+            patched,
+            self.orig_file
+            .replace(b'line 6\n', b'line six\n')
+            .replace(b'line 11\n', b''))
+
+    def test_apply_patch_with_fuzz(self):
+        """Testing apply_patch with mismatched context lines"""
+        patched = apply_patch(
+            diff=(
+                b'@@ -1,3 +1,3 @@\n'
+                b' line 1\n'
+                b'-line 2\n'
+                b'+line two\n'
+                b' line 3\n'
+                b'@@ -9,5 +9,5 @@\n'
+                b' line 9\n'
+                b' line ten\n'
+                b'-line 11\n'
+                b'+line eleven\n'
+                b' line 12\n'
+                b' line 13\n'
+            ),
+            orig_file=self.orig_file)
+
+        # The fuzzed "line 10" context line must come from the file.
+        self.assertEqual(
+            patched,
+            self.orig_file
+            .replace(b'line 2\n', b'line two\n')
+            .replace(b'line 11\n', b'line eleven\n'))
+
+    def test_apply_patch_with_fuzz_in_previous_hunk_context(self):
+        """Testing apply_patch with a fuzzed hunk overlapping the trailing
+        context of the previous hunk
+        """
+        # patch(1) only freezes lines up to the last change in a hunk, so
+        # the second hunk is found at offset -4 with fuzz 1, rather than
+        # the first location past the first hunk's trailing context.
+        patched = apply_patch(
+            diff=(
+                b'@@ -1,4 +1,6 @@\n'
+                b' l0\n'
+                b' l0\n'
+                b'+l0\n'
+                b'+chg\n'
+                b' l1\n'
+                b' l0\n'
+                b'@@ -7,5 +9,4 @@\n'
+                b' l0\n'
+                b' l0\n'
+                b'-l0\n'
+                b' l1\n'
+                b' l0\n'
+            ),
+            orig_file=b'l0\nl0\nl1\nl0\nl0\nl1\nl0\nzz\nl0\nl1\nl0\nl1\n')
+
+        self.assertEqual(patched,
+                         b'l0\nl0\nl0\nchg\nl1\nl0\nl1\nl0\nzz\nl0\nl1\nl0\n'
+                         b'l1\n')
+
+    def test_apply_patch_with_new_file(self):
+        """Testing apply_patch with a newly-created file"""
+        patched = apply_patch(
+            diff=(
+                b'--- /dev/null\n'
+                b'+++ README\n'
+                b'@@ -0,0 +1,2 @@\n'
+                b'+line 1\n'
+                b'+line 2\n'
+            ),
+            orig_file=b'')
+
+        self.assertEqual(patched, b'line 1\nline 2\n')
+
+    def test_apply_patch_with_no_newline(self):
+        """Testing apply_patch with "No newline at end of file" markers"""
+        patched = apply_patch(
+            diff=(
+                b'@@ -1,2 +1,2 @@\n'
+                b' line 1\n'
+                b'-line 2\n'
+                b'\\ No newline at end of file\n'
+                b'+line two\n'
+            ),
+            orig_file=b'line 1\nline 2')
+
+        self.assertEqual(patched, b'line 1\nline two\n')
+
+    def test_apply_patch_with_mismatched_first_hunk(self):
+        """Testing apply_patch with a first hunk that requires fuzz"""
+        # patch(1) checks whether this is a reversed patch before applying
+        # fuzz, so this must be left up to patch(1).
+        with self.assertRaisesMessage(PatchNotApplicableError,
+                                      'Hunk #1 could not be located'):
+            apply_patch(
+                diff=(
+                    b'@@ -1,3 +1,3 @@\n'
+                    b' line one\n'
+                    b'-line 2\n'
+                    b'+line two\n'
+                    b' line 3\n'
+                ),
+                orig_file=self.orig_file)
+
+    def test_apply_patch_with_unlocatable_hunk(self):
+        """Testing apply_patch with a hunk that does not apply"""
+        with self.assertRaisesMessage(PatchNotApplicableError,
+                                      'Hunk #2 could not be located'):
+            apply_patch(
+                diff=(
+                    b'@@ -1,3 +1,3 @@\n'
+                    b' line 1\n'
+                    b'-line 2\n'
+                    b'+line two\n'
+                    b' line 3\n'
+                    b'@@ -9,3 +9,3 @@\n'
+                    b' line 9\n'
+                    b'-line X\n'
+                    b'+line ten\n'
+                    b' line 11\n'
+                ),
+                orig_file=self.orig_file)
+
+    def test_apply_patch_without_hunks(self):
+        """Testing apply_patch with a diff containing no hunks"""
+        with self.assertRaisesMessage(PatchNotApplicableError,
+                                      'No hunks were found in the diff'):
+            apply_patch(diff=b'Binary files a/logo.png and b/logo.png '
+                             b'differ\n',
+                        orig_file=b'')
@@ -1,10 +1,22 @@
 from __future__ import unicode_literals
 
+import pygments
+import pygments.lexers
+from django.core.cache import cache
+from djblets.cache.backend import make_cache_key
+from kgb import SpyAgency
+
 from reviewboard.diffviewer.chunk_generator import RawDiffChunkGenerator
+from reviewboard.diffviewer.differ import DiffCompatVersion
 from reviewboard.testing import TestCase
 
 
-class RawDiffChunkGeneratorTests(TestCase):
+#: The diff compatibility version that the expected line regions in these
+#: tests were computed with.
+COMPAT_VERSION = DiffCompatVersion.MYERS_SMS_COST_BAIL
+
+
+class RawDiffChunkGeneratorTests(SpyAgency, TestCase):
     """Unit tests for RawDiffChunkGenerator."""
 
     @property
@@ -34,7 +46,9 @@ class RawDiffChunkGeneratorTests(TestCase):
             b'la de doo.\n'
         )
 
-        generator = RawDiffChunkGenerator(old, new, 'file1', 'file2')
+        generator = RawDiffChunkGenerator(
+            old, new, 'file1', 'file2',
+            diff_compat=COMPAT_VERSION)
         chunks = list(generator.get_chunks())
 
         self.assertEqual(len(chunks), 4)
@@ -154,7 +168,8 @@ class RawDiffChunkGeneratorTests(TestCase):
         generator = RawDiffChunkGenerator(old=old,
                                           new=new,
                                           orig_filename='file1.md',
-                                          modified_filename='file2.md')
+                                          modified_filename='file2.md',
+                                          diff_compat=COMPAT_VERSION)
         chunks = list(generator.get_chunks())
 
         self.assertEqual(len(chunks), 1)
@@ -197,7 +212,8 @@ class RawDiffChunkGeneratorTests(TestCase):
                                           new=new,
                                           orig_filename='file1.md',
                                           modified_filename='file2.md',
-                                          enable_syntax_highlighting=False)
+                                          enable_syntax_highlighting=False,
+                                          diff_compat=COMPAT_VERSION)
         chunks = list(generator.get_chunks())
 
         self.assertEqual(len(chunks), 1)
@@ -244,7 +260,8 @@ class RawDiffChunkGeneratorTests(TestCase):
         generator = MyRawDiffChunkGenerator(old=old,
                                             new=new,
                                             orig_filename='file1.md',
-                                            modified_filename='file2.md')
+                                            modified_filename='file2.md',
+                                            diff_compat=COMPAT_VERSION)
         chunks = list(generator.get_chunks())
 
         self.assertEqual(len(chunks), 1)
@@ -296,7 +313,8 @@ class RawDiffChunkGeneratorTests(TestCase):
         generator = RawDiffChunkGenerator(old=old,
                                           new=new,
                                           orig_filename='file1',
-                                          modified_filename='file2')
+                                          modified_filename='file2',
+                                          diff_compat=COMPAT_VERSION)
         chunks = list(generator.generate_chunks(
             old=old,
             new=new,
@@ -410,6 +428,140 @@ class RawDiffChunkGeneratorTests(TestCase):
                 'numlines': 1,
             })
 
+    def test_get_chunks_with_cache_key(self):
+        """Testing RawDiffChunkGenerator.get_chunks with cache_key stores
+        chunks in segments
+        """
+        generator = self._create_segmented_generator()
+        expected_chunks = list(generator.get_chunks_uncached())
+
+        generator = self._create_segmented_generator()
+        chunks = list(generator.get_chunks(cache_key='test-chunks'))
+        self.assertEqual(chunks, expected_chunks)
+
+        index = cache.get(make_cache_key('test-chunks'))
+        self.assertEqual(len(index['segments']), 7)
+        self.assertEqual(index['summary'], {
+            'num_chunks': 5,
+            'changed_chunk_indexes': [1, 3],
+            'whitespace_only': False,
+            'num_equal_lines': 18,
+        })
+
+        # A new generator should load the chunks from the cache.
+        generator = self._create_segmented_generator()
+        self.spy_on(generator.get_chunks_uncached)
+
+        chunks = list(generator.get_chunks(cache_key='test-chunks'))
+        self.assertEqual(chunks, expected_chunks)
+        self.assertFalse(generator.get_chunks_uncached.called)
+
+    def test_get_chunks_with_cache_key_and_evicted_segment(self):
+        """Testing RawDiffChunkGenerator.get_chunks with cache_key and an
+        evicted segment
+        """
+        generator = self._create_segmented_generator()
+        expected_chunks = list(generator.get_chunks(cache_key='test-chunks'))
+
+        cache.delete(make_cache_key('test-chunks-segment-2'))
+
+        generator = self._create_segmented_generator()
+        self.spy_on(generator.get_chunks_uncached)
+
+        chunks = list(generator.get_chunks(cache_key='test-chunks'))
+        self.assertEqual(chunks, expected_chunks)
+        self.assertTrue(generator.get_chunks_uncached.called)
+        self.assertIsNotNone(
+            cache.get(make_cache_key('test-chunks-segment-2')))
+
+    def test_get_chunks_with_cache_key_and_large_segments(self):
+        """Testing RawDiffChunkGenerator.get_chunks with cache_key splits
+        segments larger than the maximum cache item size
+        """
+        generator = self._create_segmented_generator()
+        expected_chunks = list(generator.get_chunks_uncached())
+
+        generator = self._create_segmented_generator(max_item_size=16)
+        chunks = list(generator.get_chunks(cache_key='test-chunks'))
+        self.assertEqual(chunks, expected_chunks)
+
+        index = cache.get(make_cache_key('test-chunks'))
+        segment = index['segments'][2]
+        self.assertGreater(segment['num_parts'], 1)
+
+        for part in range(1, segment['num_parts']):
+            data = cache.get(make_cache_key('test-chunks-segment-2-part-%d'
+                                            % part))
+            self.assertIsNotNone(data)
+            self.assertLessEqual(len(data), 16)
+
+        # A new generator should load the chunks from the cache.
+        generator = self._create_segmented_generator(max_item_size=16)
+        self.spy_on(generator.get_chunks_uncached)
+
+        chunks = list(generator.get_chunks(cache_key='test-chunks'))
+        self.assertEqual(chunks, expected_chunks)
+        self.assertFalse(generator.get_chunks_uncached.called)
+
+        # Losing any part of a segment should regenerate the chunks.
+        cache.delete(make_cache_key('test-chunks-segment-2-part-1'))
+
+        generator = self._create_segmented_generator(max_item_size=16)
+        self.spy_on(generator.get_chunks_uncached)
+
+        chunks = list(generator.get_chunks(cache_key='test-chunks'))
+        self.assertEqual(chunks, expected_chunks)
+        self.assertTrue(generator.get_chunks_uncached.called)
+
+    def test_get_chunks_in_range_with_cache_key(self):
+        """Testing RawDiffChunkGenerator.get_chunks_in_range with cache_key
+        loads only the needed segments
+        """
+        generator = self._create_segmented_generator()
+        expected_chunks = list(generator.get_chunks_in_range(9, 4))
+
+        generator = self._create_segmented_generator()
+        list(generator.get_chunks(cache_key='test-chunks'))
+
+        generator = self._create_segmented_generator()
+        self.spy_on(cache.get_many)
+
+        chunks = generator.get_chunks_in_range(9, 4, cache_key='test-chunks')
+        self.assertEqual(chunks, expected_chunks)
+        self.assertEqual(
+            [
+                (chunk['index'], [line[0] for line in chunk['lines']])
+                for chunk in chunks
+            ],
+            [
+                (0, [9]),
+                (1, [10]),
+                (2, [11, 12]),
+            ])
+        self.assertSpyCalledWith(cache.get_many, [
+            make_cache_key('test-chunks-segment-2'),
+            make_cache_key('test-chunks-segment-3'),
+        ])
+
+    def test_get_chunk_with_cache_key(self):
+        """Testing RawDiffChunkGenerator.get_chunk with cache_key loads only
+        the needed segments
+        """
+        generator = self._create_segmented_generator()
+        expected_chunks = list(generator.get_chunks(cache_key='test-chunks'))
+
+        generator = self._create_segmented_generator()
+        self.spy_on(cache.get_many)
+
+        chunk = generator.get_chunk(2, cache_key='test-chunks')
+        self.assertEqual(chunk, expected_chunks[2])
+        self.assertSpyCalledWith(cache.get_many, [
+            make_cache_key('test-chunks-segment-3'),
+            make_cache_key('test-chunks-segment-4'),
+        ])
+
+        self.assertIsNone(generator.get_chunk(5, cache_key='test-chunks'))
+
     def test_apply_pygments_with_lexer(self):
         """Testing RawDiffChunkGenerator._apply_pygments with valid lexer"""
         chunk_generator = RawDiffChunkGenerator(old=[],
@@ -421,6 +573,69 @@ class RawDiffChunkGeneratorTests(TestCase):
                                             filename='test.md'),
             ['This is <span class="gs">**bold**</span>'])
 
+    def test_apply_pygments_with_cache(self):
+        """Testing RawDiffChunkGenerator._apply_pygments caches by content"""
+        self.spy_on(pygments.highlight)
+
+        for filename in ('file1.md', 'file2.md'):
+            chunk_generator = RawDiffChunkGenerator(old=[],
+                                                    new=[],
+                                                    orig_filename=filename,
+                                                    modified_filename=filename)
+            self.assertEqual(
+                chunk_generator._apply_pygments(data='This is **bold**\n',
+                                                filename=filename),
+                ['This is <span class="gs">**bold**</span>'])
+
+        self.assertSpyCallCount(pygments.highlight, 1)
+
+    def test_get_chunks_looks_up_lexer_once(self):
+        """Testing RawDiffChunkGenerator.get_chunks looks up the lexer once
+        for files with the same name
+        """
+        self.spy_on(pygments.lexers.guess_lexer_for_filename)
+
+        generator = RawDiffChunkGenerator(old=b'This is **bold**',
+                                          new=b'This is *italic*',
+                                          orig_filename='file.md',
+                                          modified_filename='file.md')
+        chunks = list(generator.get_chunks())
+
+        self.assertEqual(chunks[0]['lines'][0][2],
+                         'This is <span class="gs">**bold**</span>')
+        self.assertEqual(chunks[0]['lines'][0][5],
+                         'This is <span class="ge">*italic*</span>')
+        self.assertSpyCallCount(pygments.lexers.guess_lexer_for_filename, 1)
+
+    def test_get_lexers_with_ambiguous_extension(self):
+        """Testing RawDiffChunkGenerator._get_lexers guesses the lexer for
+        each file when the filename matches several lexers
+        """
+        self.spy_on(pygments.lexers.guess_lexer_for_filename)
+
+        orig_lexer, modified_lexer = self.generator._get_lexers(
+            old='@interface Foo : NSObject\n@end\n',
+            orig_filename='foo.h',
+            new='#include <stdio.h>\nint x;\n',
+            modified_filename='foo.h')
+
+        self.assertEqual(type(orig_lexer).__name__, 'ObjectiveCLexer')
+        self.assertEqual(type(modified_lexer).__name__, 'CLexer')
+        self.assertSpyCallCount(pygments.lexers.guess_lexer_for_filename, 2)
+
+    def test_get_lexers_with_different_filenames(self):
+        """Testing RawDiffChunkGenerator._get_lexers guesses the lexer for
+        each file when the filenames differ
+        """
+        orig_lexer, modified_lexer = self.generator._get_lexers(
+            old='use strict;\nmy $x = 1;\n',
+            orig_filename='old.pl',
+            new='use strict;\nmy $x = 2;\n',
+            modified_filename='new.pl')
+
+        self.assertIsNot(orig_lexer, modified_lexer)
+        self.assertEqual(type(orig_lexer).__name__, 'PerlLexer')
+
     def test_apply_pygments_without_lexer(self):
         """Testing RawDiffChunkGenerator._apply_pygments without valid lexer"""
         chunk_generator = RawDiffChunkGenerator(old=[],
@@ -705,3 +920,35 @@ class RawDiffChunkGeneratorTests(TestCase):
              '|&lt;&mdash;&mdash;&mdash;&mdash;&mdash;&mdash;'
              '</span>        </span> foo', ''))
 
+    def _create_segmented_generator(self, max_item_size=None):
+        """Return a generator that caches chunks in small segments.
+
+        The diff contains 5 chunks across 20 lines: 9 equal lines, 1
+        replaced line, 5 equal lines, 1 replaced line, and 4 equal lines.
+
+        Args:
+            max_item_size (int, optional):
+                The maximum size of each cache item for a segment.
+
+        Returns:
+            reviewboard.diffviewer.chunk_generator.RawDiffChunkGenerator:
+            The new generator.
+        """
+        class SegmentedRawDiffChunkGenerator(RawDiffChunkGenerator):
+            CHUNK_SEGMENT_MAX_LINES = 3
+            CHUNK_SEGMENT_MAX_ITEM_SIZE = (
+                max_item_size or
+                RawDiffChunkGenerator.CHUNK_SEGMENT_MAX_ITEM_SIZE)
+
+        old = b''.join(
+            b'Line %d\n' % i
+            for i in range(1, 21)
+        )
+        new = (old
+               .replace(b'Line 10\n', b'Line ten\n')
+               .replace(b'Line 16\n', b'Line sixteen\n'))
+
+        return SegmentedRawDiffChunkGenerator(old=old,
+                                              new=new,
+                                              orig_filename='file1',
+                                              modified_filename='file2')
@@ -2,6 +2,9 @@ from __future__ import unicode_literals
 
 import bz2
 
+import nose
+
+from reviewboard.diffviewer.compression import diff_compressor_registry
 from reviewboard.diffviewer.models import RawFileDiffData
 from reviewboard.testing import TestCase
 
@@ -40,8 +43,9 @@ class RawFileDiffDataManagerTests(TestCase):
         """Testing RawFileDiffDataManager.process_diff_data with small diff
         results in uncompressed storage
         """
-        data, compression = \
-            RawFileDiffData.objects.process_diff_data(self.small_diff)
+        with self.siteconfig_settings({'diffviewer_diff_compression': 'B'}):
+            data, compression = \
+                RawFileDiffData.objects.process_diff_data(self.small_diff)
 
         self.assertEqual(data, self.small_diff)
         self.assertIsNone(compression)
@@ -50,8 +54,86 @@ class RawFileDiffDataManagerTests(TestCase):
         """Testing RawFileDiffDataManager.process_diff_data with large diff
         results in bzip2-compressed storage
         """
-        data, compression = \
-            RawFileDiffData.objects.process_diff_data(self.large_diff)
+        with self.siteconfig_settings({'diffviewer_diff_compression': 'B'}):
+            data, compression = \
+                RawFileDiffData.objects.process_diff_data(self.large_diff)
 
         self.assertEqual(data, bz2.compress(self.large_diff, 9))
         self.assertEqual(compression, RawFileDiffData.COMPRESSION_BZIP2)
+
+    def test_process_diff_data_large_diff_compressed_zstd(self):
+        """Testing RawFileDiffDataManager.process_diff_data with large diff
+        and Zstandard compression
+        """
+        compressor = diff_compressor_registry.get_compressor(
+            RawFileDiffData.COMPRESSION_ZSTD)
+
+        if not compressor.is_available():
+            raise nose.SkipTest('zstandard is not installed')
+
+        with self.siteconfig_settings({'diffviewer_diff_compression': 'Z'}):
+            data, compression = \
+                RawFileDiffData.objects.process_diff_data(self.large_diff)
+
+        self.assertEqual(compression, RawFileDiffData.COMPRESSION_ZSTD)
+        self.assertEqual(compressor.decompress(data), self.large_diff)
+
+    def test_recompress_all(self):
+        """Testing RawFileDiffDataManager.recompress_all"""
+        compressor = diff_compressor_registry.get_compressor(
+            RawFileDiffData.COMPRESSION_ZSTD)
+
+        if not compressor.is_available():
+            raise nose.SkipTest('zstandard is not installed')
+
+        with self.siteconfig_settings({'diffviewer_diff_compression': 'B'}):
+            raw_fdds = [
+                RawFileDiffData.objects.get_or_create_from_data(diff)[0]
+                for diff in (self.small_diff,
+                             self.large_diff,
+                             self.large_diff + b'+blah!\n')
+            ]
+
+        self.assertEqual(
+            [raw_fdd.compression for raw_fdd in raw_fdds],
+            [None, 'B', 'B'])
+
+        info = RawFileDiffData.objects.recompress_all(compressor=compressor,
+                                                      batch_size=1)
+
+        self.assertEqual(info['diffs_migrated'], 2)
+        self.assertEqual(
+            list(RawFileDiffData.objects.order_by('pk')
+                 .values_list('compression', flat=True)),
+            [None, 'Z', 'Z'])
+
+        for raw_fdd in raw_fdds:
+            self.assertEqual(
+                RawFileDiffData.objects.get(pk=raw_fdd.pk).content,
+                raw_fdd.content)
+
+        # Running it again should have nothing left to do.
+        info = RawFileDiffData.objects.recompress_all(compressor=compressor)
+        self.assertEqual(info['diffs_migrated'], 0)
+
+    def test_recompress_all_with_max_diffs(self):
+        """Testing RawFileDiffDataManager.recompress_all with max_diffs"""
+        compressor = diff_compressor_registry.get_compressor(
+            RawFileDiffData.COMPRESSION_ZSTD)
+
+        if not compressor.is_available():
+            raise nose.SkipTest('zstandard is not installed')
+
+        with self.siteconfig_settings({'diffviewer_diff_compression': 'B'}):
+            for i in range(3):
+                RawFileDiffData.objects.get_or_create_from_data(
+                    self.large_diff + b'+blah %d!\n' % i)
+
+        info = RawFileDiffData.objects.recompress_all(compressor=compressor,
+                                                      max_diffs=2)
+
+        self.assertEqual(info['diffs_migrated'], 2)
+        self.assertEqual(
+            list(RawFileDiffData.objects.order_by('pk')
+                 .values_list('compression', flat=True)),
+            ['Z', 'Z', 'B'])
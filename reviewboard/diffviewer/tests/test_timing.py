@@ -0,0 +1,258 @@
+"""Unit tests for reviewboard.diffviewer.timing."""
+
+from __future__ import unicode_literals
+
+import time
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.http import HttpResponse
+from django.test.client import RequestFactory
+from mock import patch
+
+from reviewboard.diffviewer.timing import (CACHE_CHUNKS,
+                                           CACHE_HTML,
+                                           DiffTimings,
+                                           STAGE_DIFF,
+                                           STAGE_FETCH,
+                                           STAGE_MOVE_DETECTION,
+                                           are_diff_timing_details_enabled,
+                                           are_diff_timings_enabled,
+                                           get_diff_timings,
+                                           record_diff_cache,
+                                           set_server_timing_header,
+                                           start_diff_timings,
+                                           time_diff_stage)
+from reviewboard.testing import TestCase
+
+
+class DiffTimingsTests(TestCase):
+    """Unit tests for reviewboard.diffviewer.timing.DiffTimings."""
+
+    def setUp(self):
+        super(DiffTimingsTests, self).setUp()
+
+        self.timings = DiffTimings()
+
+    def test_time_stage(self):
+        """Testing DiffTimings.time_stage"""
+        with self._fake_clock([10.0, 10.5, 11.0, 11.25]):
+            with self.timings.time_stage(STAGE_FETCH, 'README'):
+                pass
+
+            with self.timings.time_stage(STAGE_FETCH):
+                pass
+
+        self.assertEqual(self.timings.stages[STAGE_FETCH], {
+            'count': 2,
+            'duration': 0.75,
+        })
+        self.assertEqual(self.timings.files['README']['stages'][STAGE_FETCH],
+                         {
+                             'count': 1,
+                             'duration': 0.5,
+                         })
+
+    def test_time_stage_nested(self):
+        """Testing DiffTimings.time_stage with nested stages counts
+        durations exclusively
+        """
+        with self._fake_clock([10.0, 11.0, 13.0, 13.5]):
+            with self.timings.time_stage(STAGE_DIFF, 'README'):
+                with self.timings.time_stage(STAGE_MOVE_DETECTION):
+                    pass
+
+        self.assertEqual(self.timings.stages, {
+            STAGE_DIFF: {
+                'count': 1,
+                'duration': 1.5,
+            },
+            STAGE_MOVE_DETECTION: {
+                'count': 1,
+                'duration': 2.0,
+            },
+        })
+        self.assertEqual(list(self.timings.files['README']['stages']),
+                         [STAGE_DIFF, STAGE_MOVE_DETECTION])
+
+    def test_record_cache(self):
+        """Testing DiffTimings.record_cache"""
+        self.timings.record_cache(CACHE_CHUNKS, True, 'README')
+        self.timings.record_cache(CACHE_CHUNKS, False, 'main.c')
+
+        with self.timings.time_stage(STAGE_DIFF, 'main.c'):
+            self.timings.record_cache(CACHE_CHUNKS, True)
+
+        self.assertEqual(self.timings.cache[CACHE_CHUNKS], {
+            'hits': 2,
+            'misses': 1,
+        })
+        self.assertEqual(self.timings.files['main.c']['cache'][CACHE_CHUNKS],
+                         {
+                             'hits': 1,
+                             'misses': 1,
+                         })
+
+    def test_serialize(self):
+        """Testing DiffTimings.serialize"""
+        with self._fake_clock([10.0, 10.0125]):
+            with self.timings.time_stage(STAGE_DIFF, 'README'):
+                self.timings.record_cache(CACHE_CHUNKS, False)
+
+        self.assertEqual(self.timings.serialize(), {
+            'stages': {
+                STAGE_DIFF: {
+                    'count': 1,
+                    'duration': 12.5,
+                },
+            },
+            'cache': {
+                CACHE_CHUNKS: {
+                    'hits': 0,
+                    'misses': 1,
+                },
+            },
+            'files': [
+                {
+                    'filename': 'README',
+                    'stages': {
+                        STAGE_DIFF: {
+                            'count': 1,
+                            'duration': 12.5,
+                        },
+                    },
+                    'cache': {
+                        CACHE_CHUNKS: {
+                            'hits': 0,
+                            'misses': 1,
+                        },
+                    },
+                },
+            ],
+        })
+
+    def test_to_server_timing(self):
+        """Testing DiffTimings.to_server_timing"""
+        with self._fake_clock([10.0, 10.25]):
+            with self.timings.time_stage(STAGE_FETCH, 'README'):
+                pass
+
+            self.timings.record_cache(CACHE_HTML, True)
+            self.timings.record_cache(CACHE_HTML, False)
+
+        self.assertEqual(
+            self.timings.to_server_timing(),
+            'fetch;dur=250.0;desc="Repository fetch", '
+            'cache-html;desc="1 hit, 1 miss"')
+
+    def _fake_clock(self, times):
+        """Make time.time() return a series of times.
+
+        Args:
+            times (list of float):
+                The times to return, in order.
+
+        Returns:
+            contextlib.ContextManager:
+            A context manager faking the clock for its duration.
+        """
+        return patch.object(time, 'time', side_effect=times)
+
+
+class DiffTimingsFunctionsTests(TestCase):
+    """Unit tests for the reviewboard.diffviewer.timing functions."""
+
+    fixtures = ['test_users']
+
+    def setUp(self):
+        super(DiffTimingsFunctionsTests, self).setUp()
+
+        self.request = RequestFactory().get('/')
+
+    def test_are_diff_timings_enabled_as_anonymous(self):
+        """Testing are_diff_timings_enabled for anonymous users"""
+        self.request.user = AnonymousUser()
+
+        self.assertFalse(are_diff_timings_enabled(self.request))
+
+    def test_are_diff_timings_enabled_as_staff(self):
+        """Testing are_diff_timings_enabled for staff users"""
+        self.request.user = User.objects.get(username='admin')
+
+        self.assertTrue(are_diff_timings_enabled(self.request))
+
+    def test_are_diff_timings_enabled_with_debug(self):
+        """Testing are_diff_timings_enabled with DEBUG enabled"""
+        self.request.user = AnonymousUser()
+
+        with self.settings(DEBUG=True):
+            self.assertTrue(are_diff_timings_enabled(self.request))
+
+    def test_are_diff_timings_enabled_with_setting(self):
+        """Testing are_diff_timings_enabled with
+        diffviewer_send_server_timing enabled
+        """
+        self.request.user = User.objects.get(username='grumpy')
+
+        with self.siteconfig_settings({'diffviewer_send_server_timing': True}):
+            self.assertTrue(are_diff_timings_enabled(self.request))
+
+    def test_are_diff_timing_details_enabled_as_staff(self):
+        """Testing are_diff_timing_details_enabled for staff users"""
+        self.request.user = User.objects.get(username='admin')
+
+        self.assertTrue(are_diff_timing_details_enabled(self.request))
+
+    def test_are_diff_timing_details_enabled_with_debug(self):
+        """Testing are_diff_timing_details_enabled with DEBUG enabled"""
+        self.request.user = AnonymousUser()
+
+        with self.settings(DEBUG=True):
+            self.assertTrue(are_diff_timing_details_enabled(self.request))
+
+    def test_are_diff_timing_details_enabled_with_setting(self):
+        """Testing are_diff_timing_details_enabled with
+        diffviewer_send_server_timing enabled
+        """
+        self.request.user = User.objects.get(username='grumpy')
+
+        with self.siteconfig_settings({'diffviewer_send_server_timing': True}):
+            self.assertFalse(are_diff_timing_details_enabled(self.request))
+
+    def test_without_timings(self):
+        """Testing diff timing functions without timings started"""
+        with time_diff_stage(self.request, STAGE_DIFF):
+            record_diff_cache(self.request, CACHE_CHUNKS, True)
+
+        self.assertIsNone(get_diff_timings(self.request))
+
+        response = HttpResponse()
+        set_server_timing_header(response, self.request)
+        self.assertNotIn('Server-Timing', response)
+
+    def test_without_request(self):
+        """Testing diff timing functions with request=None"""
+        with time_diff_stage(None, STAGE_DIFF):
+            record_diff_cache(None, CACHE_CHUNKS, True)
+
+        self.assertIsNone(get_diff_timings(None))
+
+    def test_with_timings(self):
+        """Testing diff timing functions with timings started"""
+        timings = start_diff_timings(self.request)
+        self.assertIs(start_diff_timings(self.request), timings)
+
+        with time_diff_stage(self.request, STAGE_DIFF, 'README'):
+            record_diff_cache(self.request, CACHE_CHUNKS, False)
+
+        self.assertIs(get_diff_timings(self.request), timings)
+        self.assertEqual(timings.stages[STAGE_DIFF]['count'], 1)
+        self.assertEqual(timings.files['README']['cache'][CACHE_CHUNKS],
+                         {
+                             'hits': 0,
+                             'misses': 1,
+                         })
+
+        response = HttpResponse()
+        set_server_timing_header(response, self.request)
+        self.assertEqual(response['Server-Timing'],
+                         timings.to_server_timing())
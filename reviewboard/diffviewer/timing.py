@@ -0,0 +1,509 @@
+"""Timing of the stages involved in building and rendering diffs.
+
+While a diff viewer request is being handled, the time spent in each stage
+of building and rendering diffs (fetching files, patching, highlighting,
+diffing, and so on) can be recorded, along with whether each cached layer
+was hit or missed. These timings are exposed to the client through a
+``Server-Timing`` header. The full per-file timings can also be fetched as
+JSON by staff users, by passing ``?timings=1`` to a diff fragment.
+
+Timings are only collected for requests that have had
+:py:func:`start_diff_timings` called on them. All other calls are no-ops.
+The diff viewer only starts them for requests where
+:py:func:`are_diff_timings_enabled` allows it, so that timing information
+isn't exposed to every user.
+
+Version Added:
+    4.0
+"""
+
+from __future__ import unicode_literals
+
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.utils import six
+from djblets.siteconfig.models import SiteConfiguration
+
+
+#: The stage for building the list of files in a diff.
+STAGE_FILE_INFO = 'file-info'
+
+#: The stage for fetching a file from the repository.
+STAGE_FETCH = 'fetch'
+
+#: The stage for applying a parent diff to a file.
+STAGE_PARENT_PATCH = 'parent-patch'
+
+#: The stage for applying a diff to a file.
+STAGE_PATCH = 'patch'
+
+#: The stage for syntax-highlighting a file.
+STAGE_HIGHLIGHT = 'highlight'
+
+#: The stage for diffing two files and building chunks.
+STAGE_DIFF = 'diff'
+
+#: The stage for detecting moved lines.
+STAGE_MOVE_DETECTION = 'move-detection'
+
+#: The stage for rendering chunks to HTML.
+STAGE_RENDER = 'render'
+
+#: Human-readable descriptions of each stage, in order of execution.
+STAGE_DESCRIPTIONS = OrderedDict([
+    (STAGE_FILE_INFO, 'File info'),
+    (STAGE_FETCH, 'Repository fetch'),
+    (STAGE_PARENT_PATCH, 'Parent diff patch'),
+    (STAGE_PATCH, 'Patch'),
+    (STAGE_HIGHLIGHT, 'Highlight'),
+    (STAGE_DIFF, 'Diff'),
+    (STAGE_MOVE_DETECTION, 'Move detection'),
+    (STAGE_RENDER, 'Render'),
+])
+
+#: The cache of file contents fetched from the repository.
+CACHE_REPOSITORY_FILE = 'file'
+
+#: The cache of file contents built by applying a chain of ancestor diffs.
+CACHE_PATCHED_FILE = 'patched-file'
+
+#: The cache of syntax-highlighted file contents.
+CACHE_HIGHLIGHT = 'highlight'
+
+#: The cache of generated chunks.
+CACHE_CHUNKS = 'chunks'
+
+#: The cache of rendered HTML.
+CACHE_HTML = 'html'
+
+
+class DiffTimings(object):
+    """Timings collected for the diffs built and rendered during a request.
+
+    Stage durations are exclusive. If a stage starts while another is running
+    (for instance, move detection while diffing), the outer stage's clock is
+    paused until the inner stage finishes, so that no time is counted twice.
+
+    Attributes:
+        cache (collections.OrderedDict):
+            A mapping of cached layer names to a dictionary containing
+            ``hits`` and ``misses`` counts.
+
+        files (collections.OrderedDict):
+            A mapping of filenames to a dictionary containing ``stages`` and
+            ``cache`` keys, in the same form as :py:attr:`stages` and
+            :py:attr:`cache`, for that file.
+
+        stages (collections.OrderedDict):
+            A mapping of stage names to a dictionary containing the total
+            ``duration`` in seconds and the ``count`` of times the stage ran.
+    """
+
+    def __init__(self):
+        """Initialize the timings."""
+        self.stages = OrderedDict()
+        self.cache = OrderedDict()
+        self.files = OrderedDict()
+        self._running = []
+
+    @contextmanager
+    def time_stage(self, stage, filename=None):
+        """Time a stage.
+
+        Args:
+            stage (unicode):
+                The name of the stage.
+
+            filename (unicode, optional):
+                The name of the file the stage is working on. If not
+                provided, the file of the stage this is nested in (if any) is
+                used.
+
+        Context:
+            The stage will be timed for the duration of the context.
+        """
+        now = time.time()
+
+        if self._running:
+            self._pause(self._running[-1], now)
+
+        entry = self._push(stage, filename)
+        entry['started'] = now
+
+        try:
+            yield
+        finally:
+            now = time.time()
+            was_running = (self._running[-1] is entry)
+
+            self._running.remove(entry)
+            self._pause(entry, now)
+            self._get_stage_info(self.stages, stage)['count'] += 1
+
+            if entry['filename'] is not None:
+                file_stages = self._get_file_info(entry['filename'])['stages']
+                self._get_stage_info(file_stages, stage)['count'] += 1
+
+            if was_running and self._running:
+                self._running[-1]['started'] = now
+
+    def record_cache(self, layer, hit, filename=None):
+        """Record a hit or miss for a cached layer.
+
+        Args:
+            layer (unicode):
+                The name of the cached layer.
+
+            hit (bool):
+                Whether the data was found in the cache.
+
+            filename (unicode, optional):
+                The name of the file the data was for. If not provided, the
+                file of the currently-running stage (if any) is used.
+        """
+        if filename is None and self._running:
+            filename = self._running[-1]['filename']
+
+        key = 'hits' if hit else 'misses'
+        self._get_cache_info(self.cache, layer)[key] += 1
+
+        if filename is not None:
+            self._get_cache_info(self._get_file_info(filename)['cache'],
+                                 layer)[key] += 1
+
+    def serialize(self):
+        """Serialize the timings.
+
+        Returns:
+            dict:
+            A dictionary containing ``stages``, ``cache``, and ``files`` keys.
+            Durations are in milliseconds.
+        """
+        return {
+            'stages': self._serialize_stages(self.stages),
+            'cache': self.cache,
+            'files': [
+                {
+                    'filename': filename,
+                    'stages': self._serialize_stages(file_info['stages']),
+                    'cache': file_info['cache'],
+                }
+                for filename, file_info in six.iteritems(self.files)
+            ],
+        }
+
+    def to_server_timing(self):
+        """Return the timings as the value of a Server-Timing header.
+
+        Each stage is included as a metric with its total duration. Each
+        cached layer is included as a metric named ``cache-<layer>``,
+        describing its hits and misses. Filenames are not included.
+
+        Returns:
+            unicode:
+            The header value.
+        """
+        metrics = [
+            '%s;dur=%.1f;desc="%s"' % (
+                stage,
+                stage_info['duration'] * 1000,
+                STAGE_DESCRIPTIONS.get(stage, stage))
+            for stage, stage_info in six.iteritems(self.stages)
+        ]
+        metrics += [
+            'cache-%s;desc="%d hit, %d miss"' % (
+                layer, cache_info['hits'], cache_info['misses'])
+            for layer, cache_info in six.iteritems(self.cache)
+        ]
+
+        return ', '.join(metrics)
+
+    def _push(self, stage, filename):
+        """Add a stage to the stack of running stages.
+
+        Args:
+            stage (unicode):
+                The name of the stage.
+
+            filename (unicode):
+                The name of the file. If ``None``, the file of the
+                innermost running stage is used.
+
+        Returns:
+            dict:
+            The new entry for the stage.
+        """
+        if filename is None and self._running:
+            filename = self._running[-1]['filename']
+
+        entry = {
+            'filename': filename,
+            'stage': stage,
+            'started': None,
+        }
+        self._running.append(entry)
+
+        return entry
+
+    def _pause(self, entry, now):
+        """Add the time an entry has been running to its stage.
+
+        Args:
+            entry (dict):
+                The running stage entry.
+
+            now (float):
+                The current time.
+        """
+        started = entry['started']
+
+        if started is not None:
+            duration = now - started
+            entry['started'] = None
+
+            self._get_stage_info(self.stages,
+                                 entry['stage'])['duration'] += duration
+
+            if entry['filename'] is not None:
+                file_stages = self._get_file_info(entry['filename'])['stages']
+                self._get_stage_info(file_stages,
+                                     entry['stage'])['duration'] += duration
+
+    def _get_stage_info(self, stages, stage):
+        """Return the information on a stage, creating it if needed.
+
+        Args:
+            stages (collections.OrderedDict):
+                The stages to look up the stage in.
+
+            stage (unicode):
+                The name of the stage.
+
+        Returns:
+            dict:
+            The information on the stage.
+        """
+        try:
+            return stages[stage]
+        except KeyError:
+            stages[stage] = {
+                'count': 0,
+                'duration': 0.0,
+            }
+
+            return stages[stage]
+
+    def _get_cache_info(self, cache, layer):
+        """Return the information on a cached layer, creating it if needed.
+
+        Args:
+            cache (collections.OrderedDict):
+                The cached layers to look up the layer in.
+
+            layer (unicode):
+                The name of the cached layer.
+
+        Returns:
+            dict:
+            The information on the cached layer.
+        """
+        try:
+            return cache[layer]
+        except KeyError:
+            cache[layer] = {
+                'hits': 0,
+                'misses': 0,
+            }
+
+            return cache[layer]
+
+    def _get_file_info(self, filename):
+        """Return the information on a file, creating it if needed.
+
+        Args:
+            filename (unicode):
+                The name of the file.
+
+        Returns:
+            dict:
+            The information on the file.
+        """
+        try:
+            return self.files[filename]
+        except KeyError:
+            self.files[filename] = {
+                'cache': OrderedDict(),
+                'stages': OrderedDict(),
+            }
+
+            return self.files[filename]
+
+    def _serialize_stages(self, stages):
+        """Serialize stage information.
+
+        Args:
+            stages (collections.OrderedDict):
+                The stages to serialize.
+
+        Returns:
+            collections.OrderedDict:
+            The serialized stages, with durations in milliseconds.
+        """
+        return OrderedDict(
+            (stage, {
+                'count': stage_info['count'],
+                'duration': round(stage_info['duration'] * 1000, 2),
+            })
+            for stage, stage_info in six.iteritems(stages)
+        )
+
+
+def are_diff_timings_enabled(request):
+    """Return whether diff timings should be collected for a request.
+
+    Timings are collected when running in ``DEBUG`` mode, for staff users,
+    or for all users if the ``diffviewer_send_server_timing`` site
+    configuration setting is enabled.
+
+    Args:
+        request (django.http.HttpRequest):
+            The HTTP request from the client.
+
+    Returns:
+        bool:
+        Whether timings should be collected for the request.
+    """
+    if are_diff_timing_details_enabled(request):
+        return True
+
+    siteconfig = SiteConfiguration.objects.get_current()
+
+    return siteconfig.get('diffviewer_send_server_timing')
+
+
+def are_diff_timing_details_enabled(request):
+    """Return whether detailed diff timings can be shown for a request.
+
+    Detailed timings include the names of files in the diff, so they're only
+    available when running in ``DEBUG`` mode or for staff users.
+
+    Args:
+        request (django.http.HttpRequest):
+            The HTTP request from the client.
+
+    Returns:
+        bool:
+        Whether detailed timings can be shown for the request.
+    """
+    if settings.DEBUG:
+        return True
+
+    user = getattr(request, 'user', None)
+
+    return user is not None and user.is_staff
+
+
+def start_diff_timings(request):
+    """Start collecting diff timings for a request.
+
+    Args:
+        request (django.http.HttpRequest):
+            The HTTP request from the client.
+
+    Returns:
+        DiffTimings:
+        The timings for the request.
+    """
+    timings = get_diff_timings(request)
+
+    if timings is None:
+        timings = DiffTimings()
+        request._diff_timings = timings
+
+    return timings
+
+
+def get_diff_timings(request):
+    """Return the diff timings being collected for a request.
+
+    Args:
+        request (django.http.HttpRequest):
+            The HTTP request from the client. This may be ``None``.
+
+    Returns:
+        DiffTimings:
+        The timings for the request, or ``None`` if timings are not being
+        collected.
+    """
+    return getattr(request, '_diff_timings', None)
+
+
+@contextmanager
+def time_diff_stage(request, stage, filename=None):
+    """Time a stage of building or rendering a diff.
+
+    Args:
+        request (django.http.HttpRequest):
+            The HTTP request from the client. This may be ``None``.
+
+        stage (unicode):
+            The name of the stage.
+
+        filename (unicode, optional):
+            The name of the file the stage is working on.
+
+    Context:
+        The stage will be timed for the duration of the context, if timings
+        are being collected for the request.
+    """
+    timings = get_diff_timings(request)
+
+    if timings is None:
+        yield
+    else:
+        with timings.time_stage(stage, filename):
+            yield
+
+
+def record_diff_cache(request, layer, hit, filename=None):
+    """Record a hit or miss for a cached layer used when building a diff.
+
+    Args:
+        request (django.http.HttpRequest):
+            The HTTP request from the client. This may be ``None``.
+
+        layer (unicode):
+            The name of the cached layer.
+
+        hit (bool):
+            Whether the data was found in the cache.
+
+        filename (unicode, optional):
+            The name of the file the data was for.
+    """
+    timings = get_diff_timings(request)
+
+    if timings is not None:
+        timings.record_cache(layer, hit, filename)
+
+
+def set_server_timing_header(response, request):
+    """Add the diff timings for a request to a response.
+
+    This sets the ``Server-Timing`` header, if timings are being collected
+    for the request.
+
+    Args:
+        response (django.http.HttpResponse):
+            The response to set the header on.
+
+        request (django.http.HttpRequest):
+            The HTTP request from the client.
+    """
+    timings = get_diff_timings(request)
+
+    if timings is not None and (timings.stages or timings.cache):
+        response['Server-Timing'] = timings.to_server_timing()
@@ -1,5 +1,6 @@
 from __future__ import unicode_literals
 
+import json
 import logging
 import os
 import re
@@ -35,6 +36,13 @@ from reviewboard.diffviewer.errors import PatchError, UserVisibleError
 from reviewboard.diffviewer.models import DiffCommit, DiffSet, FileDiff
 from reviewboard.diffviewer.renderers import (get_diff_renderer,
                                               get_diff_renderer_class)
+from reviewboard.diffviewer.timing import (STAGE_FILE_INFO,
+                                           are_diff_timing_details_enabled,
+                                           are_diff_timings_enabled,
+                                           get_diff_timings,
+                                           set_server_timing_header,
+                                           start_diff_timings,
+                                           time_diff_stage)
 from reviewboard.scmtools.errors import FileNotFoundError
 from reviewboard.site.urlresolvers import local_site_reverse
 
@@ -57,6 +65,12 @@ class DiffViewerView(TemplateView):
     between two DiffSets). It handles loading information on the diffs,
     generating the side-by-side view, and pagination.
 
+    The time spent in each stage of building the page is sent in a
+    ``Server-Timing`` header, for requests where
+    :py:func:`~reviewboard.diffviewer.timing.are_diff_timings_enabled`
+    allows it. Files are built and rendered by :py:class:`DiffFragmentView`,
+    which reports the timings for each file in its own responses.
+
     The view expects the following parameters to be provided:
 
     ``diffset``
@@ -117,6 +131,9 @@ class DiffViewerView(TemplateView):
         """
         self.collapse_diffs = get_collapse_diff(request)
 
+        if are_diff_timings_enabled(request):
+            start_diff_timings(request)
+
         if interdiffset:
             logging.debug('Generating diff viewer page for interdiffset '
                           'ids %s-%s',
@@ -139,6 +156,8 @@ class DiffViewerView(TemplateView):
                               'id %s',
                               diffset.id, request=request)
 
+            set_server_timing_header(response, request)
+
             return response
         except Exception as e:
             if interdiffset:
@@ -225,12 +244,13 @@ class DiffViewerView(TemplateView):
                     tip_commit_id,
                     commits=commits_by_diffset_id[diffset.pk])
 
-        files = get_diff_files(diffset=diffset,
-                               interdiffset=interdiffset,
-                               request=self.request,
-                               filename_patterns=filename_patterns,
-                               base_commit=base_commit,
-                               tip_commit=tip_commit)
+        with time_diff_stage(self.request, STAGE_FILE_INFO):
+            files = get_diff_files(diffset=diffset,
+                                   interdiffset=interdiffset,
+                                   request=self.request,
+                                   filename_patterns=filename_patterns,
+                                   base_commit=base_commit,
+                                   tip_commit=tip_commit)
 
         # Break the list of files into pages
         siteconfig = SiteConfiguration.objects.get_current()
@@ -371,6 +391,20 @@ class DiffFragmentView(View):
         commit history support.
 
         This conflicts with the ``interfilediff_id``.
+
+    ``?timings=1``
+        Return the timings for each stage of building and rendering the
+        fragment (including cache hits and misses) as JSON, instead of the
+        rendered fragment.
+
+        This is only available when running in ``DEBUG`` mode or for staff
+        users. It's ignored otherwise.
+
+    The time spent in each stage of building and rendering the fragment is
+    sent in a ``Server-Timing`` header, for requests where
+    :py:func:`~reviewboard.diffviewer.timing.are_diff_timings_enabled`
+    allows it. When streaming a whole file, this
+    covers the work done before the first part of the file is sent.
     """
 
     template_name = 'diffviewer/diff_file_fragment.html'
@@ -405,12 +439,17 @@ class DiffFragmentView(View):
         chunk_index = kwargs.get('chunk_index')
 
         base_filediff_id = request.GET.get('base-filediff-id')
+        show_timings = (request.GET.get('timings') == '1' and
+                        are_diff_timing_details_enabled(request))
+
+        if show_timings or are_diff_timings_enabled(request):
+            start_diff_timings(request)
 
         try:
             renderer_settings = self._get_renderer_settings(**kwargs)
             etag = self.make_etag(renderer_settings, **kwargs)
 
-            if etag_if_none_match(request, etag):
+            if not show_timings and etag_if_none_match(request, etag):
                 return HttpResponseNotModified()
 
             diff_info_or_response = self.process_diffset_info(
@@ -444,7 +483,13 @@ class DiffFragmentView(View):
                 context=context,
                 renderer_settings=renderer_settings,
                 *args, **kwargs)
-            response = renderer.render_to_response(request)
+
+            if chunk_index is None and not show_timings:
+                # Whole files may be very large, so stream them out as
+                # they're rendered.
+                response = renderer.render_to_streaming_response(request)
+            else:
+                response = renderer.render_to_response(request)
         except PatchError as e:
             logging.warning(
                 '%s.get: PatchError when rendering diffset for filediff '
@@ -516,9 +561,15 @@ class DiffFragmentView(View):
                     'file': diff_info_or_response['diff_file'],
                 })
 
-        if response.status_code == 200:
+        if show_timings:
+            response = HttpResponse(
+                json.dumps(get_diff_timings(request).serialize()),
+                content_type='application/json')
+        elif response.status_code == 200:
             set_etag(response, etag)
 
+        set_server_timing_header(response, request)
+
         return response
 
     def make_etag(self, renderer_settings, filediff_id,
@@ -739,12 +790,13 @@ class DiffFragmentView(View):
         The file will not contain chunk information. That must be specifically
         populated later.
         """
-        files = get_diff_files(diffset=diffset,
-                               interdiffset=interdiffset,
-                               filediff=filediff,
-                               interfilediff=interfilediff,
-                               base_filediff=base_filediff,
-                               request=self.request)
+        with time_diff_stage(self.request, STAGE_FILE_INFO):
+            files = get_diff_files(diffset=diffset,
+                                   interdiffset=interdiffset,
+                                   filediff=filediff,
+                                   interfilediff=interfilediff,
+                                   base_filediff=base_filediff,
+                                   request=self.request)
 
         if files:
             diff_file = files[0]
@@ -0,0 +1,21 @@
+from __future__ import unicode_literals
+
+from reviewboard.signals import initializing
+
+
+def _connect_signals(**kwargs):
+    """Connect signal handlers for review requests.
+
+    This is called when Review Board is initializing, to guarantee that
+    Django has been loaded first.
+
+    Args:
+        **kwargs (dict):
+            Keyword arguments from the signal.
+    """
+    from reviewboard.reviews import prerender
+
+    prerender.connect_signals()
+
+
+initializing.connect(_connect_signals)
@@ -7,10 +7,12 @@ from collections import Counter, defaultdict
 from datetime import datetime
 from itertools import chain
 
+from django.conf import settings
 from django.db.models import Q
 from django.utils import six
-from django.utils.timezone import utc
-from django.utils.translation import ugettext as _
+from django.utils.timezone import get_current_timezone_name, utc
+from django.utils.translation import get_language, ugettext as _
+from djblets.cache.backend import cache_memoize
 from djblets.registries.registry import (ALREADY_REGISTERED,
                                          ATTRIBUTE_REGISTERED,
                                          NOT_REGISTERED)
@@ -18,13 +20,16 @@ from djblets.util.compat.django.template.context import flatten_context
 from djblets.util.compat.django.template.loader import render_to_string
 from djblets.util.dates import get_latest_timestamp
 from djblets.util.decorators import cached_property
+from djblets.util.http import encode_etag
 
+from reviewboard.admin.read_only import is_site_read_only_for
 from reviewboard.diffviewer.models import DiffCommit
 from reviewboard.registries.registry import OrderedRegistry
 from reviewboard.reviews.builtin_fields import (CommitListField,
                                                 ReviewRequestPageDataMixin)
 from reviewboard.reviews.features import status_updates_feature
 from reviewboard.reviews.fields import get_review_request_fieldsets
+from reviewboard.reviews.markdown_utils import is_rich_text_default_for_user
 from reviewboard.reviews.models import (BaseComment,
                                         Comment,
                                         FileAttachmentComment,
@@ -48,6 +53,18 @@ class ReviewRequestPageData(object):
     :py:meth:`query_data_pre_etag` and :py:meth:`query_data_post_etag` are
     called.
 
+    If ``since`` or ``entry_ids`` are provided, the data is queried
+    incrementally. Only the reviews and change descriptions needed for
+    entries updated since that time (or with those IDs) are loaded, along
+    with all status updates and every comment marked as an issue (for the
+    issue summary table). Callers must still filter the resulting entries.
+
+    If ``max_rendered_entries`` is provided, only the newest entries (along
+    with any the user hasn't seen since their last visit) are fully loaded.
+    The remaining reviews and change descriptions are represented by
+    lightweight :py:class:`PlaceholderEntry` instances, which the page can
+    load on demand.
+
     This object is not meant to be public API, and may change at any time. You
     should not use it in extension code.
 
@@ -179,12 +196,62 @@ class ReviewRequestPageData(object):
             Whether the status updates feature is enabled for this
             review request. This does not necessarily mean that there are
             status updates on the review request.
+
+        since (datetime.datetime):
+            The timestamp that entries must have been updated after, for
+            incremental queries. This may be ``None``.
+
+        entry_ids (dict):
+            A mapping of entry type IDs to sets of entry IDs to limit
+            incremental queries to. This may be ``None``.
+
+        max_rendered_entries (int):
+            The maximum number of reviews and change descriptions to fully
+            load, not counting any that are new to the user. This may be
+            ``None``.
+
+        placeholders (list of PlaceholderEntry):
+            The entries standing in for reviews and change descriptions that
+            weren't loaded.
     """
 
+    #: Information used to query each type of comment.
+    #:
+    #: Each item is a tuple of the comment model, the name of the field on
+    #: :py:class:`~reviewboard.reviews.models.Review` referencing it, the
+    #: key used for the comment type, and the ordering of the comments (or
+    #: ``None``).
+    _COMMENT_QUERY_INFO = (
+        (GeneralComment,
+         'general_comments',
+         'general_comments',
+         None),
+        (ScreenshotComment,
+         'screenshot_comments',
+         'screenshot_comments',
+         None),
+        (FileAttachmentComment,
+         'file_attachment_comments',
+         'file_attachment_comments',
+         None),
+        (Comment,
+         'comments',
+         'diff_comments',
+         ('comment__filediff',
+          'comment__first_line',
+          'comment__timestamp')),
+    )
+
     def __init__(self, review_request, request, last_visited=None,
-                 entry_classes=None):
+                 entry_classes=None, since=None, entry_ids=None,
+                 max_rendered_entries=None):
         """Initialize the data object.
 
+        Version Changed:
+            4.0:
+            Added the ``since``, ``entry_ids``, and ``max_rendered_entries``
+            arguments.
+
         Args:
             review_request (reviewboard.reviews.models.ReviewRequest):
                 The review request.
@@ -199,11 +266,35 @@ class ReviewRequestPageData(object):
                 The list of entry classes that should be used for data
                 generation. If not provided, all registered entry classes
                 will be used.
+
+            since (datetime.datetime, optional):
+                If provided, only data needed for entries updated after this
+                time will be queried.
+
+            entry_ids (dict, optional):
+                If provided, only data needed for entries with these IDs
+                will be queried. This is a mapping of entry type IDs to sets
+                of entry IDs.
+
+            max_rendered_entries (int, optional):
+                If provided, only this many of the most recently updated
+                reviews and change descriptions (plus any updated since
+                ``last_visited``) will be queried. The rest will be
+                represented by placeholders. This is ignored if ``since``
+                or ``entry_ids`` are provided.
         """
         self.review_request = review_request
         self.request = request
         self.last_visited = last_visited
         self.entry_classes = entry_classes or list(entry_registry)
+        self.since = since
+        self.entry_ids = entry_ids or None
+        self._incremental = (since is not None or self.entry_ids is not None)
+
+        if self._incremental:
+            self.max_rendered_entries = None
+        else:
+            self.max_rendered_entries = max_rendered_entries
 
         # These are populated in query_data_pre_etag().
         self.reviews = []
@@ -215,6 +306,7 @@ class ReviewRequestPageData(object):
         self.latest_review_timestamp = None
         self.latest_changedesc_timestamp = None
         self.draft = None
+        self.placeholders = []
 
         # These are populated in query_data_post_etag().
         self.initial_status_updates = []
@@ -284,26 +376,57 @@ class ReviewRequestPageData(object):
         if self.request.user.is_authenticated():
             reviews_query |= Q(user_id=self.request.user.pk)
 
+        # Get all status updates.
+        if self.status_updates_enabled and self._needs_status_updates:
+            self.all_status_updates = list(
+                self.review_request.status_updates.order_by('summary'))
+
+        if self.max_rendered_entries is not None:
+            self._window_entries(
+                self.review_request.reviews.filter(reviews_query))
+
         if self._needs_reviews or self._needs_status_updates:
+            reviews = self.review_request.reviews.filter(reviews_query)
+
+            if self._incremental:
+                reviews = reviews.filter(
+                    self._build_incremental_reviews_q(reviews))
+
             self.reviews = list(
-                self.review_request.reviews
-                .filter(reviews_query)
+                reviews
                 .order_by('-timestamp')
                 .select_related('user', 'user__profile')
             )
 
-        if len(self.reviews) == 0:
-            self.latest_review_timestamp = datetime.fromtimestamp(0, utc)
-        else:
-            self.latest_review_timestamp = self.reviews[0].timestamp
+        # If entries were windowed, the latest review timestamp was found
+        # across all reviews, rather than only the loaded ones.
+        if self.latest_review_timestamp is None:
+            if len(self.reviews) == 0:
+                self.latest_review_timestamp = \
+                    datetime.fromtimestamp(0, utc)
+            else:
+                self.latest_review_timestamp = self.reviews[0].timestamp
 
         # Get all the public ChangeDescriptions.
         if self._needs_changedescs:
-            self.changedescs = list(
-                self.review_request.changedescs.filter(public=True))
+            changedescs = self.review_request.changedescs.filter(public=True)
+
+            if self._incremental:
+                # Entries are collapsed based on the latest Change
+                # Description, so this is needed even if it won't be shown.
+                self.latest_changedesc_timestamp = (
+                    changedescs
+                    .values_list('timestamp', flat=True)
+                    .first()
+                )
+                self.changedescs = list(changedescs.filter(
+                    self._build_incremental_changedescs_q()))
+            else:
+                self.changedescs = list(changedescs)
 
-        if self.changedescs:
-            self.latest_changedesc_timestamp = self.changedescs[0].timestamp
+                if self.changedescs:
+                    self.latest_changedesc_timestamp = \
+                        self.changedescs[0].timestamp
 
         # Get the active draft (if any).
         if self._needs_draft:
@@ -314,11 +437,6 @@ class ReviewRequestPageData(object):
             self.diffsets = self.review_request.get_diffsets()
             self.diffsets_by_id = self._build_id_map(self.diffsets)
 
-        # Get all status updates.
-        if self.status_updates_enabled and self._needs_status_updates:
-            self.all_status_updates = list(
-                self.review_request.status_updates.order_by('summary'))
-
     def query_data_post_etag(self):
         """Perform remaining queries for the page.
 
@@ -426,25 +544,8 @@ class ReviewRequestPageData(object):
         if self.reviews:
             review_ids = self.reviews_by_id.keys()
 
-            for model, review_field_name, key, ordering in (
-                (GeneralComment,
-                 'general_comments',
-                 'general_comments',
-                 None),
-                (ScreenshotComment,
-                 'screenshot_comments',
-                 'screenshot_comments',
-                 None),
-                (FileAttachmentComment,
-                 'file_attachment_comments',
-                 'file_attachment_comments',
-                 None),
-                (Comment,
-                 'comments',
-                 'diff_comments',
-                 ('comment__filediff',
-                  'comment__first_line',
-                  'comment__timestamp'))):
+            for (model, review_field_name, key,
+                 ordering) in self._COMMENT_QUERY_INFO:
                 # Due to mistakes in how we initially made the schema, we have
                 # a ManyToManyField in between comments and reviews, instead of
                 # comments having a ForeignKey to the review. This makes it
@@ -528,19 +629,14 @@ class ReviewRequestPageData(object):
                             self.review_comments.setdefault(
                                 review.pk, []).append(comment)
 
-                    if review.public and comment.issue_opened:
-                        status_key = comment.issue_status_to_string(
-                            comment.issue_status)
-
-                        # Both "verifying" states get lumped together in the
-                        # same section in the issue summary table.
-                        if status_key in ('verifying-resolved',
-                                          'verifying-dropped'):
-                            status_key = 'verifying'
+                    if (review.public and comment.issue_opened and
+                        not self._incremental):
+                        self._add_issue(comment)
 
-                        self.issue_counts[status_key] += 1
-                        self.issue_counts['total'] += 1
-                        self.issues.append(comment)
+        if self._incremental and self._needs_reviews:
+            # Only some reviews have been loaded, but the issue summary
+            # table needs all the issues.
+            self._query_issues()
 
         if self.review_request.created_with_history:
             pks = [diffset.pk for diffset in self.diffsets]
@@ -580,6 +676,8 @@ class ReviewRequestPageData(object):
                 elif entry_cls.entry_pos == entry_cls.ENTRY_POS_MAIN:
                     main_entries += new_entries
 
+        main_entries += self.placeholders
+
         for entry in initial_entries:
             entry.finalize()
 
@@ -596,6 +694,287 @@ class ReviewRequestPageData(object):
             'main': main_entries,
         }
 
+    def _window_entries(self, reviews):
+        """Choose which reviews and change descriptions to load in full.
+
+        This performs lightweight queries for every review and change
+        description on the page, and finds the entries that were most
+        recently updated. Those, along with any entries updated since the
+        user's last visit and any reviews the user has draft replies on,
+        will be queried incrementally. :py:attr:`placeholders` will be
+        populated for the rest.
+
+        If there aren't more entries than :py:attr:`max_rendered_entries`,
+        all data will be queried as normal. Status updates must be queried
+        first.
+
+        Args:
+            reviews (django.db.models.query.QuerySet):
+                The queryset for all reviews the user can see on the page.
+        """
+        status_update_review_ids = set(
+            status_update.review_id
+            for status_update in self.all_status_updates
+            if status_update.review_id is not None
+        )
+        change_status_updates = defaultdict(list)
+
+        for status_update in self.all_status_updates:
+            if status_update.change_description_id is not None:
+                change_status_updates[
+                    status_update.change_description_id].append(
+                        status_update.timestamp)
+
+        # Each item is a tuple of the entry class, the primary key, the added
+        # timestamp, the updated timestamp, and the username.
+        entry_infos = []
+        always_loaded = {
+            ReviewEntry: set(),
+            ChangeEntry: set(),
+        }
+
+        if self._needs_reviews:
+            latest_reply_timestamps = {}
+            review_infos = []
+            review_rows = list(
+                reviews.values_list('pk', 'base_reply_to_id', 'timestamp',
+                                    'public', 'user__username'))
+
+            if review_rows:
+                self.latest_review_timestamp = max(
+                    row[2]
+                    for row in review_rows
+                )
+            else:
+                self.latest_review_timestamp = \
+                    datetime.fromtimestamp(0, utc)
+
+            for pk, base_reply_to_id, timestamp, public, username in \
+                    review_rows:
+                if base_reply_to_id is not None:
+                    latest_reply_timestamps[base_reply_to_id] = max(
+                        timestamp,
+                        latest_reply_timestamps.get(base_reply_to_id,
+                                                    timestamp))
+
+                    if not public:
+                        # The user's draft replies are shown along with
+                        # the review they're replying to.
+                        always_loaded[ReviewEntry].add(base_reply_to_id)
+                elif not public:
+                    always_loaded[ReviewEntry].add(pk)
+                elif pk not in status_update_review_ids:
+                    review_infos.append((pk, timestamp, username))
+
+            entry_infos += [
+                (ReviewEntry, pk, timestamp,
+                 latest_reply_timestamps.get(pk, timestamp), username)
+                for pk, timestamp, username in review_infos
+            ]
+
+        if self._needs_changedescs:
+            entry_infos += [
+                (ChangeEntry, pk, timestamp,
+                 get_latest_timestamp(
+                     [timestamp] + change_status_updates.get(pk, [])),
+                 None)
+                for pk, timestamp in (
+                    self.review_request.changedescs
+                    .filter(public=True)
+                    .values_list('pk', 'timestamp')
+                )
+            ]
+
+        if len(entry_infos) <= self.max_rendered_entries:
+            self.latest_review_timestamp = None
+            return
+
+        entry_infos.sort(key=lambda info: info[3], reverse=True)
+        self.entry_ids = {
+            ReviewEntry.entry_type_id: set(),
+            ChangeEntry.entry_type_id: set(),
+        }
+        self._incremental = True
+
+        for i, (entry_cls, pk, added_timestamp, updated_timestamp,
+                username) in enumerate(entry_infos):
+            entry_id = six.text_type(pk)
+
+            if (i < self.max_rendered_entries or
+                pk in always_loaded[entry_cls] or
+                (self.last_visited is not None and
+                 updated_timestamp > self.last_visited)):
+                self.entry_ids[entry_cls.entry_type_id].add(entry_id)
+            else:
+                self.placeholders.append(PlaceholderEntry(
+                    data=self,
+                    entry_cls=entry_cls,
+                    entry_id=entry_id,
+                    added_timestamp=added_timestamp,
+                    updated_timestamp=updated_timestamp,
+                    username=username))
+
+        for entry_cls, pks in six.iteritems(always_loaded):
+            self.entry_ids[entry_cls.entry_type_id].update(
+                six.text_type(pk)
+                for pk in pks
+            )
+
+    def _build_incremental_reviews_q(self, reviews):
+        """Return a query for the reviews needed for an incremental update.
+
+        This matches the top-level reviews for the entries being updated,
+        along with all their replies. Reviews for status updates (and their
+        replies) are always matched, since they're needed to attach to the
+        status updates.
+
+        Args:
+            reviews (django.db.models.query.QuerySet):
+                The queryset for all reviews the user can see on the page.
+
+        Returns:
+            django.db.models.Q:
+            The query for the reviews.
+        """
+        review_ids = None
+
+        if self.since is not None:
+            review_ids = set(
+                base_reply_to_id or pk
+                for pk, base_reply_to_id in (
+                    reviews
+                    .filter(timestamp__gt=self.since)
+                    .values_list('pk', 'base_reply_to_id')
+                )
+            )
+
+        if self.entry_ids is not None:
+            requested_ids = self._get_requested_entry_pks(
+                ReviewEntry.entry_type_id)
+
+            if review_ids is None:
+                review_ids = requested_ids
+            else:
+                review_ids &= requested_ids
+
+        q = Q(pk__in=review_ids) | Q(base_reply_to__in=review_ids)
+
+        if self.all_status_updates:
+            q |= (Q(status_update__isnull=False) |
+                  Q(base_reply_to__status_update__isnull=False))
+
+        return q
+
+    def _build_incremental_changedescs_q(self):
+        """Return a query for Change Descriptions for an incremental update.
+
+        This matches Change Descriptions made after :py:attr:`since`, or
+        having status updates changed after it. Status updates must be
+        queried first.
+
+        Returns:
+            django.db.models.Q:
+            The query for the Change Descriptions.
+        """
+        q = Q()
+
+        if self.since is not None:
+            q &= (
+                Q(timestamp__gt=self.since) |
+                Q(pk__in=[
+                    status_update.change_description_id
+                    for status_update in self.all_status_updates
+                    if (status_update.change_description_id is not None and
+                        status_update.timestamp > self.since)
+                ])
+            )
+
+        if self.entry_ids is not None:
+            q &= Q(pk__in=self._get_requested_entry_pks(
+                ChangeEntry.entry_type_id))
+
+        return q
+
+    def _get_requested_entry_pks(self, entry_type_id):
+        """Return the requested IDs for a type of entry as primary keys.
+
+        Args:
+            entry_type_id (unicode):
+                The ID of the type of entry.
+
+        Returns:
+            set of int:
+            The primary keys of the requested entries. IDs that aren't
+            valid primary keys are ignored.
+        """
+        return set(
+            int(entry_id)
+            for entry_id in self.entry_ids.get(entry_type_id, [])
+            if entry_id.isdigit()
+        )
+
+    def _query_issues(self):
+        """Query all the comments on the page marked as issues.
+
+        This is used for incremental updates, where only the comments for
+        some reviews have been loaded. Comments that have already been
+        loaded are reused.
+        """
+        comments_by_key = {}
+
+        for comment in self.all_comments:
+            comments_by_key[(comment._type, comment.pk)] = comment
+
+        for model, review_field_name, key, ordering in \
+                self._COMMENT_QUERY_INFO:
+            related_field = Review._meta.get_field(review_field_name)
+            comment_field_name = related_field.m2m_reverse_field_name()
+            through = related_field.rel.through
+            q = (
+                through.objects
+                .filter(**{
+                    'review__review_request': self.review_request,
+                    'review__public': True,
+                    '%s__issue_opened' % comment_field_name: True,
+                })
+                .select_related('review__user', 'review__user__profile',
+                                comment_field_name)
+            )
+
+            if ordering:
+                q = q.order_by(*ordering)
+
+            for obj in q:
+                comment = comments_by_key.get(
+                    (key, getattr(obj, '%s_id' % comment_field_name)))
+
+                if comment is None:
+                    comment = getattr(obj, comment_field_name)
+                    comment._type = key
+                    comment.review_obj = obj.review
+                    comment._review = obj.review
+                    comment._review_request = self.review_request
+
+                self._add_issue(comment)
+
+    def _add_issue(self, comment):
+        """Add a comment to the issues and issue counts.
+
+        Args:
+            comment (reviewboard.reviews.models.BaseComment):
+                The comment marked as an issue.
+        """
+        status_key = comment.issue_status_to_string(comment.issue_status)
+
+        # Both "verifying" states get lumped together in the same section in
+        # the issue summary table.
+        if status_key in ('verifying-resolved', 'verifying-dropped'):
+            status_key = 'verifying'
+
+        self.issue_counts[status_key] += 1
+        self.issue_counts['total'] += 1
+        self.issues.append(comment)
+
     def _build_id_map(self, objects):
         """Return an ID map from a list of objects.
 
@@ -762,6 +1141,28 @@ class BaseReviewRequestPageEntry(object):
         """
         return ''
 
+    def build_render_etag_data(self):
+        """Build data identifying the rendered HTML for the entry.
+
+        The rendered HTML for an entry is cached, keyed off of the entry's
+        type, ID, updated timestamp, the user viewing it, and this data. The
+        data should represent anything that can change the HTML for the entry
+        without changing :py:attr:`updated_timestamp` (such as edits to
+        comments), along with anything added in :py:meth:`get_extra_context`.
+
+        By default, this returns ``None``, which disables caching. Subclasses
+        must override this to opt into caching.
+
+        Version Added:
+            4.0
+
+        Returns:
+            unicode:
+            The data to include in the cache key, or ``None`` if the rendered
+            HTML should not be cached.
+        """
+        return None
+
     def __init__(self, data, entry_id, added_timestamp,
                  updated_timestamp=None, avatar_user=None):
         """Initialize the entry.
@@ -975,22 +1376,129 @@ class BaseReviewRequestPageEntry(object):
             return ''
 
         try:
-            return render_to_string(template_name=self.template_name,
-                                    context=new_context,
-                                    request=request)
+            return self.render_template(request, new_context)
         except Exception as e:
             logging.exception('Error rendering template for %s (ID=%s): %s',
                               self.__class__.__name__, self.entry_id, e)
             return ''
 
+    def render_template(self, request, context):
+        """Render the entry's template to a string.
+
+        If :py:meth:`build_render_etag_data` returns data for the entry, the
+        result will be cached, and later renders of the unchanged entry for
+        the same user will use the cached HTML.
+
+        Version Added:
+            4.0
+
+        Args:
+            request (django.http.HttpRequest):
+                The HTTP request from the client.
+
+            context (dict):
+                The full context for the template, including ``entry`` and
+                ``entry_is_new``.
+
+        Returns:
+            unicode:
+            The resulting HTML for the entry.
+        """
+        def _render():
+            return render_to_string(template_name=self.template_name,
+                                    context=context,
+                                    request=request)
+
+        cache_key = self._make_render_cache_key(
+            request,
+            entry_is_new=context.get('entry_is_new', False))
+
+        if cache_key is None:
+            return _render()
+
+        return cache_memoize(cache_key, _render)
+
     def finalize(self):
         """Perform final computations after all comments have been added."""
         pass
 
+    def _make_render_cache_key(self, request, entry_is_new):
+        """Return the cache key for the rendered HTML of the entry.
+
+        Args:
+            request (django.http.HttpRequest):
+                The HTTP request from the client.
+
+            entry_is_new (bool):
+                Whether the entry is shown as new to the user.
+
+        Returns:
+            unicode:
+            The cache key, or ``None`` if the HTML should not be cached.
+        """
+        etag_data = self.build_render_etag_data()
+
+        if etag_data is None:
+            return None
+
+        user = request.user
+        review_request = self.data.review_request
+
+        return 'review-request-entry-html-%s' % encode_etag(
+            ':'.join(six.text_type(value) for value in (
+                self.entry_type_id,
+                self.entry_id,
+                self.entry_pos,
+                review_request.pk,
+                review_request.status,
+                self.updated_timestamp,
+                self.collapsed,
+                entry_is_new,
+                user.pk,
+                is_rich_text_default_for_user(user),
+                is_site_read_only_for(user),
+                get_language(),
+                get_current_timezone_name(),
+                settings.TEMPLATE_SERIAL,
+                settings.AJAX_SERIAL,
+                etag_data,
+            )))
+
 
 class ReviewEntryMixin(object):
     """Mixin to provide functionality for entries containing reviews."""
 
+    def build_review_etag_data(self, review, comments):
+        """Build data identifying the rendered state of a review.
+
+        This covers changes that don't update the review's timestamp, such
+        as revoking a Ship It or changing the status of an issue.
+
+        Version Added:
+            4.0
+
+        Args:
+            review (reviewboard.reviews.models.Review):
+                The review.
+
+            comments (dict):
+                A dictionary mapping comment types to lists of comments on
+                the review.
+
+        Returns:
+            unicode:
+            The data for the review.
+        """
+        comments = list(chain.from_iterable(six.itervalues(comments)))
+
+        latest_timestamp = get_latest_timestamp(chain(
+            (comment.timestamp for comment in comments),
+            (reply.timestamp
+             for comment in comments
+             for reply in getattr(comment, '_replies', []))))
+
+        return '%s:%s:%s' % (review.pk, review.ship_it, latest_timestamp)
+
     def is_review_collapsed(self, review):
         """Return whether a review should be collapsed.
 
@@ -1138,6 +1646,30 @@ class StatusUpdatesEntryMixin(DiffCommentsSerializerMixin, ReviewEntryMixin):
         self.status_updates_by_review = {}
         self.state_counts = Counter()
 
+    def build_render_etag_data(self):
+        """Build data identifying the rendered HTML for the entry.
+
+        This includes the state of each status update (which can time out
+        without being saved) and of each review posted by a status update.
+
+        Version Added:
+            4.0
+
+        Returns:
+            unicode:
+            The data to include in the cache key.
+        """
+        etag_data = []
+
+        for update in getattr(self, 'status_updates', []):
+            etag_data.append('%s:%s' % (update.pk, update.effective_state))
+
+            if update.review_id is not None:
+                etag_data.append(self.build_review_etag_data(
+                    update.review, update.comments))
+
+        return ':'.join(etag_data)
+
     def are_status_updates_collapsed(self, status_updates):
         """Return whether all status updates should be collapsed.
 
@@ -1502,7 +2034,8 @@ class InitialStatusUpdatesEntry(StatusUpdatesEntryMixin,
         return (
             # Don't collapse if the user has not seen this page before (or
             # are anonymous) and there aren't any change descriptions yet.
-            (data.last_visited or len(data.changedescs) > 0) and
+            (data.last_visited or
+             data.latest_changedesc_timestamp is not None) and
 
             # Don't collapse if there are status updates containing reviews
             # that should not be collapsed.
@@ -1599,6 +2132,18 @@ class ReviewEntry(ReviewEntryMixin, DiffCommentsSerializerMixin,
         """Whether the Ship It can be revoked by the current user."""
         return self.review.can_user_revoke_ship_it(self.data.request.user)
 
+    def build_render_etag_data(self):
+        """Build data identifying the rendered HTML for the entry.
+
+        Version Added:
+            4.0
+
+        Returns:
+            unicode:
+            The data to include in the cache key.
+        """
+        return self.build_review_etag_data(self.review, self.comments)
+
     def get_dom_element_id(self):
         """Return the ID used for the DOM element for this entry.
 
@@ -1737,11 +2282,9 @@ class ChangeEntry(StatusUpdatesEntryMixin, BaseReviewRequestPageEntry):
                 The change description for this entry.
         """
         self.changedesc = changedesc
-        self.fields_changed_groups = []
 
         status_updates = data.change_status_updates.get(changedesc.pk, [])
         review_request = data.review_request
-        request = data.request
 
         timestamps = [changedesc.timestamp] + [
             status_update.timestamp
@@ -1759,8 +2302,6 @@ class ChangeEntry(StatusUpdatesEntryMixin, BaseReviewRequestPageEntry):
         if data.status_updates_enabled:
             StatusUpdatesEntryMixin.__init__(self)
 
-        cur_field_changed_group = None
-
         # See if there was a review request status change.
         status_change = changedesc.fields_changed.get('status')
 
@@ -1771,6 +2312,22 @@ class ChangeEntry(StatusUpdatesEntryMixin, BaseReviewRequestPageEntry):
         else:
             self.new_status = None
 
+    @cached_property
+    def fields_changed_groups(self):
+        """The groups of fields changed in the Change Description.
+
+        Each group is a dictionary containing an ``inline`` flag and a list
+        of ``fields`` containing rendered HTML for each field that changed.
+        This is computed when first accessed, so that it's skipped if the
+        entry's HTML is cached.
+        """
+        data = self.data
+        changedesc = self.changedesc
+        review_request = data.review_request
+        request = data.request
+        fields_changed_groups = []
+        cur_field_changed_group = None
+
         # Process the list of fields, in order by fieldset. These will be
         # put into groups composed of inline vs. full-width field values,
         # for render into the box.
@@ -1793,7 +2350,7 @@ class ChangeEntry(StatusUpdatesEntryMixin, BaseReviewRequestPageEntry):
                         'inline': inline,
                         'fields': [],
                     }
-                    self.fields_changed_groups.append(cur_field_changed_group)
+                    fields_changed_groups.append(cur_field_changed_group)
 
                 if issubclass(field_cls, ReviewRequestPageDataMixin):
                     field = field_cls(review_request, request=request,
@@ -1805,6 +2362,27 @@ class ChangeEntry(StatusUpdatesEntryMixin, BaseReviewRequestPageEntry):
                     field.get_change_entry_sections_html(
                         changedesc.fields_changed[field_id])
 
+        return fields_changed_groups
+
+    def build_render_etag_data(self):
+        """Build data identifying the rendered HTML for the entry.
+
+        This includes the text of the Change Description, which can be
+        edited (for instance, when changing a close description) without
+        updating its timestamp.
+
+        Version Added:
+            4.0
+
+        Returns:
+            unicode:
+            The data to include in the cache key.
+        """
+        return '%s:%s:%s' % (
+            super(ChangeEntry, self).build_render_etag_data(),
+            self.changedesc.rich_text,
+            self.changedesc.text)
+
     def get_dom_element_id(self):
         """Return the ID used for the DOM element for this entry.
 
@@ -1894,6 +2472,88 @@ class ChangeEntry(StatusUpdatesEntryMixin, BaseReviewRequestPageEntry):
         return model_data
 
 
+class PlaceholderEntry(BaseReviewRequestPageEntry):
+    """A placeholder for an entry that hasn't been loaded.
+
+    On review requests with a long history, only the most recently updated
+    reviews and change descriptions are fully loaded and rendered. The rest
+    are shown as collapsed placeholders, which the page replaces with the
+    full entry (fetched from the updates view) when expanded.
+
+    Placeholders aren't registered entry types. They use the type ID, entry
+    ID, and DOM element ID of the entry they stand in for.
+
+    Version Added:
+        4.0
+
+    Attributes:
+        entry_cls (type):
+            The class of the entry this stands in for.
+
+        entry_js_model_class (unicode):
+            The name of the JavaScript Backbone.Model class for the entry
+            this stands in for.
+
+        entry_js_view_class (unicode):
+            The name of the JavaScript Backbone.View class for the entry this
+            stands in for.
+
+        username (unicode):
+            The username of the user who created the entry. This may be
+            ``None``.
+    """
+
+    template_name = 'reviews/entries/placeholder.html'
+    js_template_name = 'reviews/entries/placeholder.js'
+    js_view_class = 'RB.ReviewRequestPage.PlaceholderEntryView'
+
+    def __init__(self, data, entry_cls, entry_id, added_timestamp,
+                 updated_timestamp, username=None):
+        """Initialize the entry.
+
+        Args:
+            data (ReviewRequestPageData):
+                Pre-queried data for the review request page.
+
+            entry_cls (type):
+                The class of the entry this stands in for.
+
+            entry_id (unicode):
+                The ID of the entry this stands in for.
+
+            added_timestamp (datetime.datetime):
+                The timestamp of the entry.
+
+            updated_timestamp (datetime.datetime):
+                The timestamp when the entry was last updated.
+
+            username (unicode, optional):
+                The username of the user who created the entry.
+        """
+        super(PlaceholderEntry, self).__init__(
+            data=data,
+            entry_id=entry_id,
+            added_timestamp=added_timestamp,
+            updated_timestamp=updated_timestamp)
+
+        self.entry_cls = entry_cls
+        self.entry_type_id = entry_cls.entry_type_id
+        self.entry_js_model_class = entry_cls.js_model_class
+        self.entry_js_view_class = entry_cls.js_view_class
+        self.username = username
+
+    def calculate_collapsed(self):
+        """Calculate whether the entry should currently be collapsed.
+
+        Placeholders are always collapsed.
+
+        Returns:
+            bool:
+            ``True``, always.
+        """
+        return True
+
+
 class ReviewRequestPageEntryRegistry(OrderedRegistry):
     """A registry for types of entries on the review request page."""
 
@@ -0,0 +1,82 @@
+"""Management command to pre-render queued diffs."""
+
+from __future__ import unicode_literals
+
+import time
+
+from django.conf import settings
+from django.utils.translation import ugettext as _
+from djblets.util.compat.django.core.management.base import BaseCommand
+
+from reviewboard.reviews.prerender import process_prerender_jobs
+
+
+class Command(BaseCommand):
+    """Management command to pre-render queued diffs.
+
+    By default, this processes all queued jobs and exits. With ``--worker``,
+    it keeps running, checking for new jobs as they're queued.
+    """
+
+    help = _('Pre-renders diffs that have been queued when uploaded or '
+             'published, storing them in the cache.')
+
+    def add_arguments(self, parser):
+        """Add arguments to the command.
+
+        Args:
+            parser (argparse.ArgumentParser):
+                The argument parser for the command.
+        """
+        parser.add_argument(
+            '--worker',
+            action='store_true',
+            dest='worker',
+            default=False,
+            help=_('Keep running, and process new jobs as they are queued.'))
+        parser.add_argument(
+            '--poll-interval',
+            action='store',
+            dest='poll_interval',
+            type=float,
+            default=5,
+            help=_('The number of seconds to wait before checking for new '
+                   'jobs when running as a worker.'))
+        parser.add_argument(
+            '--max-jobs',
+            action='store',
+            dest='max_jobs',
+            type=int,
+            default=None,
+            help=_('The maximum number of jobs to process before exiting.'))
+
+    def handle(self, **options):
+        """Handle the command.
+
+        Args:
+            **options (dict):
+                Options parsed on the command line.
+        """
+        max_jobs = options['max_jobs']
+        total_jobs = 0
+
+        # Don't allow queries to be stored.
+        settings.DEBUG = False
+
+        while True:
+            if max_jobs is None:
+                num_jobs = process_prerender_jobs()
+            else:
+                num_jobs = process_prerender_jobs(
+                    max_jobs=max_jobs - total_jobs)
+
+            total_jobs += num_jobs
+
+            if (not options['worker'] or
+                (max_jobs is not None and total_jobs >= max_jobs)):
+                break
+
+            if num_jobs == 0:
+                time.sleep(options['poll_interval'])
+
+        self.stdout.write(_('Processed %d pre-render jobs.') % total_jobs)
@@ -1,13 +1,14 @@
 from __future__ import unicode_literals
 
 import logging
+import uuid
 
 from django.contrib.auth.models import User
 from django.core.exceptions import ObjectDoesNotExist
-from django.db import connections, router, transaction
-from django.db.models import Manager, Q
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import F, Manager, Q
 from django.db.models.query import QuerySet
-from django.utils import six
+from django.utils import six, timezone
 from djblets.db.managers import ConcurrencyManager
 
 from reviewboard.diffviewer.models import DiffSetHistory
@@ -737,3 +738,114 @@ class ReviewManager(ConcurrencyManager):
         query = self.filter(query).distinct()
 
         return query
+
+
+class DiffPrerenderJobManager(Manager):
+    """A manager for DiffPrerenderJob models.
+
+    Version Added:
+        4.0
+    """
+
+    def queue(self, diffset, priority):
+        """Queue a diffset for pre-rendering.
+
+        If the diffset is already queued, its job will be kept, and its
+        priority will be raised to ``priority`` if it's lower. The job will
+        be made available right away, and if a worker is processing it, it
+        will be processed again afterward.
+
+        Args:
+            diffset (reviewboard.diffviewer.models.DiffSet):
+                The diffset to pre-render.
+
+            priority (int):
+                The priority of the job.
+        """
+        try:
+            # This is wrapped in a transaction.atomic block so that a
+            # duplicate job doesn't break any transaction we're in.
+            with transaction.atomic():
+                self.create(diffset=diffset, priority=priority)
+        except IntegrityError:
+            self.filter(diffset=diffset).update(available_at=timezone.now(),
+                                                claim_id=None,
+                                                attempts=0)
+            self.filter(diffset=diffset,
+                        priority__lt=priority).update(priority=priority)
+
+    def claim_next(self):
+        """Claim the next job to process.
+
+        The job is claimed for
+        :py:attr:`~reviewboard.reviews.models.DiffPrerenderJob.CLAIM_TIMEOUT`,
+        so that no other worker will process it in that time. It stays in
+        the queue until :py:meth:`complete` is called. Jobs that have been
+        attempted
+        :py:attr:`~reviewboard.reviews.models.DiffPrerenderJob.MAX_ATTEMPTS`
+        times are removed instead of being claimed.
+
+        Returns:
+            reviewboard.reviews.models.DiffPrerenderJob:
+            The claimed job, or ``None`` if there are no available jobs.
+        """
+        while True:
+            now = timezone.now()
+            jobs = list(
+                self.filter(available_at__lte=now)
+                .order_by('-priority', 'timestamp')[:10])
+
+            if not jobs:
+                return None
+
+            for job in jobs:
+                if job.attempts >= job.MAX_ATTEMPTS:
+                    logging.warning('Giving up on pre-rendering diffset '
+                                    'ID=%s after %d attempts.',
+                                    job.diffset_id, job.attempts)
+                    self.filter(pk=job.pk, claim_id=job.claim_id).delete()
+                    continue
+
+                claim_id = uuid.uuid4().hex
+                available_at = now + job.CLAIM_TIMEOUT
+
+                # Another worker may have claimed this job first, in which
+                # case its claim ID will have changed.
+                num_updated = (
+                    self.filter(pk=job.pk, claim_id=job.claim_id)
+                    .update(claim_id=claim_id,
+                            available_at=available_at,
+                            attempts=F('attempts') + 1))
+
+                if num_updated:
+                    job.claim_id = claim_id
+                    job.available_at = available_at
+                    job.attempts += 1
+
+                    return job
+
+    def complete(self, job):
+        """Remove a claimed job from the queue once it's been processed.
+
+        If the diffset was queued again while the job was being processed,
+        the job will be kept, so that it's processed again.
+
+        Args:
+            job (reviewboard.reviews.models.DiffPrerenderJob):
+                The job returned by :py:meth:`claim_next`.
+        """
+        self.filter(pk=job.pk, claim_id=job.claim_id).delete()
+
+    def release(self, job, delay):
+        """Release a claimed job, to be processed again later.
+
+        Args:
+            job (reviewboard.reviews.models.DiffPrerenderJob):
+                The job returned by :py:meth:`claim_next`.
+
+            delay (datetime.timedelta):
+                How long to wait before the job can be claimed again.
+        """
+        self.filter(pk=job.pk, claim_id=job.claim_id).update(
+            available_at=timezone.now() + delay,
+            claim_id=None)
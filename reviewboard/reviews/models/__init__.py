@@ -3,6 +3,7 @@ from __future__ import unicode_literals
 from reviewboard.reviews.models.base_comment import BaseComment
 from reviewboard.reviews.models.default_reviewer import DefaultReviewer
 from reviewboard.reviews.models.diff_comment import Comment
+from reviewboard.reviews.models.diff_prerender_job import DiffPrerenderJob
 from reviewboard.reviews.models.file_attachment_comment import \
     FileAttachmentComment
 from reviewboard.reviews.models.general_comment import GeneralComment
@@ -19,6 +20,7 @@ __all__ = [
     'BaseComment',
     'Comment',
     'DefaultReviewer',
+    'DiffPrerenderJob',
     'FileAttachmentComment',
     'GeneralComment',
     'Group',
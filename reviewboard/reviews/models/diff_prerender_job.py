@@ -0,0 +1,89 @@
+"""Definitions for the DiffPrerenderJob model."""
+
+from __future__ import unicode_literals
+
+from datetime import timedelta
+
+from django.db import models
+from django.utils import timezone
+from django.utils.encoding import python_2_unicode_compatible
+from django.utils.translation import ugettext_lazy as _
+
+from reviewboard.diffviewer.models import DiffSet
+from reviewboard.reviews.managers import DiffPrerenderJobManager
+
+
+@python_2_unicode_compatible
+class DiffPrerenderJob(models.Model):
+    """A pending job to pre-render the files in a diff.
+
+    Jobs are queued when a diff is uploaded or a review request with a new
+    diff is published, and are processed by the ``prerender_diffs``
+    management command. There's at most one job for any diffset. Jobs with
+    a higher priority are processed first.
+
+    A worker claims a job for :py:attr:`CLAIM_TIMEOUT` while processing it,
+    and the job is only removed once it's complete. If the worker stops
+    before then, the job can be claimed again once the claim expires.
+
+    Version Added:
+        4.0
+    """
+
+    #: The priority for diffs that have been uploaded to a draft.
+    PRIORITY_UPLOADED = 0
+
+    #: The priority for diffs that have just been published.
+    #:
+    #: Reviewers are likely to look at these soon.
+    PRIORITY_PUBLISHED = 10
+
+    #: How long a worker may hold a job before it can be claimed again.
+    CLAIM_TIMEOUT = timedelta(minutes=30)
+
+    #: The maximum number of times a job will be attempted.
+    MAX_ATTEMPTS = 3
+
+    #: The diffset to pre-render.
+    diffset = models.OneToOneField(
+        DiffSet,
+        related_name='prerender_job',
+        verbose_name=_('diff set'))
+
+    #: The priority of the job.
+    priority = models.IntegerField(_('priority'), default=PRIORITY_UPLOADED,
+                                   db_index=True)
+
+    #: The time the job was queued.
+    timestamp = models.DateTimeField(_('timestamp'), default=timezone.now)
+
+    #: The earliest time the job can be claimed by a worker.
+    available_at = models.DateTimeField(_('available at'),
+                                        default=timezone.now,
+                                        db_index=True)
+
+    #: A unique ID for the worker's claim on the job, if claimed.
+    claim_id = models.CharField(_('claim ID'), max_length=32, null=True,
+                                blank=True)
+
+    #: The number of times a worker has claimed the job.
+    attempts = models.PositiveIntegerField(_('attempts'), default=0)
+
+    objects = DiffPrerenderJobManager()
+
+    def __str__(self):
+        """Return a human-readable representation of the job.
+
+        Returns:
+            unicode:
+            A human-readable representation of the job.
+        """
+        return 'Pre-render job for diffset %s (priority %s)' % (
+            self.diffset_id, self.priority)
+
+    class Meta:
+        app_label = 'reviews'
+        db_table = 'reviews_diffprerenderjob'
+        ordering = ['-priority', 'timestamp']
+        verbose_name = _('Diff Pre-render Job')
+        verbose_name_plural = _('Diff Pre-render Jobs')
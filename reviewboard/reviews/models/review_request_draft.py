@@ -12,7 +12,7 @@ from djblets.db.managers import ConcurrencyManager
 
 from reviewboard.attachments.models import FileAttachment
 from reviewboard.changedescs.models import ChangeDescription
-from reviewboard.diffviewer.models import DiffSet
+from reviewboard.diffviewer.models import DiffSet, DiffSetHistory
 from reviewboard.reviews.errors import NotModifiedError, PublishError
 from reviewboard.reviews.fields import get_review_request_fields
 from reviewboard.reviews.models.group import Group
@@ -377,6 +377,11 @@ class ReviewRequestDraft(BaseReviewRequestDetails):
             self.diffset.timestamp = timestamp
             self.diffset.save(update_fields=('history', 'timestamp'))
 
+            # Store the size of the new diff, so that lists of review
+            # requests can show and sort by it without loading the diff.
+            DiffSetHistory.objects.populate_last_diff_line_counts(
+                [review_request.diffset_history])
+
         if self.changedesc:
             self.changedesc.user = user
             self.changedesc.timestamp = timestamp
@@ -0,0 +1,300 @@
+"""Background pre-rendering of diffs.
+
+When a diff is uploaded or published, it can be queued for pre-rendering.
+The ``prerender_diffs`` management command then processes the queue, fetching
+and patching the files, generating and highlighting the chunks and rendering
+the HTML for each file in the diff viewer, and storing the results in the
+cache. This saves the first reviewer to open the diff from waiting on all of
+that work.
+
+Queuing is enabled through the ``diffviewer_prerender_diffs`` site
+configuration setting, and should only be turned on when a worker is running.
+The worker must share a cache server (such as memcached) with the web server.
+
+Version Added:
+    4.0
+"""
+
+from __future__ import unicode_literals
+
+import logging
+from datetime import timedelta
+
+from django.core.urlresolvers import resolve
+from django.db.models.signals import post_save
+from django.http import HttpRequest, QueryDict
+from django.utils import translation
+from djblets.siteconfig.models import SiteConfiguration
+
+from reviewboard.diffviewer.diffutils import get_diff_files
+from reviewboard.diffviewer.models import DiffSet
+from reviewboard.reviews.models import DiffPrerenderJob, ReviewRequest
+from reviewboard.reviews.signals import review_request_published
+from reviewboard.site.middleware import LocalSiteMiddleware
+from reviewboard.site.urlresolvers import local_site_reverse
+
+
+logger = logging.getLogger(__name__)
+
+
+#: How long to wait before retrying a diffset without a review request.
+UNATTACHED_RETRY_DELAY = timedelta(minutes=1)
+
+
+def is_prerendering_enabled():
+    """Return whether diffs should be queued for pre-rendering.
+
+    Returns:
+        bool:
+        Whether pre-rendering is enabled.
+    """
+    siteconfig = SiteConfiguration.objects.get_current()
+
+    return siteconfig.get('diffviewer_prerender_diffs')
+
+
+def get_review_request_for_diffset(diffset):
+    """Return the review request that owns a diffset.
+
+    Args:
+        diffset (reviewboard.diffviewer.models.DiffSet):
+            The diffset, which may be published or on a draft.
+
+    Returns:
+        reviewboard.reviews.models.ReviewRequest:
+        The review request, or ``None`` if the diffset isn't (yet) attached
+        to one.
+    """
+    if diffset.history_id is not None:
+        queryset = ReviewRequest.objects.filter(
+            diffset_history=diffset.history_id)
+    else:
+        queryset = ReviewRequest.objects.filter(draft__diffset=diffset)
+
+    try:
+        return queryset.select_related('local_site').get()
+    except ReviewRequest.DoesNotExist:
+        return None
+
+
+def prerender_diffset(diffset, review_request):
+    """Pre-render all files in a diffset.
+
+    Each file is rendered by dispatching a request for its diff fragment
+    URL, as the diff viewer would when showing the file to the review
+    request's submitter (who can see both drafts and published diffs). This
+    caches the chunks for the file along with the rendered HTML, under the
+    same keys used for any user with the default diff viewer settings.
+
+    Binary and deleted files are skipped, as there's nothing to render for
+    them. Errors rendering a file are logged, and don't stop the rest of the
+    files from being rendered.
+
+    Args:
+        diffset (reviewboard.diffviewer.models.DiffSet):
+            The diffset to pre-render.
+
+        review_request (reviewboard.reviews.models.ReviewRequest):
+            The review request that owns the diffset.
+
+    Returns:
+        int:
+        The number of files that were rendered.
+    """
+    user = review_request.submitter
+    num_rendered = 0
+
+    for diff_file in get_diff_files(diffset=diffset):
+        if diff_file['binary'] or diff_file['deleted']:
+            continue
+
+        filediff = diff_file['filediff']
+        url = local_site_reverse(
+            'view-diff-fragment',
+            local_site=review_request.local_site,
+            kwargs={
+                'review_request_id': review_request.display_id,
+                'revision': diffset.revision,
+                'filediff_id': filediff.pk,
+            })
+
+        try:
+            response = _dispatch_get(url, user,
+                                     {'index': diff_file['index']})
+        except Exception as e:
+            logger.exception('Error pre-rendering filediff ID=%s in '
+                             'diffset ID=%s: %s',
+                             filediff.pk, diffset.pk, e)
+            continue
+
+        if response.status_code == 200:
+            num_rendered += 1
+        else:
+            logger.warning('Unable to pre-render filediff ID=%s in '
+                           'diffset ID=%s: HTTP %s',
+                           filediff.pk, diffset.pk, response.status_code)
+
+    return num_rendered
+
+
+def process_prerender_jobs(max_jobs=None):
+    """Process queued pre-render jobs.
+
+    Jobs are processed in order of priority, and then in the order they were
+    queued. A job is only removed from the queue once its diffset has been
+    rendered. If rendering fails, the job is retried after
+    :py:attr:`DiffPrerenderJob.CLAIM_TIMEOUT
+    <reviewboard.reviews.models.DiffPrerenderJob.CLAIM_TIMEOUT>`.
+
+    Diffsets that aren't attached to a review request yet (which happens
+    briefly while a diff is being uploaded) are retried after
+    :py:data:`UNATTACHED_RETRY_DELAY`.
+
+    Args:
+        max_jobs (int, optional):
+            The maximum number of jobs to process. By default, jobs are
+            processed until no more are available.
+
+    Returns:
+        int:
+        The number of jobs processed.
+    """
+    num_jobs = 0
+
+    while max_jobs is None or num_jobs < max_jobs:
+        job = DiffPrerenderJob.objects.claim_next()
+
+        if job is None:
+            break
+
+        num_jobs += 1
+        diffset = job.diffset
+        review_request = get_review_request_for_diffset(diffset)
+
+        if review_request is None:
+            logger.debug('Diffset ID=%s is not attached to a review request '
+                         'yet. Retrying pre-render later.',
+                         diffset.pk)
+            DiffPrerenderJob.objects.release(job,
+                                             delay=UNATTACHED_RETRY_DELAY)
+            continue
+
+        try:
+            num_rendered = prerender_diffset(diffset, review_request)
+        except Exception as e:
+            logger.exception('Error pre-rendering diffset ID=%s: %s',
+                             diffset.pk, e)
+            DiffPrerenderJob.objects.release(job, delay=job.CLAIM_TIMEOUT)
+            continue
+
+        DiffPrerenderJob.objects.complete(job)
+
+        logger.debug('Pre-rendered %d files in diffset ID=%s',
+                     num_rendered, diffset.pk)
+
+    return num_jobs
+
+
+def _dispatch_get(url, user, query):
+    """Dispatch a GET request to a view, as the given user.
+
+    Streaming responses are read in full before returning.
+
+    The URL is resolved and its view is called directly, with the Local Site
+    set up for the request by
+    :py:class:`~reviewboard.site.middleware.LocalSiteMiddleware`, and the
+    default language for the request activated.
+
+    Args:
+        url (unicode):
+            The URL to request.
+
+        user (django.contrib.auth.models.User):
+            The user making the request.
+
+        query (dict):
+            The query parameters for the request.
+
+    Returns:
+        django.http.HttpResponse:
+        The response from the view.
+    """
+    match = resolve(url)
+
+    request = HttpRequest()
+    request.method = 'GET'
+    request.path = url
+    request.path_info = url
+    request.user = user
+    request.GET = QueryDict(mutable=True)
+    request.GET.update(query)
+    request.resolver_match = match
+
+    LocalSiteMiddleware().process_view(request, match.func, match.args,
+                                       match.kwargs)
+
+    # Cache keys contain the language, which must match what the diff viewer
+    # will use by default.
+    with translation.override(translation.get_language_from_request(request)):
+        response = match.func(request, *match.args, **match.kwargs)
+
+        if response.streaming:
+            # Render the rest of the response, so that it's cached.
+            for content in response.streaming_content:
+                pass
+
+    return response
+
+
+def _on_diffset_saved(instance, created=False, raw=False, **kwargs):
+    """Queue a newly-uploaded diffset for pre-rendering.
+
+    Args:
+        instance (reviewboard.diffviewer.models.DiffSet):
+            The diffset that was saved.
+
+        created (bool):
+            Whether the diffset was newly created.
+
+        raw (bool):
+            Whether the diffset is being loaded from a fixture.
+
+        **kwargs (dict):
+            Additional keyword arguments from the signal.
+    """
+    if created and not raw and is_prerendering_enabled():
+        DiffPrerenderJob.objects.queue(
+            instance,
+            priority=DiffPrerenderJob.PRIORITY_UPLOADED)
+
+
+def _on_review_request_published(review_request, changedesc=None, **kwargs):
+    """Queue a newly-published diffset for pre-rendering.
+
+    Args:
+        review_request (reviewboard.reviews.models.ReviewRequest):
+            The review request that was published.
+
+        changedesc (reviewboard.changedescs.models.ChangeDescription,
+                    optional):
+            The change description for the publish, if this isn't the
+            first publish.
+
+        **kwargs (dict):
+            Additional keyword arguments from the signal.
+    """
+    if ((changedesc is None or 'diff' in changedesc.fields_changed) and
+        is_prerendering_enabled()):
+        diffset = review_request.get_latest_diffset()
+
+        if diffset is not None:
+            DiffPrerenderJob.objects.queue(
+                diffset,
+                priority=DiffPrerenderJob.PRIORITY_PUBLISHED)
+
+
+def connect_signals():
+    """Connect the signals used to queue diffs for pre-rendering."""
+    post_save.connect(_on_diffset_saved, sender=DiffSet)
+    review_request_published.connect(_on_review_request_published,
+                                     sender=ReviewRequest)
@@ -11,6 +11,7 @@ from django.test.client import RequestFactory
 from django.utils import six, timezone
 from django.utils.timezone import utc
 from djblets.testing.decorators import add_fixtures
+from djblets.util.compat.django.template.loader import render_to_string
 from kgb import SpyAgency
 
 from reviewboard.changedescs.models import ChangeDescription
@@ -203,6 +204,56 @@ class BaseReviewRequestPageEntryTests(SpyAgency, TestCase):
         self.assertEqual(logging.exception.spy.calls[0].args[0],
                          'Error rendering template for %s (ID=%s): %s')
 
+    def test_render_to_string_with_cache(self):
+        """Testing BaseReviewRequestPageEntry.render_to_string caches HTML
+        when build_render_etag_data returns data
+        """
+        entry = BaseReviewRequestPageEntry(
+            data=self.data,
+            entry_id='test',
+            added_timestamp=datetime(2017, 9, 7, 17, 0, 0, tzinfo=utc))
+        entry.template_name = 'reviews/entries/base.html'
+
+        self.spy_on(entry.build_render_etag_data,
+                    call_fake=lambda entry: 'abc')
+        self.spy_on(render_to_string)
+
+        context = RequestContext(self.request, {
+            'last_visited': timezone.now(),
+        })
+
+        html = entry.render_to_string(self.request, context)
+        self.assertNotEqual(html, '')
+        self.assertEqual(len(render_to_string.spy.calls), 1)
+
+        self.assertEqual(entry.render_to_string(self.request, context), html)
+        self.assertEqual(len(render_to_string.spy.calls), 1)
+
+        # Any updates to the entry should cause it to be rendered again.
+        entry.updated_timestamp = datetime(2017, 9, 8, 17, 0, 0, tzinfo=utc)
+
+        entry.render_to_string(self.request, context)
+        self.assertEqual(len(render_to_string.spy.calls), 2)
+
+    def test_render_to_string_without_cache(self):
+        """Testing BaseReviewRequestPageEntry.render_to_string does not cache
+        HTML by default
+        """
+        entry = BaseReviewRequestPageEntry(data=self.data,
+                                           entry_id='test',
+                                           added_timestamp=None)
+        entry.template_name = 'reviews/entries/base.html'
+
+        self.spy_on(render_to_string)
+
+        context = RequestContext(self.request, {
+            'last_visited': timezone.now(),
+        })
+
+        entry.render_to_string(self.request, context)
+        entry.render_to_string(self.request, context)
+        self.assertEqual(len(render_to_string.spy.calls), 2)
+
     def test_is_entry_new_with_timestamp(self):
         """Testing BaseReviewRequestPageEntry.is_entry_new with timestamp"""
         entry = BaseReviewRequestPageEntry(
@@ -1453,6 +1504,50 @@ class ReviewEntryTests(TestCase):
                 'general_comments': [comment],
             })
 
+    def test_build_render_etag_data_with_issue_status_change(self):
+        """Testing ReviewEntry.build_render_etag_data after changing the
+        status of an issue
+        """
+        comment = self.create_general_comment(self.review,
+                                              issue_opened=True,
+                                              issue_status=BaseComment.OPEN)
+
+        etag_data = self._build_render_etag_data()
+
+        comment.issue_status = BaseComment.RESOLVED
+        comment.save()
+
+        self.assertNotEqual(self._build_render_etag_data(), etag_data)
+
+    def test_build_render_etag_data_with_revoked_ship_it(self):
+        """Testing ReviewEntry.build_render_etag_data after revoking a
+        Ship It
+        """
+        self.review.ship_it = True
+        self.review.save(update_fields=('ship_it',))
+
+        etag_data = self._build_render_etag_data()
+
+        self.review.revoke_ship_it(self.review.user)
+
+        self.assertNotEqual(self._build_render_etag_data(), etag_data)
+
+    def _build_render_etag_data(self):
+        """Return the render ETag data for a freshly-built entry.
+
+        Returns:
+            unicode:
+            The ETag data for the review entry.
+        """
+        data = ReviewRequestPageData(review_request=self.review_request,
+                                     request=self.request)
+        data.query_data_pre_etag()
+        data.query_data_post_etag()
+
+        entry = list(ReviewEntry.build_entries(data))[0]
+
+        return entry.build_render_etag_data()
+
 
 class ChangeEntryTests(TestCase):
     """Unit tests for ChangeEntry."""
@@ -1864,3 +1959,17 @@ class ChangeEntryTests(TestCase):
         self.assertFalse(entry.is_entry_new(
             last_visited=self.changedesc.timestamp + timedelta(days=1),
             user=user))
+
+    def test_build_render_etag_data_with_text_change(self):
+        """Testing ChangeEntry.build_render_etag_data after changing the
+        Change Description text
+        """
+        entry = ChangeEntry(data=self.data,
+                            changedesc=self.changedesc)
+        etag_data = entry.build_render_etag_data()
+
+        self.changedesc.text = 'New close description'
+        entry = ChangeEntry(data=self.data,
+                            changedesc=self.changedesc)
+
+        self.assertNotEqual(entry.build_render_etag_data(), etag_data)
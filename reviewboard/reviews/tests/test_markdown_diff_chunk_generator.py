@@ -0,0 +1,25 @@
+"""Unit tests for reviewboard.reviews.chunk_generators."""
+
+from __future__ import unicode_literals
+
+from reviewboard.reviews.chunk_generators import MarkdownDiffChunkGenerator
+from reviewboard.testing import TestCase
+
+
+class MarkdownDiffChunkGeneratorTests(TestCase):
+    """Unit tests for MarkdownDiffChunkGenerator."""
+
+    def test_get_line_changed_regions_with_markup_only(self):
+        """Testing MarkdownDiffChunkGenerator.get_line_changed_regions with
+        lines that only differ in markup
+        """
+        generator = MarkdownDiffChunkGenerator(old=[],
+                                               new=[],
+                                               orig_filename='file1.md',
+                                               modified_filename='file2.md')
+
+        self.assertEqual(
+            generator.get_line_changed_regions(
+                1, '<p><img src="old.png"></p>',
+                1, '<p><img src="new.png"></p>'),
+            ([], []))
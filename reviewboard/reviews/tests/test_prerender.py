@@ -0,0 +1,279 @@
+"""Unit tests for reviewboard.reviews.prerender."""
+
+from __future__ import unicode_literals
+
+from datetime import timedelta
+
+from django.utils import timezone
+from kgb import SpyAgency
+
+from reviewboard.diffviewer.renderers import DiffRenderer
+from reviewboard.reviews import prerender
+from reviewboard.reviews.models import DiffPrerenderJob
+from reviewboard.reviews.prerender import process_prerender_jobs
+from reviewboard.scmtools.core import PRE_CREATION
+from reviewboard.site.urlresolvers import local_site_reverse
+from reviewboard.testing import TestCase
+
+
+class DiffPrerenderJobManagerTests(TestCase):
+    """Unit tests for reviewboard.reviews.managers.DiffPrerenderJobManager."""
+
+    fixtures = ['test_scmtools']
+
+    def test_queue_with_duplicate(self):
+        """Testing DiffPrerenderJobManager.queue with an already-queued
+        diffset
+        """
+        diffset = self.create_diffset(repository=self.create_repository())
+
+        DiffPrerenderJob.objects.queue(
+            diffset, priority=DiffPrerenderJob.PRIORITY_PUBLISHED)
+        DiffPrerenderJob.objects.queue(
+            diffset, priority=DiffPrerenderJob.PRIORITY_UPLOADED)
+
+        job = DiffPrerenderJob.objects.get()
+        self.assertEqual(job.diffset, diffset)
+        self.assertEqual(job.priority, DiffPrerenderJob.PRIORITY_PUBLISHED)
+
+    def test_queue_with_higher_priority(self):
+        """Testing DiffPrerenderJobManager.queue raises the priority of an
+        already-queued diffset
+        """
+        diffset = self.create_diffset(repository=self.create_repository())
+
+        DiffPrerenderJob.objects.queue(
+            diffset, priority=DiffPrerenderJob.PRIORITY_UPLOADED)
+        DiffPrerenderJob.objects.queue(
+            diffset, priority=DiffPrerenderJob.PRIORITY_PUBLISHED)
+
+        job = DiffPrerenderJob.objects.get()
+        self.assertEqual(job.priority, DiffPrerenderJob.PRIORITY_PUBLISHED)
+
+    def test_claim_next(self):
+        """Testing DiffPrerenderJobManager.claim_next"""
+        repository = self.create_repository()
+        diffset1 = self.create_diffset(repository=repository)
+        diffset2 = self.create_diffset(repository=repository)
+        diffset3 = self.create_diffset(repository=repository)
+
+        DiffPrerenderJob.objects.queue(
+            diffset1, priority=DiffPrerenderJob.PRIORITY_UPLOADED)
+        DiffPrerenderJob.objects.queue(
+            diffset2, priority=DiffPrerenderJob.PRIORITY_PUBLISHED)
+        DiffPrerenderJob.objects.queue(
+            diffset3, priority=DiffPrerenderJob.PRIORITY_UPLOADED)
+
+        self.assertEqual(
+            [
+                DiffPrerenderJob.objects.claim_next().diffset
+                for i in range(3)
+            ],
+            [diffset2, diffset1, diffset3])
+        self.assertIsNone(DiffPrerenderJob.objects.claim_next())
+
+        # Claimed jobs stay in the queue until they're complete.
+        self.assertEqual(DiffPrerenderJob.objects.count(), 3)
+
+    def test_claim_next_with_expired_claim(self):
+        """Testing DiffPrerenderJobManager.claim_next with a job whose
+        claim has expired
+        """
+        diffset = self.create_diffset(repository=self.create_repository())
+        DiffPrerenderJob.objects.queue(
+            diffset, priority=DiffPrerenderJob.PRIORITY_UPLOADED)
+
+        job1 = DiffPrerenderJob.objects.claim_next()
+        self.assertIsNone(DiffPrerenderJob.objects.claim_next())
+
+        DiffPrerenderJob.objects.update(
+            available_at=timezone.now() - timedelta(seconds=1))
+
+        job2 = DiffPrerenderJob.objects.claim_next()
+        self.assertEqual(job2.pk, job1.pk)
+        self.assertEqual(job2.attempts, 2)
+        self.assertNotEqual(job2.claim_id, job1.claim_id)
+
+        # The expired claim can no longer complete the job.
+        DiffPrerenderJob.objects.complete(job1)
+        self.assertTrue(DiffPrerenderJob.objects.exists())
+
+        DiffPrerenderJob.objects.complete(job2)
+        self.assertFalse(DiffPrerenderJob.objects.exists())
+
+    def test_claim_next_with_max_attempts(self):
+        """Testing DiffPrerenderJobManager.claim_next removes jobs that
+        have been attempted too many times
+        """
+        diffset = self.create_diffset(repository=self.create_repository())
+        DiffPrerenderJob.objects.queue(
+            diffset, priority=DiffPrerenderJob.PRIORITY_UPLOADED)
+        DiffPrerenderJob.objects.update(
+            attempts=DiffPrerenderJob.MAX_ATTEMPTS)
+
+        self.assertIsNone(DiffPrerenderJob.objects.claim_next())
+        self.assertFalse(DiffPrerenderJob.objects.exists())
+
+    def test_complete_with_requeue(self):
+        """Testing DiffPrerenderJobManager.complete keeps a job that was
+        queued again while claimed
+        """
+        diffset = self.create_diffset(repository=self.create_repository())
+        DiffPrerenderJob.objects.queue(
+            diffset, priority=DiffPrerenderJob.PRIORITY_UPLOADED)
+
+        job = DiffPrerenderJob.objects.claim_next()
+        DiffPrerenderJob.objects.queue(
+            diffset, priority=DiffPrerenderJob.PRIORITY_PUBLISHED)
+        DiffPrerenderJob.objects.complete(job)
+
+        job = DiffPrerenderJob.objects.claim_next()
+        self.assertIsNotNone(job)
+        self.assertEqual(job.diffset, diffset)
+        self.assertEqual(job.priority, DiffPrerenderJob.PRIORITY_PUBLISHED)
+
+    def test_release(self):
+        """Testing DiffPrerenderJobManager.release"""
+        diffset = self.create_diffset(repository=self.create_repository())
+        DiffPrerenderJob.objects.queue(
+            diffset, priority=DiffPrerenderJob.PRIORITY_UPLOADED)
+
+        job = DiffPrerenderJob.objects.claim_next()
+        DiffPrerenderJob.objects.release(job, delay=timedelta(minutes=1))
+
+        job = DiffPrerenderJob.objects.get()
+        self.assertIsNone(job.claim_id)
+        self.assertGreater(job.available_at, timezone.now())
+        self.assertIsNone(DiffPrerenderJob.objects.claim_next())
+
+
+class PrerenderTests(SpyAgency, TestCase):
+    """Unit tests for reviewboard.reviews.prerender."""
+
+    fixtures = ['test_scmtools', 'test_users']
+
+    def test_queue_on_upload(self):
+        """Testing diffsets are queued for pre-rendering when uploaded"""
+        review_request = self.create_review_request(create_repository=True)
+
+        with self.siteconfig_settings({'diffviewer_prerender_diffs': True}):
+            diffset = self.create_diffset(review_request, draft=True)
+
+        job = DiffPrerenderJob.objects.get()
+        self.assertEqual(job.diffset, diffset)
+        self.assertEqual(job.priority, DiffPrerenderJob.PRIORITY_UPLOADED)
+
+    def test_queue_on_upload_when_disabled(self):
+        """Testing diffsets are not queued for pre-rendering when uploaded
+        with pre-rendering disabled
+        """
+        review_request = self.create_review_request(create_repository=True)
+        self.create_diffset(review_request, draft=True)
+
+        self.assertFalse(DiffPrerenderJob.objects.exists())
+
+    def test_queue_on_publish(self):
+        """Testing diffsets are queued for pre-rendering when published"""
+        review_request = self.create_review_request(create_repository=True)
+        review_request.target_people.add(review_request.submitter)
+
+        with self.siteconfig_settings({'diffviewer_prerender_diffs': True}):
+            diffset = self.create_diffset(review_request, draft=True)
+            review_request.publish(review_request.submitter)
+
+        job = DiffPrerenderJob.objects.get()
+        self.assertEqual(job.diffset, diffset)
+        self.assertEqual(job.priority, DiffPrerenderJob.PRIORITY_PUBLISHED)
+
+    def test_process_prerender_jobs(self):
+        """Testing process_prerender_jobs caches the rendered diff"""
+        review_request = self.create_review_request(create_repository=True,
+                                                    publish=True)
+        diffset = self.create_diffset(review_request)
+        filediff = self.create_filediff(
+            diffset,
+            source_revision=PRE_CREATION,
+            diff=(
+                b'--- README\n'
+                b'+++ README\n'
+                b'@@ -0,0 +1,2 @@\n'
+                b'+Hello,\n'
+                b'+world!\n'
+            ))
+
+        DiffPrerenderJob.objects.queue(
+            diffset, priority=DiffPrerenderJob.PRIORITY_PUBLISHED)
+
+        self.spy_on(DiffRenderer.render_to_iter_uncached)
+
+        self.assertEqual(process_prerender_jobs(), 1)
+        self.assertEqual(len(DiffRenderer.render_to_iter_uncached.calls), 1)
+        self.assertFalse(DiffPrerenderJob.objects.exists())
+
+        # The diff viewer should now be able to use the cached diff.
+        rsp = self.client.get(
+            local_site_reverse(
+                'view-diff-fragment',
+                kwargs={
+                    'review_request_id': review_request.display_id,
+                    'revision': diffset.revision,
+                    'filediff_id': filediff.pk,
+                }),
+            data={'index': 0})
+
+        self.assertEqual(rsp.status_code, 200)
+        self.assertIn(b'world!', b''.join(rsp.streaming_content))
+        self.assertEqual(len(DiffRenderer.render_to_iter_uncached.calls), 1)
+
+    def test_process_prerender_jobs_without_review_request(self):
+        """Testing process_prerender_jobs with a diffset not attached to a
+        review request
+        """
+        diffset = self.create_diffset(repository=self.create_repository())
+        DiffPrerenderJob.objects.queue(
+            diffset, priority=DiffPrerenderJob.PRIORITY_UPLOADED)
+
+        self.spy_on(DiffRenderer.render_to_iter_uncached)
+
+        self.assertEqual(process_prerender_jobs(), 1)
+        self.assertFalse(DiffRenderer.render_to_iter_uncached.called)
+
+        # The job should be retried once the diffset is attached.
+        job = DiffPrerenderJob.objects.get()
+        self.assertIsNone(job.claim_id)
+        self.assertGreater(job.available_at, timezone.now())
+
+    def test_process_prerender_jobs_with_draft(self):
+        """Testing process_prerender_jobs with a diffset on a draft"""
+        review_request = self.create_review_request(create_repository=True)
+        diffset = self.create_diffset(review_request, draft=True)
+        self.create_filediff(diffset)
+
+        DiffPrerenderJob.objects.queue(
+            diffset, priority=DiffPrerenderJob.PRIORITY_UPLOADED)
+
+        self.spy_on(DiffRenderer.render_to_iter_uncached)
+
+        self.assertEqual(process_prerender_jobs(), 1)
+        self.assertEqual(len(DiffRenderer.render_to_iter_uncached.calls), 1)
+        self.assertFalse(DiffPrerenderJob.objects.exists())
+
+    def test_process_prerender_jobs_with_error(self):
+        """Testing process_prerender_jobs with an error processing a job"""
+        review_request = self.create_review_request(create_repository=True,
+                                                    publish=True)
+        diffset = self.create_diffset(review_request)
+
+        DiffPrerenderJob.objects.queue(
+            diffset, priority=DiffPrerenderJob.PRIORITY_PUBLISHED)
+
+        self.spy_on(prerender.prerender_diffset,
+                    call_fake=lambda *args, **kwargs: 1 / 0)
+
+        self.assertEqual(process_prerender_jobs(), 1)
+
+        # The job should be kept to be retried later.
+        job = DiffPrerenderJob.objects.get()
+        self.assertIsNone(job.claim_id)
+        self.assertEqual(job.attempts, 1)
+        self.assertGreater(job.available_at, timezone.now())
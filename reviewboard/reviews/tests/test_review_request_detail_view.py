@@ -13,7 +13,9 @@ from djblets.siteconfig.models import SiteConfiguration
 from kgb import SpyAgency
 
 from reviewboard.extensions.base import Extension, get_extension_manager
-from reviewboard.reviews.detail import InitialStatusUpdatesEntry, ReviewEntry
+from reviewboard.reviews.detail import (InitialStatusUpdatesEntry,
+                                        PlaceholderEntry,
+                                        ReviewEntry)
 from reviewboard.reviews.fields import get_review_request_fieldsets
 from reviewboard.reviews.models import Comment, GeneralComment, Review
 from reviewboard.site.urlresolvers import local_site_reverse
@@ -383,6 +385,43 @@ class ReviewRequestDetailViewTests(SpyAgency, TestCase):
         # Make sure they're not equal
         self.assertNotEqual(etag1, etag2)
 
+    def test_get_with_placeholder_entries(self):
+        """Testing ReviewRequestDetailView.get with more entries than
+        review_request_page_max_rendered_entries
+        """
+        review_request = self.create_review_request(publish=True)
+        review1 = self.create_review(
+            review_request,
+            timestamp=review_request.time_added + timedelta(days=1),
+            publish=True)
+        review2 = self.create_review(
+            review_request,
+            timestamp=review1.timestamp + timedelta(days=1),
+            publish=True)
+
+        settings = {
+            'review_request_page_max_rendered_entries': 1,
+        }
+
+        with self.siteconfig_settings(settings, reload_settings=False):
+            response = self.client.get(review_request.get_absolute_url())
+
+        self.assertEqual(response.status_code, 200)
+
+        entries = response.context['entries']['main']
+        self.assertEqual(len(entries), 2)
+        self.assertIsInstance(entries[0], PlaceholderEntry)
+        self.assertEqual(entries[0].entry_id, six.text_type(review1.pk))
+        self.assertIsInstance(entries[1], ReviewEntry)
+        self.assertEqual(entries[1].review, review2)
+
+        content = response.content.decode('utf-8')
+        self.assertIn('review-request-page-entry-placeholder', content)
+        self.assertIn('new RB.ReviewRequestPage.PlaceholderEntryView(',
+                      content)
+        self.assertIn('entryViewClass: RB.ReviewRequestPage.ReviewEntryView,',
+                      content)
+
     def test_review_request_box_template_hooks(self):
         """Testing ReviewRequestDetailView template hooks for the review
         request box
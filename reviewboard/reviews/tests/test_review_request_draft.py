@@ -10,6 +10,7 @@ from reviewboard.accounts.models import Profile
 from reviewboard.attachments.models import FileAttachment
 from reviewboard.changedescs.models import ChangeDescription
 from reviewboard.diffviewer.features import dvcs_feature
+from reviewboard.diffviewer.models import DiffSetHistory
 from reviewboard.reviews.errors import PublishError
 from reviewboard.reviews.fields import (BaseEditableField,
                                         BaseTextAreaField,
@@ -764,6 +765,39 @@ class ReviewRequestDraftTests(TestCase):
             self.assertEqual(review_request.status,
                              ReviewRequest.PENDING_REVIEW)
 
+    def test_publish_with_diff_stores_line_counts(self):
+        """Testing ReviewRequestDraft.publish stores the line counts of the
+        new diff on the diffset history
+        """
+        review_request = self.create_review_request(create_repository=True,
+                                                    publish=True)
+        diffset = self.create_diffset(review_request)
+        self.create_filediff(diffset,
+                             diff=self.DEFAULT_GIT_FILEDIFF_DATA_DIFF)
+
+        history = review_request.diffset_history
+        self.assertEqual(history.get_last_diff_line_counts(), {
+            'raw_insert_count': 1,
+            'raw_delete_count': 1,
+        })
+
+        diffset = self.create_diffset(review_request, revision=2, draft=True)
+        self.create_filediff(diffset,
+                             diff=self.DEFAULT_GIT_FILEDIFF_DATA_DIFF)
+        self.create_filediff(diffset,
+                             source_file='/test-file-2',
+                             dest_file='/test-file-2',
+                             diff=self.DEFAULT_GIT_FILEDIFF_DATA_DIFF)
+
+        draft = review_request.get_draft()
+        draft.target_people = [review_request.submitter]
+        draft.publish()
+
+        history = DiffSetHistory.objects.get(pk=history.pk)
+        self.assertEqual(history.last_diff_insert_count, 2)
+        self.assertEqual(history.last_diff_delete_count, 2)
+        self.assertEqual(history.last_diff_line_count, 4)
+
     def _get_draft(self):
         """Convenience function for getting a new draft to work with."""
         review_request = self.create_review_request(publish=True)
@@ -4,11 +4,13 @@ from __future__ import unicode_literals
 
 from datetime import datetime, timedelta
 
+from django.contrib.auth.models import AnonymousUser
 from django.test.client import RequestFactory
-from django.utils import timezone
+from django.utils import six, timezone
 
 from reviewboard.reviews.detail import (ChangeEntry,
                                         InitialStatusUpdatesEntry,
+                                        PlaceholderEntry,
                                         ReviewEntry,
                                         ReviewRequestEntry,
                                         ReviewRequestPageData)
@@ -418,3 +420,186 @@ class ReviewRequestPageDataTests(TestCase):
         # Create some status updates.
         self.status_update1 = self.create_status_update(self.review_request)
         self.status_update2 = self.create_status_update(self.review_request)
+
+
+class ReviewRequestPageDataIncrementalTests(TestCase):
+    """Unit tests for ReviewRequestPageData with incremental queries."""
+
+    fixtures = ['test_users']
+
+    def setUp(self):
+        super(ReviewRequestPageDataIncrementalTests, self).setUp()
+
+        self.request = RequestFactory().get('/r/1/')
+        self.request.user = AnonymousUser()
+
+        self.review_request = self.create_review_request(
+            publish=True,
+            time_added=datetime(2017, 9, 7, 17, 0, 0, tzinfo=timezone.utc))
+
+        self.review1 = self.create_review(
+            self.review_request,
+            timestamp=self.review_request.time_added + timedelta(days=1),
+            publish=True)
+        self.comment1 = self.create_general_comment(self.review1,
+                                                    issue_opened=True)
+
+        self.review2 = self.create_review(
+            self.review_request,
+            timestamp=self.review1.timestamp + timedelta(days=1),
+            publish=True)
+        self.comment2 = self.create_general_comment(self.review2)
+
+        self.changedesc1 = self.review_request.changedescs.create(
+            timestamp=self.review1.timestamp + timedelta(hours=1),
+            public=True)
+        self.changedesc2 = self.review_request.changedescs.create(
+            timestamp=self.review2.timestamp + timedelta(hours=1),
+            public=True)
+
+    def test_query_data_with_since(self):
+        """Testing ReviewRequestPageData with since"""
+        data = self._query_data(
+            since=self.review1.timestamp + timedelta(hours=2))
+
+        self.assertEqual(data.reviews, [self.review2])
+        self.assertEqual(data.changedescs, [self.changedesc2])
+        self.assertEqual(data.latest_changedesc_timestamp,
+                         self.changedesc2.timestamp)
+        self.assertEqual(data.all_comments, [self.comment2])
+
+        # All issues are still loaded for the issue summary table.
+        self.assertEqual(data.issues, [self.comment1])
+        self.assertEqual(data.issues[0].review_obj, self.review1)
+        self.assertEqual(data.issue_counts['open'], 1)
+
+    def test_query_data_with_since_and_reply(self):
+        """Testing ReviewRequestPageData with since and a newer reply to an
+        older review
+        """
+        reply = self.create_reply(
+            self.review1,
+            timestamp=self.review2.timestamp + timedelta(days=1),
+            publish=True)
+
+        data = self._query_data(
+            since=self.review2.timestamp + timedelta(hours=2))
+
+        self.assertEqual(data.reviews, [reply, self.review1])
+        self.assertEqual(data.changedescs, [])
+        self.assertEqual(data.latest_changedesc_timestamp,
+                         self.changedesc2.timestamp)
+        self.assertEqual(data.latest_timestamps_by_review_id,
+                         {self.review1.pk: reply.timestamp})
+
+    def test_query_data_with_entry_ids(self):
+        """Testing ReviewRequestPageData with entry_ids"""
+        data = self._query_data(entry_ids={
+            'review': {six.text_type(self.review1.pk)},
+            'changedesc': {six.text_type(self.changedesc1.pk), 'invalid'},
+        })
+
+        self.assertEqual(data.reviews, [self.review1])
+        self.assertEqual(data.changedescs, [self.changedesc1])
+        self.assertEqual(data.issues, [self.comment1])
+
+    def test_query_data_with_max_rendered_entries(self):
+        """Testing ReviewRequestPageData with max_rendered_entries"""
+        data = self._query_data(max_rendered_entries=2)
+
+        self.assertEqual(data.reviews, [self.review2])
+        self.assertEqual(data.changedescs, [self.changedesc2])
+        self.assertEqual(data.latest_changedesc_timestamp,
+                         self.changedesc2.timestamp)
+        self.assertEqual(data.latest_review_timestamp,
+                         self.review2.timestamp)
+        self.assertEqual(data.all_comments, [self.comment2])
+        self.assertEqual(data.issues, [self.comment1])
+
+        entries = data.get_entries()['main']
+
+        self.assertEqual(
+            [
+                (type(entry), entry.entry_type_id, entry.entry_id)
+                for entry in entries
+            ],
+            [
+                (PlaceholderEntry, 'review',
+                 six.text_type(self.review1.pk)),
+                (PlaceholderEntry, 'changedesc',
+                 six.text_type(self.changedesc1.pk)),
+                (ReviewEntry, 'review', six.text_type(self.review2.pk)),
+                (ChangeEntry, 'changedesc',
+                 six.text_type(self.changedesc2.pk)),
+            ])
+        self.assertEqual(entries[0].username, self.review1.user.username)
+        self.assertIsNone(entries[1].username)
+        self.assertTrue(entries[0].collapsed)
+
+    def test_query_data_with_max_rendered_entries_and_last_visited(self):
+        """Testing ReviewRequestPageData with max_rendered_entries and
+        entries updated since the last visit
+        """
+        data = self._query_data(
+            max_rendered_entries=1,
+            last_visited=self.review1.timestamp + timedelta(minutes=30))
+
+        self.assertEqual(data.reviews, [self.review2])
+        self.assertEqual(data.changedescs,
+                         [self.changedesc2, self.changedesc1])
+        self.assertEqual(
+            [entry.entry_id for entry in data.placeholders],
+            [six.text_type(self.review1.pk)])
+
+    def test_query_data_with_max_rendered_entries_and_reply(self):
+        """Testing ReviewRequestPageData with max_rendered_entries and a
+        newer reply to an older review
+        """
+        reply = self.create_reply(
+            self.review1,
+            timestamp=self.changedesc2.timestamp + timedelta(days=1),
+            publish=True)
+
+        data = self._query_data(max_rendered_entries=1)
+
+        self.assertEqual(data.reviews, [reply, self.review1])
+        self.assertEqual(data.changedescs, [])
+        self.assertEqual(data.latest_review_timestamp, reply.timestamp)
+        self.assertEqual(
+            [entry.entry_id for entry in data.placeholders],
+            [
+                six.text_type(self.review2.pk),
+                six.text_type(self.changedesc2.pk),
+                six.text_type(self.changedesc1.pk),
+            ])
+
+    def test_query_data_with_max_rendered_entries_not_reached(self):
+        """Testing ReviewRequestPageData with max_rendered_entries greater
+        than the number of entries
+        """
+        data = self._query_data(max_rendered_entries=4)
+
+        self.assertEqual(data.reviews, [self.review2, self.review1])
+        self.assertEqual(data.changedescs,
+                         [self.changedesc2, self.changedesc1])
+        self.assertEqual(data.placeholders, [])
+        self.assertIsNone(data.entry_ids)
+
+    def _query_data(self, **kwargs):
+        """Return page data that has been queried.
+
+        Args:
+            **kwargs (dict):
+                Keyword arguments for the page data.
+
+        Returns:
+            reviewboard.reviews.detail.ReviewRequestPageData:
+            The queried page data.
+        """
+        data = ReviewRequestPageData(review_request=self.review_request,
+                                     request=self.request,
+                                     **kwargs)
+        data.query_data_pre_etag()
+        data.query_data_post_etag()
+
+        return data
@@ -324,6 +324,52 @@ class ReviewRequestUpdatesViewTests(TestCase):
         self.assertTrue(html.startswith('<div id="issue-summary"'))
         self.assertTrue(html.endswith('\n</div>'))
 
+    def test_get_with_since_and_reply(self):
+        """Testing ReviewRequestUpdatesView GET with ?since=... and a newer
+        reply to an older review
+        """
+        self.create_reply(
+            self.review1,
+            timestamp=self.review2.timestamp + timedelta(days=1),
+            publish=True)
+
+        updates = self._get_updates({
+            'since': (self.review2.timestamp + timedelta(hours=1)).isoformat(),
+        })
+        self.assertEqual(len(updates), 2)
+
+        metadata, html = updates[0]
+        self.assertEqual(metadata['type'], 'entry')
+        self.assertEqual(metadata['entryType'], 'review')
+        self.assertEqual(metadata['entryID'], '1')
+        self.assertEqual(metadata['updatedTimestamp'],
+                         '2017-09-28 17:00:00+00:00')
+
+        # The issue summary table must include issues from all reviews.
+        metadata, html = updates[1]
+        self.assertEqual(metadata['type'], 'issue-summary-table')
+        self.assertIn('data-issue-id="%s"' % self.general_comment.pk, html)
+
+    def test_get_with_since_and_older_issues(self):
+        """Testing ReviewRequestUpdatesView GET with ?since=... includes
+        issues from older reviews in the issue summary table
+        """
+        updates = self._get_updates({
+            'since': (self.review1.timestamp + timedelta(days=1)).isoformat(),
+        })
+        self.assertEqual(len(updates), 2)
+
+        metadata, html = updates[1]
+        self.assertEqual(metadata['type'], 'issue-summary-table')
+        self.assertIn('data-issue-id="%s"' % self.general_comment.pk, html)
+
+    def test_get_with_invalid_since(self):
+        """Testing ReviewRequestUpdatesView GET with invalid ?since=..."""
+        response = self.client.get(self._build_url(), {
+            'since': 'not-a-date',
+        })
+        self.assertEqual(response.status_code, 400)
+
     def test_post(self):
         """Testing ReviewRequestUpdatesView POST not allowed"""
         # 1 SQL query for SiteConfiguration in the middleware.
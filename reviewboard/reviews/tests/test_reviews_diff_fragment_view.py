@@ -2,6 +2,9 @@
 
 from __future__ import unicode_literals
 
+import json
+
+from reviewboard.scmtools.core import PRE_CREATION
 from reviewboard.site.urlresolvers import local_site_reverse
 from reviewboard.testing import TestCase
 
@@ -146,3 +149,67 @@ class ReviewsDiffFragmentViewTests(TestCase):
             b'for FileDiff %d.'
             % (base_filediff.pk, filediff.pk),
             rsp.content)
+
+    def test_timings_as_admin(self):
+        """Testing ReviewsDiffFragmentView.get with ?timings=1 as an
+        administrator
+        """
+        self.client.login(username='admin', password='admin')
+
+        rsp = self._get_fragment({'timings': '1'})
+        self.assertEqual(rsp.status_code, 200)
+        self.assertEqual(rsp['Content-Type'], 'application/json')
+        self.assertIn('render;dur=', rsp['Server-Timing'])
+
+        timings = json.loads(rsp.content.decode('utf-8'))
+        self.assertIn('render', timings['stages'])
+        self.assertIn('html', timings['cache'])
+        self.assertEqual(len(timings['files']), 1)
+        self.assertEqual(timings['files'][0]['filename'], '/test-file')
+        self.assertIn('render', timings['files'][0]['stages'])
+
+    def test_timings_as_anonymous(self):
+        """Testing ReviewsDiffFragmentView.get with ?timings=1 as an
+        anonymous user
+        """
+        with self.siteconfig_settings({'diffviewer_send_server_timing': True}):
+            rsp = self._get_fragment({'timings': '1'})
+
+        self.assertEqual(rsp.status_code, 200)
+        self.assertNotEqual(rsp['Content-Type'], 'application/json')
+        self.assertIn('Server-Timing', rsp)
+
+    def _get_fragment(self, data):
+        """Return the diff fragment for a file in a new review request.
+
+        Args:
+            data (dict):
+                The query parameters for the request.
+
+        Returns:
+            django.http.HttpResponse:
+            The response for the diff fragment.
+        """
+        review_request = self.create_review_request(create_repository=True,
+                                                    publish=True)
+        diffset = self.create_diffset(review_request)
+        filediff = self.create_filediff(
+            diffset,
+            source_revision=PRE_CREATION,
+            diff=(
+                b'--- README\n'
+                b'+++ README\n'
+                b'@@ -0,0 +1,2 @@\n'
+                b'+Hello,\n'
+                b'+world!\n'
+            ))
+
+        return self.client.get(
+            local_site_reverse(
+                'view-diff-fragment',
+                kwargs={
+                    'review_request_id': review_request.display_id,
+                    'revision': diffset.revision,
+                    'filediff_id': filediff.pk,
+                }),
+            data=data)
@@ -287,3 +287,51 @@ class ReviewsDiffViewerViewTests(TestCase):
         files = response.context['files']
         self.assertEqual({file_info['filediff'] for file_info in files},
                          {filediff1, filediff2, filediff3, filediff4})
+
+    def test_server_timing_as_anonymous(self):
+        """Testing ReviewsDiffViewerView does not send Server-Timing to
+        anonymous users
+        """
+        response = self._get_diff_viewer_page()
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Server-Timing', response)
+
+    def test_server_timing_as_admin(self):
+        """Testing ReviewsDiffViewerView sends Server-Timing to
+        administrators
+        """
+        self.client.login(username='admin', password='admin')
+
+        response = self._get_diff_viewer_page()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('file-info;dur=', response['Server-Timing'])
+
+    def test_server_timing_with_setting(self):
+        """Testing ReviewsDiffViewerView sends Server-Timing to all users
+        with diffviewer_send_server_timing enabled
+        """
+        with self.siteconfig_settings({'diffviewer_send_server_timing': True}):
+            response = self._get_diff_viewer_page()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('file-info;dur=', response['Server-Timing'])
+
+    def _get_diff_viewer_page(self):
+        """Return the diff viewer page for a new review request.
+
+        Returns:
+            django.http.HttpResponse:
+            The response for the diff viewer page.
+        """
+        review_request = self.create_review_request(create_repository=True,
+                                                    publish=True)
+        diffset = self.create_diffset(review_request)
+        self.create_filediff(diffset)
+
+        return self.client.get(
+            local_site_reverse(
+                'view-diff-revision',
+                kwargs={
+                    'review_request_id': review_request.display_id,
+                    'revision': diffset.revision,
+                }))
@@ -1,8 +1,12 @@
 """Unit tests for reviewboard.reviews.ui.text.TextBasedReviewUI."""
 from __future__ import unicode_literals
 
+from functools import partial
+
 from django.test.client import RequestFactory
 
+from reviewboard.diffviewer.chunk_generator import RawDiffChunkGenerator
+from reviewboard.diffviewer.differ import DiffCompatVersion
 from reviewboard.reviews.ui.text import TextBasedReviewUI
 from reviewboard.testing import TestCase
 
@@ -74,6 +78,12 @@ class TextBasedReviewUITests(TestCase):
                                       obj=new_attachment)
         review_ui.set_diff_against(self.attachment)
 
+        # The expected line regions were computed with this diff
+        # compatibility version.
+        review_ui.source_chunk_generator_cls = partial(
+            RawDiffChunkGenerator,
+            diff_compat=DiffCompatVersion.MYERS_SMS_COST_BAIL)
+
         request = RequestFactory().get('/')
         extra_context = review_ui.get_extra_context(request)
 
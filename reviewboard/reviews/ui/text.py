@@ -13,7 +13,6 @@ from pygments.lexers import (ClassNotFound, guess_lexer_for_filename,
 from reviewboard.attachments.models import FileAttachment
 from reviewboard.diffviewer.chunk_generator import (NoWrapperHtmlFormatter,
                                                     RawDiffChunkGenerator)
-from reviewboard.diffviewer.diffutils import get_chunks_in_range
 from reviewboard.reviews.ui.base import FileAttachmentReviewUI
 
 
@@ -253,9 +252,9 @@ class TextBasedReviewUI(FileAttachmentReviewUI):
             elif view_mode == 'rendered':
                 chunk_generator = self._get_rendered_diff_chunk_generator()
 
-            chunks = get_chunks_in_range(chunk_generator.get_chunks(),
-                                         begin_line_num,
-                                         end_line_num - begin_line_num + 1)
+            chunks = chunk_generator.get_chunks_in_range(
+                begin_line_num,
+                end_line_num - begin_line_num + 1)
 
             context.update({
                 'chunks': chunks,
@@ -14,7 +14,8 @@ from django.db.models import Q
 from django.http import (Http404,
                          HttpResponse,
                          HttpResponseBadRequest,
-                         HttpResponseNotFound)
+                         HttpResponseNotFound,
+                         StreamingHttpResponse)
 from django.shortcuts import get_object_or_404, get_list_or_404, render
 from django.template.defaultfilters import date
 from django.utils import six, timezone
@@ -545,6 +546,12 @@ class ReviewRequestDetailView(ReviewRequestViewMixin,
     This page shows information on the review request, all the reviews and
     issues that have been posted, and the status updates made on uploaded
     changes.
+
+    On review requests with a long history, only the most recently updated
+    reviews and change descriptions (along with any the user hasn't seen)
+    are rendered, as set by the ``review_request_page_max_rendered_entries``
+    site configuration setting. The rest are shown as placeholders, which
+    the page loads on demand through :py:class:`ReviewRequestUpdatesView`.
     """
 
     template_name = 'reviews/review_detail.html'
@@ -594,9 +601,14 @@ class ReviewRequestDetailView(ReviewRequestViewMixin,
         # Begin building data for the contents of the page. This will include
         # the reviews, change descriptions, and other content shown on the
         # page.
-        data = ReviewRequestPageData(review_request=review_request,
-                                     request=request,
-                                     last_visited=self.last_visited)
+        siteconfig = SiteConfiguration.objects.get_current()
+        data = ReviewRequestPageData(
+            review_request=review_request,
+            request=request,
+            last_visited=self.last_visited,
+            max_rendered_entries=(
+                siteconfig.get('review_request_page_max_rendered_entries') or
+                None))
         self.data = data
 
         data.query_data_pre_etag()
@@ -620,12 +632,20 @@ class ReviewRequestDetailView(ReviewRequestViewMixin,
         else:
             draft_timestamp = ''
 
+        # The entries that are fully rendered depend on the last visited
+        # time, so the placeholders must be part of the ETag.
+        placeholder_ids = ','.join(
+            '%s%s' % (entry.entry_type_id, entry.entry_id)
+            for entry in data.placeholders
+        )
+
         return ':'.join(six.text_type(value) for value in (
             request.user,
             etag_timestamp,
             draft_timestamp,
             data.latest_changedesc_timestamp,
             entry_etags,
+            placeholder_ids,
             data.latest_review_timestamp,
             review_request.last_review_activity_timestamp,
             is_rich_text_default_for_user(request.user),
@@ -867,10 +887,24 @@ class ReviewRequestUpdatesView(ReviewRequestViewMixin, ETagViewMixin,
         if not entry_classes:
             raise Http404
 
-        self.since = request.GET.get('since')
+        since = request.GET.get('since')
 
+        if since:
+            try:
+                since = dateutil.parser.parse(since)
+            except ValueError as e:
+                return HttpResponseBadRequest('Invalid ?since= value: %s' % e)
+
+            if not is_aware(since):
+                since = make_aware(since, utc)
+
+            self.since = since
+
+        # Only the data needed for the requested entries will be queried.
         self.data = ReviewRequestPageData(self.review_request, request,
-                                          entry_classes=entry_classes)
+                                          entry_classes=entry_classes,
+                                          since=self.since,
+                                          entry_ids=self.entry_ids)
 
     def get_etag_data(self, request, *args, **kwargs):
         """Return an ETag for the view.
@@ -962,11 +996,6 @@ class ReviewRequestUpdatesView(ReviewRequestViewMixin, ETagViewMixin,
         # See if the caller only wants to fetch entries updated since a given
         # timestamp.
         if since:
-            since = dateutil.parser.parse(since)
-
-            if not is_aware(since):
-                since = make_aware(since, utc)
-
             entries = (
                 entry
                 for entry in entries
@@ -1001,14 +1030,13 @@ class ReviewRequestUpdatesView(ReviewRequestViewMixin, ETagViewMixin,
                     make_review_request_context(request, review_request))
 
             try:
-                html = render_to_string(
-                    template_name=entry.template_name,
-                    context=dict({
+                html = entry.render_template(
+                    request,
+                    dict({
                         'show_entry_statuses_area': (
                             entry.entry_pos == entry.ENTRY_POS_MAIN),
                         'entry': entry,
-                    }, **base_entry_context),
-                    request=request)
+                    }, **base_entry_context))
             except Exception as e:
                 logging.error('Error rendering review request page entry '
                               '%r: %s',
@@ -1378,7 +1406,7 @@ class DownloadRawDiffView(ReviewRequestViewMixin, View):
                 Keyword arguments passed to the handler.
 
         Returns:
-            django.http.HttpResponse:
+            django.http.StreamingHttpResponse:
             The HTTP response to send to the client.
         """
         review_request = self.review_request
@@ -1387,9 +1415,12 @@ class DownloadRawDiffView(ReviewRequestViewMixin, View):
         diffset = self.get_diff(revision, draft)
 
         tool = review_request.repository.get_scmtool()
-        data = tool.get_parser(b'').raw_diff(diffset)
 
-        resp = HttpResponse(data, content_type='text/x-patch')
+        # The diff is streamed one file at a time, so that large diffs don't
+        # have to be held in memory all at once.
+        resp = StreamingHttpResponse(
+            tool.get_parser(b'').iter_raw_diff(diffset),
+            content_type='text/x-patch')
 
         if diffset.name == 'diff':
             filename = 'rb%d.patch' % review_request.display_id
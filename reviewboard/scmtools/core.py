@@ -660,6 +660,45 @@ class SCMTool(object):
         except FileNotFoundError:
             return False
 
+    def get_files(self, files, **kwargs):
+        """Return the contents of several files from a repository.
+
+        This is used to fetch all the files needed for a diff at once.
+        By default, this calls :py:meth:`get_file` for each file.
+
+        Subclasses should override this if they have a more efficient way of
+        fetching many files at once (such as in a single request or process).
+
+        Version Added:
+            4.0
+
+        Args:
+            files (list of tuple):
+                A list of ``(path, revision, base_commit_id)`` tuples, each
+                representing the arguments that would be passed to
+                :py:meth:`get_file`. ``base_commit_id`` may be ``None``.
+
+            **kwargs (dict):
+                Additional keyword arguments. This is not currently used, but
+                is available for future expansion.
+
+        Returns:
+            list:
+            A list of results, in the same order as ``files``. Each result
+            is either the file contents (:py:class:`bytes`), or the
+            exception that was raised when fetching that file.
+        """
+        results = []
+
+        for path, revision, base_commit_id in files:
+            try:
+                results.append(self.get_file(path, revision,
+                                             base_commit_id=base_commit_id))
+            except Exception as e:
+                results.append(e)
+
+        return results
+
     def parse_diff_revision(self, file_str, revision_str, moved=False,
                             copied=False, **kwargs):
         """Return a parsed filename and revision as represented in a diff.
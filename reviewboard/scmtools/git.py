@@ -6,9 +6,12 @@ import os
 import platform
 import re
 import stat
+import subprocess
+import threading
+import time
 
 from django.utils import six
-from django.utils.encoding import force_bytes
+from django.utils.encoding import force_bytes, force_str
 from django.utils.six.moves import cStringIO as StringIO
 from django.utils.six.moves.urllib.parse import (quote as urlquote,
                                                  urlsplit as urlsplit,
@@ -23,6 +26,7 @@ from reviewboard.scmtools.errors import (FileNotFoundError,
                                          InvalidRevisionFormatError,
                                          RepositoryNotFoundError,
                                          SCMError)
+from reviewboard.scmtools.pools import IdleResourcePool
 from reviewboard.ssh import utils as sshutils
 
 
@@ -101,6 +105,49 @@ class GitTool(SCMTool):
 
         return self.client.get_file(path, revision)
 
+    def get_files(self, files, **kwargs):
+        """Return the contents of several files from the repository.
+
+        For local repositories, all files are fetched in one batch from a
+        long-lived :command:`git cat-file --batch` process.
+
+        Version Added:
+            4.0
+
+        Args:
+            files (list of tuple):
+                A list of ``(path, revision, base_commit_id)`` tuples.
+
+            **kwargs (dict):
+                Additional keyword arguments.
+
+        Returns:
+            list:
+            A list of results, in the same order as ``files``. Each result
+            is either the file contents (:py:class:`bytes`), or the
+            exception that was raised when fetching that file.
+        """
+        if self.client.raw_file_url:
+            return super(GitTool, self).get_files(files, **kwargs)
+
+        results = [b''] * len(files)
+        to_fetch = []
+
+        for i, (path, revision, base_commit_id) in enumerate(files):
+            if revision != PRE_CREATION:
+                to_fetch.append((i, path, revision))
+
+        if to_fetch:
+            fetched = self.client.get_files([
+                (path, revision)
+                for i, path, revision in to_fetch
+            ])
+
+            for (i, path, revision), result in zip(to_fetch, fetched):
+                results[i] = result
+
+        return results
+
     def file_exists(self, path, revision=HEAD, **kwargs):
         if revision == PRE_CREATION:
             return False
@@ -372,8 +419,7 @@ class GitDiffParser(DiffParser):
         diff_git_line = self.lines[linenum]
 
         file_info = ParsedDiffFile()
-        file_info.append_data(diff_git_line)
-        file_info.append_data(b'\n')
+        file_info.append_lines(self.lines, linenum, linenum + 1)
         file_info.binary = False
 
         linenum += 1
@@ -452,8 +498,7 @@ class GitDiffParser(DiffParser):
                 break
             elif self._is_binary_patch(linenum):
                 file_info.binary = True
-                file_info.append_data(self.lines[linenum])
-                file_info.append_data(b'\n')
+                file_info.append_lines(self.lines, linenum, linenum + 1)
                 empty_change = False
                 linenum += 1
                 break
@@ -494,10 +539,7 @@ class GitDiffParser(DiffParser):
                 else:
                     file_info.modified_filename = new_filename
 
-                file_info.append_data(orig_line)
-                file_info.append_data(b'\n')
-                file_info.append_data(new_line)
-                file_info.append_data(b'\n')
+                file_info.append_lines(self.lines, linenum, linenum + 2)
                 linenum += 2
             else:
                 empty_change = False
@@ -598,6 +640,346 @@ class GitDiffParser(DiffParser):
                 setattr(file_info, attr, b'')
 
 
+class GitCatFileProcess(object):
+    """A long-lived git-cat-file(1) process for a repository.
+
+    This wraps :command:`git cat-file --batch` (or ``--batch-check``, when
+    only object information is needed), allowing any number of objects to be
+    looked up without spawning a new process for each one.
+
+    Lookups are serialized, so a process can be shared between threads. If
+    the process dies or produces unexpected output, it will be restarted on
+    the next lookup.
+
+    Version Added:
+        4.0
+    """
+
+    #: The maximum size of a batch of requests written to the process.
+    #:
+    #: This is kept well below the size of a pipe's buffer.
+    MAX_BATCH_BYTES = 16 * 1024
+
+    def __init__(self, git_dir, local_site_name=None, check_only=False):
+        """Initialize the process wrapper.
+
+        The process won't be started until the first lookup.
+
+        Args:
+            git_dir (unicode):
+                The path to the Git repository.
+
+            local_site_name (unicode, optional):
+                The name of the Local Site the repository belongs to.
+
+            check_only (bool, optional):
+                Whether to only look up object information
+                (``--batch-check``), rather than contents (``--batch``).
+        """
+        self.git_dir = git_dir
+        self.local_site_name = local_site_name
+        self.check_only = check_only
+        self.last_used = time.time()
+        self._process = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_running(self):
+        """Whether the process is currently running."""
+        return self._process is not None and self._process.poll() is None
+
+    def lookup(self, object_name):
+        """Look up an object in the repository.
+
+        If the process fails during the lookup, it will be restarted and the
+        lookup retried once.
+
+        Args:
+            object_name (unicode):
+                The name of the object to look up. This can be anything
+                understood by :command:`git cat-file`, such as a SHA1 or
+                ``<revision>:<path>``.
+
+        Returns:
+            tuple:
+            A 2-tuple containing:
+
+            1. The type of the object (:py:class:`bytes`), or ``None`` if the
+               object was not found.
+            2. The contents of the object (:py:class:`bytes`), or ``None`` if
+               the object was not found or this is a ``--batch-check``
+               process.
+
+        Raises:
+            reviewboard.scmtools.errors.SCMError:
+                The lookup failed after restarting the process.
+        """
+        return self.lookup_many([object_name])[0]
+
+    def lookup_many(self, object_names):
+        """Look up several objects in the repository.
+
+        Requests are written to the process in batches, so that many objects
+        can be fetched without waiting on each one in turn.
+
+        If the process fails during the lookup, it will be restarted and the
+        lookup retried once.
+
+        Args:
+            object_names (list of unicode):
+                The names of the objects to look up. See :py:meth:`lookup`.
+
+        Returns:
+            list of tuple:
+            A list of results, in the same order as ``object_names``. See
+            :py:meth:`lookup` for the contents of each result.
+
+        Raises:
+            reviewboard.scmtools.errors.SCMError:
+                The lookup failed after restarting the process.
+        """
+        object_names = [
+            force_bytes(object_name)
+            for object_name in object_names
+        ]
+
+        with self._lock:
+            self.last_used = time.time()
+
+            for attempt in (1, 2):
+                try:
+                    if not self.is_running:
+                        self._start()
+
+                    return self._lookup_many(object_names)
+                except (IOError, OSError, ValueError) as e:
+                    logging.warning('git cat-file process for %s failed '
+                                    '(attempt %d): %s',
+                                    self.git_dir, attempt, e)
+                    self._close()
+
+            raise SCMError(
+                _('Unable to look up "%s" in the Git repository.')
+                % b', '.join(object_names).decode('utf-8', 'replace'))
+
+    def close(self):
+        """Close the process, if running."""
+        with self._lock:
+            self._close()
+
+    def _start(self):
+        """Start the process."""
+        if self.check_only:
+            mode = '--batch-check'
+        else:
+            mode = '--batch'
+
+        env = dict(os.environ)
+
+        if self.local_site_name:
+            env[str('RB_LOCAL_SITE')] = force_str(self.local_site_name)
+
+        with open(os.devnull, 'wb') as devnull:
+            self._process = subprocess.Popen(
+                ['git', '--git-dir=%s' % self.git_dir, 'cat-file', mode],
+                env=env,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=devnull,
+                close_fds=(os.name != 'nt'))
+
+    def _close(self):
+        """Close the process, if running.
+
+        This must be called with the lock held.
+        """
+        process = self._process
+        self._process = None
+
+        if process is not None:
+            try:
+                process.stdin.close()
+            except (IOError, OSError):
+                pass
+
+            if process.poll() is None:
+                process.kill()
+
+            process.wait()
+            process.stdout.close()
+
+    def _lookup_many(self, object_names):
+        """Perform lookups on the running process.
+
+        This must be called with the lock held.
+
+        Args:
+            object_names (list of bytes):
+                The names of the objects to look up.
+
+        Returns:
+            list of tuple:
+            A list of 2-tuples of object types and contents. See
+            :py:meth:`lookup`.
+
+        Raises:
+            IOError:
+                The process could not be communicated with.
+
+            ValueError:
+                The process returned unexpected output.
+        """
+        process = self._process
+        results = []
+        i = 0
+
+        while i < len(object_names):
+            # Write as many requests as safely fit in the pipe's buffer
+            # before reading the results, so that neither side blocks.
+            batch = []
+            batch_len = 0
+
+            while (i < len(object_names) and
+                   (not batch or
+                    batch_len + len(object_names[i]) < self.MAX_BATCH_BYTES)):
+                batch.append(object_names[i])
+                batch_len += len(object_names[i]) + 1
+                i += 1
+
+            process.stdin.write(b''.join(
+                b'%s\n' % object_name
+                for object_name in batch
+            ))
+            process.stdin.flush()
+
+            for object_name in batch:
+                results.append(self._read_result())
+
+        return results
+
+    def _read_result(self):
+        """Read the result of a lookup from the running process.
+
+        This must be called with the lock held.
+
+        Returns:
+            tuple:
+            A 2-tuple of the object type and contents. See :py:meth:`lookup`.
+
+        Raises:
+            IOError:
+                The process could not be communicated with.
+
+            ValueError:
+                The process returned unexpected output.
+        """
+        stdout = self._process.stdout
+        header = stdout.readline()
+
+        if not header.endswith(b'\n'):
+            raise ValueError('Unexpected end of output')
+
+        parts = header.split()
+
+        if parts[-1] in (b'missing', b'ambiguous'):
+            return None, None
+
+        if len(parts) != 3:
+            raise ValueError('Unexpected output: %r' % header)
+
+        object_type = parts[1]
+
+        if self.check_only:
+            return object_type, None
+
+        size = int(parts[2])
+        contents = stdout.read(size + 1)
+
+        if len(contents) != size + 1:
+            raise ValueError('Unexpected end of output')
+
+        return object_type, contents[:-1]
+
+
+class GitCatFilePool(IdleResourcePool):
+    """A per-process pool of git-cat-file(1) processes.
+
+    This keeps one :py:class:`GitCatFileProcess` of each type for each
+    repository. Processes that haven't been used for
+    :py:attr:`IDLE_TIMEOUT` seconds are closed by a background thread.
+
+    Version Added:
+        4.0
+    """
+
+    def create_resource(self, key, **kwargs):
+        """Create a new process for the pool.
+
+        Args:
+            key (tuple):
+                A 3-tuple of the Git directory, Local Site name, and whether
+                the process is for ``--batch-check``.
+
+            **kwargs (dict):
+                Unused keyword arguments.
+
+        Returns:
+            GitCatFileProcess:
+            The new process.
+        """
+        git_dir, local_site_name, check_only = key
+
+        return GitCatFileProcess(git_dir=git_dir,
+                                 local_site_name=local_site_name,
+                                 check_only=check_only)
+
+    def get_process(self, git_dir, local_site_name=None, check_only=False):
+        """Return the process for a repository.
+
+        Args:
+            git_dir (unicode):
+                The path to the Git repository.
+
+            local_site_name (unicode, optional):
+                The name of the Local Site the repository belongs to.
+
+            check_only (bool, optional):
+                Whether to return a ``--batch-check`` process.
+
+        Returns:
+            GitCatFileProcess:
+            The process for the repository.
+        """
+        return self.get_resource((git_dir, local_site_name, check_only))
+
+    def has_running_process(self, git_dir, local_site_name=None):
+        """Return whether there's a running process for a repository.
+
+        Args:
+            git_dir (unicode):
+                The path to the Git repository.
+
+            local_site_name (unicode, optional):
+                The name of the Local Site the repository belongs to.
+
+        Returns:
+            bool:
+            ``True`` if a process for the repository is running.
+        """
+        for check_only in (False, True):
+            process = self.get_existing_resource(
+                (git_dir, local_site_name, check_only))
+
+            if process is not None and process.is_running:
+                return True
+
+        return False
+
+
+#: The pool of git-cat-file(1) processes used by GitClient.
+cat_file_pool = GitCatFilePool()
+
+
 class GitClient(SCMClient):
     FULL_SHA1_LENGTH = 40
 
@@ -630,6 +1012,12 @@ class GitClient(SCMClient):
             else:
                 self.git_dir = url_parts[2]
 
+            # A running cat-file process for the repository means it's
+            # already known to be accessible, so we can skip the check.
+            if cat_file_pool.has_running_process(self.git_dir,
+                                                 local_site_name):
+                return
+
             p = self._run_git(['--git-dir=%s' % self.git_dir, 'config',
                                'core.repositoryformatversion'])
             failure = p.wait()
@@ -685,6 +1073,63 @@ class GitClient(SCMClient):
         else:
             return self._cat_file(path, revision, "blob")
 
+    def get_files(self, files):
+        """Return the contents of several blobs from a local repository.
+
+        The blobs are looked up in one batch using a long-lived
+        :command:`git cat-file --batch` process from :py:data:`cat_file_pool`.
+
+        Version Added:
+            4.0
+
+        Args:
+            files (list of tuple):
+                A list of ``(path, revision)`` tuples.
+
+        Returns:
+            list:
+            A list of results, in the same order as ``files``. Each result
+            is either the blob contents (:py:class:`bytes`), or the
+            exception that was raised when fetching that blob.
+        """
+        assert not self.raw_file_url
+
+        object_names = [
+            self._resolve_head(revision, path)
+            for path, revision in files
+        ]
+
+        if any('\n' in object_name for object_name in object_names):
+            results = []
+
+            for path, revision in files:
+                try:
+                    results.append(self.get_file(path, revision))
+                except Exception as e:
+                    results.append(e)
+
+            return results
+
+        process = cat_file_pool.get_process(
+            git_dir=self.git_dir,
+            local_site_name=self.local_site_name)
+        lookups = process.lookup_many(object_names)
+        results = []
+
+        for (path, revision), object_name, lookup in zip(files, object_names,
+                                                         lookups):
+            object_type, contents = lookup
+
+            if object_type is None:
+                results.append(FileNotFoundError(path, revision=object_name))
+            elif object_type != b'blob':
+                results.append(SCMError('fatal: git cat-file %s: bad file'
+                                        % object_name))
+            else:
+                results.append(contents)
+
+        return results
+
     def get_file_exists(self, path, revision):
         if self.raw_file_url:
             try:
@@ -727,9 +1172,30 @@ class GitClient(SCMClient):
 
         Otherwise, "option" can be used to pass a switch to git-cat-file,
         e.g. to test or existence or get the type of "commit".
+
+        Blob contents and types are looked up through a long-lived
+        ``git cat-file --batch`` process from :py:data:`cat_file_pool`,
+        where possible.
         """
         commit = self._resolve_head(revision, path)
 
+        if option in ('blob', '-t') and '\n' not in commit:
+            process = cat_file_pool.get_process(
+                git_dir=self.git_dir,
+                local_site_name=self.local_site_name,
+                check_only=(option == '-t'))
+            object_type, contents = process.lookup(commit)
+
+            if object_type is None:
+                raise FileNotFoundError(path, revision=commit)
+
+            if option == '-t':
+                return object_type + b'\n'
+            elif object_type != b'blob':
+                raise SCMError('fatal: git cat-file %s: bad file' % commit)
+
+            return contents
+
         p = self._run_git(['--git-dir=%s' % self.git_dir, 'cat-file',
                            option, commit])
         contents = force_bytes(p.stdout.read())
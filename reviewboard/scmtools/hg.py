@@ -2,10 +2,15 @@ from __future__ import unicode_literals
 
 import json
 import logging
+import os
+import struct
+import subprocess
+import threading
+import time
 from datetime import datetime
 
 from django.utils import six
-from django.utils.encoding import force_text
+from django.utils.encoding import force_bytes, force_str, force_text
 from django.utils.six.moves.urllib.parse import quote as urllib_quote, urlparse
 from djblets.util.filesystem import is_exe_in_path
 
@@ -15,6 +20,7 @@ from reviewboard.scmtools.core import (Branch, Commit, FileNotFoundError, HEAD,
                                        UNKNOWN)
 from reviewboard.scmtools.errors import SCMError
 from reviewboard.scmtools.git import GitDiffParser
+from reviewboard.scmtools.pools import IdleResourcePool
 
 
 class HgTool(SCMTool):
@@ -582,6 +588,295 @@ class HgWebClient(SCMClient):
         return json.loads(contents.decode('utf-8'))
 
 
+class HgCommandServer(object):
+    """A long-lived Mercurial command server for a repository.
+
+    This wraps :command:`hg serve --cmdserver pipe`, allowing any number of
+    commands to be run against a repository without paying Mercurial's
+    startup cost for each one.
+
+    Commands are serialized, so a server can be shared between threads. If
+    the server dies or produces unexpected output, the command fails with
+    an :py:class:`~reviewboard.scmtools.errors.SCMError`, and the server
+    must be started again before it can be used.
+
+    Version Added:
+        4.0
+    """
+
+    def __init__(self, path, local_site_name=None):
+        """Initialize the server wrapper.
+
+        The server won't be started until :py:meth:`start` is called.
+
+        Args:
+            path (unicode):
+                The path to the repository.
+
+            local_site_name (unicode, optional):
+                The name of the Local Site the repository belongs to.
+        """
+        self.path = path
+        self.local_site_name = local_site_name
+        self.last_used = time.time()
+        self.enabled = True
+        self._process = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_running(self):
+        """Whether the server is currently running."""
+        return self._process is not None and self._process.poll() is None
+
+    def start(self, hg_args):
+        """Start the server, if it's not already running.
+
+        If the server fails to start, it will be disabled, and
+        :py:attr:`enabled` will be set to ``False``.
+
+        Args:
+            hg_args (list of unicode):
+                The global arguments to pass to :command:`hg`.
+
+        Raises:
+            reviewboard.scmtools.errors.SCMError:
+                The server could not be started.
+        """
+        with self._lock:
+            if self.is_running:
+                return
+
+            self._close()
+
+            env = dict(os.environ)
+
+            if self.local_site_name:
+                env[str('RB_LOCAL_SITE')] = force_str(self.local_site_name)
+
+            try:
+                with open(os.devnull, 'wb') as devnull:
+                    self._process = subprocess.Popen(
+                        ['hg'] + hg_args + ['serve', '--cmdserver', 'pipe'],
+                        env=env,
+                        stdin=subprocess.PIPE,
+                        stdout=subprocess.PIPE,
+                        stderr=devnull,
+                        close_fds=(os.name != 'nt'))
+
+                channel, hello = self._read_message()
+
+                if channel != b'o' or b'runcommand' not in hello:
+                    raise ValueError('Unexpected hello message: %r' % hello)
+            except (IOError, OSError, ValueError, struct.error) as e:
+                logging.warning('Unable to start the Mercurial command '
+                                'server for %s. Commands will be run '
+                                'without it: %s',
+                                self.path, e)
+                self._close()
+                self.enabled = False
+
+                raise SCMError('Unable to start the Mercurial command '
+                               'server: %s' % e)
+
+    def run_command(self, args):
+        """Run a command on the server.
+
+        Args:
+            args (list of unicode):
+                The arguments to the :command:`hg` command.
+
+        Returns:
+            tuple:
+            A 3-tuple containing:
+
+            1. The command's exit code (:py:class:`int`).
+            2. The command's output (:py:class:`bytes`).
+            3. The command's error output (:py:class:`bytes`).
+
+        Raises:
+            reviewboard.scmtools.errors.SCMError:
+                The server wasn't running, or failed while running the
+                command.
+        """
+        data = b'\0'.join(force_bytes(arg) for arg in args)
+
+        with self._lock:
+            self.last_used = time.time()
+
+            if not self.is_running:
+                raise SCMError('The Mercurial command server is not running')
+
+            try:
+                return self._run_command(data)
+            except (IOError, OSError, ValueError, struct.error) as e:
+                logging.warning('Mercurial command server for %s failed: %s',
+                                self.path, e)
+                self._close()
+
+                raise SCMError('The Mercurial command server failed: %s'
+                               % e)
+
+    def close(self):
+        """Close the server, if running."""
+        with self._lock:
+            self._close()
+
+    def _run_command(self, data):
+        """Run a command on the running server.
+
+        This must be called with the lock held.
+
+        Args:
+            data (bytes):
+                The NUL-separated command arguments.
+
+        Returns:
+            tuple:
+            A 3-tuple of the exit code, output, and error output. See
+            :py:meth:`run_command`.
+
+        Raises:
+            IOError:
+                The server could not be communicated with.
+
+            ValueError:
+                The server returned unexpected output.
+        """
+        stdin = self._process.stdin
+        stdin.write(b'runcommand\n%s%s'
+                    % (struct.pack(str('>I'), len(data)), data))
+        stdin.flush()
+
+        output = []
+        errors = []
+
+        while True:
+            channel, message = self._read_message()
+
+            if channel == b'o':
+                output.append(message)
+            elif channel == b'e':
+                errors.append(message)
+            elif channel == b'r':
+                return (struct.unpack(str('>i'), message)[0],
+                        b''.join(output),
+                        b''.join(errors))
+            elif channel in (b'I', b'L'):
+                # The command wants input, which we don't have. Respond with
+                # an end of input.
+                stdin.write(struct.pack(str('>I'), 0))
+                stdin.flush()
+            elif channel.isupper():
+                raise ValueError('Unsupported required channel %r' % channel)
+
+    def _read_message(self):
+        """Read a message from the server.
+
+        This must be called with the lock held.
+
+        Returns:
+            tuple:
+            A 2-tuple of the channel (:py:class:`bytes`) and message
+            contents (:py:class:`bytes`). For input channels, the message
+            contents will be empty.
+
+        Raises:
+            IOError:
+                The server could not be communicated with.
+
+            ValueError:
+                The server returned unexpected output.
+        """
+        stdout = self._process.stdout
+        header = stdout.read(5)
+
+        if len(header) != 5:
+            raise ValueError('Unexpected end of output')
+
+        channel, length = struct.unpack(str('>cI'), header)
+
+        if channel in (b'I', b'L'):
+            return channel, b''
+
+        message = stdout.read(length)
+
+        if len(message) != length:
+            raise ValueError('Unexpected end of output')
+
+        return channel, message
+
+    def _close(self):
+        """Close the server, if running.
+
+        This must be called with the lock held.
+        """
+        process = self._process
+        self._process = None
+
+        if process is not None:
+            try:
+                process.stdin.close()
+            except (IOError, OSError):
+                pass
+
+            if process.poll() is None:
+                process.kill()
+
+            process.wait()
+            process.stdout.close()
+
+
+class HgCommandServerPool(IdleResourcePool):
+    """A per-process pool of Mercurial command servers.
+
+    This keeps one :py:class:`HgCommandServer` for each repository. Servers
+    that haven't been used for :py:attr:`IDLE_TIMEOUT` seconds are closed
+    by a background thread.
+
+    Version Added:
+        4.0
+    """
+
+    def create_resource(self, key, **kwargs):
+        """Create a new server for the pool.
+
+        Args:
+            key (tuple):
+                A 2-tuple of the repository path and Local Site name.
+
+            **kwargs (dict):
+                Unused keyword arguments.
+
+        Returns:
+            HgCommandServer:
+            The new server.
+        """
+        path, local_site_name = key
+
+        return HgCommandServer(path=path,
+                               local_site_name=local_site_name)
+
+    def get_server(self, path, local_site_name=None):
+        """Return the server for a repository.
+
+        Args:
+            path (unicode):
+                The path to the repository.
+
+            local_site_name (unicode, optional):
+                The name of the Local Site the repository belongs to.
+
+        Returns:
+            HgCommandServer:
+            The server for the repository.
+        """
+        return self.get_resource((path, local_site_name))
+
+
+#: The pool of Mercurial command servers used by HgClient.
+command_server_pool = HgCommandServerPool()
+
+
 class HgClient(SCMClient):
     COMMITS_PAGE_LIMIT = '31'
 
@@ -606,9 +901,8 @@ class HgClient(SCMClient):
             rev = ""
 
         if path:
-            p = self._run_hg(['cat', '--rev', rev, path])
-            contents = p.stdout.read()
-            failure = p.wait()
+            failure, contents, errors = self._run_hg_command(
+                ['cat', '--rev', rev, path])
 
             if not failure:
                 return contents
@@ -622,17 +916,18 @@ class HgClient(SCMClient):
             list of reviewboard.scmtools.core.Branch:
             The list of the branches.
         """
-        p = self._run_hg(['branches', '--template', 'json'])
+        failure, contents, errors = self._run_hg_command(
+            ['branches', '--template', 'json'])
 
-        if p.wait() != 0:
-            raise SCMError('Cannot load branches: %s' % p.stderr.read())
+        if failure:
+            raise SCMError('Cannot load branches: %s' % errors)
 
         results = [
             Branch(
                 id=data['branch'],
                 commit=data['node'],
                 default=(data['branch'] == 'default'))
-            for data in json.loads(force_text(p.stdout.read()))
+            for data in json.loads(force_text(contents))
             if not data['closed']
         ]
 
@@ -654,14 +949,14 @@ class HgClient(SCMClient):
             The list of commit objects.
         """
         cmd = ['log'] + revset + ['--template', 'json']
-        p = self._run_hg(cmd)
+        failure, contents, errors = self._run_hg_command(cmd)
 
-        if p.wait() != 0:
-            raise SCMError('Cannot load commits: %s' % p.stderr.read())
+        if failure:
+            raise SCMError('Cannot load commits: %s' % errors)
 
         results = []
 
-        for data in json.loads(force_text(p.stdout.read())):
+        for data in json.loads(force_text(contents)):
             try:
                 parent = data['parents'][0]
             except IndexError:
@@ -724,13 +1019,13 @@ class HgClient(SCMClient):
         if changesets:
             commit = changesets[0]
             cmd = ['diff', '-c', revision]
-            p = self._run_hg(cmd)
+            failure, contents, errors = self._run_hg_command(cmd)
 
-            if p.wait() != 0:
-                e = p.stderr.read()
-                raise SCMError('Cannot load patch %s: %s' % (revision, e))
+            if failure:
+                raise SCMError('Cannot load patch %s: %s'
+                               % (revision, errors))
 
-            commit.diff = p.stdout.read()
+            commit.diff = contents
             return commit
 
         raise SCMError('Cannot load changeset %s' % revision)
@@ -774,6 +1069,52 @@ class HgClient(SCMClient):
 
         return contents.strip()
 
+    def _run_hg_command(self, args):
+        """Run a Mercurial command and return its results.
+
+        The command will be run on this repository's long-lived command
+        server from :py:data:`command_server_pool`, starting it if needed.
+        If the server can't be used, this will fall back on running
+        :command:`hg` directly.
+
+        Version Added:
+            4.0
+
+        Args:
+            args (list of unicode):
+                The arguments to the :command:`hg` command.
+
+        Returns:
+            tuple:
+            A 3-tuple containing:
+
+            1. The command's exit code (:py:class:`int`).
+            2. The command's output (:py:class:`bytes`).
+            3. The command's error output (:py:class:`bytes`).
+        """
+        server = command_server_pool.get_server(
+            path=self.path,
+            local_site_name=self.local_site_name)
+
+        if server.enabled:
+            try:
+                if not server.is_running:
+                    if not self.default_args:
+                        self._calculate_default_args()
+
+                    server.start(self.default_args)
+
+                return server.run_command(args)
+            except SCMError as e:
+                logging.debug('Running "hg %s" without the command server: '
+                              '%s',
+                              ' '.join(args), e)
+
+        p = self._run_hg(args)
+        contents, errors = p.communicate()
+
+        return p.returncode, contents, errors
+
     def _run_hg(self, args):
         """Runs the Mercurial command, returning a subprocess.Popen."""
         if not self.default_args:
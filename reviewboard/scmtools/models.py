@@ -3,24 +3,30 @@ from __future__ import unicode_literals
 import logging
 import uuid
 import warnings
+import zlib
 from importlib import import_module
+from multiprocessing.pool import ThreadPool
 from time import time
 
 from django.contrib.auth.models import User
 from django.core.cache import cache
 from django.core.exceptions import ImproperlyConfigured, ValidationError
-from django.db import IntegrityError, models
+from django.db import IntegrityError, connections, models
 from django.db.models import Q
 from django.utils import six, timezone
 from django.utils.encoding import python_2_unicode_compatible
 from django.utils.http import urlquote
-from django.utils.six.moves import range
+from django.utils.six.moves import cPickle as pickle, range
 from django.utils.translation import ugettext_lazy as _
 from djblets.cache.backend import cache_memoize, make_cache_key
 from djblets.db.fields import JSONField
 from djblets.log import log_timed
 from djblets.util.decorators import cached_property
 
+from reviewboard.diffviewer.timing import (CACHE_REPOSITORY_FILE,
+                                           STAGE_FETCH,
+                                           record_diff_cache,
+                                           time_diff_stage)
 from reviewboard.hostingsvcs.models import HostingServiceAccount
 from reviewboard.hostingsvcs.service import get_hosting_service
 from reviewboard.scmtools.crypto_utils import (decrypt_password,
@@ -193,6 +199,18 @@ class Repository(models.Model):
     #: doesn't specify a list of encodings.
     FALLBACK_ENCODING = 'iso-8859-15'
 
+    #: The maximum number of concurrent file fetches from a hosting service.
+    #:
+    #: This is used by :py:meth:`get_files` when fetching many files that
+    #: aren't yet in the cache.
+    MAX_CONCURRENT_FILE_FETCHES = 4
+
+    #: The maximum number of concurrent file existence checks.
+    #:
+    #: This is used by :py:meth:`get_files_exist` when checking many files
+    #: on a hosting service that aren't yet known to exist.
+    MAX_CONCURRENT_FILE_EXISTS_CHECKS = 8
+
     #: The error message used to indicate that a repository name conflicts.
     NAME_CONFLICT_ERROR = _('A repository with this name already exists')
 
@@ -591,25 +609,25 @@ class Repository(models.Model):
         #
         # Basically, this fixes the massive regressions introduced by the
         # Django unicode changes.
-        if not isinstance(path, six.text_type):
-            raise TypeError('"path" must be a Unicode string, not %s'
-                            % type(path))
+        self._check_file_args(path, revision, base_commit_id)
 
-        if not isinstance(revision, six.text_type):
-            raise TypeError('"revision" must be a Unicode string, not %s'
-                            % type(revision))
+        fetched = []
 
-        if (base_commit_id is not None and
-            not isinstance(base_commit_id, six.text_type)):
-            raise TypeError('"base_commit_id" must be a Unicode string, '
-                            'not %s'
-                            % type(base_commit_id))
+        def _get_file():
+            fetched.append(True)
+
+            return [self._get_file_uncached(path, revision, base_commit_id,
+                                            request)]
+
+        with time_diff_stage(request, STAGE_FETCH):
+            data = cache_memoize(
+                self._make_file_cache_key(path, revision, base_commit_id),
+                _get_file,
+                large_data=True)[0]
+
+        record_diff_cache(request, CACHE_REPOSITORY_FILE, not fetched)
 
-        return cache_memoize(
-            self._make_file_cache_key(path, revision, base_commit_id),
-            lambda: [self._get_file_uncached(path, revision, base_commit_id,
-                                             request)],
-            large_data=True)[0]
+        return data
 
     def get_file_exists(self, path, revision, base_commit_id=None,
                         request=None):
@@ -654,19 +672,7 @@ class Repository(models.Model):
                 One or more of the provided arguments is an invalid type.
                 Details are contained in the error message.
         """
-        if not isinstance(path, six.text_type):
-            raise TypeError('"path" must be a Unicode string, not %s'
-                            % type(path))
-
-        if not isinstance(revision, six.text_type):
-            raise TypeError('"revision" must be a Unicode string, not %s'
-                            % type(revision))
-
-        if (base_commit_id is not None and
-            not isinstance(base_commit_id, six.text_type)):
-            raise TypeError('"base_commit_id" must be a Unicode string, '
-                            'not %s'
-                            % type(base_commit_id))
+        self._check_file_args(path, revision, base_commit_id)
 
         key = self._make_file_exists_cache_key(path, revision, base_commit_id)
 
@@ -681,6 +687,153 @@ class Repository(models.Model):
 
         return exists
 
+    def get_files_exist(self, files, request=None):
+        """Return whether or not several files exist in the repository.
+
+        This works like :py:meth:`get_file_exists`, but is optimized for
+        checking many files at once. The cache is checked for all files in
+        one operation, and any files that aren't known to exist are then
+        checked using :py:meth:`get_file_exists`. Checks against a hosting
+        service are made concurrently (up to
+        :py:attr:`MAX_CONCURRENT_FILE_EXISTS_CHECKS` at a time).
+
+        Version Added:
+            4.0
+
+        Args:
+            files (list of tuple):
+                A list of ``(path, revision, base_commit_id)`` tuples, each
+                representing the arguments that would be passed to
+                :py:meth:`get_file_exists`. ``base_commit_id`` may be
+                ``None``.
+
+            request (django.http.HttpRequest, optional):
+                The current HTTP request from the client. This is used for
+                logging purposes.
+
+        Returns:
+            list:
+            A list of results, in the same order as ``files``. Each result
+            is either a boolean indicating whether the file exists, or the
+            exception that was raised when checking that file.
+
+        Raises:
+            TypeError:
+                One or more of the provided arguments is an invalid type.
+                Details are contained in the error message.
+        """
+        exists_keys = []
+        cache_keys = []
+
+        for path, revision, base_commit_id in files:
+            self._check_file_args(path, revision, base_commit_id)
+
+            exists_key = self._make_file_exists_cache_key(path, revision,
+                                                          base_commit_id)
+            exists_keys.append(exists_key)
+            cache_keys += [
+                make_cache_key(exists_key),
+                make_cache_key(self._make_file_cache_key(path, revision,
+                                                         base_commit_id)),
+            ]
+
+        cached = cache.get_many(cache_keys)
+        results = {}
+        to_check = {}
+
+        for i, (exists_key, file_info) in enumerate(zip(exists_keys, files)):
+            if (cached.get(cache_keys[i * 2]) == '1' or
+                cache_keys[i * 2 + 1] in cached):
+                results[exists_key] = True
+            elif exists_key not in to_check:
+                to_check[exists_key] = file_info
+
+        if to_check:
+            check_keys = list(six.iterkeys(to_check))
+            results.update(zip(
+                check_keys,
+                self._check_files_exist([to_check[key] for key in check_keys],
+                                        request)))
+
+        return [
+            results[exists_key]
+            for exists_key in exists_keys
+        ]
+
+    def get_files(self, files, request=None):
+        """Return several files from the repository.
+
+        This works like :py:meth:`get_file`, but is optimized for fetching
+        many files at once. Files are loaded from the cache in bulk, and any
+        files that aren't cached are fetched together, letting the hosting
+        service or SCMTool fetch them in bulk.
+
+        The :py:data:`~reviewboard.scmtools.signals.fetching_file` and
+        :py:data:`~reviewboard.scmtools.signals.fetched_file` signals are
+        sent for each file not found in the cache.
+
+        Version Added:
+            4.0
+
+        Args:
+            files (list of tuple):
+                A list of ``(path, revision, base_commit_id)`` tuples, each
+                representing the arguments that would be passed to
+                :py:meth:`get_file`. ``base_commit_id`` may be ``None``.
+
+            request (django.http.HttpRequest, optional):
+                The current HTTP request from the client. This is used for
+                logging purposes.
+
+        Returns:
+            list:
+            A list of results, in the same order as ``files``. Each result
+            is either the file contents (:py:class:`bytes`), or the
+            exception that was raised when fetching that file.
+
+        Raises:
+            TypeError:
+                One or more of the provided arguments is an invalid type.
+                Details are contained in the error message.
+        """
+        results = self._fetch_uncached_files(files, request,
+                                             load_cached=True)
+
+        return [
+            results[self._make_file_cache_key(path, revision, base_commit_id)]
+            for path, revision, base_commit_id in files
+        ]
+
+    def prefetch_files(self, files, request=None):
+        """Fetch several files from the repository into the cache.
+
+        This fetches any of the files that aren't already in the cache, so
+        that later calls to :py:meth:`get_file` won't need to access the
+        repository. Files that are already cached are not loaded.
+
+        Errors fetching individual files are logged and otherwise ignored.
+        They will be raised again when the file is later fetched.
+
+        Version Added:
+            4.0
+
+        Args:
+            files (list of tuple):
+                A list of ``(path, revision, base_commit_id)`` tuples, each
+                representing the arguments that would be passed to
+                :py:meth:`get_file`. ``base_commit_id`` may be ``None``.
+
+            request (django.http.HttpRequest, optional):
+                The current HTTP request from the client. This is used for
+                logging purposes.
+
+        Raises:
+            TypeError:
+                One or more of the provided arguments is an invalid type.
+                Details are contained in the error message.
+        """
+        self._fetch_uncached_files(files, request)
+
     def get_branches(self):
         """Return a list of all branches on the repository.
 
@@ -1006,6 +1159,38 @@ class Repository(models.Model):
             if errors:
                 raise ValidationError(errors)
 
+    def _check_file_args(self, path, revision, base_commit_id):
+        """Check the types of the arguments used to look up a file.
+
+        Args:
+            path (unicode):
+                The path to the file in the repository.
+
+            revision (unicode):
+                The revision of the file.
+
+            base_commit_id (unicode):
+                The ID of the commit containing the revision of the file.
+
+        Raises:
+            TypeError:
+                One or more of the provided arguments is an invalid type.
+                Details are contained in the error message.
+        """
+        if not isinstance(path, six.text_type):
+            raise TypeError('"path" must be a Unicode string, not %s'
+                            % type(path))
+
+        if not isinstance(revision, six.text_type):
+            raise TypeError('"revision" must be a Unicode string, not %s'
+                            % type(revision))
+
+        if (base_commit_id is not None and
+            not isinstance(base_commit_id, six.text_type)):
+            raise TypeError('"base_commit_id" must be a Unicode string, '
+                            'not %s'
+                            % type(base_commit_id))
+
     def _make_file_cache_key(self, path, revision, base_commit_id):
         """Return a cache key for fetched files.
 
@@ -1137,6 +1322,323 @@ class Repository(models.Model):
 
         return data
 
+    def _fetch_uncached_files(self, files, request, load_cached=False):
+        """Fetch and cache any files that aren't already in the cache.
+
+        The cache is checked for all files in one operation. Any files not
+        found are fetched using :py:meth:`_get_files_uncached` and stored
+        in the cache.
+
+        Args:
+            files (list of tuple):
+                A list of ``(path, revision, base_commit_id)`` tuples.
+
+            request (django.http.HttpRequest):
+                The current HTTP request from the client.
+
+            load_cached (bool, optional):
+                Whether to load the contents of files found in the cache,
+                using :py:meth:`_get_cached_files`.
+
+        Returns:
+            dict:
+            A dictionary mapping file cache keys to the fetched file contents
+            (:py:class:`bytes`) or the exception raised when fetching the
+            file. Unless ``load_cached`` is set, this only contains files that
+            were not in the cache.
+
+        Raises:
+            TypeError:
+                One or more of the provided arguments is an invalid type.
+                Details are contained in the error message.
+        """
+        keys = []
+
+        for path, revision, base_commit_id in files:
+            self._check_file_args(path, revision, base_commit_id)
+            keys.append(self._make_file_cache_key(path, revision,
+                                                  base_commit_id))
+
+        if load_cached:
+            results = self._get_cached_files(set(keys))
+            cached_keys = set(results)
+        else:
+            results = {}
+            found_keys = set(cache.get_many([
+                make_cache_key(key)
+                for key in keys
+            ]))
+            cached_keys = {
+                key
+                for key in keys
+                if make_cache_key(key) in found_keys
+            }
+
+        to_fetch = {}
+
+        for key, file_info in zip(keys, files):
+            if key not in to_fetch and key not in cached_keys:
+                to_fetch[key] = file_info
+
+        if not to_fetch:
+            return results
+
+        fetch_keys = list(six.iterkeys(to_fetch))
+        fetched = dict(zip(
+            fetch_keys,
+            self._get_files_uncached([to_fetch[key] for key in fetch_keys],
+                                     request)))
+
+        for key, data in six.iteritems(fetched):
+            if isinstance(data, Exception):
+                path, revision, base_commit_id = to_fetch[key]
+                logging.debug('Unable to fetch file "%s" (revision %s) from '
+                              'repository %s: %s',
+                              path, revision, self.pk, data)
+            else:
+                cache_memoize(key, lambda data=data: [data], large_data=True,
+                              force_overwrite=True)
+
+        results.update(fetched)
+
+        return results
+
+    def _get_cached_files(self, keys):
+        """Return the contents of several files from the cache.
+
+        Files are stored by :py:meth:`get_file` using
+        :py:func:`~djblets.cache.backend.cache_memoize` with
+        ``large_data=True``, which stores the number of chunks under the
+        file's key and the compressed, pickled contents across the chunks.
+        Rather than loading each file separately, the chunk counts for all
+        the files are loaded in one operation, and then all the chunks in
+        another.
+
+        djblets doesn't provide an API for loading several large cached
+        items at once, so this reads its storage format directly. That is
+        covered by unit tests, so any change to the format won't go
+        unnoticed.
+
+        Args:
+            keys (set of unicode):
+                The file cache keys to load.
+
+        Returns:
+            dict:
+            A dictionary mapping file cache keys to the file contents
+            (:py:class:`bytes`). Files that aren't fully cached are not
+            included.
+        """
+        chunk_counts = cache.get_many([
+            make_cache_key(key)
+            for key in keys
+        ])
+        chunk_keys = {}
+
+        for key in keys:
+            try:
+                chunk_count = int(chunk_counts[make_cache_key(key)])
+            except (KeyError, TypeError, ValueError):
+                continue
+
+            chunk_keys[key] = [
+                make_cache_key('%s-%d' % (key, i))
+                for i in range(chunk_count)
+            ]
+
+        if not chunk_keys:
+            return {}
+
+        chunks = cache.get_many([
+            chunk_key
+            for key_chunk_keys in six.itervalues(chunk_keys)
+            for chunk_key in key_chunk_keys
+        ])
+        results = {}
+
+        for key, key_chunk_keys in six.iteritems(chunk_keys):
+            try:
+                data = zlib.decompress(b''.join(
+                    chunks[chunk_key][0]
+                    for chunk_key in key_chunk_keys
+                ))
+                results[key] = pickle.loads(data)[0]
+            except KeyError:
+                # One of the chunks was evicted. The file will be fetched
+                # again.
+                pass
+            except Exception as e:
+                logging.warning('Unable to load cached file for key "%s" '
+                                'in repository %s: %s',
+                                key, self.pk, e)
+
+        return results
+
+    def _get_files_uncached(self, files, request):
+        """Return several files from the repository, bypassing cache.
+
+        This is called internally by :py:meth:`get_files` and
+        :py:meth:`prefetch_files` for any files that aren't already in the
+        cache.
+
+        Files are fetched from hosting services concurrently (up to
+        :py:attr:`MAX_CONCURRENT_FILE_FETCHES` at a time), and from
+        repositories using :py:meth:`SCMTool.get_files()
+        <reviewboard.scmtools.core.SCMTool.get_files>`.
+
+        This will send the
+        :py:data:`~reviewboard.scmtools.signals.fetching_file` signal before
+        fetching each file from the repository, and the
+        :py:data:`~reviewboard.scmtools.signals.fetched_file` signal after
+        each file is successfully fetched.
+
+        Args:
+            files (list of tuple):
+                A list of ``(path, revision, base_commit_id)`` tuples.
+
+            request (django.http.HttpRequest):
+                The current HTTP request from the client.
+
+        Returns:
+            list:
+            A list of results, in the same order as ``files``. Each result
+            is either the file contents (:py:class:`bytes`), or the
+            exception that was raised when fetching that file.
+        """
+        for path, revision, base_commit_id in files:
+            fetching_file.send(sender=self,
+                               path=path,
+                               revision=revision,
+                               base_commit_id=base_commit_id,
+                               request=request)
+
+        log_timer = log_timed('Fetching %d files from %s'
+                              % (len(files), self),
+                              request=request)
+
+        hosting_service = self.hosting_service
+
+        if hosting_service:
+            def _fetch_file(file_info):
+                path, revision, base_commit_id = file_info
+
+                try:
+                    return hosting_service.get_file(
+                        self,
+                        path,
+                        revision,
+                        base_commit_id=base_commit_id)
+                except Exception as e:
+                    return e
+
+            if len(files) == 1:
+                results = [_fetch_file(files[0])]
+            else:
+                def _fetch_file_in_thread(file_info):
+                    try:
+                        return _fetch_file(file_info)
+                    finally:
+                        connections.close_all()
+
+                pool = ThreadPool(min(len(files),
+                                      self.MAX_CONCURRENT_FILE_FETCHES))
+
+                try:
+                    results = pool.map(_fetch_file_in_thread, files)
+                finally:
+                    pool.close()
+                    pool.join()
+
+            impl_name = '%s.get_file()' % type(hosting_service).__name__
+        else:
+            tool = self.get_scmtool()
+            results = tool.get_files(files)
+            impl_name = '%s.get_files()' % type(tool).__name__
+
+        assert len(results) == len(files), (
+            '%s must return one result per file' % impl_name)
+
+        for (path, revision, base_commit_id), data in zip(files, results):
+            if isinstance(data, Exception):
+                continue
+
+            assert isinstance(data, bytes), (
+                '%s must return a byte string, not %s'
+                % (impl_name, type(data)))
+
+            fetched_file.send(sender=self,
+                              path=path,
+                              revision=revision,
+                              base_commit_id=base_commit_id,
+                              request=request,
+                              data=data)
+
+        log_timer.done()
+
+        return results
+
+    def _check_files_exist(self, files, request):
+        """Check for the existence of several files not known to exist.
+
+        This is called internally by :py:meth:`get_files_exist`. Each file
+        is checked using :py:meth:`get_file_exists`. Files on hosting
+        services are checked concurrently (up to
+        :py:attr:`MAX_CONCURRENT_FILE_EXISTS_CHECKS` at a time), and files
+        in repositories are checked one at a time.
+
+        Args:
+            files (list of tuple):
+                A list of ``(path, revision, base_commit_id)`` tuples.
+
+            request (django.http.HttpRequest):
+                The current HTTP request from the client.
+
+        Returns:
+            list:
+            A list of results, in the same order as ``files``. Each result
+            is either a boolean indicating whether the file exists, or the
+            exception that was raised when checking that file.
+        """
+        def _check_file(file_info):
+            path, revision, base_commit_id = file_info
+
+            try:
+                return self.get_file_exists(path,
+                                            revision,
+                                            base_commit_id=base_commit_id,
+                                            request=request)
+            except Exception as e:
+                return e
+
+        if len(files) == 1 or not self.hosting_service:
+            return [
+                _check_file(file_info)
+                for file_info in files
+            ]
+
+        def _check_file_in_thread(file_info):
+            try:
+                return _check_file(file_info)
+            finally:
+                connections.close_all()
+
+        log_timer = log_timed('Checking existence of %d files in %s'
+                              % (len(files), self),
+                              request=request)
+
+        pool = ThreadPool(min(len(files),
+                              self.MAX_CONCURRENT_FILE_EXISTS_CHECKS))
+
+        try:
+            results = pool.map(_check_file_in_thread, files)
+        finally:
+            pool.close()
+            pool.join()
+
+        log_timer.done()
+
+        return results
+
     def _get_file_exists_uncached(self, path, revision, base_commit_id,
                                   request):
         """Check for file existence, bypassing cache.
@@ -12,6 +12,7 @@ import socket
 import stat
 import subprocess
 import tempfile
+import threading
 import time
 from contextlib import contextmanager
 
@@ -31,6 +32,7 @@ from reviewboard.scmtools.errors import (SCMError, EmptyChangeSetError,
                                          InvalidRevisionFormatError,
                                          RepositoryNotFoundError,
                                          UnverifiedCertificateError)
+from reviewboard.scmtools.pools import IdleResourcePool
 
 
 class STunnelProxy(object):
@@ -178,6 +180,23 @@ class STunnelProxy(object):
 
         shutil.rmtree(tempdir)
 
+    @property
+    def is_running(self):
+        """Whether the tunnel is currently running.
+
+        Version Added:
+            4.0
+        """
+        if not self.pid:
+            return False
+
+        try:
+            os.kill(self.pid, 0)
+        except OSError:
+            return False
+
+        return True
+
     def shutdown(self):
         """Shut down the tunnel."""
         if self.pid:
@@ -216,6 +235,206 @@ class STunnelProxy(object):
                     pass
 
 
+class PerforceConnection(object):
+    """An open, authenticated connection to a Perforce server.
+
+    This pairs a connected :py:class:`P4.P4` instance with the stunnel
+    proxy it connects through (if any), so that both can be kept open and
+    reused by :py:class:`PerforceConnectionPool`.
+
+    Version Added:
+        4.0
+    """
+
+    def __init__(self, p4, proxy=None):
+        """Initialize the connection.
+
+        Args:
+            p4 (P4.P4):
+                The connected Perforce client.
+
+            proxy (STunnelProxy, optional):
+                The stunnel proxy the client is connected through.
+        """
+        self.p4 = p4
+        self.proxy = proxy
+        self.last_used = time.time()
+        self.last_ticket_check = time.time()
+
+    @property
+    def is_alive(self):
+        """Whether the connection (and its proxy) is still open."""
+        return (self.p4.connected() and
+                (self.proxy is None or self.proxy.is_running))
+
+    def ping(self):
+        """Check that the server is still responding on this connection.
+
+        Returns:
+            bool:
+            ``True`` if the server responded.
+        """
+        from P4 import P4Exception
+
+        try:
+            self.p4.run_info()
+        except P4Exception as e:
+            logging.debug('Perforce connection to %s failed a health '
+                          'check: %s',
+                          self.p4.port, e)
+            return False
+
+        return self.is_alive
+
+    def close(self):
+        """Close the connection and shut down its proxy."""
+        from P4 import P4Exception
+
+        try:
+            if self.p4.connected():
+                self.p4.disconnect()
+        except P4Exception as e:
+            logging.debug('Error disconnecting from Perforce server %s: %s',
+                          self.p4.port, e)
+
+        if self.proxy is not None:
+            try:
+                self.proxy.shutdown()
+            except Exception:
+                pass
+
+            self.proxy = None
+
+
+class PerforceServerConnections(object):
+    """The idle connections to a Perforce server for a set of credentials.
+
+    Connections are checked out with :py:meth:`acquire` for the duration
+    of an operation, and then returned with :py:meth:`release`, so that a
+    connection is never used by two threads at once.
+
+    Version Added:
+        4.0
+    """
+
+    #: The maximum number of idle connections kept open.
+    MAX_IDLE_CONNECTIONS = 4
+
+    #: The number of idle seconds after which a connection is pinged.
+    #:
+    #: Connections that have been idle for longer than this will be checked
+    #: with a round trip to the server before being reused.
+    PING_IDLE_SECS = 60
+
+    def __init__(self):
+        """Initialize the list of connections."""
+        self.last_used = time.time()
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Check out a healthy idle connection.
+
+        Returns:
+            PerforceConnection:
+            An idle connection, or ``None`` if there are no healthy idle
+            connections. A new connection must then be opened.
+        """
+        while True:
+            with self._lock:
+                self.last_used = time.time()
+
+                if not self._idle:
+                    return None
+
+                connection = self._idle.pop()
+
+            if (connection.is_alive and
+                (time.time() - connection.last_used < self.PING_IDLE_SECS or
+                 connection.ping())):
+                return connection
+
+            connection.close()
+
+    def release(self, connection):
+        """Return a connection, making it available for reuse.
+
+        Connections that are no longer open, or that would exceed
+        :py:attr:`MAX_IDLE_CONNECTIONS`, will be closed.
+
+        Args:
+            connection (PerforceConnection):
+                The connection to return.
+        """
+        connection.last_used = time.time()
+
+        if connection.is_alive:
+            with self._lock:
+                self.last_used = connection.last_used
+
+                if len(self._idle) < self.MAX_IDLE_CONNECTIONS:
+                    self._idle.append(connection)
+                    return
+
+        connection.close()
+
+    def close(self):
+        """Close all idle connections."""
+        with self._lock:
+            idle = self._idle
+            self._idle = []
+
+        for connection in idle:
+            connection.close()
+
+
+class PerforceConnectionPool(IdleResourcePool):
+    """A per-process pool of Perforce connections.
+
+    This keeps open, authenticated connections (and their stunnel proxies)
+    for each Perforce server and set of credentials, so that operations
+    don't pay for connecting, tunneling, and checking login tickets each
+    time. Connections that haven't been used for :py:attr:`IDLE_TIMEOUT`
+    seconds are closed by a background thread.
+
+    Version Added:
+        4.0
+    """
+
+    def create_resource(self, key, **kwargs):
+        """Create a new list of connections for the pool.
+
+        Args:
+            key (tuple):
+                The key identifying the server and credentials.
+
+            **kwargs (dict):
+                Unused keyword arguments.
+
+        Returns:
+            PerforceServerConnections:
+            The new list of connections.
+        """
+        return PerforceServerConnections()
+
+    def get_connections(self, key):
+        """Return the connections for a server and set of credentials.
+
+        Args:
+            key (tuple):
+                The key identifying the server and credentials.
+
+        Returns:
+            PerforceServerConnections:
+            The connections for the server and credentials.
+        """
+        return self.get_resource(key)
+
+
+#: The pool of Perforce connections used by PerforceClient.
+connection_pool = PerforceConnectionPool()
+
+
 class PerforceClient(object):
     """Client for talking to a Perforce server.
 
@@ -231,6 +450,23 @@ class PerforceClient(object):
     #: We default this to 1 hour.
     TICKET_RENEWAL_SECS = 1 * 60 * 60
 
+    #: The number of seconds between ticket checks on pooled connections.
+    #:
+    #: This is well below :py:attr:`TICKET_RENEWAL_SECS`, so that tickets
+    #: are always renewed before they expire.
+    TICKET_CHECK_INTERVAL_SECS = 5 * 60
+
+    #: Python encodings for Perforce charsets with differing names.
+    #:
+    #: Other charsets (such as ``iso8859-1``, ``shiftjis``, or ``cp1251``)
+    #: are known to Python by their Perforce names.
+    P4_CHARSET_ENCODINGS = {
+        'macosroman': 'mac_roman',
+        'utf8-bom': 'utf-8-sig',
+        'winansi': 'cp1252',
+        'winoem': 'cp437',
+    }
+
     def __init__(self, path, username, password, encoding='', host=None,
                  client_name=None, local_site_name=None,
                  use_ticket_auth=False):
@@ -349,14 +585,20 @@ class PerforceClient(object):
     def connect(self):
         """Connect to the Perforce server.
 
-        This is a context manager used to set up, open, and then close a
-        connection to the Perforce server. Generally, :py:meth:`run_worker`
-        should be used instead, as this will convert certain P4 exceptions to
-        Review Board exceptions.
+        This is a context manager used to provide an open connection to the
+        Perforce server for the duration of an operation. Generally,
+        :py:meth:`run_worker` should be used instead, as this will convert
+        certain P4 exceptions to Review Board exceptions.
+
+        Connections are reused across operations through
+        :py:data:`connection_pool`. A pooled connection that's no longer
+        open is replaced, and login tickets on pooled connections are
+        checked and refreshed every
+        :py:attr:`TICKET_CHECK_INTERVAL_SECS` seconds.
 
         Context:
             The context for the connection. Once the context ends, the
-            connection will close.
+            connection will be returned to the pool.
 
             No variables are passed to the context.
 
@@ -366,6 +608,60 @@ class PerforceClient(object):
                 with client.connect():
                     ...
         """
+        connections = connection_pool.get_connections((
+            self.p4port,
+            self.use_stunnel,
+            self.username,
+            self.password,
+            self.encoding,
+            self.p4host,
+            self.client_name,
+            self.local_site_name,
+            self.use_ticket_auth,
+        ))
+        connection = connections.acquire()
+
+        if connection is None:
+            connection = self._open_connection()
+        else:
+            self.p4 = connection.p4
+
+            if (self.use_ticket_auth and
+                (time.time() - connection.last_ticket_check >=
+                 self.TICKET_CHECK_INTERVAL_SECS)):
+                try:
+                    self.check_refresh_ticket()
+                except Exception:
+                    connection.close()
+                    raise
+
+                connection.last_ticket_check = time.time()
+
+        try:
+            yield
+        finally:
+            connections.release(connection)
+
+    def _open_connection(self):
+        """Open a new connection to the Perforce server.
+
+        This will set up the Perforce client, start an stunnel proxy (if
+        needed), connect, and check the login ticket (if using ticket-based
+        authentication).
+
+        Version Added:
+            4.0
+
+        Returns:
+            PerforceConnection:
+            The new connection.
+        """
+        if self.p4.connected():
+            # This client's last connection is still open, and belongs to
+            # the pool. Start over with a new client.
+            import P4
+            self.p4 = P4.P4()
+
         self.p4.user = force_str(self.username)
 
         if self.encoding:
@@ -421,21 +717,21 @@ class PerforceClient(object):
             # need to set the password that's provided.
             self.p4.password = force_str(self.password)
 
+        connection = PerforceConnection(p4=self.p4, proxy=proxy)
+
         try:
-            with self.p4.connect():
-                if self.use_ticket_auth:
-                    # The ticket may not exist, may have expired, or may be
-                    # close to expiring. Check for those conditions and
-                    # possibly request/extend a ticket.
-                    self.check_refresh_ticket()
+            self.p4.connect()
 
-                yield
-        finally:
-            if proxy:
-                try:
-                    proxy.shutdown()
-                except Exception:
-                    pass
+            if self.use_ticket_auth:
+                # The ticket may not exist, may have expired, or may be
+                # close to expiring. Check for those conditions and
+                # possibly request/extend a ticket.
+                self.check_refresh_ticket()
+        except Exception:
+            connection.close()
+            raise
+
+        return connection
 
     @contextmanager
     def run_worker(self):
@@ -563,31 +859,222 @@ class PerforceClient(object):
         if revision == PRE_CREATION:
             return b''
 
+        with self.run_worker():
+            return self._print_file(path, revision)
+
+    def get_files(self, files):
+        """Return the contents of several files at specified revisions.
+
+        All the files are fetched using a single :command:`p4 print`
+        command. The contents of each file are then converted according to
+        its file type and the connection's charset, so that they match the
+        results of :py:meth:`get_file`. Any files whose contents can't be
+        converted with certainty are printed individually, in the same way
+        as :py:meth:`get_file`.
+
+        Version Added:
+            4.0
+
+        Args:
+            files (list of tuple):
+                A list of ``(path, revision)`` tuples, each containing a
+                Perforce depot path (without a revision) and the revision
+                for the path.
+
+        Returns:
+            list of bytes:
+            The contents of each file, in the same order as ``files``.
+
+        Raises:
+            reviewboard.scmtools.errors.SCMError:
+                There was an error fetching one or more of the files. The
+                exception message will have more details.
+        """
+        results = [b''] * len(files)
+        depot_paths = []
+        indexes = []
+
+        for i, (path, revision) in enumerate(files):
+            if revision == PRE_CREATION:
+                continue
+
+            if revision == HEAD:
+                depot_paths.append(path)
+            else:
+                depot_paths.append('%s#%s' % (path, revision))
+
+            indexes.append(i)
+
+        if not depot_paths:
+            return results
+
+        with self.run_worker():
+            printed_files = self._print_files(depot_paths)
+
+            for i, (file_type, content) in zip(indexes, printed_files):
+                data = self._convert_printed_file(file_type, content)
+
+                if data is None:
+                    path, revision = files[i]
+                    data = self._print_file(path, revision)
+
+                results[i] = data
+
+        return results
+
+    def _print_files(self, depot_paths):
+        """Return the raw contents of several files using one command.
+
+        This must be called within :py:meth:`run_worker`.
+
+        Version Added:
+            4.0
+
+        Args:
+            depot_paths (list of unicode):
+                The depot paths (including any revisions) to print.
+
+        Returns:
+            list of tuple:
+            A list of ``(file_type, content)`` tuples, in the same order as
+            ``depot_paths``. ``file_type`` is the Perforce file type, and
+            ``content`` is the file's content as sent by the server.
+
+        Raises:
+            reviewboard.scmtools.errors.SCMError:
+                The output didn't contain one entry for each requested file.
+        """
+        # Fetch contents as bytes, rather than decoding them according to
+        # the server's charset.
+        old_encoding = self.p4.encoding
+        self.p4.encoding = 'raw'
+
+        try:
+            output = self.p4.run_print('-q', *depot_paths)
+        finally:
+            self.p4.encoding = old_encoding
+
+        # The output consists of a dictionary of information for each file,
+        # followed by zero or more blocks of content.
+        printed_files = []
+
+        for item in output:
+            if isinstance(item, dict):
+                file_type = item.get('type', item.get(b'type', ''))
+                printed_files.append((force_text(file_type), []))
+            elif printed_files:
+                printed_files[-1][1].append(item)
+
+        if len(printed_files) != len(depot_paths):
+            raise SCMError('p4 print returned %d files, but %d were '
+                           'requested'
+                           % (len(printed_files), len(depot_paths)))
+
+        return [
+            (file_type, b''.join(content))
+            for file_type, content in printed_files
+        ]
+
+    def _convert_printed_file(self, file_type, content):
+        """Convert the raw contents of a printed file.
+
+        This converts the contents sent by the server to the contents that
+        :command:`p4 print -o` would write to a file, based on the file
+        type and the connection's charset:
+
+        * ``symlink`` files result in empty content, as in
+          :py:meth:`get_file`.
+        * ``unicode`` files are sent as UTF-8, and are converted to the
+          connection's charset.
+        * ``utf16`` files are sent as UTF-8, and are converted to UTF-16
+          with a byte order mark.
+        * Other files (such as ``text`` and ``binary``) are used as-is.
+
+        Version Added:
+            4.0
+
+        Args:
+            file_type (unicode):
+                The Perforce file type, including any modifiers.
+
+            content (bytes):
+                The raw contents of the file.
+
+        Returns:
+            bytes:
+            The converted contents, or ``None`` if the contents can't be
+            converted with certainty and must be printed individually.
+        """
+        base_type = file_type.split('+', 1)[0]
+
+        if base_type == 'symlink':
+            return b''
+        elif base_type.endswith('utf16'):
+            encoding = 'utf-16'
+        elif base_type.endswith('unicode'):
+            charset = force_text(self.p4.charset or '')
+
+            if charset in ('', 'none', 'utf8'):
+                return content
+
+            encoding = self.P4_CHARSET_ENCODINGS.get(charset, charset)
+        elif base_type == 'utf8':
+            # Whether a byte order mark is written depends on the server's
+            # filesys.utf8bom configurable.
+            return None
+        else:
+            return content
+
+        try:
+            return content.decode('utf-8').encode(encoding)
+        except (LookupError, UnicodeError):
+            return None
+
+    def _print_file(self, path, revision):
+        """Return the contents of a file using the current connection.
+
+        The file is printed to a temporary file, so that its contents are
+        written the same way as by :command:`p4 print -o` for any file
+        type or server charset.
+
+        This must be called within :py:meth:`run_worker`.
+
+        Version Added:
+            4.0
+
+        Args:
+            path (unicode):
+                The Perforce depot path, without a revision.
+
+            revision (unicode):
+                The revision for the path.
+
+        Returns:
+            bytes:
+            The contents of the file.
+        """
         if revision == HEAD:
             depot_path = path
         else:
             depot_path = '%s#%s' % (path, revision)
 
-        with self.run_worker():
-            fd, filename = tempfile.mkstemp(prefix='reviewboard.')
+        fd, filename = tempfile.mkstemp(prefix='reviewboard.')
 
-            try:
-                os.close(fd)
-                self.p4.run_print('-q', '-o', filename, depot_path)
-
-                if os.path.islink(filename):
-                    return b''
-                else:
-                    # p4 print will change the permissions on the file to be
-                    # read-only, which will break the unlink unless we fix it.
-                    os.chmod(filename, stat.S_IREAD | stat.S_IWRITE)
+        try:
+            os.close(fd)
+            self.p4.run_print('-q', '-o', filename, depot_path)
 
-                    with open(filename, 'rb') as f:
-                        return f.read()
-            finally:
-                os.unlink(filename)
+            if os.path.islink(filename):
+                return b''
+            else:
+                # p4 print will change the permissions on the file to be
+                # read-only, which will break the unlink unless we fix it.
+                os.chmod(filename, stat.S_IREAD | stat.S_IWRITE)
 
-        return b''
+                with open(filename, 'rb') as f:
+                    return f.read()
+        finally:
+            os.unlink(filename)
 
     def get_file_stat(self, path, revision):
         """Return status information about a file in the repository.
@@ -806,6 +1293,43 @@ class PerforceTool(SCMTool):
         """
         return self.client.get_file(path, revision)
 
+    def get_files(self, files, **kwargs):
+        """Return the contents of several files in the repository.
+
+        The files are fetched using a single :command:`p4 print`. If that
+        fails (for instance, if any one of the files can't be found), each
+        file will be fetched individually, so that errors are reported for
+        the correct files.
+
+        Version Added:
+            4.0
+
+        Args:
+            files (list of tuple):
+                A list of ``(path, revision, base_commit_id)`` tuples.
+
+            **kwargs (dict):
+                Unused keyword arguments.
+
+        Returns:
+            list:
+            A list of results, in the same order as ``files``. Each result
+            is either the file contents (:py:class:`bytes`), or the
+            exception that was raised when fetching that file.
+        """
+        try:
+            return self.client.get_files([
+                (path, revision)
+                for path, revision, base_commit_id in files
+            ])
+        except SCMError as e:
+            logging.warning('Unable to fetch %d files from Perforce '
+                            'repository %s in bulk. Falling back to '
+                            'fetching individually: %s',
+                            len(files), self.client.p4port, e)
+
+            return super(PerforceTool, self).get_files(files, **kwargs)
+
     def file_exists(self, path, revision=HEAD, **kwargs):
         """Return whether a particular file exists in a repository.
 
@@ -0,0 +1,156 @@
+"""Pools of long-lived resources used to talk to repositories.
+
+Version Added:
+    4.0
+"""
+
+from __future__ import unicode_literals
+
+import os
+import threading
+import time
+
+from django.utils import six
+
+
+class IdleResourcePool(object):
+    """A per-process pool of long-lived resources.
+
+    This keeps one resource (such as a process or a server connection) for
+    each key. Resources that haven't been used for :py:attr:`IDLE_TIMEOUT`
+    seconds are closed by a background thread.
+
+    Resources must provide a ``last_used`` attribute, containing the time
+    they were last used, and a ``close()`` method. Closed resources remain
+    in the pool, and are expected to reopen themselves when next used.
+
+    If the pool is used after a :py:func:`os.fork`, it will start over with
+    new resources, rather than sharing the parent's.
+
+    Subclasses must implement :py:meth:`create_resource`.
+
+    Version Added:
+        4.0
+    """
+
+    #: The number of seconds a resource may be idle before it's closed.
+    IDLE_TIMEOUT = 5 * 60
+
+    #: The number of seconds between checks for idle resources.
+    REAP_INTERVAL = 30
+
+    def __init__(self):
+        """Initialize the pool."""
+        self._lock = threading.Lock()
+        self._reset()
+
+    def create_resource(self, key, **kwargs):
+        """Create a new resource for the pool.
+
+        Args:
+            key (tuple):
+                The key identifying the resource.
+
+            **kwargs (dict):
+                Keyword arguments passed to :py:meth:`get_resource`.
+
+        Returns:
+            object:
+            The new resource.
+        """
+        raise NotImplementedError
+
+    def get_resource(self, key, **kwargs):
+        """Return the resource for a key, creating it if needed.
+
+        Args:
+            key (tuple):
+                The key identifying the resource.
+
+            **kwargs (dict):
+                Keyword arguments to pass to :py:meth:`create_resource`.
+
+        Returns:
+            object:
+            The resource for the key.
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+
+            try:
+                resource = self._resources[key]
+            except KeyError:
+                resource = self.create_resource(key, **kwargs)
+                self._resources[key] = resource
+
+            if self._reaper is None:
+                self._reaper = threading.Thread(target=self._reap)
+                self._reaper.daemon = True
+                self._reaper.start()
+
+        return resource
+
+    def get_existing_resource(self, key):
+        """Return the resource for a key, if one has been created.
+
+        Args:
+            key (tuple):
+                The key identifying the resource.
+
+        Returns:
+            object:
+            The resource for the key, or ``None`` if there isn't one in this
+            process.
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                return None
+
+            return self._resources.get(key)
+
+    def close_idle(self, now=None):
+        """Close any resources that have been idle for too long.
+
+        Args:
+            now (float, optional):
+                The current time. Defaults to :py:func:`time.time`.
+        """
+        if now is None:
+            now = time.time()
+
+        with self._lock:
+            idle = [
+                resource
+                for resource in six.itervalues(self._resources)
+                if now - resource.last_used >= self.IDLE_TIMEOUT
+            ]
+
+        for resource in idle:
+            resource.close()
+
+    def close_all(self):
+        """Close all resources in the pool."""
+        with self._lock:
+            resources = list(six.itervalues(self._resources))
+
+        for resource in resources:
+            resource.close()
+
+    def _reset(self):
+        """Reset the state of the pool for the current process.
+
+        This must be called with the lock held.
+        """
+        self._pid = os.getpid()
+        self._resources = {}
+        self._reaper = None
+
+    def _reap(self):
+        """Periodically close idle resources.
+
+        This runs in a background thread.
+        """
+        while True:
+            time.sleep(self.REAP_INTERVAL)
+            self.close_idle()
@@ -11,7 +11,9 @@ from kgb import SpyAgency
 from reviewboard.diffviewer.parser import DiffParserError
 from reviewboard.scmtools.core import PRE_CREATION
 from reviewboard.scmtools.errors import SCMError, FileNotFoundError
-from reviewboard.scmtools.git import ShortSHA1Error, GitClient, GitTool
+from reviewboard.scmtools.git import (GitCatFilePool, GitCatFileProcess,
+                                      GitClient, GitTool, ShortSHA1Error,
+                                      cat_file_pool)
 from reviewboard.scmtools.models import Repository, Tool
 from reviewboard.scmtools.tests.testcases import SCMTestCase
 from reviewboard.testing.testcase import TestCase
@@ -1109,6 +1111,73 @@ class GitTests(SpyAgency, SCMTestCase):
         with self.assertRaises(FileNotFoundError):
             tool.get_file('readme', '0000000')
 
+    def test_get_files(self):
+        """Testing GitTool.get_files"""
+        cat_file_pool.close_all()
+        self.spy_on(GitCatFileProcess._start, owner=GitCatFileProcess)
+
+        results = self.tool.get_files([
+            ('readme', 'e965047', None),
+            ('readme', PRE_CREATION, None),
+            ('readme', '0000000', None),
+            ('readme', 'a62df6c', None),
+            ('readme', 'd6613f5', None),
+        ])
+
+        self.assertEqual(len(results), 5)
+        self.assertEqual(results[0], b'Hello\n')
+        self.assertEqual(results[1], b'')
+        self.assertIsInstance(results[2], FileNotFoundError)
+        self.assertIsInstance(results[3], SCMError)
+        self.assertEqual(results[4], b'Hello there\n')
+
+        self.assertEqual(len(GitCatFileProcess._start.calls), 1)
+
+    def test_get_file_reuses_cat_file_process(self):
+        """Testing GitTool.get_file reuses a git cat-file process"""
+        cat_file_pool.close_all()
+        self.spy_on(GitCatFileProcess._start, owner=GitCatFileProcess)
+
+        tool = self.repository.get_scmtool()
+        self.assertEqual(tool.get_file('readme', 'e965047'), b'Hello\n')
+        self.assertTrue(tool.file_exists('readme', 'e965047'))
+
+        tool = self.repository.get_scmtool()
+        self.assertEqual(tool.get_file('readme', 'd6613f5'),
+                         b'Hello there\n')
+        self.assertTrue(tool.file_exists('readme', 'd6613f5'))
+
+        # One --batch and one --batch-check process.
+        self.assertEqual(len(GitCatFileProcess._start.calls), 2)
+
+    def test_get_file_restarts_cat_file_process(self):
+        """Testing GitTool.get_file restarts a failed git cat-file process"""
+        tool = self.tool
+        self.assertEqual(tool.get_file('readme', 'e965047'), b'Hello\n')
+
+        process = cat_file_pool.get_process(tool.client.git_dir)
+        process._process.kill()
+        process._process.wait()
+
+        self.assertEqual(tool.get_file('readme', 'd6613f5'),
+                         b'Hello there\n')
+        self.assertTrue(process.is_running)
+
+    def test_cat_file_pool_close_idle(self):
+        """Testing GitCatFilePool.close_idle"""
+        tool = self.tool
+        self.assertEqual(tool.get_file('readme', 'e965047'), b'Hello\n')
+
+        process = cat_file_pool.get_process(tool.client.git_dir)
+        self.assertTrue(process.is_running)
+
+        cat_file_pool.close_idle(now=process.last_used + 1)
+        self.assertTrue(process.is_running)
+
+        cat_file_pool.close_idle(
+            now=process.last_used + GitCatFilePool.IDLE_TIMEOUT)
+        self.assertFalse(process.is_running)
+
     def test_parse_diff_revision_with_remote_and_short_SHA1_error(self):
         """Testing GitTool.parse_diff_revision with remote files and short
         SHA1 error
@@ -10,17 +10,20 @@ from kgb import SpyAgency
 
 from reviewboard.scmtools.core import HEAD, PRE_CREATION, Revision
 from reviewboard.scmtools.errors import SCMError, FileNotFoundError
-from reviewboard.scmtools.hg import (HgDiffParser,
+from reviewboard.scmtools.hg import (HgClient,
+                                     HgCommandServer,
+                                     HgDiffParser,
                                      HgGitDiffParser,
                                      HgTool,
-                                     HgWebClient)
+                                     HgWebClient,
+                                     command_server_pool)
 from reviewboard.scmtools.models import Repository, Tool
 from reviewboard.scmtools.tests.testcases import SCMTestCase
 from reviewboard.testing import online_only
 from reviewboard.testing.testcase import TestCase
 
 
-class MercurialTests(SCMTestCase):
+class MercurialTests(SpyAgency, SCMTestCase):
     """Unit tests for mercurial."""
 
     fixtures = ['test_scmtools']
@@ -347,6 +350,60 @@ class MercurialTests(SCMTestCase):
         with self.assertRaises(FileNotFoundError):
             tool.get_file('hello', PRE_CREATION)
 
+    def test_get_file_uses_command_server(self):
+        """Testing HgTool.get_file reuses a Mercurial command server"""
+        command_server_pool.close_all()
+        self.spy_on(HgCommandServer.start, owner=HgCommandServer)
+        self.spy_on(HgClient._run_hg, owner=HgClient)
+
+        rev = Revision('661e5dd3c493')
+
+        tool = self.repository.get_scmtool()
+        self.assertEqual(tool.get_file('doc/readme', rev),
+                         b'Hello\n\ngoodbye\n')
+
+        tool = self.repository.get_scmtool()
+        self.assertEqual(tool.get_file('doc/readme', rev),
+                         b'Hello\n\ngoodbye\n')
+
+        with self.assertRaises(FileNotFoundError):
+            tool.get_file('doc/readme2', rev)
+
+        self.assertSpyCallCount(HgCommandServer.start, 1)
+
+        # hg should only have been run directly to compute the options for
+        # starting the server.
+        self.assertSpyCallCount(HgClient._run_hg, 1)
+        self.assertSpyCalledWith(HgClient._run_hg,
+                                 ['showconfig', 'ui.ssh'])
+
+    def test_get_file_with_command_server_failure(self):
+        """Testing HgTool.get_file falls back on running hg directly when
+        the command server fails
+        """
+        def _run_command(*args, **kwargs):
+            raise IOError('Broken pipe')
+
+        rev = Revision('661e5dd3c493')
+        tool = self.tool
+        self.assertEqual(tool.get_file('doc/readme', rev),
+                         b'Hello\n\ngoodbye\n')
+
+        server = command_server_pool.get_server(self.repository.path)
+        self.assertTrue(server.is_running)
+
+        self.spy_on(HgCommandServer._run_command,
+                    owner=HgCommandServer,
+                    call_fake=_run_command)
+        self.spy_on(HgClient._run_hg, owner=HgClient)
+
+        self.assertEqual(tool.get_file('doc/readme', rev),
+                         b'Hello\n\ngoodbye\n')
+        self.assertFalse(server.is_running)
+        self.assertSpyCalledWith(HgClient._run_hg,
+                                 ['cat', '--rev', '661e5dd3c493',
+                                  'doc/readme'])
+
     def test_file_exists(self):
         """Testing HgTool.file_exists"""
         rev = Revision('661e5dd3c493')
@@ -25,7 +25,9 @@ from reviewboard.scmtools.errors import (AuthenticationError,
                                          SCMError,
                                          UnverifiedCertificateError)
 from reviewboard.scmtools.models import Repository, Tool
-from reviewboard.scmtools.perforce import PerforceTool, STunnelProxy
+from reviewboard.scmtools.perforce import (PerforceTool,
+                                           STunnelProxy,
+                                           connection_pool)
 from reviewboard.scmtools.tests.testcases import SCMTestCase
 from reviewboard.site.models import LocalSite
 from reviewboard.testing import online_only
@@ -42,8 +44,70 @@ if P4 is not None:
 
         def connect(self):
             return self
+
+    class ConnectedDummyP4(DummyP4):
+        """A dummy wrapper around P4 that simulates an open connection.
+
+        This is used for tests that need connections to be kept open in the
+        connection pool.
+        """
+
+        is_connected = False
+
+        def connect(self):
+            self.is_connected = True
+            return self
+
+        def connected(self):
+            return self.is_connected
+
+        def disconnect(self):
+            self.is_connected = False
+
+    class PrintingDummyP4(ConnectedDummyP4):
+        """A dummy wrapper around P4 that simulates printing files.
+
+        This is used for tests that need to compare :command:`p4 print`
+        output with and without ``-o``.
+        """
+
+        #: The files available to print.
+        #:
+        #: Each key is a depot path (including the revision), and each value
+        #: is a tuple of the file type, the content sent by the server, and
+        #: the content written by :command:`p4 print -o`.
+        depot_files = {}
+
+        def run_print(self, *args):
+            args = list(args)
+
+            if '-o' in args:
+                filename = args[args.index('-o') + 1]
+                file_type, sent, written = self.depot_files[args[-1]]
+
+                if file_type == 'symlink':
+                    os.unlink(filename)
+                    os.symlink(sent, filename)
+                else:
+                    with open(filename, 'wb') as fp:
+                        fp.write(written)
+
+                return [{'depotFile': args[-1], 'type': file_type}]
+
+            output = []
+
+            for depot_path in args[1:]:
+                file_type, sent, written = self.depot_files[depot_path]
+                output.append({'depotFile': depot_path, 'type': file_type})
+
+                # Content is sent by the server in blocks.
+                output += [sent[:4], sent[4:]]
+
+            return output
 else:
     DummyP4 = None
+    ConnectedDummyP4 = None
+    PrintingDummyP4 = None
 
 
 class BasePerforceTestCase(SpyAgency, SCMTestCase):
@@ -62,6 +126,8 @@ class BasePerforceTestCase(SpyAgency, SCMTestCase):
         if not is_exe_in_path('p4'):
             raise nose.SkipTest('The p4 command line tool is not installed')
 
+        connection_pool.close_all()
+
 
 class PerforceTests(BasePerforceTestCase):
     """Unit tests for Perforce.
@@ -198,6 +264,82 @@ class PerforceTests(BasePerforceTestCase):
             self.assertTrue(p4.ticket_file.endswith(
                 os.path.join('data', 'p4', 'p4tickets')))
 
+    def test_connect_reuses_connection(self):
+        """Testing PerforceTool.connect reuses pooled connections"""
+        self.repository.extra_data['use_ticket_auth'] = False
+
+        client = PerforceTool(self.repository).client
+        p4 = ConnectedDummyP4()
+        client.p4 = p4
+
+        with client.connect():
+            pass
+
+        self.assertTrue(p4.connected())
+
+        client = PerforceTool(self.repository).client
+
+        with client.connect():
+            self.assertIs(client.p4, p4)
+
+            # The connection is checked out, so a second connection must
+            # be opened.
+            client2 = PerforceTool(self.repository).client
+            client2.p4 = ConnectedDummyP4()
+
+            with client2.connect():
+                self.assertIsNot(client2.p4, p4)
+
+    def test_connect_replaces_closed_connection(self):
+        """Testing PerforceTool.connect replaces pooled connections that
+        were closed
+        """
+        self.repository.extra_data['use_ticket_auth'] = False
+
+        client = PerforceTool(self.repository).client
+        p4 = ConnectedDummyP4()
+        client.p4 = p4
+
+        with client.connect():
+            pass
+
+        p4.is_connected = False
+
+        client = PerforceTool(self.repository).client
+        client.p4 = ConnectedDummyP4()
+
+        with client.connect():
+            self.assertIsNot(client.p4, p4)
+
+    def test_connect_refreshes_ticket_on_pooled_connection(self):
+        """Testing PerforceTool.connect periodically checks tickets on
+        pooled connections
+        """
+        self.repository.extra_data['use_ticket_auth'] = True
+
+        client = PerforceTool(self.repository).client
+        client.p4 = ConnectedDummyP4()
+
+        self.spy_on(client.check_refresh_ticket, call_original=False)
+
+        with client.connect():
+            pass
+
+        self.assertSpyCallCount(client.check_refresh_ticket, 1)
+
+        # The ticket was just checked, so it won't be checked again.
+        with client.connect():
+            pass
+
+        self.assertSpyCallCount(client.check_refresh_ticket, 1)
+
+        client.TICKET_CHECK_INTERVAL_SECS = 0
+
+        with client.connect():
+            pass
+
+        self.assertSpyCallCount(client.check_refresh_ticket, 2)
+
     def test_run_worker_with_unverified_cert(self):
         """Testing PerforceTool.run_worker with unverified certificate"""
         self.repository.path = 'p4.example.com:1666'
@@ -391,6 +533,96 @@ class PerforceTests(BasePerforceTestCase):
         self.assertEqual(md5(content).hexdigest(),
                          '227bdd87b052fcad9369e65c7bf23fd0')
 
+    @online_only
+    def test_get_files(self):
+        """Testing PerforceTool.get_files"""
+        results = self.tool.get_files([
+            ('//public/perforce/api/python/P4Client/p4.py', '1', None),
+            ('//depot/foo', PRE_CREATION, None),
+        ])
+
+        self.assertEqual(len(results), 2)
+        self.assertIsInstance(results[0], bytes)
+        self.assertEqual(md5(results[0]).hexdigest(),
+                         '227bdd87b052fcad9369e65c7bf23fd0')
+        self.assertEqual(results[1], b'')
+
+    def test_get_files_matches_get_file(self):
+        """Testing PerforceTool.get_files returns the same content as
+        get_file for each file type
+        """
+        self.repository.encoding = 'shiftjis'
+        self.repository.extra_data['use_ticket_auth'] = False
+
+        text = 'Hello, 世界\n'
+        p4 = PrintingDummyP4()
+        p4.depot_files = {
+            '//depot/text#1': (
+                'text', b'line 1\nline 2\n', b'line 1\nline 2\n'),
+            '//depot/binary#1': (
+                'binary+F', b'\x00\x89PNG\xff', b'\x00\x89PNG\xff'),
+            '//depot/unicode#1': (
+                'unicode', text.encode('utf-8'), text.encode('shift_jis')),
+            '//depot/utf16#1': (
+                'utf16', text.encode('utf-8'), text.encode('utf-16')),
+            '//depot/symlink#1': ('symlink', b'text', b''),
+        }
+
+        client = PerforceTool(self.repository).client
+        client.p4 = p4
+
+        files = [
+            ('//depot/text', '1'),
+            ('//depot/binary', '1'),
+            ('//depot/unicode', '1'),
+            ('//depot/utf16', '1'),
+            ('//depot/symlink', '1'),
+            ('//depot/new', PRE_CREATION),
+        ]
+
+        self.spy_on(p4.run_print)
+
+        results = client.get_files(files)
+
+        # All the files were fetched with a single p4 print.
+        self.assertEqual(len(p4.run_print.calls), 1)
+
+        self.assertEqual(
+            results,
+            [
+                client.get_file(path, revision)
+                for path, revision in files
+            ])
+        self.assertEqual(results[2], text.encode('shift_jis'))
+        self.assertEqual(results[3], text.encode('utf-16'))
+
+    def test_get_files_with_unconvertible_file(self):
+        """Testing PerforceTool.get_files prints files individually if
+        their content can't be converted
+        """
+        self.repository.extra_data['use_ticket_auth'] = False
+
+        p4 = PrintingDummyP4()
+        p4.depot_files = {
+            '//depot/text#1': ('text', b'text\n', b'text\n'),
+            '//depot/utf8#1': ('utf8', b'text\n', b'\xef\xbb\xbftext\n'),
+        }
+
+        client = PerforceTool(self.repository).client
+        client.p4 = p4
+
+        self.spy_on(p4.run_print)
+
+        self.assertEqual(
+            client.get_files([
+                ('//depot/text', '1'),
+                ('//depot/utf8', '1'),
+            ]),
+            [b'text\n', b'\xef\xbb\xbftext\n'])
+
+        self.assertEqual(len(p4.run_print.calls), 2)
+        self.assertEqual(p4.run_print.calls[1].args[-1], '//depot/utf8#1')
+
     @online_only
     def test_file_exists(self):
         """Testing PerforceTool.file_exists"""
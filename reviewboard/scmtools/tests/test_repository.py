@@ -1,14 +1,20 @@
 from __future__ import unicode_literals
 
 import os
+import threading
 
 from django.contrib.auth.models import AnonymousUser
 from django.core.cache import cache
 from django.core.exceptions import ValidationError
+from djblets.cache.backend import (CACHE_CHUNK_SIZE, cache_memoize,
+                                   make_cache_key)
 from djblets.testing.decorators import add_fixtures
 from kgb import SpyAgency
 
+from reviewboard.hostingsvcs.github import GitHub
+from reviewboard.hostingsvcs.models import HostingServiceAccount
 from reviewboard.scmtools.core import HEAD
+from reviewboard.scmtools.errors import FileNotFoundError
 from reviewboard.scmtools.models import Repository, Tool
 from reviewboard.scmtools.signals import (checked_file_exists,
                                           checking_file_exists,
@@ -182,6 +188,183 @@ class RepositoryTests(SpyAgency, TestCase):
         self.assertEqual(found_signals[1],
                          ('fetched_file', path, revision, request))
 
+    def test_get_files(self):
+        """Testing Repository.get_files fetches uncached files in bulk"""
+        repository = self.repository
+        scmtool_cls = repository.scmtool_class
+
+        self.spy_on(scmtool_cls.get_file,
+                    call_fake=lambda *args, **kwargs: b'cached data',
+                    owner=scmtool_cls)
+        self.spy_on(scmtool_cls.get_files,
+                    call_fake=lambda self, files, **kwargs: [
+                        ('data for %s' % revision).encode('utf-8')
+                        for path, revision, base_commit_id in files
+                    ],
+                    owner=scmtool_cls)
+
+        repository.get_file('readme', 'e965047')
+
+        files = [
+            ('readme', 'e965047', None),
+            ('readme', 'd6613f5', None),
+            ('readme', 'd6613f5', None),
+            ('readme', 'a62df6c', 'abc123'),
+        ]
+
+        self.spy_on(Repository.get_file, owner=Repository)
+
+        results = repository.get_files(files)
+
+        self.assertEqual(results, [
+            b'cached data',
+            b'data for d6613f5',
+            b'data for d6613f5',
+            b'data for a62df6c',
+        ])
+        self.assertSpyCallCount(scmtool_cls.get_file, 1)
+        self.assertSpyCallCount(scmtool_cls.get_files, 1)
+        self.assertEqual(
+            sorted(scmtool_cls.get_files.last_call.args[0]),
+            [
+                ('readme', 'a62df6c', 'abc123'),
+                ('readme', 'd6613f5', None),
+            ])
+
+        # Cached files should be returned without loading them again.
+        self.assertSpyNotCalled(Repository.get_file)
+
+        # Everything should now be cached.
+        self.assertEqual(repository.get_files(files), results)
+        self.assertSpyCallCount(scmtool_cls.get_file, 1)
+        self.assertSpyCallCount(scmtool_cls.get_files, 1)
+
+    def test_get_files_with_evicted_cache_chunk(self):
+        """Testing Repository.get_files with part of a cached file evicted"""
+        repository = self.repository
+        scmtool_cls = repository.scmtool_class
+
+        self.spy_on(scmtool_cls.get_files,
+                    call_fake=lambda self, files, **kwargs: [b'new data'],
+                    owner=scmtool_cls)
+
+        repository.get_file('readme', 'e965047')
+        cache.delete(make_cache_key(
+            '%s-0' % repository._make_file_cache_key('readme', 'e965047',
+                                                     None)))
+
+        self.assertEqual(repository.get_files([('readme', 'e965047', None)]),
+                         [b'new data'])
+        self.assertSpyCallCount(scmtool_cls.get_files, 1)
+
+    def test_get_cached_files(self):
+        """Testing Repository._get_cached_files reads files stored by
+        cache_memoize(large_data=True)
+        """
+        # _get_cached_files() reads the storage format used by djblets
+        # directly. This will fail if that format ever changes.
+        repository = self.repository
+        small_data = b'small data'
+        large_data = os.urandom(CACHE_CHUNK_SIZE * 2)
+
+        small_key = repository._make_file_cache_key('readme', 'e965047',
+                                                    None)
+        large_key = repository._make_file_cache_key('readme', 'd6613f5',
+                                                    None)
+
+        cache_memoize(small_key, lambda: [small_data], large_data=True)
+        cache_memoize(large_key, lambda: [large_data], large_data=True)
+
+        # Make sure the large file was split across several chunks.
+        self.assertIsNotNone(cache.get(make_cache_key('%s-1' % large_key)))
+
+        self.assertEqual(
+            repository._get_cached_files({small_key, large_key}),
+            {
+                small_key: small_data,
+                large_key: large_data,
+            })
+
+    def test_get_files_with_errors(self):
+        """Testing Repository.get_files with errors fetching files"""
+        def _get_files(_self, files, **kwargs):
+            if len(scmtool_cls.get_files.calls) == 1:
+                return [b'file data', error]
+            else:
+                return [b'new data']
+
+        repository = self.repository
+        scmtool_cls = repository.scmtool_class
+        error = FileNotFoundError('readme', '0000000')
+
+        self.spy_on(scmtool_cls.get_files,
+                    call_fake=_get_files,
+                    owner=scmtool_cls)
+
+        files = [
+            ('readme', 'e965047', None),
+            ('readme', '0000000', None),
+        ]
+
+        self.assertEqual(repository.get_files(files), [b'file data', error])
+
+        # The error should not have been cached.
+        self.assertEqual(repository.get_files(files),
+                         [b'file data', b'new data'])
+        self.assertSpyCallCount(scmtool_cls.get_files, 2)
+        self.assertSpyLastCalledWith(scmtool_cls.get_files,
+                                     [('readme', '0000000', None)])
+
+    def test_get_files_signals(self):
+        """Testing Repository.get_files emits signals"""
+        def on_fetching_file(sender, path, revision, request, **kwargs):
+            found_signals.append(('fetching_file', path, revision, request))
+
+        def on_fetched_file(sender, path, revision, request, **kwargs):
+            found_signals.append(('fetched_file', path, revision, request))
+
+        found_signals = []
+
+        fetching_file.connect(on_fetching_file, sender=self.repository)
+        fetched_file.connect(on_fetched_file, sender=self.repository)
+
+        request = {}
+
+        self.repository.get_files(
+            [
+                ('readme', 'e965047', None),
+                ('readme', 'd6613f5', None),
+            ],
+            request=request)
+
+        self.assertEqual(found_signals, [
+            ('fetching_file', 'readme', 'e965047', request),
+            ('fetching_file', 'readme', 'd6613f5', request),
+            ('fetched_file', 'readme', 'e965047', request),
+            ('fetched_file', 'readme', 'd6613f5', request),
+        ])
+
+    def test_prefetch_files(self):
+        """Testing Repository.prefetch_files"""
+        repository = self.repository
+        scmtool_cls = repository.scmtool_class
+
+        self.spy_on(scmtool_cls.get_file, owner=scmtool_cls)
+        self.spy_on(scmtool_cls.get_files, owner=scmtool_cls)
+
+        repository.prefetch_files([
+            ('readme', 'e965047', None),
+            ('readme', 'd6613f5', None),
+        ])
+
+        self.assertSpyCallCount(scmtool_cls.get_files, 1)
+
+        self.assertEqual(repository.get_file('readme', 'e965047'),
+                         b'Hello\n')
+        self.assertEqual(repository.get_file('readme', 'd6613f5'),
+                         b'Hello there\n')
+        self.assertSpyNotCalled(scmtool_cls.get_file)
+
     def test_get_file_exists_caching_when_exists(self):
         """Testing Repository.get_file_exists caches result when exists"""
         path = 'readme'
@@ -276,6 +459,100 @@ class RepositoryTests(SpyAgency, TestCase):
         self.assertEqual(found_signals[1],
                          ('checked_file_exists', path, revision, request))
 
+    def test_get_files_exist(self):
+        """Testing Repository.get_files_exist checks uncached files"""
+        repository = self.repository
+        scmtool_cls = repository.scmtool_class
+
+        self.spy_on(scmtool_cls.get_file,
+                    call_fake=lambda *args, **kwargs: b'file data',
+                    owner=scmtool_cls)
+        self.spy_on(scmtool_cls.file_exists,
+                    call_fake=lambda self, path, revision=None, **kwargs: (
+                        revision != '0000000'),
+                    owner=scmtool_cls)
+
+        repository.get_file('readme', 'e965047')
+        repository.get_file_exists('readme', 'd6613f5')
+
+        files = [
+            ('readme', 'e965047', None),
+            ('readme', 'd6613f5', None),
+            ('readme', 'a62df6c', 'abc123'),
+            ('readme', '0000000', None),
+            ('readme', 'a62df6c', 'abc123'),
+        ]
+
+        self.assertEqual(repository.get_files_exist(files),
+                         [True, True, True, False, True])
+        self.assertSpyCallCount(scmtool_cls.file_exists, 3)
+        self.assertSpyCalledWith(scmtool_cls.file_exists.calls[1],
+                                 'readme',
+                                 revision='a62df6c',
+                                 base_commit_id='abc123')
+        self.assertSpyCalledWith(scmtool_cls.file_exists.calls[2],
+                                 'readme',
+                                 revision='0000000')
+
+        # Only files that exist should be cached.
+        self.assertEqual(repository.get_files_exist(files),
+                         [True, True, True, False, True])
+        self.assertSpyCallCount(scmtool_cls.file_exists, 4)
+
+    def test_get_files_exist_with_errors(self):
+        """Testing Repository.get_files_exist with errors checking files"""
+        repository = self.repository
+        scmtool_cls = repository.scmtool_class
+        error = Exception('Oh no')
+
+        def _file_exists(_self, path, revision=None, **kwargs):
+            if revision == 'd6613f5':
+                raise error
+
+            return True
+
+        self.spy_on(scmtool_cls.file_exists,
+                    call_fake=_file_exists,
+                    owner=scmtool_cls)
+
+        self.assertEqual(
+            repository.get_files_exist([
+                ('readme', 'e965047', None),
+                ('readme', 'd6613f5', None),
+            ]),
+            [True, error])
+
+    def test_get_files_exist_with_hosting_service(self):
+        """Testing Repository.get_files_exist checks files on a hosting
+        service concurrently
+        """
+        def _get_file_exists(_self, repository, path, revision, *args,
+                             **kwargs):
+            threads.add(threading.current_thread())
+
+            return revision != '0000000'
+
+        threads = set()
+        repository = self.create_repository(
+            name='Hosted repo',
+            hosting_account=HostingServiceAccount.objects.create(
+                service_name='github',
+                username='test-user'))
+
+        self.spy_on(GitHub.get_file_exists,
+                    call_fake=_get_file_exists)
+
+        results = repository.get_files_exist([
+            ('file%d' % i, '0000000' if i == 5 else 'abc%d' % i, None)
+            for i in range(20)
+        ])
+
+        self.assertEqual(results, [i != 5 for i in range(20)])
+        self.assertSpyCallCount(GitHub.get_file_exists, 20)
+        self.assertNotIn(threading.current_thread(), threads)
+        self.assertLessEqual(len(threads),
+                             Repository.MAX_CONCURRENT_FILE_EXISTS_CHECKS)
+
     def test_repository_name_with_255_characters(self):
         """Testing Repository.name with 255 characters"""
         repository = self.create_repository(name='t' * 255)
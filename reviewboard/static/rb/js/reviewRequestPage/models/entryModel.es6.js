@@ -14,6 +14,10 @@
  *     collapsed (boolean):
  *         Whether this entry is in a collapsed state.
  *
+ *     isPlaceholder (boolean):
+ *         Whether this entry is a placeholder for an entry that hasn't been
+ *         loaded yet.
+ *
  *     page (RB.ReviewRequestPage):
  *         The page that owns this entry.
  *
@@ -31,6 +35,7 @@ RB.ReviewRequestPage.Entry = Backbone.Model.extend({
     defaults: {
         addedTimestamp: null,
         collapsed: false,
+        isPlaceholder: false,
         page: null,
         reviewRequestEditor: null,
         typeID: null,
@@ -52,6 +57,7 @@ RB.ReviewRequestPage.Entry = Backbone.Model.extend({
         return {
             id: attrs.id,
             collapsed: attrs.collapsed,
+            isPlaceholder: !!attrs.isPlaceholder,
             addedTimestamp: moment.utc(attrs.addedTimestamp).toDate(),
             updatedTimestamp: moment.utc(attrs.updatedTimestamp).toDate(),
             typeID: attrs.typeID,
@@ -158,6 +158,31 @@ RB.ReviewRequestPage.ReviewRequestPage = RB.ReviewablePage.extend({
         }
     },
 
+    /**
+     * Load the full contents of placeholder entries.
+     *
+     * Placeholders are shown for older entries on review requests with a
+     * long history. Once loaded, each placeholder will be replaced with the
+     * full entry.
+     *
+     * Args:
+     *     entries (Array of RB.ReviewRequestPage.Entry):
+     *         The placeholder entries to load.
+     *
+     *     onDone (function, optional):
+     *         Optional function to call after the entries are loaded.
+     */
+    loadPlaceholderEntries(entries, onDone) {
+        entries = entries.filter(entry => entry.get('isPlaceholder'));
+
+        if (entries.length > 0) {
+            this._loadUpdates({
+                entries: entries,
+                onDone: onDone,
+            });
+        }
+    },
+
     /**
      * Schedule the next updates check.
      *
@@ -405,10 +430,14 @@ RB.ReviewRequestPage.ReviewRequestPage = RB.ReviewablePage.extend({
 
         console.assert(entry.get('typeID') === metadata.entryType);
 
-        /* Only reload this entry if its updated timestamp has changed. */
+        /*
+         * Only reload this entry if its updated timestamp has changed, or
+         * if it's a placeholder that's being loaded.
+         */
         const newTimestamp = new Date(metadata.updatedTimestamp);
 
-        if (newTimestamp <= entry.get('updatedTimestamp')) {
+        if (!entry.get('isPlaceholder') &&
+            newTimestamp <= entry.get('updatedTimestamp')) {
             return;
         }
 
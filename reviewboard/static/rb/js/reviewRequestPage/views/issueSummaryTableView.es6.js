@@ -457,7 +457,8 @@ RB.ReviewRequestPage.IssueSummaryTableView = Backbone.View.extend({
      * Handler for when an issue is clicked.
      *
      * This will notify any listeners to the ``issueClicked`` event that the
-     * issue has been clicked, providing the comment type and the issue ID.
+     * issue has been clicked, providing the comment type, the issue ID, and
+     * the ID of the review containing it.
      *
      * It will then navigate to the URL for that particular comment.
      *
@@ -484,6 +485,7 @@ RB.ReviewRequestPage.IssueSummaryTableView = Backbone.View.extend({
             commentType: $el.data('comment-type'),
             commentID: $el.data('issue-id'),
             commentURL: $el.data('comment-href'),
+            reviewID: $el.data('review-id'),
         });
     },
 
@@ -0,0 +1,55 @@
+(function() {
+
+
+const ParentView = RB.ReviewRequestPage.EntryView;
+
+
+/**
+ * A placeholder for an entry that hasn't been loaded yet.
+ *
+ * On review requests with a long history, older entries are shown as
+ * collapsed placeholders. Expanding a placeholder loads the full entry from
+ * the server, after which the page replaces this view with one for the
+ * loaded entry.
+ */
+RB.ReviewRequestPage.PlaceholderEntryView = ParentView.extend({
+    /**
+     * Initialize the view.
+     *
+     * Args:
+     *     options (object):
+     *          Options for the view.
+     *
+     * Option Args:
+     *     entryModelClass (function):
+     *         The model class to use for the loaded entry.
+     *
+     *     entryViewClass (function):
+     *         The view class to use for the loaded entry.
+     *
+     *     reviewRequestEditorView (RB.ReviewRequestEditorView):
+     *         The review request editor.
+     */
+    initialize(options) {
+        ParentView.prototype.initialize.apply(this, arguments);
+
+        this.entryModelClass = options.entryModelClass;
+        this.entryViewClass = options.entryViewClass;
+        this.reviewRequestEditorView = options.reviewRequestEditorView;
+    },
+
+    /**
+     * Expand the box.
+     *
+     * The box will show a loading indicator, and the full entry will be
+     * loaded from the server.
+     */
+    expand() {
+        ParentView.prototype.expand.call(this);
+
+        this.model.get('page').loadPlaceholderEntries([this.model]);
+    },
+});
+
+
+})();
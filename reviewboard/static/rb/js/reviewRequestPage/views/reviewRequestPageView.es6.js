@@ -60,6 +60,21 @@ RB.ReviewRequestPage.ReviewRequestPageView = RB.ReviewablePageView.extend({
         this.listenTo(this.model, 'applyingUpdate:entry', (metadata, html) => {
             const entryID = metadata.entryID;
             const entryView = this._entryViewsByID[entryID];
+
+            if (entryView.model.get('isPlaceholder')) {
+                /*
+                 * Placeholders are replaced with a new view for the loaded
+                 * entry, rather than reloaded.
+                 */
+                this.listenToOnce(
+                    this.model,
+                    `appliedUpdate:entry:${entryID}`,
+                    metadata => this._replacePlaceholderView(
+                        entryView, metadata, html));
+
+                return;
+            }
+
             const collapsed = entryView.isCollapsed();
 
             this._onApplyingUpdate(entryView, metadata);
@@ -231,6 +246,61 @@ RB.ReviewRequestPage.ReviewRequestPageView = RB.ReviewablePageView.extend({
         view.render();
     },
 
+    /**
+     * Replace a placeholder entry's view with the loaded entry.
+     *
+     * This will create a model and view for the entry using the classes
+     * provided to the placeholder, and swap them in for the placeholder's.
+     * The loaded entry will be expanded.
+     *
+     * Args:
+     *     placeholderView (RB.ReviewRequestPage.PlaceholderEntryView):
+     *         The view for the placeholder.
+     *
+     *     metadata (object):
+     *         The metadata set in the update.
+     *
+     *     html (string):
+     *         The HTML for the loaded entry.
+     */
+    _replacePlaceholderView(placeholderView, metadata, html) {
+        const placeholder = placeholderView.model;
+        const EntryModelClass = placeholderView.entryModelClass;
+        const EntryViewClass = placeholderView.entryViewClass;
+        const entry = new EntryModelClass(_.extend({
+            id: placeholder.id,
+            collapsed: false,
+            addedTimestamp: metadata.addedTimestamp,
+            updatedTimestamp: metadata.updatedTimestamp,
+            typeID: placeholder.get('typeID'),
+            reviewRequestEditor: placeholder.get('reviewRequestEditor'),
+        }, metadata.modelData), {
+            parse: true,
+        });
+        const $el = $(html);
+
+        placeholderView.$el.replaceWith($el);
+        placeholderView.undelegateEvents();
+        placeholderView.stopListening();
+        this.model.entries.remove(placeholder);
+
+        const entryView = new EntryViewClass(_.extend({
+            el: $el,
+            model: entry,
+            reviewRequestEditorView: placeholderView.reviewRequestEditorView,
+        }, metadata.viewOptions));
+
+        this._entryViews[this._entryViews.indexOf(placeholderView)] =
+            entryView;
+        this._entryViewsByID[entry.id] = entryView;
+        this.model.addEntry(entry);
+
+        if (this._rendered) {
+            entryView.render();
+            entryView.expand();
+        }
+    },
+
     /**
      * Handler for when a new update is being applied to a view.
      *
@@ -348,14 +418,25 @@ RB.ReviewRequestPage.ReviewRequestPageView = RB.ReviewablePageView.extend({
         e.preventDefault();
         e.stopPropagation();
 
-        this._entryViews.forEach(entryView => entryView.expand());
+        /*
+         * Placeholders are all loaded in a single request, rather than one
+         * request per placeholder. They'll be expanded once loaded.
+         */
+        this._entryViews.forEach(entryView => {
+            if (!entryView.model.get('isPlaceholder')) {
+                entryView.expand();
+            }
+        });
+
+        this.model.loadPlaceholderEntries(_.pluck(this._entryViews, 'model'));
     },
 
     /**
      * Handler for when an issue in the issue summary table is clicked.
      *
      * This will expand the review entry that contains the comment for the
-     * issue, and navigate to the comment.
+     * issue, and navigate to the comment. If the review is a placeholder,
+     * it will be loaded first.
      *
      * Args:
      *     params (object):
@@ -364,14 +445,30 @@ RB.ReviewRequestPage.ReviewRequestPageView = RB.ReviewablePageView.extend({
     _onIssueClicked(params) {
         const prefix = commentTypeToIDPrefix[params.commentType];
         const selector = `#${prefix}comment${params.commentID}`;
+        const reviewID = String(params.reviewID);
+        const placeholders = [];
 
         this._entryViews.forEach(entryView => {
-            if (entryView.$el.find(selector).length > 0) {
+            const entry = entryView.model;
+
+            if (entry.get('isPlaceholder')) {
+                if (entry.get('typeID') === 'review' &&
+                    entry.id === reviewID) {
+                    placeholders.push(entry);
+                }
+            } else if (entryView.$el.find(selector).length > 0) {
                 entryView.expand();
             }
         });
 
-        window.location = params.commentURL;
+        if (placeholders.length > 0) {
+            this.model.loadPlaceholderEntries(placeholders, () => {
+                window.location = params.commentURL;
+                this._onHashChanged();
+            });
+        } else {
+            window.location = params.commentURL;
+        }
     },
 });
 
@@ -353,6 +353,7 @@ PIPELINE_JAVASCRIPT = dict({
             'rb/js/reviewRequestPage/views/changeEntryView.es6.js',
             'rb/js/reviewRequestPage/views/initialStatusUpdatesEntryView.es6.js',
             'rb/js/reviewRequestPage/views/issueSummaryTableView.es6.js',
+            'rb/js/reviewRequestPage/views/placeholderEntryView.es6.js',
             'rb/js/reviewRequestPage/views/reviewEntryView.es6.js',
             'rb/js/reviewRequestPage/views/reviewReplyDraftBannerView.es6.js',
             'rb/js/reviewRequestPage/views/reviewReplyEditorView.es6.js',
@@ -0,0 +1,19 @@
+{% load djblets_js %}
+
+page.addEntryView(new {{entry.js_view_class}}({
+    el: $('#{{entry.get_dom_element_id}}'),
+    reviewRequestEditorView: page.reviewRequestEditorView,
+    entryModelClass: {{entry.entry_js_model_class}},
+    entryViewClass: {{entry.entry_js_view_class}},
+    model: new {{entry.js_model_class}}({
+        id: '{{entry.entry_id|escapejs}}',
+        collapsed: true,
+        isPlaceholder: true,
+        addedTimestamp: {{entry.added_timestamp|json_dumps}},
+        updatedTimestamp: {{entry.updated_timestamp|json_dumps}},
+        typeID: '{{entry.entry_type_id|escapejs}}',
+        reviewRequestEditor: page.model.reviewRequestEditor
+    }, {
+        parse: true
+    })
+}));
@@ -486,11 +486,13 @@ setup(
         'ldap': ['python-ldap'],
         'mercurial': ['mercurial'],
         'mysql': ['mysqlclient'],
+        'numpy': ['numpy'],
         'p4': ['p4python'],
         'postgres': ['psycopg2-binary'],
         's3': ['django-storages>=1.8,<1.9'],
         'subvertpy': ['subvertpy'],
         'swift': ['django-storage-swift'],
+        'zstd': ['zstandard'],
     },
     include_package_data=True,
     zip_safe=False,